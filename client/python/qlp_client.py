@@ -9,9 +9,13 @@ from dataclasses import dataclass
 from datetime import datetime
 import httpx
 import asyncio
+import json
 import time
 from urllib.parse import urljoin
 
+# Workflow states after which no further progress events are published
+TERMINAL_STATUSES = ("COMPLETED", "FAILED", "CANCELLED", "CANCELED", "TERMINATED", "TIMED_OUT")
+
 
 @dataclass
 class WorkflowResult:
@@ -265,11 +269,78 @@ class QLPClient:
         
         return response.content
     
+    async def _wait_for_terminal_event(
+        self,
+        workflow_id: str,
+        idle_check_interval: float = 10.0,
+        max_reconnects: int = 3
+    ) -> bool:
+        """
+        Follow the progress stream until the workflow finishes; False if streaming is unavailable
+
+        Cancelled, terminated and timed-out workflows publish no terminal event,
+        and keepalives hold the stream open, so the status is also checked
+        whenever no event has arrived for ``idle_check_interval`` seconds.
+        """
+        last_event = [time.monotonic()]
+        stream = asyncio.ensure_future(self._follow_progress_stream(workflow_id, last_event, max_reconnects))
+        watch = asyncio.ensure_future(self._check_status_when_idle(workflow_id, last_event, idle_check_interval))
+        try:
+            done, _ = await asyncio.wait({stream, watch}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            stream.cancel()
+            watch.cancel()
+        return watch in done or stream.result()
+
+    async def _follow_progress_stream(self, workflow_id: str, last_event: List[float], max_reconnects: int) -> bool:
+        """True on a terminal event; False when the stream is unavailable or delivers no events"""
+        url = urljoin(self.base_url, f"/progress/stream/{workflow_id}")
+        last_event_id = None
+        for _ in range(max_reconnects + 1):
+            headers = {"Last-Event-ID": last_event_id} if last_event_id else {}
+            events = 0
+            try:
+                async with self.client.stream("GET", url, headers=headers,
+                                              timeout=httpx.Timeout(10.0, read=60.0)) as response:
+                    if response.status_code != 200:
+                        return False
+                    async for line in response.aiter_lines():
+                        if line.startswith("id: "):
+                            last_event_id = line[4:]
+                        elif line.startswith("data: "):
+                            events += 1
+                            last_event[0] = time.monotonic()
+                            event = json.loads(line[6:])
+                            if event.get("type") in ("workflow_completed", "workflow_failed"):
+                                return True
+            except (httpx.HTTPError, json.JSONDecodeError):
+                pass
+            if not events:
+                # Nothing but keepalives, or no connection: poll instead
+                return False
+        return False
+
+    async def _check_status_when_idle(self, workflow_id: str, last_event: List[float], interval: float) -> None:
+        """Returns once a status check made while the stream is quiet shows the workflow has ended"""
+        while True:
+            idle = time.monotonic() - last_event[0]
+            if idle < interval:
+                await asyncio.sleep(interval - idle)
+                continue
+            try:
+                status = await self.get_status(workflow_id)
+                if status.status.upper() in TERMINAL_STATUSES:
+                    return
+            except httpx.HTTPError:
+                pass
+            last_event[0] = time.monotonic()
+
     async def wait_for_completion(
         self,
         workflow_id: str,
         poll_interval: float = 2.0,
-        timeout: Optional[float] = None
+        timeout: Optional[float] = None,
+        idle_check_interval: float = 10.0
     ) -> CapsuleResult:
         """
         Wait for workflow to complete and return result
@@ -278,6 +349,7 @@ class QLPClient:
             workflow_id: Workflow ID to monitor
             poll_interval: Seconds between status checks
             timeout: Maximum seconds to wait (None for no timeout)
+            idle_check_interval: Seconds without a progress event before the status is checked
             
         Returns:
             CapsuleResult when workflow completes
@@ -288,15 +360,30 @@ class QLPClient:
         """
         start_time = time.time()
         
+        # Wait on the push stream; the status check below then runs once,
+        # or takes over at once if the stream is unavailable
+        try:
+            await asyncio.wait_for(
+                self._wait_for_terminal_event(workflow_id, idle_check_interval=idle_check_interval),
+                timeout=timeout
+            )
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"Workflow did not complete within {timeout}s")
+        
         while True:
             status = await self.get_status(workflow_id)
+            state = status.status.upper()
             
-            if status.status == "COMPLETED":
+            if state == "COMPLETED":
                 return await self.get_result(workflow_id)
-            elif status.status == "FAILED":
+            elif state == "FAILED":
                 raise RuntimeError(f"Workflow failed: {workflow_id}")
-            elif status.status == "CANCELLED":
+            elif state in ("CANCELLED", "CANCELED"):
                 raise RuntimeError(f"Workflow cancelled: {workflow_id}")
+            elif state == "TERMINATED":
+                raise RuntimeError(f"Workflow terminated: {workflow_id}")
+            elif state == "TIMED_OUT":
+                raise RuntimeError(f"Workflow timed out: {workflow_id}")
             
             # Check timeout
             if timeout and (time.time() - start_time) > timeout:
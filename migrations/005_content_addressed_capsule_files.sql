@@ -0,0 +1,15 @@
+-- Migration: Content-addressed capsule files
+-- Version: 005
+-- Description: Store capsule files once in a blob store and keep path -> hash manifests on capsules and versions
+
+-- Blobs for the postgres blob store backend (STORAGE_BACKEND=postgres)
+CREATE TABLE IF NOT EXISTS capsule_blobs (
+    hash VARCHAR(64) PRIMARY KEY,
+    size INTEGER NOT NULL,
+    data BYTEA NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Manifests; rows without one still carry their files inline
+ALTER TABLE capsules ADD COLUMN IF NOT EXISTS file_manifest JSONB;
+ALTER TABLE capsule_versions ADD COLUMN IF NOT EXISTS file_manifest JSONB;
@@ -0,0 +1,6 @@
+-- Migration: Capsule listing indexes
+-- Version: 006
+-- Description: Keyset pagination of capsule listings by (created_at, id) within a tenant or user
+
+CREATE INDEX IF NOT EXISTS idx_capsule_tenant_created_id ON capsules (tenant_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_capsule_tenant_user_created_id ON capsules (tenant_id, user_id, created_at, id);
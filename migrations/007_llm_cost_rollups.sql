@@ -0,0 +1,70 @@
+-- Migration: LLM cost rollups
+-- Version: 007
+-- Description: Incrementally maintained cost totals per workflow, per tenant per day and per model per day,
+--              so cost reports read a few rows instead of aggregating llm_usage
+
+CREATE TABLE IF NOT EXISTS llm_cost_workflow_rollups (
+    workflow_id VARCHAR(255) NOT NULL,
+    provider VARCHAR(50) NOT NULL,
+    model VARCHAR(100) NOT NULL,
+    tenant_id VARCHAR(255) NOT NULL,
+    request_count BIGINT NOT NULL DEFAULT 0,
+    input_tokens BIGINT NOT NULL DEFAULT 0,
+    output_tokens BIGINT NOT NULL DEFAULT 0,
+    cost_usd DECIMAL(16, 6) NOT NULL DEFAULT 0,
+    first_request TIMESTAMP WITH TIME ZONE,
+    last_request TIMESTAMP WITH TIME ZONE,
+    PRIMARY KEY (workflow_id, provider, model)
+);
+
+CREATE TABLE IF NOT EXISTS llm_cost_tenant_daily_rollups (
+    tenant_id VARCHAR(255) NOT NULL,
+    usage_date DATE NOT NULL,
+    request_count BIGINT NOT NULL DEFAULT 0,
+    input_tokens BIGINT NOT NULL DEFAULT 0,
+    output_tokens BIGINT NOT NULL DEFAULT 0,
+    cost_usd DECIMAL(16, 6) NOT NULL DEFAULT 0,
+    PRIMARY KEY (tenant_id, usage_date)
+);
+
+CREATE TABLE IF NOT EXISTS llm_cost_model_daily_rollups (
+    usage_date DATE NOT NULL,
+    provider VARCHAR(50) NOT NULL,
+    model VARCHAR(100) NOT NULL,
+    request_count BIGINT NOT NULL DEFAULT 0,
+    input_tokens BIGINT NOT NULL DEFAULT 0,
+    output_tokens BIGINT NOT NULL DEFAULT 0,
+    cost_usd DECIMAL(16, 6) NOT NULL DEFAULT 0,
+    PRIMARY KEY (usage_date, provider, model)
+);
+
+-- Backfill from usage recorded before the rollups existed
+INSERT INTO llm_cost_workflow_rollups
+    (workflow_id, provider, model, tenant_id, request_count, input_tokens, output_tokens, cost_usd,
+     first_request, last_request)
+SELECT workflow_id, provider, model, MIN(tenant_id), COUNT(*), SUM(input_tokens), SUM(output_tokens),
+       SUM(total_cost_usd), MIN(created_at), MAX(created_at)
+FROM llm_usage
+WHERE workflow_id IS NOT NULL
+GROUP BY workflow_id, provider, model
+ON CONFLICT DO NOTHING;
+
+INSERT INTO llm_cost_tenant_daily_rollups
+    (tenant_id, usage_date, request_count, input_tokens, output_tokens, cost_usd)
+SELECT tenant_id, DATE(created_at AT TIME ZONE 'UTC'), COUNT(*), SUM(input_tokens), SUM(output_tokens),
+       SUM(total_cost_usd)
+FROM llm_usage
+GROUP BY tenant_id, DATE(created_at AT TIME ZONE 'UTC')
+ON CONFLICT DO NOTHING;
+
+INSERT INTO llm_cost_model_daily_rollups
+    (usage_date, provider, model, request_count, input_tokens, output_tokens, cost_usd)
+SELECT DATE(created_at AT TIME ZONE 'UTC'), provider, model, COUNT(*), SUM(input_tokens), SUM(output_tokens),
+       SUM(total_cost_usd)
+FROM llm_usage
+GROUP BY DATE(created_at AT TIME ZONE 'UTC'), provider, model
+ON CONFLICT DO NOTHING;
+
+COMMENT ON TABLE llm_cost_workflow_rollups IS 'LLM cost totals per workflow and model, maintained on each usage flush';
+COMMENT ON TABLE llm_cost_tenant_daily_rollups IS 'LLM cost totals per tenant per UTC day, maintained on each usage flush';
+COMMENT ON TABLE llm_cost_model_daily_rollups IS 'LLM cost totals per model per UTC day, maintained on each usage flush';
@@ -6,6 +6,7 @@ import httpx
 import asyncio
 import json
 import os
+import time
 import zipfile
 import tarfile
 from typing import Dict, Any, Optional
@@ -76,6 +77,108 @@ class QLPClient:
             except Exception as e:
                 raise GenerationError(f"Request failed: {str(e)}")
     
+    async def _follow_progress_stream(
+        self,
+        client: httpx.AsyncClient,
+        workflow_id: str,
+        progress: Optional[Progress] = None,
+        task: Optional[int] = None,
+        max_reconnects: int = 3,
+        idle_check_interval: float = 10.0
+    ) -> bool:
+        """Follow the server's push progress stream; True once the workflow has finished
+        
+        Cancelled, terminated and timed-out workflows publish no terminal event and
+        keepalives hold the stream open, so the status is also checked whenever no
+        event has arrived for ``idle_check_interval`` seconds. Returns False, for the
+        caller to poll instead, when the stream is unavailable or delivers no events.
+        """
+        last_event = [time.monotonic()]
+        stream = asyncio.ensure_future(
+            self._read_progress_stream(client, workflow_id, last_event, progress, task, max_reconnects)
+        )
+        watch = asyncio.ensure_future(
+            self._check_status_when_idle(client, workflow_id, last_event, idle_check_interval)
+        )
+        try:
+            done, _ = await asyncio.wait({stream, watch}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            stream.cancel()
+            watch.cancel()
+        return watch in done or stream.result()
+    
+    async def _read_progress_stream(
+        self,
+        client: httpx.AsyncClient,
+        workflow_id: str,
+        last_event: list,
+        progress: Optional[Progress],
+        task: Optional[int],
+        max_reconnects: int
+    ) -> bool:
+        last_event_id = None
+        for _ in range(max_reconnects + 1):
+            headers = dict(self.headers)
+            if last_event_id:
+                headers['Last-Event-ID'] = last_event_id
+            events = 0
+            try:
+                async with client.stream(
+                    "GET",
+                    f"{self.base_url}/progress/stream/{workflow_id}",
+                    headers=headers,
+                    timeout=httpx.Timeout(10.0, read=60.0)
+                ) as response:
+                    if response.status_code != 200:
+                        return False
+                    async for line in response.aiter_lines():
+                        if line.startswith('id: '):
+                            last_event_id = line[4:]
+                        elif line.startswith('data: '):
+                            events += 1
+                            last_event[0] = time.monotonic()
+                            event = json.loads(line[6:])
+                            if event.get('type') in ('workflow_completed', 'workflow_failed'):
+                                return True
+                            data = event.get('data', {})
+                            if progress and task is not None and 'progress_percentage' in data:
+                                done = len(data.get('completed_tasks', []))
+                                progress.update(
+                                    task,
+                                    completed=min(90, 10 + data['progress_percentage'] * 0.8),
+                                    description=f"Processing... ({done} task(s) just completed)"
+                                )
+            except (httpx.HTTPError, json.JSONDecodeError):
+                pass
+            if not events:
+                # Nothing but keepalives, or no connection: poll instead
+                return False
+        return False
+    
+    async def _check_status_when_idle(
+        self,
+        client: httpx.AsyncClient,
+        workflow_id: str,
+        last_event: list,
+        interval: float
+    ) -> None:
+        """Returns once a status check made while the stream is quiet shows the workflow has ended"""
+        while True:
+            idle = time.monotonic() - last_event[0]
+            if idle < interval:
+                await asyncio.sleep(interval - idle)
+                continue
+            try:
+                response = await client.get(
+                    f"{self.base_url}/workflow/status/{workflow_id}",
+                    headers=self.headers
+                )
+                if response.status_code == 200 and response.json().get('status') not in ('running', 'unknown', None):
+                    return
+            except (httpx.HTTPError, ValueError):
+                pass
+            last_event[0] = time.monotonic()
+    
     async def poll_workflow_status(
         self, 
         workflow_id: str,
@@ -86,7 +189,18 @@ class QLPClient:
         """Poll workflow status until completion"""
         
         async with httpx.AsyncClient(timeout=10.0) as client:
-            max_attempts = timeout_minutes * 30  # Check every 2 seconds
+            deadline = time.monotonic() + timeout_minutes * 60
+            # Prefer one push connection; polling then only fetches the final status
+            try:
+                await asyncio.wait_for(
+                    self._follow_progress_stream(client, workflow_id, progress, task),
+                    timeout=timeout_minutes * 60
+                )
+            except asyncio.TimeoutError:
+                pass
+            
+            # Polling shares the one deadline with the stream; one last check once it has passed
+            max_attempts = max(1, int((deadline - time.monotonic()) / 2))  # Check every 2 seconds
             attempt = 0
             
             while attempt < max_attempts:
@@ -106,8 +220,8 @@ class QLPClient:
                         
                         status = data.get('status', 'unknown')
                         
-                        # Handle completed workflow
-                        if status == 'completed':
+                        # Handle finished workflow; partial runs still produced a capsule
+                        if status in ('completed', 'partial'):
                             # Extract result
                             result = data.get('result', {})
                             
@@ -121,11 +235,13 @@ class QLPClient:
                                     raise GenerationError(f"{error_msg}{tasks_info}")
                             
                             if progress and task is not None:
-                                progress.update(task, completed=100, description="Generation complete!")
+                                description = ("Generation complete!" if status == 'completed'
+                                               else "Generation finished with failed tasks")
+                                progress.update(task, completed=100, description=description)
                             
                             if isinstance(result, dict) and 'capsule_id' in result:
                                 return {
-                                    'status': 'completed',
+                                    'status': status,
                                     'result': result
                                 }
                             else:
@@ -207,7 +323,7 @@ class QLPClient:
                                 )
                         
                         # Handle failed/error/terminated/canceled workflows
-                        elif status in ['failed', 'error', 'terminated', 'canceled']:
+                        elif status in ['failed', 'error', 'terminated', 'canceled', 'timed_out']:
                             error_msg = data.get('error', f'Workflow {status}')
                             raise GenerationError(f"Workflow {status}: {error_msg}")
                         
@@ -289,8 +289,8 @@ async def show_live_progress(client, workflow_id: str, timeout_minutes: int = 30
                         display.update(data)
                         live.update(display.create_layout())
                         
-                        # Check if completed
-                        if status == 'completed':
+                        # Check if completed (partial runs still produced a capsule)
+                        if status in ('completed', 'partial'):
                             display.progress_pct = 100
                             display.activity_tracker.update_current("completed")
                             live.update(display.create_layout())
@@ -192,7 +192,9 @@ async def _generate_async(client: QLPClient, description: str, language: str,
                 )
         
         # Handle workflow completion (same for both live and standard display)
-        if status['status'] == 'completed':
+        if status['status'] in ('completed', 'partial'):
+            if status['status'] == 'partial':
+                console.print("\n[yellow]Warning:[/] Some tasks failed; the capsule is incomplete")
             # Get capsule info safely
             result = status.get('result', {})
             capsule_id = result.get('capsule_id') if isinstance(result, dict) else None
@@ -401,8 +403,11 @@ async def _check_status(client: QLPClient, workflow_id: str):
             status = data.get('status', 'unknown')
             
             # Check if completed
-            if status == 'completed':
-                console.print("[bold green]✅ Workflow completed![/]\n")
+            if status in ('completed', 'partial'):
+                if status == 'completed':
+                    console.print("[bold green]✅ Workflow completed![/]\n")
+                else:
+                    console.print("[bold yellow]⚠️  Workflow completed with failed tasks[/]\n")
                 
                 table = Table(show_header=False)
                 table.add_column("Property", style="cyan")
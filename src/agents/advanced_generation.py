@@ -24,6 +24,7 @@ from src.memory.client import VectorMemoryClient
 from src.validation.client import ValidationMeshClient
 from src.sandbox.client import SandboxServiceClient
 from src.common.config import settings
+from src.common.language_classifier import classify_code
 from src.mcp.context_manager import ContextManager
 
 logger = structlog.get_logger()
@@ -671,6 +672,29 @@ class StaticAnalysisLoop:
         return max(0.0, min(1.0, score))
 
 
+# File extension and interpreter for languages whose test cases run as a sandbox batch
+BATCH_TEST_RUNNERS = {
+    "python": (".py", "python"),
+    "javascript": (".js", "node"),
+}
+
+
+def _inject_case_inputs(code: str, language: str, case_input: Any) -> str:
+    """Prepend a test case's input as variables, as the sandbox does for /execute inputs"""
+    if not isinstance(case_input, dict):
+        case_input = {"test_input": case_input} if case_input is not None else {}
+    inputs = {key: value for key, value in case_input.items() if str(key).isidentifier()}
+    if not inputs:
+        return code
+    if language == "python":
+        prelude = "# Injected inputs\n" + "".join(f"{key} = {value!r}\n" for key, value in inputs.items())
+    else:
+        prelude = "// Injected inputs\n" + "".join(
+            f"const {key} = {json.dumps(value)};\n" for key, value in inputs.items()
+        )
+    return prelude + "\n" + code
+
+
 class ExecutionBasedValidator:
     """Validate generated code through actual execution"""
     
@@ -681,28 +705,8 @@ class ExecutionBasedValidator:
     
     def _detect_language(self, code: str) -> str:
         """Detect programming language from code content"""
-        # Simple heuristic-based detection
-        code_lower = code.lower()
-        
-        if 'def ' in code and ':' in code:
-            return 'python'
-        elif 'function' in code and ('{' in code or '=>' in code):
-            return 'javascript'
-        elif '#include' in code or 'int main' in code:
-            return 'cpp'
-        elif 'class' in code and 'public static void main' in code:
-            return 'java'
-        elif 'package main' in code or 'func main' in code:
-            return 'go'
-        elif 'fn main' in code or 'let mut' in code:
-            return 'rust'
-        elif '<?php' in code:
-            return 'php'
-        elif 'using System;' in code or 'namespace' in code:
-            return 'csharp'
-        else:
-            # Default to python if uncertain
-            return 'python'
+        # Default to python if uncertain
+        return classify_code(code).language or 'python'
     
     async def generate_and_validate(self, spec: Dict[str, Any]) -> GenerationResult:
         """Generate code and validate through execution"""
@@ -787,6 +791,12 @@ class ExecutionBasedValidator:
         # Detect language from code or use default
         language = self._detect_language(code)
         
+        if language in BATCH_TEST_RUNNERS and test_cases:
+            try:
+                return await self._execute_test_cases_batch(code, language, test_cases)
+            except Exception as e:
+                logger.warning(f"Batch execution unavailable, falling back to single run: {e}")
+        
         # For now, simplified execution without test case injection
         # TODO: Implement language-specific test execution strategies
         try:
@@ -832,6 +842,59 @@ class ExecutionBasedValidator:
                 "performance": {"execution_time": 0.1, "memory_used": "10MB"}
             }
     
+    async def _execute_test_cases_batch(self, code: str, language: str,
+                                        test_cases: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Run every test case in one sandbox container, each with its own input and arguments"""
+        extension, interpreter = BATCH_TEST_RUNNERS[language]
+        files = {}
+        tests = []
+        for i, case in enumerate(test_cases):
+            case_file = f"case_{i}{extension}"
+            files[case_file] = _inject_case_inputs(code, language, case.get("input"))
+            tests.append({
+                "name": case.get("name") or f"case_{i}_{case.get('type', 'basic')}",
+                "command": [interpreter, case_file, *(str(arg) for arg in case.get("args") or [])]
+            })
+        
+        batch = await self.sandbox_client.execute_batch(
+            files=files,
+            language=language,
+            tests=tests
+        )
+        
+        failures = []
+        total_time = 0.0
+        for case, result in zip(test_cases, batch["cases"]):
+            total_time += result.get("duration_ms", 0) / 1000.0
+            expected_output = case.get("expected_output")
+            passed = result["passed"] and (
+                not isinstance(expected_output, (str, int, float))
+                or str(expected_output) in (result.get("output") or "")
+            )
+            if not passed:
+                failures.append({
+                    "test_case": result["name"],
+                    "input": case.get("input", {}),
+                    "args": case.get("args", []),
+                    "expected_output": expected_output,
+                    "status": result["status"],
+                    "error": result.get("error"),
+                    "output": result.get("output")
+                })
+        
+        passed_count = len(batch["cases"]) - len(failures)
+        return {
+            "all_passed": not failures and len(batch["cases"]) == len(test_cases),
+            "pass_rate": passed_count / len(test_cases),
+            "failures": failures,
+            "performance": {
+                "execution_time": total_time,
+                "memory_used": 0
+            },
+            "test_results": batch["cases"],
+            "output": "\n".join(r.get("output") or "" for r in batch["cases"])
+        }
+    
     async def _refine_based_on_execution(self, code: str, failures: List[Dict], spec: Dict[str, Any]) -> str:
         """Refine code based on execution failures"""
         refinement_prompt = f"""
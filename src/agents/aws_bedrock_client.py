@@ -7,7 +7,7 @@ import asyncio
 import json
 import time
 from datetime import datetime, timezone
-from typing import Dict, Any, Optional, List, Tuple
+from typing import Dict, Any, Optional, List, Tuple, AsyncGenerator
 from dataclasses import dataclass, field
 from enum import Enum
 import logging
@@ -27,6 +27,7 @@ from tenacity import (
 )
 
 from src.common.config import settings
+from src.agents.llm_streaming import StreamChunk
 
 logger = structlog.get_logger()
 
@@ -191,6 +192,38 @@ class BedrockModelRegistry:
         return [model for model in cls.MODELS.values() if model.family == family]
 
 
+# Errors a response stream can raise in place of an event
+STREAM_ERRORS = {
+    "throttlingException": BedrockRateLimitError,
+    "modelTimeoutException": BedrockTimeoutError,
+    "validationException": BedrockModelNotFoundError,
+}
+
+_STREAM_END = object()
+
+
+def _client_error(e: ClientError) -> BedrockError:
+    """Map a botocore ClientError to the Bedrock error it stands for"""
+    error_code = e.response['Error']['Code']
+    error_message = e.response['Error']['Message']
+    
+    if error_code == 'ThrottlingException':
+        return BedrockRateLimitError(f"Rate limit exceeded: {error_message}")
+    elif error_code == 'ValidationException':
+        return BedrockModelNotFoundError(f"Model validation error: {error_message}")
+    elif error_code == 'TimeoutError':
+        return BedrockTimeoutError(f"Request timeout: {error_message}")
+    else:
+        return BedrockError(f"Bedrock API error ({error_code}): {error_message}")
+
+
+def _stream_error(event: Dict[str, Any]) -> BedrockError:
+    """Map an exception event from a response stream to a Bedrock error"""
+    name = next(iter(event), "unknown")
+    message = (event.get(name) or {}).get("message", name)
+    return STREAM_ERRORS.get(name, BedrockError)(f"Bedrock stream error ({name}): {message}")
+
+
 class ProductionBedrockClient:
     """
     Production-grade AWS Bedrock client with enterprise features:
@@ -439,17 +472,44 @@ class ProductionBedrockClient:
             return response_body
             
         except ClientError as e:
-            error_code = e.response['Error']['Code']
-            error_message = e.response['Error']['Message']
+            raise _client_error(e)
+        
+        except BotoCoreError as e:
+            raise BedrockError(f"Boto core error: {e}")
+        
+        except Exception as e:
+            raise BedrockError(f"Unexpected error: {e}")
+    
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=2, max=10),
+        retry=retry_if_exception_type((ClientError, BotoCoreError, BedrockTimeoutError)),
+        before_sleep=before_sleep_log(logger, logging.INFO),
+        after=after_log(logger, logging.INFO)
+    )
+    async def _invoke_model_stream_with_retry(
+        self,
+        model_id: str,
+        body: Dict[str, Any],
+        **kwargs
+    ) -> Any:
+        """Open a response stream with retry logic; returns the botocore event stream"""
+        try:
+            loop = asyncio.get_event_loop()
+            response = await loop.run_in_executor(
+                None,
+                lambda: self._client.invoke_model_with_response_stream(
+                    modelId=model_id,
+                    body=json.dumps(body),
+                    contentType='application/json',
+                    accept='application/json',
+                    **kwargs
+                )
+            )
+            return response['body']
             
-            if error_code == 'ThrottlingException':
-                raise BedrockRateLimitError(f"Rate limit exceeded: {error_message}")
-            elif error_code == 'ValidationException':
-                raise BedrockModelNotFoundError(f"Model validation error: {error_message}")
-            elif error_code == 'TimeoutError':
-                raise BedrockTimeoutError(f"Request timeout: {error_message}")
-            else:
-                raise BedrockError(f"Bedrock API error ({error_code}): {error_message}")
+        except ClientError as e:
+            raise _client_error(e)
         
         except BotoCoreError as e:
             raise BedrockError(f"Boto core error: {e}")
@@ -457,6 +517,64 @@ class ProductionBedrockClient:
         except Exception as e:
             raise BedrockError(f"Unexpected error: {e}")
     
+    @staticmethod
+    def _pump_stream_events(events: Any, queue: asyncio.Queue, loop: asyncio.AbstractEventLoop):
+        """Read a response stream on a worker thread, handing each event to the event loop"""
+        def put(item):
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+            except RuntimeError:
+                pass  # The event loop closed while the stream was being read
+        
+        try:
+            for event in events:
+                if "chunk" in event:
+                    put(json.loads(event["chunk"]["bytes"]))
+                else:
+                    # Errors raised mid-stream arrive as exception events
+                    put(_stream_error(event))
+                    return
+        except Exception as e:
+            put(BedrockError(f"Response stream failed: {e}"))
+        finally:
+            put(_STREAM_END)
+    
+    def _parse_bedrock_stream_event(self, event: Dict[str, Any], model_family: BedrockModelFamily) -> StreamChunk:
+        """Parse one response stream event from specific model families"""
+        # Bedrock appends invocation metrics, with exact token counts, to the last event
+        metrics = event.get("amazon-bedrock-invocationMetrics") or {}
+        usage = None
+        if "inputTokenCount" in metrics:
+            usage = {"prompt_tokens": metrics["inputTokenCount"], "completion_tokens": metrics["outputTokenCount"]}
+        
+        if model_family == BedrockModelFamily.CLAUDE:
+            # Claude streams Messages API events
+            event_type = event.get("type")
+            if event_type == "message_start":
+                input_tokens = event.get("message", {}).get("usage", {}).get("input_tokens")
+                return StreamChunk(usage=usage or ({"prompt_tokens": input_tokens} if input_tokens is not None else None))
+            if event_type == "content_block_delta":
+                return StreamChunk(delta=event.get("delta", {}).get("text", ""), usage=usage)
+            if event_type == "message_delta":
+                output_tokens = event.get("usage", {}).get("output_tokens")
+                return StreamChunk(
+                    finish_reason=event.get("delta", {}).get("stop_reason"),
+                    usage=usage or ({"completion_tokens": output_tokens} if output_tokens is not None else None)
+                )
+            return StreamChunk(usage=usage)
+        
+        elif model_family == BedrockModelFamily.TITAN:
+            return StreamChunk(delta=event.get("outputText", ""), usage=usage,
+                               finish_reason=event.get("completionReason"))
+        
+        elif model_family == BedrockModelFamily.COHERE:
+            return StreamChunk(delta=event.get("text", ""), usage=usage,
+                               finish_reason=event.get("finish_reason"))
+        
+        else:
+            return StreamChunk(delta=event.get("generation") or event.get("completion") or "", usage=usage,
+                               finish_reason=event.get("stop_reason"))
+    
     async def chat_completion(
         self,
         messages: List[Dict[str, str]],
@@ -544,28 +662,131 @@ class ProductionBedrockClient:
                 }
                 
             except Exception as e:
-                # Update metrics and circuit breaker
+                self._record_failure(e, model, start_time)
+                raise
+    
+    async def stream_chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        model: str,
+        temperature: float = 0.3,
+        max_tokens: int = 2000,
+        **kwargs
+    ) -> AsyncGenerator[StreamChunk, None]:
+        """
+        Stream a chat completion using AWS Bedrock
+        
+        Args:
+            messages: List of message dictionaries
+            model: Bedrock model ID
+            temperature: Sampling temperature
+            max_tokens: Maximum tokens to generate
+            **kwargs: Additional model-specific parameters
+            
+        Yields:
+            A StreamChunk per response stream event, then one with the cost
+        """
+        start_time = time.time()
+        
+        # Check circuit breaker
+        if self._check_circuit_breaker():
+            raise BedrockError("Circuit breaker is open")
+        
+        # Get model configuration
+        model_config = BedrockModelRegistry.get_model(model)
+        if not model_config:
+            raise BedrockModelNotFoundError(f"Model {model} not found in registry")
+        
+        if not model_config.supports_streaming:
+            response = await self.chat_completion(messages, model, temperature, max_tokens, **kwargs)
+            yield StreamChunk(delta=response["content"], usage=response["usage"], model=model,
+                              finish_reason=response["finish_reason"], cost=response["cost"])
+            return
+        
+        # Limit concurrent requests; the slot is held until the stream ends
+        async with self.semaphore:
+            events = None
+            try:
+                body = self._format_messages_for_bedrock(messages, model_config.family)
+                body.update({
+                    "max_tokens": min(max_tokens, model_config.max_tokens),
+                    "temperature": temperature,
+                    **kwargs
+                })
+                
+                events = await self._invoke_model_stream_with_retry(model, body)
+                
+                # boto3 reads the stream synchronously, so a worker thread feeds it to the loop
+                loop = asyncio.get_running_loop()
+                queue: asyncio.Queue = asyncio.Queue()
+                loop.run_in_executor(None, self._pump_stream_events, events, queue, loop)
+                
+                usage = {"prompt_tokens": 0, "completion_tokens": 0}
+                while True:
+                    item = await queue.get()
+                    if item is _STREAM_END:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+                    chunk = self._parse_bedrock_stream_event(item, model_config.family)
+                    if chunk.usage:
+                        usage.update(chunk.usage)
+                    yield chunk
+                
                 latency = time.time() - start_time
-                error_type = "general"
+                self.metrics.update_success(latency)
+                self._update_circuit_breaker(True)
                 
-                if isinstance(e, BedrockRateLimitError):
-                    error_type = "throttle"
-                elif isinstance(e, BedrockTimeoutError):
-                    error_type = "timeout"
+                input_cost = (usage["prompt_tokens"] / 1000) * model_config.cost_per_1k_input
+                output_cost = (usage["completion_tokens"] / 1000) * model_config.cost_per_1k_output
+                total_cost = input_cost + output_cost
                 
-                self.metrics.update_failure(str(e), error_type)
-                self._update_circuit_breaker(False)
+                if settings.AWS_BEDROCK_ENABLE_LOGGING:
+                    logger.info(
+                        "Bedrock streamed completion successful",
+                        model=model,
+                        region=self.region,
+                        latency=f"{latency:.3f}s",
+                        prompt_tokens=usage["prompt_tokens"],
+                        completion_tokens=usage["completion_tokens"],
+                        cost_usd=f"${total_cost:.6f}"
+                    )
                 
-                logger.error(
-                    "Bedrock completion failed",
-                    model=model,
-                    region=self.region,
-                    error=str(e),
-                    error_type=error_type,
-                    latency=f"{latency:.3f}s"
-                )
+                yield StreamChunk(model=model, cost={
+                    "input_cost_usd": input_cost,
+                    "output_cost_usd": output_cost,
+                    "total_cost_usd": total_cost
+                })
                 
+            except Exception as e:
+                self._record_failure(e, model, start_time)
                 raise
+            finally:
+                if events is not None:
+                    # Also ends the worker thread's read when the consumer stops early
+                    events.close()
+    
+    def _record_failure(self, error: Exception, model: str, start_time: float):
+        """Update metrics and circuit breaker for a failed request"""
+        latency = time.time() - start_time
+        error_type = "general"
+        
+        if isinstance(error, BedrockRateLimitError):
+            error_type = "throttle"
+        elif isinstance(error, BedrockTimeoutError):
+            error_type = "timeout"
+        
+        self.metrics.update_failure(str(error), error_type)
+        self._update_circuit_breaker(False)
+        
+        logger.error(
+            "Bedrock completion failed",
+            model=model,
+            region=self.region,
+            error=str(error),
+            error_type=error_type,
+            latency=f"{latency:.3f}s"
+        )
     
     def get_health_status(self) -> Dict[str, Any]:
         """Get comprehensive health status"""
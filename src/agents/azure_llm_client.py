@@ -3,7 +3,7 @@ Azure OpenAI client wrapper for QLP
 Provides a unified interface for both OpenAI and Azure OpenAI
 """
 
-from typing import Dict, Any, Optional, List, Union
+from typing import Dict, Any, Optional, List, Union, AsyncGenerator
 from datetime import datetime
 import asyncio
 import os
@@ -27,6 +27,11 @@ from src.common.config import settings
 from src.agents.azure_llm_optimized import optimized_azure_client
 from src.common.cost_calculator_persistent import track_llm_cost
 from src.agents.rate_limiter import global_rate_limiter, rate_limit_handler, RateLimitBackoff
+from src.agents.llm_cache import CachePolicy, DEFAULT_POLICY, LLMResponseCache
+from src.agents.llm_streaming import (
+    AbortCheck, CompletionStream, StreamAborted, StreamChunk, StreamProgress, TokenMeter,
+    anthropic_chunk, openai_chunk
+)
 
 logger = structlog.get_logger()
 
@@ -81,6 +86,13 @@ class LLMClient:
             "retries": 0,
             "total_latency": 0
         }
+        self.response_cache = LLMResponseCache(
+            embed_fn=self._embed,
+            redis_url=settings.REDIS_URL,
+            max_entries=settings.LLM_CACHE_MEMORY_ENTRIES,
+            similarity_entries=settings.LLM_SIMILARITY_CACHE_ENTRIES,
+            ttl_seconds=settings.LLM_CACHE_TTL_SECONDS
+        )
     
     @property
     def request_semaphore(self):
@@ -202,12 +214,9 @@ class LLMClient:
                 
                 await asyncio.sleep(delay)
                 
-                # Optionally reduce rate limits if we keep hitting them
+                # Reduce rate limits fleet-wide if we keep hitting them
                 if attempt >= 2:
-                    current_rpm = global_rate_limiter.provider_limits.get(provider.value, {}).get("rpm", 60)
-                    reduced_rpm = int(current_rpm * 0.8)
-                    global_rate_limiter.update_limits(provider.value, rpm=reduced_rpm)
-                    logger.info(f"Reduced {provider.value} rate limit to {reduced_rpm} RPM")
+                    await global_rate_limiter.report_rate_limited(provider.value, deployment=model)
                 
             except Exception as e:
                 # Non-retryable error
@@ -235,6 +244,10 @@ class LLMClient:
         user_id: Optional[str] = None,
         task_id: Optional[str] = None,
         metadata: Optional[Dict[str, Any]] = None,
+        cache: Optional[CachePolicy] = None,
+        stream: bool = False,
+        should_abort: Optional[AbortCheck] = None,
+        progress: Optional[StreamProgress] = None,
         **kwargs
     ) -> Dict[str, Any]:
         """
@@ -247,10 +260,18 @@ class LLMClient:
             temperature: Sampling temperature
             max_tokens: Maximum tokens to generate
             timeout: Request timeout in seconds
+            cache: How this call site shares deterministic (temperature 0)
+                responses; coalescing and exact matches by default
+            stream: Generate through the provider's stream (implied by
+                should_abort and progress)
+            should_abort: Asked with the text so far after each generated
+                line; a reason stops the generation and raises StreamAborted
+            progress: Forwards the generated text into a progress stream
             **kwargs: Additional provider-specific parameters
             
         Returns:
-            Completion response dict with 'content' and metadata
+            Completion response dict with 'content' and metadata; responses
+            served from the cache carry 'cached' and 'cache_hit'
         """
         
         start_time = time.time()
@@ -260,6 +281,49 @@ class LLMClient:
         if provider is None:
             provider = self._detect_provider(model)
         
+        async def complete() -> Dict[str, Any]:
+            if stream or should_abort is not None or progress is not None:
+                return await self._complete_streaming(
+                    messages, model, provider, temperature, max_tokens, timeout,
+                    workflow_id, tenant_id, user_id, task_id, metadata, should_abort, progress,
+                    start_time, **kwargs
+                )
+            return await self._complete(
+                messages, model, provider, temperature, max_tokens, timeout, use_optimized,
+                workflow_id, tenant_id, user_id, task_id, metadata, start_time, **kwargs
+            )
+        
+        # Deterministic requests are shared between identical calls of the same call site and tenant
+        return await self.response_cache.get_or_complete(
+            complete,
+            policy=cache or DEFAULT_POLICY,
+            tenant_id=tenant_id,
+            provider=provider.value,
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            params=kwargs
+        )
+    
+    async def _complete(
+        self,
+        messages: List[Dict[str, str]],
+        model: str,
+        provider: LLMProvider,
+        temperature: float,
+        max_tokens: int,
+        timeout: float,
+        use_optimized: bool,
+        workflow_id: Optional[str],
+        tenant_id: Optional[str],
+        user_id: Optional[str],
+        task_id: Optional[str],
+        metadata: Optional[Dict[str, Any]],
+        start_time: float,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """Send one completion request to the provider and track its cost"""
         # Use optimized Azure client if available and requested
         if (use_optimized and 
             provider == LLMProvider.AZURE_OPENAI and 
@@ -273,6 +337,7 @@ class LLMClient:
                     model=model,
                     temperature=temperature,
                     max_tokens=max_tokens,
+                    use_cache=False,  # Responses are shared through self.response_cache instead
                     **optimized_kwargs
                 )
                 self.metrics["total_latency"] += time.time() - start_time
@@ -322,11 +387,14 @@ class LLMClient:
         # Estimate tokens for rate limiting (rough approximation)
         estimated_tokens = sum(len(m.get("content", "").split()) * 1.3 for m in messages) + max_tokens
         
-        # Wait for rate limit clearance
+        # Wait for rate limit clearance on the deployment actually called
+        deployment = AZURE_DEPLOYMENT_MAPPING.get(model, model) if provider == LLMProvider.AZURE_OPENAI else model
         acquired = await global_rate_limiter.wait_and_acquire(
             provider.value,
             int(estimated_tokens),
-            max_wait=30.0
+            max_wait=30.0,
+            deployment=deployment,
+            tenant_id=tenant_id
         )
         
         if not acquired:
@@ -529,6 +597,276 @@ class LLMClient:
             finally:
                 self.metrics["total_latency"] += time.time() - start_time
     
+    def stream_chat_completion(
+        self,
+        messages: List[Dict[str, str]],
+        model: str,
+        provider: Optional[LLMProvider] = None,
+        temperature: float = 0.3,
+        max_tokens: int = 2000,
+        timeout: float = 600.0,
+        workflow_id: Optional[str] = None,
+        tenant_id: Optional[str] = None,
+        user_id: Optional[str] = None,
+        task_id: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        should_abort: Optional[AbortCheck] = None,
+        progress: Optional[StreamProgress] = None,
+        **kwargs
+    ) -> CompletionStream:
+        """
+        Stream a chat completion from the specified provider
+        
+        Iterate the returned stream (inside ``async with`` if you may stop
+        early) for the text as it is generated. Streams are not shared
+        through the response cache.
+        
+        Args:
+            messages: List of message dictionaries
+            model: Model name (provider-specific)
+            provider: LLM provider to use (auto-detected if None)
+            temperature: Sampling temperature
+            max_tokens: Maximum tokens to generate
+            timeout: Request timeout in seconds
+            should_abort: Asked with the text so far after each generated
+                line; a reason stops the generation
+            progress: Forwards the generated text into a progress stream
+            **kwargs: Additional provider-specific parameters
+            
+        Returns:
+            CompletionStream of text deltas; once it ends its 'response' is
+            the completion response dict chat_completion returns
+        """
+        self.metrics["requests"] += 1
+        
+        if provider is None:
+            provider = self._detect_provider(model)
+        
+        return self._open_stream(
+            messages, model, provider, temperature, max_tokens, timeout,
+            workflow_id, tenant_id, user_id, task_id, metadata, should_abort, progress,
+            time.time(), **kwargs
+        )
+    
+    async def _complete_streaming(
+        self,
+        messages: List[Dict[str, str]],
+        model: str,
+        provider: LLMProvider,
+        temperature: float,
+        max_tokens: int,
+        timeout: float,
+        workflow_id: Optional[str],
+        tenant_id: Optional[str],
+        user_id: Optional[str],
+        task_id: Optional[str],
+        metadata: Optional[Dict[str, Any]],
+        should_abort: Optional[AbortCheck],
+        progress: Optional[StreamProgress],
+        start_time: float,
+        **kwargs
+    ) -> Dict[str, Any]:
+        """Stream a completion to its end and return it as one response"""
+        async with self._open_stream(
+            messages, model, provider, temperature, max_tokens, timeout,
+            workflow_id, tenant_id, user_id, task_id, metadata, should_abort, progress,
+            start_time, **kwargs
+        ) as stream:
+            async for _ in stream:
+                pass
+        
+        if stream.aborted:
+            raise StreamAborted(stream.abort_reason, stream.response)
+        return stream.response
+    
+    def _open_stream(
+        self,
+        messages: List[Dict[str, str]],
+        model: str,
+        provider: LLMProvider,
+        temperature: float,
+        max_tokens: int,
+        timeout: float,
+        workflow_id: Optional[str],
+        tenant_id: Optional[str],
+        user_id: Optional[str],
+        task_id: Optional[str],
+        metadata: Optional[Dict[str, Any]],
+        should_abort: Optional[AbortCheck],
+        progress: Optional[StreamProgress],
+        start_time: float,
+        **kwargs
+    ) -> CompletionStream:
+        if progress is not None and progress.max_tokens is None:
+            progress.max_tokens = max_tokens
+        
+        def track_cost(stream: CompletionStream):
+            self._track_stream_cost(stream, provider, workflow_id, tenant_id, user_id, task_id, metadata)
+        
+        return CompletionStream(
+            self._stream_chunks(messages, model, provider, temperature, max_tokens, timeout, tenant_id, **kwargs),
+            TokenMeter(model, messages, start_time),
+            provider.value,
+            should_abort=should_abort,
+            progress=progress,
+            on_close=track_cost
+        )
+    
+    async def _stream_chunks(
+        self,
+        messages: List[Dict[str, str]],
+        model: str,
+        provider: LLMProvider,
+        temperature: float,
+        max_tokens: int,
+        timeout: float,
+        tenant_id: Optional[str],
+        **kwargs
+    ) -> AsyncGenerator[StreamChunk, None]:
+        """Open the provider's stream and normalise its events to StreamChunks"""
+        if provider not in self.clients:
+            raise ValueError(f"Provider {provider} not initialized. Check API keys.")
+        
+        client = self.clients[provider]
+        start_time = time.time()
+        
+        # Filter out cost tracking params that providers don't accept
+        provider_kwargs = {k: v for k, v in kwargs.items() 
+                           if k not in ['workflow_id', 'tenant_id', 'user_id', 'task_id', 'metadata']}
+        
+        estimated_tokens = sum(len(m.get("content", "").split()) * 1.3 for m in messages) + max_tokens
+        deployment = AZURE_DEPLOYMENT_MAPPING.get(model, model) if provider == LLMProvider.AZURE_OPENAI else model
+        acquired = await global_rate_limiter.wait_and_acquire(
+            provider.value,
+            int(estimated_tokens),
+            max_wait=30.0,
+            deployment=deployment,
+            tenant_id=tenant_id
+        )
+        
+        if not acquired:
+            raise RateLimitError(f"Rate limit timeout for {provider.value}")
+        
+        # The request slot is held until the stream ends or is closed
+        async with self.request_semaphore:
+            try:
+                if provider in [LLMProvider.OPENAI, LLMProvider.AZURE_OPENAI, LLMProvider.GROQ]:
+                    if provider != LLMProvider.GROQ:
+                        # Groq rejects stream_options and reports usage under x_groq instead
+                        provider_kwargs["stream_options"] = {"include_usage": True}
+                    # Opening the stream is retried; a stream failing part way is not
+                    stream = await self._make_request_with_retry(
+                        client=client,
+                        provider=provider,
+                        model=deployment,
+                        messages=messages,
+                        temperature=temperature,
+                        max_tokens=max_tokens,
+                        timeout=timeout,
+                        stream=True,
+                        **provider_kwargs
+                    )
+                    parse = openai_chunk
+                    
+                elif provider == LLMProvider.ANTHROPIC:
+                    stream = await self._make_request_with_retry(
+                        client=client,
+                        provider=provider,
+                        model=model,
+                        messages=messages,
+                        temperature=temperature,
+                        max_tokens=max_tokens,
+                        stream=True,
+                        **provider_kwargs
+                    )
+                    parse = anthropic_chunk
+                    
+                elif provider == LLMProvider.AWS_BEDROCK:
+                    # The Bedrock client streams StreamChunks already
+                    stream = client.stream_chat_completion(
+                        messages=messages,
+                        model=model,
+                        temperature=temperature,
+                        max_tokens=max_tokens,
+                        **provider_kwargs
+                    )
+                    parse = None
+                    
+                else:
+                    raise ValueError(f"Unknown provider: {provider}")
+                
+                try:
+                    async for event in stream:
+                        yield parse(event) if parse else event
+                finally:
+                    # Closing the stream ends the provider's generation
+                    await (stream.close() if parse else stream.aclose())
+                    
+            except Exception as e:
+                self.metrics["errors"] += 1
+                logger.error("LLM streaming completion failed", 
+                            provider=provider.value, 
+                            model=model, 
+                            error=str(e))
+                raise
+            finally:
+                self.metrics["total_latency"] += time.time() - start_time
+    
+    def _track_stream_cost(
+        self,
+        stream: CompletionStream,
+        provider: LLMProvider,
+        workflow_id: Optional[str],
+        tenant_id: Optional[str],
+        user_id: Optional[str],
+        task_id: Optional[str],
+        metadata: Optional[Dict[str, Any]]
+    ):
+        """Track what a stream generated, from the running count when it ended before reporting usage"""
+        meter = stream.meter
+        if not meter.chars and meter.prompt_tokens is None:
+            return  # Nothing was generated
+        
+        usage = meter.usage()
+        stream_metadata = {**(metadata or {}), "streamed": True, "usage_estimated": meter.estimated}
+        if stream.aborted:
+            stream_metadata["abort_reason"] = stream.abort_reason
+        
+        cost_task = asyncio.create_task(
+            track_llm_cost(
+                model=meter.model,
+                provider=provider.value,
+                prompt_tokens=usage["prompt_tokens"],
+                completion_tokens=usage["completion_tokens"],
+                workflow_id=workflow_id,
+                tenant_id=tenant_id,
+                user_id=user_id,
+                task_id=task_id,
+                metadata=stream_metadata,
+                latency_ms=int((time.time() - meter.start_time) * 1000)
+            ),
+            name=f"track_cost_{workflow_id}_{task_id}"
+        )
+        def handle_cost_error(task):
+            try:
+                task.result()
+            except Exception as e:
+                logger.error(f"Cost tracking failed: {e}")
+        cost_task.add_done_callback(handle_cost_error)
+    
+    async def _embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed prompts for the similarity cache with whichever OpenAI-compatible provider is configured"""
+        model = settings.LLM_CACHE_EMBEDDING_MODEL
+        if LLMProvider.AZURE_OPENAI in self.clients:
+            client = self.clients[LLMProvider.AZURE_OPENAI]
+            model = AZURE_DEPLOYMENT_MAPPING.get(model, model)
+        elif LLMProvider.OPENAI in self.clients:
+            client = self.clients[LLMProvider.OPENAI]
+        else:
+            raise ValueError("No embedding provider initialized for the similarity cache")
+        response = await client.embeddings.create(model=model, input=texts)
+        return [item.embedding for item in response.data]
+    
     def _detect_provider(self, model: str) -> LLMProvider:
         """Auto-detect provider based on model name"""
         
@@ -582,6 +920,7 @@ class LLMClient:
             "average_latency": avg_latency,
             "error_rate": self.metrics["errors"] / max(self.metrics["requests"], 1),
             "total_cost_usd": float(cost_calculator.total_cost),
+            "response_cache": self.response_cache.get_stats(),
             "cost_breakdown": {
                 "total_usage_count": len(cost_calculator.usage_history),
                 "by_provider": self._get_cost_by_provider()
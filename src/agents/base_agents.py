@@ -3,7 +3,7 @@ Base agent classes for the Quantum Layer Platform
 These are the core agent implementations used by both the factory and ensemble
 """
 
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
 import asyncio
 import json
@@ -31,6 +31,9 @@ from src.common.error_handling import (
 from src.memory.client import VectorMemoryClient
 from src.sandbox.client import SandboxServiceClient
 from src.agents.azure_llm_client import llm_client, get_model_for_tier, LLMProvider
+from src.agents.llm_cache import CachePolicy, json_content
+from src.agents.llm_streaming import AbortCheck, StreamAborted, StreamProgress
+from src.common.language_classifier import classify_code, classify_description
 from src.agents.language_utils import (
     LanguageDetector,
     get_language_example,
@@ -40,6 +43,55 @@ from src.agents.language_utils import (
 
 logger = structlog.get_logger()
 
+# Consecutive identical lines after which a generation is taken to be looping
+MAX_REPEATED_LINES = 25
+# Languages a code block may be in without being the wrong language
+COMPATIBLE_LANGUAGES = ({"javascript", "typescript"}, {"c", "cpp"})
+SUPPORT_LANGUAGES = {"shell", "sql"}
+
+
+def generation_guard(language: str) -> AbortCheck:
+    """
+    Stop a streamed code generation that has clearly gone wrong: its first
+    code block is in another programming language than the required one, or
+    it keeps repeating the same line.
+    """
+    fence_checked = False
+    
+    def should_abort(text: str) -> Optional[str]:
+        nonlocal fence_checked
+        if not fence_checked:
+            start = text.find("```")
+            end = text.find("\n", start) if start != -1 else -1
+            if end != -1:
+                fence_checked = True
+                tag = text[start + 3:end].strip()
+                fenced = classify_description(tag, min_score=1).language if tag else None
+                if (fenced and fenced != language and fenced not in SUPPORT_LANGUAGES
+                        and not any({fenced, language} <= pair for pair in COMPATIBLE_LANGUAGES)):
+                    return f"generated {fenced} instead of {language}"
+        
+        lines = text.rstrip("\n").rsplit("\n", MAX_REPEATED_LINES)[-MAX_REPEATED_LINES:]
+        if len(lines) == MAX_REPEATED_LINES and lines[-1].strip() and len(set(lines)) == 1:
+            return f"the same line repeated {MAX_REPEATED_LINES} times"
+        return None
+    
+    return should_abort
+
+
+def stream_progress(context: Dict[str, Any], task: Task) -> Optional[StreamProgress]:
+    """Forwards a generation into the progress stream the caller follows, if it named one"""
+    workflow_id = context.get("progress_workflow_id")
+    if not workflow_id:
+        return None
+    return StreamProgress(
+        workflow_id,
+        task_id=context.get("progress_task_id") or task.id,
+        tenant_id=context.get("tenant_id"),
+        user_id=context.get("user_id"),
+        source="agent-factory"
+    )
+
 # Security prompt template
 SECURITY_REQUIREMENTS = """
 Security Requirements:
@@ -92,84 +144,8 @@ class Agent:
     
     def _detect_language_from_patterns(self, code: str) -> str:
         """Comprehensive pattern-based language detection as fallback"""
-        # Language-specific patterns with confidence scoring
-        patterns = {
-            "python": [
-                (r'^\s*def\s+\w+\s*\(', 10),  # Function definition
-                (r'^\s*class\s+\w+', 10),      # Class definition  
-                (r'^\s*import\s+\w+', 8),      # Import statement
-                (r'^\s*from\s+\w+\s+import', 8),
-                (r'if\s+__name__\s*==\s*["\']__main__["\']', 10),
-                (r'print\s*\(', 5),
-                (r'^\s*@\w+', 7),  # Decorators
-                (r':\s*$', 3),     # Colon at end of line
-                (r'self\.', 7),    # Self reference
-            ],
-            "javascript": [
-                (r'function\s+\w+\s*\(', 10),
-                (r'const\s+\w+\s*=', 8),
-                (r'let\s+\w+\s*=', 8),
-                (r'var\s+\w+\s*=', 7),
-                (r'=>', 8),  # Arrow functions
-                (r'console\.log\s*\(', 7),
-                (r'module\.exports', 8),
-                (r'require\s*\(', 8),
-                (r'async\s+function', 8),
-                (r'\.then\s*\(', 7),
-            ],
-            "java": [
-                (r'public\s+class\s+\w+', 10),
-                (r'private\s+\w+\s+\w+', 8),
-                (r'public\s+static\s+void\s+main', 10),
-                (r'import\s+java\.', 9),
-                (r'System\.out\.println', 8),
-                (r'@Override', 7),
-                (r'new\s+\w+\s*\(', 6),
-            ],
-            "go": [
-                (r'package\s+\w+', 10),
-                (r'func\s+\w+\s*\(', 10),
-                (r'import\s+\(', 8),
-                (r'fmt\.Print', 8),
-                (r':=', 9),  # Short variable declaration
-                (r'go\s+func', 8),
-            ],
-            "rust": [
-                (r'fn\s+\w+\s*\(', 10),
-                (r'let\s+mut\s+', 9),
-                (r'impl\s+\w+', 8),
-                (r'pub\s+fn', 8),
-                (r'use\s+\w+::', 8),
-                (r'println!\s*\(', 7),
-                (r'match\s+\w+\s*\{', 8),
-            ],
-            "cpp": [
-                (r'#include\s*<', 10),
-                (r'using\s+namespace\s+std', 9),
-                (r'int\s+main\s*\(', 10),
-                (r'cout\s*<<', 8),
-                (r'class\s+\w+\s*\{', 8),
-                (r'::', 6),  # Scope resolution
-            ],
-        }
-        
-        scores = {}
-        for lang, lang_patterns in patterns.items():
-            score = 0
-            for pattern, weight in lang_patterns:
-                import re
-                if re.search(pattern, code, re.MULTILINE):
-                    score += weight
-            scores[lang] = score
-        
-        # Get language with highest score
-        if scores:
-            best_lang = max(scores, key=scores.get)
-            if scores[best_lang] > 10:  # Minimum confidence threshold
-                return best_lang
-        
         # As last resort, return most common language for enterprise
-        return "python"  # Most common in data science/ML context
+        return classify_code(code).language or "python"
     
     async def _clean_llm_response(self, response: str, expected_language: str = None) -> str:
         """Clean LLM response to extract pure code"""
@@ -774,12 +750,19 @@ class T2Agent(Agent):
         logger.info(f"T2: Detected language: {language}")
         
         try:
+            solution = None
             for iteration in range(max_iterations):
                 # Generate solution with language context
-                solution = await self._generate_solution(task, context, iteration, language)
+                try:
+                    solution = await self._generate_solution(task, context, iteration, language)
+                except StreamAborted as e:
+                    # Stopped part way; the next iteration gets the reason as feedback
+                    logger.info("T2: generation aborted", task_id=task.id, reason=e.reason)
+                    context["validation_feedback"] = f"The previous attempt was stopped: {e.reason}"
+                    continue
                 
                 # Validate solution
-                validation_result = await self._validate_solution(solution, task)
+                validation_result = await self._validate_solution(solution, task, context)
                 
                 if validation_result["valid"]:
                     execution_time = (datetime.utcnow() - start_time).total_seconds()
@@ -804,6 +787,9 @@ class T2Agent(Agent):
                 # Use validation feedback for next iteration
                 context["validation_feedback"] = validation_result["feedback"]
             
+            if solution is None:
+                raise RuntimeError(f"All {max_iterations} generations were aborted")
+            
             # Max iterations reached without valid solution
             return TaskResult(
                 task_id=task.id,
@@ -871,13 +857,22 @@ If this is a retry, use the validation feedback to improve."""
             model=model,
             provider=provider,
             temperature=0.4,
-            max_tokens=4000
+            max_tokens=4000,
+            workflow_id=context.get("workflow_id"),
+            tenant_id=context.get("tenant_id"),
+            user_id=context.get("user_id"),
+            task_id=task.id,
+            # Streamed so clients see the code as it is written and a
+            # generation gone wrong is stopped instead of run to max_tokens
+            should_abort=generation_guard(safe_language),
+            progress=stream_progress(context, task)
         )
         
         # Parse and structure the response with correct language
         return self._parse_solution(response["content"], safe_language)
     
-    async def _validate_solution(self, solution: Dict[str, Any], task: Task) -> Dict[str, Any]:
+    async def _validate_solution(self, solution: Dict[str, Any], task: Task,
+                                 context: Dict[str, Any]) -> Dict[str, Any]:
         """Validate the generated solution"""
         # This would normally call the validation service
         # For now, we do a simple LLM-based validation
@@ -908,8 +903,11 @@ Respond with JSON:
                 {"role": "user", "content": validation_prompt}
             ],
             model="gpt-4-turbo-preview",  # Will auto-select Azure if available
-            temperature=0.1,
-            response_format={"type": "json_object"}  # Note: response_format support varies by provider
+            temperature=0,  # Responses are only shared for deterministic calls
+            response_format={"type": "json_object"},  # Note: response_format support varies by provider
+            tenant_id=context.get("tenant_id"),
+            # Ensemble members and retries review the same solution; review it once
+            cache=CachePolicy(scope="solution_review", validate=json_content)
         )
         
         return json.loads(response["content"])
@@ -949,8 +947,8 @@ class T3Agent(Agent):
                 context=context
             )
             
-            # Ensure language is propagated to sub-agents
-            context = {**context, "required_language": language}
+            # Ensure language is propagated to sub-agents, and their progress to this task
+            context = {**context, "required_language": language, "progress_task_id": task.id}
             
             # Analyze task to determine agent composition
             agent_plan = await self._plan_agent_composition(task, context)
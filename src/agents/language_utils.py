@@ -4,120 +4,18 @@ Production-grade implementation with comprehensive support
 """
 
 from typing import Dict, Any, Optional, Tuple, List
-import re
 import structlog
 
+from src.common.language_classifier import LANGUAGE_KEYWORDS, classify_code, classify_description
+
 logger = structlog.get_logger()
 
 
 class LanguageDetector:
     """Production-grade language detection with multiple strategies"""
     
-    # Comprehensive language patterns with confidence scoring
-    LANGUAGE_PATTERNS = {
-        "python": {
-            "keywords": ["python", "py", "pip", "poetry", "conda", "venv", "virtualenv"],
-            "frameworks": ["flask", "django", "fastapi", "pandas", "numpy", "tensorflow", "pytorch", "scikit", "jupyter", "streamlit", "dash"],
-            "extensions": [".py", ".pyx", ".pyw"],
-            "confidence": 10
-        },
-        "javascript": {
-            "keywords": ["javascript", "js", "node", "nodejs", "npm", "yarn", "pnpm"],
-            "frameworks": ["express", "react", "vue", "angular", "next", "nuxt", "svelte", "webpack", "babel", "jest", "mocha"],
-            "extensions": [".js", ".mjs", ".jsx"],
-            "confidence": 10
-        },
-        "typescript": {
-            "keywords": ["typescript", "ts", "tsx", "type-safe", "typed"],
-            "frameworks": ["angular", "nestjs", "next.js", "deno"],
-            "extensions": [".ts", ".tsx", ".d.ts"],
-            "confidence": 12  # Higher than JS to prefer TS when both match
-        },
-        "java": {
-            "keywords": ["java", "jvm", "maven", "gradle", "ant"],
-            "frameworks": ["spring", "springboot", "hibernate", "struts", "junit", "mockito", "tomcat", "jetty"],
-            "extensions": [".java", ".jar", ".class"],
-            "confidence": 10
-        },
-        "go": {
-            "keywords": ["go", "golang", "gopher"],
-            "frameworks": ["gin", "echo", "fiber", "gorilla", "chi", "beego", "iris", "revel"],
-            "extensions": [".go"],
-            "confidence": 10
-        },
-        "rust": {
-            "keywords": ["rust", "cargo", "rustc", "rustup"],
-            "frameworks": ["actix", "rocket", "warp", "tokio", "serde", "diesel", "yew"],
-            "extensions": [".rs"],
-            "confidence": 10
-        },
-        "cpp": {
-            "keywords": ["c++", "cpp", "cplusplus"],
-            "frameworks": ["boost", "qt", "cmake", "stl", "opencv"],
-            "extensions": [".cpp", ".cc", ".cxx", ".hpp", ".h++"],
-            "confidence": 9
-        },
-        "c": {
-            "keywords": ["c language", "ansi c", "embedded c", "pure c"],
-            "frameworks": ["gtk", "opengl", "sdl"],
-            "extensions": [".c", ".h"],
-            "confidence": 8  # Lower than C++ to avoid false positives
-        },
-        "csharp": {
-            "keywords": ["c#", "csharp", "dotnet", ".net"],
-            "frameworks": ["asp.net", "blazor", "xamarin", "unity", "entityframework", "wpf", "winforms"],
-            "extensions": [".cs", ".csx"],
-            "confidence": 10
-        },
-        "php": {
-            "keywords": ["php"],
-            "frameworks": ["laravel", "symfony", "codeigniter", "wordpress", "drupal", "composer", "yii", "slim"],
-            "extensions": [".php", ".phtml"],
-            "confidence": 10
-        },
-        "ruby": {
-            "keywords": ["ruby", "rb", "gem", "bundler"],
-            "frameworks": ["rails", "sinatra", "rspec", "rake", "capistrano"],
-            "extensions": [".rb", ".erb"],
-            "confidence": 10
-        },
-        "swift": {
-            "keywords": ["swift", "ios", "macos", "watchos", "tvos"],
-            "frameworks": ["swiftui", "uikit", "cocoapods", "carthage", "spm", "vapor"],
-            "extensions": [".swift"],
-            "confidence": 10
-        },
-        "kotlin": {
-            "keywords": ["kotlin", "kt"],
-            "frameworks": ["android", "ktor", "spring", "coroutines", "compose"],
-            "extensions": [".kt", ".kts"],
-            "confidence": 10
-        },
-        "scala": {
-            "keywords": ["scala"],
-            "frameworks": ["akka", "play", "spark", "cats", "zio", "sbt"],
-            "extensions": [".scala", ".sc"],
-            "confidence": 10
-        },
-        "r": {
-            "keywords": ["r language", "rlang", "rstats"],
-            "frameworks": ["tidyverse", "ggplot", "shiny", "dplyr", "caret"],
-            "extensions": [".r", ".rmd"],
-            "confidence": 10
-        },
-        "sql": {
-            "keywords": ["sql", "query", "database"],
-            "frameworks": ["mysql", "postgresql", "sqlite", "oracle", "sqlserver", "mariadb"],
-            "extensions": [".sql"],
-            "confidence": 8
-        },
-        "shell": {
-            "keywords": ["bash", "shell", "sh", "zsh", "fish", "script"],
-            "frameworks": ["unix", "linux", "posix"],
-            "extensions": [".sh", ".bash", ".zsh"],
-            "confidence": 7
-        }
-    }
+    # Description keywords, shared with the language classifier
+    LANGUAGE_PATTERNS = LANGUAGE_KEYWORDS
     
     # Context-based defaults
     CONTEXT_DEFAULTS = {
@@ -199,126 +97,14 @@ class LanguageDetector:
         """Detect language from code patterns"""
         if not code:
             return None
-            
-        # Language-specific patterns with confidence scoring
-        patterns = {
-            "python": [
-                (r'^\s*def\s+\w+\s*\(', 10),
-                (r'^\s*class\s+\w+', 10),
-                (r'^\s*import\s+\w+', 8),
-                (r'^\s*from\s+\w+\s+import', 8),
-                (r'if\s+__name__\s*==\s*["\']__main__["\']', 10),
-                (r'print\s*\(', 5),
-                (r'^\s*@\w+', 7),
-                (r':\s*$', 3),
-                (r'self\.', 7),
-            ],
-            "javascript": [
-                (r'function\s+\w+\s*\(', 10),
-                (r'const\s+\w+\s*=', 8),
-                (r'let\s+\w+\s*=', 8),
-                (r'var\s+\w+\s*=', 7),
-                (r'=>', 8),
-                (r'console\.log\s*\(', 7),
-                (r'module\.exports', 8),
-                (r'require\s*\(', 8),
-                (r'async\s+function', 8),
-                (r'\.then\s*\(', 7),
-            ],
-            "typescript": [
-                (r':\s*\w+\s*[=;]', 10),  # Type annotations
-                (r'interface\s+\w+', 10),
-                (r'type\s+\w+\s*=', 10),
-                (r'<\w+>', 8),  # Generics
-                (r'export\s+interface', 9),
-                (r'implements\s+\w+', 9),
-            ],
-            "java": [
-                (r'public\s+class\s+\w+', 10),
-                (r'private\s+\w+\s+\w+', 8),
-                (r'public\s+static\s+void\s+main', 10),
-                (r'import\s+java\.', 9),
-                (r'System\.out\.println', 8),
-                (r'@Override', 7),
-                (r'new\s+\w+\s*\(', 6),
-            ],
-            "go": [
-                (r'package\s+\w+', 10),
-                (r'func\s+\w+\s*\(', 10),
-                (r'import\s+\(', 8),
-                (r'fmt\.Print', 8),
-                (r':=', 9),
-                (r'go\s+func', 8),
-            ],
-            "rust": [
-                (r'fn\s+\w+\s*\(', 10),
-                (r'let\s+mut\s+', 9),
-                (r'impl\s+\w+', 8),
-                (r'pub\s+fn', 8),
-                (r'use\s+\w+::', 8),
-                (r'println!\s*\(', 7),
-                (r'match\s+\w+\s*\{', 8),
-            ],
-        }
-        
-        scores = {}
-        for lang, lang_patterns in patterns.items():
-            score = 0
-            for pattern, weight in lang_patterns:
-                if re.search(pattern, code, re.MULTILINE):
-                    score += weight
-            if score > 0:
-                scores[lang] = score
-        
-        if scores:
-            best_lang = max(scores, key=scores.get)
-            if scores[best_lang] >= 10:
-                return best_lang
-        
-        return None
+        return classify_code(code).language
     
     @classmethod
     def _detect_from_description(cls, description: str) -> Optional[str]:
         """Detect language from task description with scoring"""
         if not description:
             return None
-            
-        desc_lower = description.lower()
-        language_scores = {}
-        
-        # Score each language based on pattern matches
-        for language, patterns in cls.LANGUAGE_PATTERNS.items():
-            score = 0
-            
-            # Check keywords
-            for keyword in patterns["keywords"]:
-                if keyword in desc_lower:
-                    # Exact language name gets highest score
-                    if keyword == language:
-                        score += patterns["confidence"]
-                    else:
-                        score += patterns["confidence"] // 2
-            
-            # Check frameworks
-            for framework in patterns["frameworks"]:
-                if framework in desc_lower:
-                    score += patterns["confidence"] // 3
-            
-            # Check file extensions
-            for ext in patterns["extensions"]:
-                if ext in desc_lower:
-                    score += patterns["confidence"] // 4
-            
-            if score > 0:
-                language_scores[language] = score
-        
-        # Find best match with minimum threshold
-        if language_scores:
-            best_language = max(language_scores, key=language_scores.get)
-            if language_scores[best_language] >= 5:
-                return best_language
-        
-        return None
+        return classify_description(description).language
     
     @classmethod
     def _get_context_default(cls, description: str) -> Optional[str]:
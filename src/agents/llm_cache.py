@@ -0,0 +1,315 @@
+"""
+Response sharing for LLMClient
+
+Identical requests in flight at the same time share one provider call
+(single-flight), identical requests are answered from an exact-match cache
+(in-process LRU in front of Redis), and call sites that opt in are answered
+from an embedding-similarity cache when their prompt is a near duplicate.
+
+Only deterministic (temperature 0) requests are shared: callers that sample
+want distinct samples. Every key and namespace starts with the tenant, so
+cached content is never served across tenants, and with the call site's
+scope, so each call site shares only with itself.
+"""
+
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import structlog
+
+from src.common.cost_calculator import LLM_PRICING
+from src.common.tiered_cache import TieredCache
+from src.memory.embedding_cache import EmbedFn, EmbeddingBatcher
+
+logger = structlog.get_logger()
+
+Completion = Callable[[], Awaitable[Dict[str, Any]]]
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    """How one call site shares responses"""
+    scope: str = "default"
+    # Share one provider call between identical requests in flight together
+    coalesce: bool = True
+    # Answer identical requests from the response cache
+    exact: bool = True
+    # Answer near-duplicate prompts from the similarity cache (opt-in)
+    semantic: bool = False
+    similarity: float = 0.97
+    ttl_seconds: Optional[int] = None
+    # Only cache responses the call site can use, e.g. ones that parse
+    validate: Optional[Callable[[Dict[str, Any]], bool]] = None
+
+
+DEFAULT_POLICY = CachePolicy()
+NO_SHARING = CachePolicy(coalesce=False, exact=False)
+
+
+def is_deterministic(temperature: float) -> bool:
+    return temperature == 0
+
+
+def json_content(response: Dict[str, Any]) -> bool:
+    """CachePolicy.validate for call sites that parse the content as JSON"""
+    try:
+        json.loads(response.get("content") or "")
+    except (TypeError, ValueError):
+        return False
+    return True
+
+
+def _digest(payload: Dict[str, Any]) -> str:
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def request_key(
+    tenant_id: Optional[str],
+    scope: str,
+    provider: str,
+    model: str,
+    messages: List[Dict[str, Any]],
+    temperature: float,
+    max_tokens: int,
+    params: Optional[Dict[str, Any]] = None
+) -> str:
+    """Cache key for an exact request, namespaced by tenant and call site"""
+    digest = _digest({
+        "provider": provider, "model": model, "messages": messages,
+        "temperature": temperature, "max_tokens": max_tokens, "params": params or {},
+    })
+    return f"qlp:llm:{tenant_id or '-'}:{scope}:{digest}"
+
+
+def similarity_namespace(
+    tenant_id: Optional[str],
+    scope: str,
+    provider: str,
+    model: str,
+    messages: List[Dict[str, Any]],
+    temperature: float,
+    max_tokens: int,
+    params: Optional[Dict[str, Any]] = None
+) -> str:
+    """Everything but the final message must match exactly for a similarity hit"""
+    return request_key(tenant_id, scope, provider, model, messages[:-1], temperature, max_tokens, params)
+
+
+def model_pricing(model: Optional[str]) -> Optional[Dict[str, float]]:
+    """USD per 1M input and output tokens for a model, None when it is not priced"""
+    model = (model or "").lower()
+    return next((prices for name, prices in LLM_PRICING.items() if name in model), None)
+
+
+def response_cost(response: Dict[str, Any]) -> float:
+    """What a response cost to generate, from its cost data or its usage"""
+    cost = response.get("cost") or {}
+    if cost.get("total_cost_usd") is not None:
+        return float(cost["total_cost_usd"])
+    usage = response.get("usage") or {}
+    pricing = model_pricing(response.get("model"))
+    if pricing is None:
+        return 0.0
+    return (usage.get("prompt_tokens", 0) * pricing["input"]
+            + usage.get("completion_tokens", 0) * pricing["output"]) / 1_000_000
+
+
+class SingleFlight:
+    """Runs one call per key at a time; callers arriving meanwhile share its outcome"""
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    async def run(self, key: str, call: Completion) -> Tuple[Dict[str, Any], bool]:
+        """Return (result, shared); shared is True when another caller made the call"""
+        task = self._inflight.get(key)
+        if task is not None:
+            return await asyncio.shield(task), True
+
+        task = asyncio.ensure_future(call())
+        self._inflight[key] = task
+        task.add_done_callback(lambda done: self._finished(key, done))
+        # Shielded so a cancelled caller does not cancel the call for the others
+        return await asyncio.shield(task), False
+
+    def _finished(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Retrieved here too, in case every caller was cancelled
+            task.exception()
+
+
+class ExactResponseCache(TieredCache):
+    """Two-tier response cache: in-process LRU with TTL, then Redis"""
+
+    def __init__(self, max_entries: int = 2048, ttl_seconds: int = 3600, redis_url: Optional[str] = None):
+        super().__init__("LLM response cache", max_entries=max_entries, ttl_seconds=ttl_seconds,
+                         redis_url=redis_url, encode=lambda response: json.dumps(response, default=str))
+
+
+class SimilarityResponseCache:
+    """
+    In-process cache of responses by prompt embedding.
+
+    Each namespace (tenant, call site and every request field but the final
+    prompt) holds up to ``max_entries`` unit vectors; a lookup is one matrix
+    product against them.
+    """
+
+    def __init__(self, embed_fn: EmbedFn, max_entries: int = 256, max_namespaces: int = 1024,
+                 ttl_seconds: int = 3600):
+        self.batcher = EmbeddingBatcher(embed_fn)
+        self.max_entries = max_entries
+        self.max_namespaces = max_namespaces
+        self.ttl_seconds = ttl_seconds
+        self._namespaces: "OrderedDict[str, List[Tuple[float, np.ndarray, Dict[str, Any]]]]" = OrderedDict()
+
+    async def embed(self, text: str) -> np.ndarray:
+        vector = np.asarray(await self.batcher.embed(text), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, namespace: str, vector: np.ndarray, similarity: float) -> Optional[Dict[str, Any]]:
+        entries = self._namespaces.get(namespace)
+        if not entries:
+            return None
+        now = time.monotonic()
+        live = [entry for entry in entries if entry[0] >= now]
+        if len(live) != len(entries):
+            self._namespaces[namespace] = entries = live
+        if not entries:
+            return None
+        scores = np.stack([entry[1] for entry in entries]) @ vector
+        best = int(np.argmax(scores))
+        if scores[best] < similarity:
+            return None
+        self._namespaces.move_to_end(namespace)
+        return entries[best][2]
+
+    def put(self, namespace: str, vector: np.ndarray, response: Dict[str, Any], ttl_seconds: Optional[int] = None):
+        entries = self._namespaces.setdefault(namespace, [])
+        entries.append((time.monotonic() + (ttl_seconds or self.ttl_seconds), vector, response))
+        del entries[:-self.max_entries]
+        self._namespaces.move_to_end(namespace)
+        while len(self._namespaces) > self.max_namespaces:
+            self._namespaces.popitem(last=False)
+
+
+class LLMResponseCache:
+    """Coalescing, exact and similarity sharing of LLM responses with per-scope metrics"""
+
+    def __init__(
+        self,
+        embed_fn: Optional[EmbedFn] = None,
+        redis_url: Optional[str] = None,
+        max_entries: int = 2048,
+        similarity_entries: int = 256,
+        ttl_seconds: int = 3600
+    ):
+        self.flights = SingleFlight()
+        self.exact = ExactResponseCache(max_entries=max_entries, ttl_seconds=ttl_seconds, redis_url=redis_url)
+        self.similar = (
+            SimilarityResponseCache(embed_fn, max_entries=similarity_entries, ttl_seconds=ttl_seconds)
+            if embed_fn else None
+        )
+        self.scopes: Dict[str, Dict[str, float]] = {}
+
+    def _stats(self, scope: str) -> Dict[str, float]:
+        if scope not in self.scopes:
+            self.scopes[scope] = {
+                "exact_hits": 0, "semantic_hits": 0, "coalesced": 0, "misses": 0, "saved_cost_usd": 0.0
+            }
+        return self.scopes[scope]
+
+    @staticmethod
+    def _served(response: Dict[str, Any], how: str) -> Dict[str, Any]:
+        return {**response, "cached": True, "cache_hit": how}
+
+    async def get_or_complete(
+        self,
+        complete: Completion,
+        policy: CachePolicy,
+        tenant_id: Optional[str],
+        provider: str,
+        model: str,
+        messages: List[Dict[str, Any]],
+        temperature: float,
+        max_tokens: int,
+        params: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """Return a shared response for the request, calling ``complete`` only when there is none"""
+        if not is_deterministic(temperature) or not (policy.coalesce or policy.exact or policy.semantic):
+            return await complete()
+
+        request = (tenant_id, policy.scope, provider, model, messages, temperature, max_tokens, params)
+        key = request_key(*request)
+        stats = self._stats(policy.scope)
+
+        if policy.exact:
+            cached = await self.exact.get(key)
+            if cached is not None:
+                stats["exact_hits"] += 1
+                stats["saved_cost_usd"] += response_cost(cached)
+                return self._served(cached, "exact")
+
+        namespace = vector = None
+        if policy.semantic and self.similar is not None and messages:
+            namespace = similarity_namespace(*request)
+            try:
+                vector = await self.similar.embed(str(messages[-1].get("content", "")))
+            except Exception as e:
+                logger.warning(f"Prompt embedding failed, skipping similarity cache: {e}")
+            if vector is not None:
+                similar = self.similar.lookup(namespace, vector, policy.similarity)
+                if similar is not None:
+                    stats["semantic_hits"] += 1
+                    stats["saved_cost_usd"] += response_cost(similar)
+                    return self._served(similar, "semantic")
+
+        async def complete_and_store() -> Dict[str, Any]:
+            response = await complete()
+            if policy.validate is not None and not policy.validate(response):
+                # A retry must reach the provider instead of this response
+                return response
+            if policy.exact:
+                await self.exact.put(key, response, policy.ttl_seconds)
+            if vector is not None:
+                self.similar.put(namespace, vector, response, policy.ttl_seconds)
+            return response
+
+        if policy.coalesce:
+            response, shared = await self.flights.run(key, complete_and_store)
+        else:
+            response, shared = await complete_and_store(), False
+
+        if shared:
+            stats["coalesced"] += 1
+            stats["saved_cost_usd"] += response_cost(response)
+            return self._served(response, "coalesced")
+        stats["misses"] += 1
+        return response
+
+    def get_stats(self) -> Dict[str, Any]:
+        totals = {"exact_hits": 0, "semantic_hits": 0, "coalesced": 0, "misses": 0, "saved_cost_usd": 0.0}
+        for stats in self.scopes.values():
+            for name in totals:
+                totals[name] += stats[name]
+        served = totals["exact_hits"] + totals["semantic_hits"] + totals["coalesced"]
+        lookups = served + totals["misses"]
+        return {
+            **totals,
+            "hit_rate": served / lookups if lookups else 0.0,
+            "in_flight": len(self.flights),
+            "by_scope": {scope: dict(stats) for scope, stats in self.scopes.items()},
+        }
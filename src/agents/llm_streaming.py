@@ -0,0 +1,364 @@
+"""
+Streaming completions for LLMClient
+
+Every provider streams a completion as it is generated: OpenAI, Azure OpenAI
+and Groq as SSE chat completion chunks, Anthropic as message events and
+Bedrock through invoke_model_with_response_stream. Their events are
+normalised to StreamChunks here, and a CompletionStream hands the text to the
+caller as it arrives instead of once the whole completion is done.
+
+While a completion streams, its TokenMeter keeps a running token count that
+the provider's reported usage replaces at the end; a generation that ends
+early (aborted by a validator, or a provider error) is billed from the
+running count. A StreamProgress forwards the new text and the count into the
+workflow's progress stream.
+"""
+
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, AsyncGenerator, Callable, Dict, List, Optional
+from uuid import uuid4
+
+import structlog
+
+from src.agents.llm_cache import model_pricing
+
+logger = structlog.get_logger()
+
+# Called with the text generated so far each time a line completes; returns
+# why the generation should stop, or None to let it continue
+AbortCheck = Callable[[str], Optional[str]]
+
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count of text, for accounting before the provider reports usage"""
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+@dataclass
+class StreamChunk:
+    """One provider stream event; usage holds whichever counts the event reported"""
+    delta: str = ""
+    usage: Optional[Dict[str, int]] = None
+    finish_reason: Optional[str] = None
+    model: Optional[str] = None
+    cost: Optional[Dict[str, Any]] = None
+
+
+class StreamAborted(Exception):
+    """A streamed generation was stopped early; response holds what was generated"""
+
+    def __init__(self, reason: str, response: Dict[str, Any]):
+        super().__init__(f"Generation aborted: {reason}")
+        self.reason = reason
+        self.response = response
+
+
+def openai_chunk(event: Any) -> StreamChunk:
+    """Chat completion chunk from OpenAI, Azure OpenAI or Groq"""
+    delta, finish_reason = "", None
+    if event.choices:
+        choice = event.choices[0]
+        delta = (choice.delta.content if choice.delta else None) or ""
+        finish_reason = choice.finish_reason
+    # The last chunk carries usage when requested; Groq also reports it under x_groq
+    usage = getattr(event, "usage", None) or getattr(getattr(event, "x_groq", None), "usage", None)
+    return StreamChunk(
+        delta=delta,
+        finish_reason=finish_reason,
+        model=event.model or None,
+        usage={"prompt_tokens": usage.prompt_tokens, "completion_tokens": usage.completion_tokens} if usage else None
+    )
+
+
+def anthropic_chunk(event: Any) -> StreamChunk:
+    """Message stream event from the Anthropic API"""
+    if event.type == "message_start":
+        return StreamChunk(model=event.message.model,
+                           usage={"prompt_tokens": event.message.usage.input_tokens})
+    if event.type == "content_block_delta" and event.delta.type == "text_delta":
+        return StreamChunk(delta=event.delta.text)
+    if event.type == "message_delta":
+        # output_tokens is cumulative
+        return StreamChunk(finish_reason=event.delta.stop_reason,
+                           usage={"completion_tokens": event.usage.output_tokens})
+    return StreamChunk()
+
+
+class TokenMeter:
+    """
+    Running token count and text of a streamed completion.
+
+    Most providers report usage only at the end of a stream; until then the
+    prompt is estimated from the messages and the completion from the text
+    received so far.
+    """
+
+    def __init__(self, model: str, messages: List[Dict[str, Any]] = (), start_time: Optional[float] = None):
+        self.model = model
+        self.start_time = start_time or time.time()
+        self.estimated_prompt_tokens = sum(estimate_tokens(str(m.get("content", ""))) for m in messages)
+        self.prompt_tokens: Optional[int] = None
+        self.reported_completion_tokens: Optional[int] = None
+        self.chars = 0
+        self.finish_reason: Optional[str] = None
+        self.first_token_at: Optional[float] = None
+        self.provider_cost: Optional[Dict[str, Any]] = None
+        self._parts: List[str] = []
+
+    def add(self, chunk: StreamChunk):
+        if chunk.delta:
+            if self.first_token_at is None:
+                self.first_token_at = time.time()
+            self._parts.append(chunk.delta)
+            self.chars += len(chunk.delta)
+        if chunk.model:
+            self.model = chunk.model
+        if chunk.usage:
+            if chunk.usage.get("prompt_tokens") is not None:
+                self.prompt_tokens = chunk.usage["prompt_tokens"]
+            if chunk.usage.get("completion_tokens") is not None:
+                self.reported_completion_tokens = chunk.usage["completion_tokens"]
+        if chunk.finish_reason:
+            self.finish_reason = chunk.finish_reason
+        if chunk.cost:
+            self.provider_cost = chunk.cost
+
+    @property
+    def text(self) -> str:
+        if len(self._parts) > 1:
+            self._parts = ["".join(self._parts)]
+        return self._parts[0] if self._parts else ""
+
+    @property
+    def completion_tokens(self) -> int:
+        if self.reported_completion_tokens is not None:
+            return self.reported_completion_tokens
+        return -(-self.chars // CHARS_PER_TOKEN)
+
+    @property
+    def estimated(self) -> bool:
+        """True while either count is still an estimate"""
+        return self.prompt_tokens is None or self.reported_completion_tokens is None
+
+    @property
+    def time_to_first_token(self) -> Optional[float]:
+        return self.first_token_at - self.start_time if self.first_token_at else None
+
+    def usage(self) -> Dict[str, int]:
+        prompt_tokens = self.prompt_tokens if self.prompt_tokens is not None else self.estimated_prompt_tokens
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": prompt_tokens + self.completion_tokens
+        }
+
+    def cost(self) -> Dict[str, Any]:
+        if self.provider_cost is not None:
+            return dict(self.provider_cost)
+        usage = self.usage()
+        pricing = model_pricing(self.model) or {"input": 0.0, "output": 0.0}
+        input_cost = usage["prompt_tokens"] * pricing["input"] / 1_000_000
+        output_cost = usage["completion_tokens"] * pricing["output"] / 1_000_000
+        return {
+            "input_cost_usd": input_cost,
+            "output_cost_usd": output_cost,
+            "total_cost_usd": input_cost + output_cost,
+            "estimated": self.estimated
+        }
+
+
+class StreamProgress:
+    """
+    Forwards a streamed completion into a workflow's progress stream.
+
+    The first text is published as soon as it arrives, later text at most
+    every ``interval`` seconds. Each task progress event carries the text
+    since the previous one (``delta``, starting at character ``offset``) and
+    the running token count. Progress events of a task coalesce for slow
+    subscribers, so a gap in offsets means text was skipped and the client
+    should take the content from the task result.
+    """
+
+    def __init__(
+        self,
+        workflow_id: str,
+        task_id: Optional[str] = None,
+        tenant_id: Optional[str] = None,
+        user_id: Optional[str] = None,
+        max_tokens: Optional[int] = None,
+        source: str = "llm-stream",
+        interval: float = 0.25,
+        publish: Optional[Callable[[Any], Any]] = None
+    ):
+        self.workflow_id = workflow_id
+        self.task_id = task_id
+        self.tenant_id = tenant_id
+        self.user_id = user_id
+        self.max_tokens = max_tokens
+        self.source = source
+        self.interval = interval
+        self._publish_event = publish
+        self._pending: List[str] = []
+        self._offset = 0
+        self._published_at: Optional[float] = None
+        self.events_published = 0
+
+    async def update(self, meter: TokenMeter, delta: str):
+        self._pending.append(delta)
+        if self._published_at is None or time.monotonic() - self._published_at >= self.interval:
+            await self._publish(meter, "generating")
+
+    async def finish(self, meter: TokenMeter, abort_reason: Optional[str] = None):
+        if abort_reason:
+            await self._publish(meter, "aborted", abort_reason=abort_reason)
+        else:
+            await self._publish(meter, "generated" if meter.finish_reason else "interrupted")
+
+    async def _publish(self, meter: TokenMeter, stage: str, **extra):
+        from src.common.progress_streaming import ProgressEvent, ProgressEventType, progress_manager
+
+        delta = "".join(self._pending)
+        self._pending = []
+        data = {
+            "stage": stage,
+            "delta": delta,
+            "offset": self._offset,
+            "completion_tokens": meter.completion_tokens,
+            "elapsed": round(time.time() - meter.start_time, 3),
+            **extra
+        }
+        if self.max_tokens:
+            data["progress_percentage"] = round(min(meter.completion_tokens / self.max_tokens, 1.0) * 100, 2)
+        self._offset += len(delta)
+        self._published_at = time.monotonic()
+
+        publish = self._publish_event or progress_manager.publish_event
+        try:
+            await publish(ProgressEvent(
+                id=str(uuid4()),
+                type=ProgressEventType.TASK_PROGRESS,
+                timestamp=datetime.utcnow(),
+                source=self.source,
+                data=data,
+                workflow_id=self.workflow_id,
+                task_id=self.task_id,
+                user_id=self.user_id,
+                tenant_id=self.tenant_id
+            ))
+            self.events_published += 1
+        except Exception as e:
+            # Progress is best effort; the generation goes on without it
+            logger.warning("Streaming progress publish failed", workflow_id=self.workflow_id, error=str(e))
+
+
+class CompletionStream:
+    """
+    A streaming completion: iterate it for the text as it arrives, then read
+    ``response`` for the dict chat_completion returns.
+
+    ``should_abort`` is asked after each completed line whether to stop, and
+    ``abort`` stops the generation from elsewhere; either way the provider
+    stream is closed at once. Use ``async with`` when the consumer may stop
+    iterating early, so the provider stream is closed then too.
+    """
+
+    def __init__(
+        self,
+        chunks: AsyncGenerator[StreamChunk, None],
+        meter: TokenMeter,
+        provider: str,
+        should_abort: Optional[AbortCheck] = None,
+        progress: Optional[StreamProgress] = None,
+        on_close: Optional[Callable[["CompletionStream"], None]] = None
+    ):
+        self.meter = meter
+        self.provider = provider
+        self.should_abort = should_abort
+        self.progress = progress
+        self.on_close = on_close
+        self.abort_reason: Optional[str] = None
+        self.closed = False
+        self.finished_at: Optional[float] = None
+        self._chunks = chunks
+        self._iterator = None
+
+    def __aiter__(self):
+        if self._iterator is None:
+            self._iterator = self._iterate()
+        return self._iterator
+
+    async def __aenter__(self) -> "CompletionStream":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    @property
+    def aborted(self) -> bool:
+        return self.abort_reason is not None
+
+    def abort(self, reason: str):
+        """Stop the generation; the provider stream is closed before the next chunk is handed out"""
+        if self.abort_reason is None:
+            self.abort_reason = reason
+
+    async def _iterate(self):
+        try:
+            async for chunk in self._chunks:
+                self.meter.add(chunk)
+                if self.should_abort is not None and "\n" in chunk.delta and not self.aborted:
+                    reason = self.should_abort(self.meter.text)
+                    if reason:
+                        self.abort(reason)
+                if self.aborted:
+                    logger.info("Streaming generation aborted", provider=self.provider,
+                                model=self.meter.model, reason=self.abort_reason,
+                                completion_tokens=self.meter.completion_tokens)
+                    break
+                if chunk.delta:
+                    if self.progress is not None:
+                        await self.progress.update(self.meter, chunk.delta)
+                    yield chunk.delta
+        finally:
+            await self._close()
+
+    async def _close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.finished_at = time.time()
+        try:
+            await self._chunks.aclose()
+        finally:
+            if self.progress is not None:
+                await self.progress.finish(self.meter, self.abort_reason)
+            if self.on_close is not None:
+                self.on_close(self)
+
+    async def aclose(self):
+        if self._iterator is not None:
+            await self._iterator.aclose()
+        await self._close()
+
+    @property
+    def response(self) -> Dict[str, Any]:
+        """The completion so far, in chat_completion's response format"""
+        meter = self.meter
+        response = {
+            "content": meter.text,
+            "usage": meter.usage(),
+            "model": meter.model,
+            "provider": self.provider,
+            "finish_reason": "aborted" if self.aborted else meter.finish_reason,
+            "latency": (self.finished_at or time.time()) - meter.start_time,
+            "time_to_first_token": meter.time_to_first_token,
+            "cost": meter.cost(),
+            "streamed": True
+        }
+        if self.aborted:
+            response["abort_reason"] = self.abort_reason
+        return response
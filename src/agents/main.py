@@ -165,6 +165,9 @@ class AgentFactory:
             metrics.total_executions
         )
         metrics.last_updated = datetime.utcnow().isoformat()
+        metrics.complexity = task.complexity
+        metrics.last_success = bool(success)
+        metrics.last_execution_time = result.execution_time
         
         # Store in vector memory for future optimization
         await memory_client.store_agent_metrics(metrics)
@@ -5,6 +5,7 @@ Tone Agent - Adjusts content tone for different audiences and channels
 from typing import Dict, List, Optional
 import asyncio
 from src.agents.azure_llm_client import llm_client, LLMProvider
+from src.agents.llm_cache import CachePolicy
 from src.common.config import settings
 from src.agents.marketing.models import ToneStyle, Channel
 import structlog
@@ -157,7 +158,7 @@ Rewrite the content to match the target tone while preserving the core message a
         
         return defaults.get(tone, defaults[ToneStyle.CONVERSATIONAL])
     
-    async def analyze_tone(self, content: str) -> Dict[str, any]:
+    async def analyze_tone(self, content: str, tenant_id: Optional[str] = None) -> Dict[str, any]:
         """Analyze the current tone of content"""
         prompt = f"""Analyze the tone of this content:
 
@@ -176,7 +177,12 @@ Provide:
                 messages=[{"role": "user", "content": prompt}],
                 model=settings.AZURE_OPENAI_DEPLOYMENT_NAME,
                 provider=LLMProvider.AZURE_OPENAI,
-                temperature=0.3
+                # Responses are only shared for deterministic calls. Exact
+                # matches only: the prompt template would dominate a similarity
+                # match, so different drafts could share an analysis
+                temperature=0,
+                tenant_id=tenant_id,
+                cache=CachePolicy(scope="tone_analysis")
             )
             
             return self._parse_tone_analysis(response.get("content", ""))
@@ -1,13 +1,14 @@
 """
 Rate limiting utilities for LLM API calls
-Provides token bucket algorithm and sliding window rate limiting
+Provides token bucket algorithm and sliding window rate limiting, plus a
+Redis-backed limiter that shares provider quotas across processes
 """
 
 import asyncio
 import time
-from typing import Dict, Optional, Any
+from typing import Dict, Optional, Any, Tuple
 from datetime import datetime, timedelta
-from collections import deque
+from collections import OrderedDict, deque
 import structlog
 
 logger = structlog.get_logger()
@@ -50,28 +51,24 @@ class TokenBucket:
             if await self.acquire(tokens):
                 return True
             
-            # Calculate wait time until next refill
-            time_since_refill = time.time() - self.last_refill
-            time_until_refill = self.refill_period - time_since_refill
-            
-            # Wait for a fraction of the refill period or 1 second, whichever is smaller
-            wait_time = min(1.0, time_until_refill / 10)
+            # Sleep exactly until enough tokens have trickled in
+            deficit = min(tokens, self.capacity) - self.tokens
+            wait_time = max(0.01, deficit * self.refill_period / self.refill_rate)
+            remaining = max_wait - (time.time() - start_time)
+            if wait_time > remaining:
+                break
             await asyncio.sleep(wait_time)
         
         return False
     
     async def _refill(self):
-        """Refill tokens based on elapsed time"""
+        """Refill tokens continuously based on elapsed time"""
         current_time = time.time()
         time_elapsed = current_time - self.last_refill
         
-        if time_elapsed >= self.refill_period:
-            # Full refill
-            tokens_to_add = self.refill_rate * (time_elapsed / self.refill_period)
-            self.tokens = min(self.capacity, self.tokens + tokens_to_add)
-            self.last_refill = current_time
-            
-            logger.debug(f"Token bucket refilled: {self.tokens}/{self.capacity} tokens")
+        tokens_to_add = self.refill_rate * (time_elapsed / self.refill_period)
+        self.tokens = min(self.capacity, self.tokens + tokens_to_add)
+        self.last_refill = current_time
 
 
 class SlidingWindowRateLimiter:
@@ -127,101 +124,338 @@ class SlidingWindowRateLimiter:
         return False
 
 
-class ProviderRateLimiter:
-    """Rate limiter that manages limits for different LLM providers"""
+# Atomically refill and debit the RPM and TPM buckets of one provider deployment.
+# Uses the Redis clock so every process sees the same refill. Returns
+# {allowed, wait_ms}; a denied call debits nothing.
+TAKE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local scale = tonumber(redis.call('GET', KEYS[2]) or '1')
+local rpm = math.max(1, tonumber(ARGV[1]) * scale)
+local tpm = math.max(1, tonumber(ARGV[2]) * scale)
+local cost = math.min(tonumber(ARGV[3]), tpm)
+local state = redis.call('HMGET', KEYS[1], 'requests', 'tokens', 'ts')
+local requests = tonumber(state[1]) or rpm
+local tokens = tonumber(state[2]) or tpm
+local elapsed = math.max(0, now - (tonumber(state[3]) or now)) / 60000
+requests = math.min(rpm, requests + elapsed * rpm)
+tokens = math.min(tpm, tokens + elapsed * tpm)
+local wait = 0
+if requests < 1 then wait = math.max(wait, (1 - requests) / rpm * 60000) end
+if tokens < cost then wait = math.max(wait, (cost - tokens) / tpm * 60000) end
+local allowed = 0
+if wait == 0 then
+    requests = requests - 1
+    tokens = tokens - cost
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'requests', tostring(requests), 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], 120000)
+return {allowed, math.ceil(wait)}
+"""
+
+# Return one request and its tokens to a bucket after a grant went unused.
+# Capped at the scaled limits so a refund never creates capacity.
+REFUND_SCRIPT = """
+local scale = tonumber(redis.call('GET', KEYS[2]) or '1')
+local rpm = math.max(1, tonumber(ARGV[1]) * scale)
+local tpm = math.max(1, tonumber(ARGV[2]) * scale)
+local state = redis.call('HMGET', KEYS[1], 'requests', 'tokens')
+if not state[1] then return 0 end
+local requests = math.min(rpm, tonumber(state[1]) + 1)
+local tokens = math.min(tpm, tonumber(state[2]) + math.min(tonumber(ARGV[3]), tpm))
+redis.call('HSET', KEYS[1], 'requests', tostring(requests), 'tokens', tostring(tokens))
+return 1
+"""
+
+# Shrink the shared limit scale after a 429; the key expires so limits recover
+REDUCE_SCRIPT = """
+local scale = tonumber(redis.call('GET', KEYS[1]) or '1')
+scale = math.max(tonumber(ARGV[2]), scale * tonumber(ARGV[1]))
+redis.call('SET', KEYS[1], tostring(scale), 'EX', tonumber(ARGV[3]))
+return tostring(scale)
+"""
+
+
+def _take(state: Dict[str, float], now: float, rpm: float, tpm: float, cost: float) -> Tuple[bool, float]:
+    """In-process equivalent of TAKE_SCRIPT; returns (allowed, wait_seconds)"""
+    cost = min(cost, tpm)
+    elapsed = max(0.0, now - state.get("ts", now)) / 60.0
+    requests = min(rpm, state.get("requests", rpm) + elapsed * rpm)
+    tokens = min(tpm, state.get("tokens", tpm) + elapsed * tpm)
+    
+    wait = 0.0
+    if requests < 1:
+        wait = max(wait, (1 - requests) / rpm * 60.0)
+    if tokens < cost:
+        wait = max(wait, (cost - tokens) / tpm * 60.0)
+    if wait == 0:
+        requests -= 1
+        tokens -= cost
+    
+    state.update(requests=requests, tokens=tokens, ts=now)
+    return wait == 0, wait
+
+
+class DistributedRateLimiter:
+    """Continuous-refill RPM/TPM buckets shared by every process through Redis
+    
+    Falls back to in-process buckets when Redis is not configured or unreachable,
+    so a Redis outage degrades to per-process limiting instead of failing calls.
+    """
+    
+    def __init__(self, redis_url: Optional[str] = None, key_prefix: str = "qlp:ratelimit",
+                 reduction_ttl: int = 600):
+        self.redis_url = redis_url
+        self.key_prefix = key_prefix
+        self.reduction_ttl = reduction_ttl
+        self._redis = None
+        self._take_script = None
+        self._refund_script = None
+        self._reduce_script = None
+        self._local: Dict[str, Dict[str, float]] = {}
+        self._local_scales: Dict[str, Tuple[float, float]] = {}
+    
+    def _get_redis(self):
+        if self._redis is None and self.redis_url:
+            try:
+                import redis.asyncio as redis
+                self._redis = redis.from_url(self.redis_url, decode_responses=True)
+                self._take_script = self._redis.register_script(TAKE_SCRIPT)
+                self._refund_script = self._redis.register_script(REFUND_SCRIPT)
+                self._reduce_script = self._redis.register_script(REDUCE_SCRIPT)
+            except Exception as e:
+                logger.warning(f"Distributed rate limiting unavailable, using local buckets: {e}")
+                self.redis_url = None
+        return self._redis
+    
+    def _keys(self, provider: str, deployment: str) -> Tuple[str, str]:
+        base = f"{self.key_prefix}:{provider}:{deployment}"
+        return f"{base}:bucket", f"{base}:scale"
+    
+    def _local_scale(self, scale_key: str) -> float:
+        scale, expires_at = self._local_scales.get(scale_key, (1.0, 0.0))
+        return scale if expires_at > time.monotonic() else 1.0
+    
+    async def try_acquire(self, provider: str, deployment: str, rpm: int, tpm: int, tokens: int) -> float:
+        """Take one request and `tokens` tokens; returns 0 on success, else seconds to wait"""
+        bucket_key, scale_key = self._keys(provider, deployment)
+        if self._get_redis() is not None:
+            try:
+                allowed, wait_ms = await self._take_script(keys=[bucket_key, scale_key], args=[rpm, tpm, tokens])
+                return 0.0 if int(allowed) else int(wait_ms) / 1000.0
+            except Exception as e:
+                logger.warning(f"Redis rate limiter failed, using local bucket: {e}")
+        
+        scale = self._local_scale(scale_key)
+        allowed, wait = _take(
+            self._local.setdefault(bucket_key, {}), time.monotonic(),
+            max(1.0, rpm * scale), max(1.0, tpm * scale), tokens
+        )
+        return 0.0 if allowed else wait
+    
+    async def refund(self, provider: str, deployment: str, rpm: int, tpm: int, tokens: int):
+        """Give back a request and `tokens` tokens taken by try_acquire but never used"""
+        bucket_key, scale_key = self._keys(provider, deployment)
+        if self._get_redis() is not None:
+            try:
+                await self._refund_script(keys=[bucket_key, scale_key], args=[rpm, tpm, tokens])
+                return
+            except Exception as e:
+                logger.warning(f"Redis rate limiter failed, refunding local bucket: {e}")
+        
+        state = self._local.get(bucket_key)
+        if state:
+            scale = self._local_scale(scale_key)
+            rpm, tpm = max(1.0, rpm * scale), max(1.0, tpm * scale)
+            state["requests"] = min(rpm, state["requests"] + 1)
+            state["tokens"] = min(tpm, state["tokens"] + min(tokens, tpm))
+    
+    async def reduce_limits(self, provider: str, deployment: str, factor: float = 0.8,
+                            floor: float = 0.1) -> float:
+        """Shrink the limits for every process after a provider 429; returns the new scale"""
+        _, scale_key = self._keys(provider, deployment)
+        if self._get_redis() is not None:
+            try:
+                return float(await self._reduce_script(keys=[scale_key], args=[factor, floor, self.reduction_ttl]))
+            except Exception as e:
+                logger.warning(f"Redis rate limiter failed, reducing local limits: {e}")
+        
+        scale = max(floor, self._local_scale(scale_key) * factor)
+        self._local_scales[scale_key] = (scale, time.monotonic() + self.reduction_ttl)
+        return scale
+
+
+class _FairQueue:
+    """Waiters for one provider deployment: FIFO per tenant, round-robin across tenants
+    
+    The queue lives in one process, so fairness only holds between the callers
+    of that process. Across processes the Redis buckets bound the total rate,
+    but a busy tenant in one worker is not interleaved with tenants in another.
+    """
     
     def __init__(self):
+        self.tenants: "OrderedDict[str, deque]" = OrderedDict()
+        self.dispatcher: Optional[asyncio.Task] = None
+    
+    def push(self, tenant: str, tokens: int) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self.tenants.setdefault(tenant, deque()).append((tokens, future))
+        return future
+    
+    def head(self) -> Optional[Tuple[str, int, asyncio.Future]]:
+        """Oldest live waiter of the tenant whose turn it is"""
+        while self.tenants:
+            tenant, waiters = next(iter(self.tenants.items()))
+            while waiters and waiters[0][1].done():
+                waiters.popleft()
+            if waiters:
+                return tenant, waiters[0][0], waiters[0][1]
+            del self.tenants[tenant]
+        return None
+    
+    def pop(self, tenant: str):
+        """Grant the head waiter and send its tenant to the back of the line"""
+        waiters = self.tenants[tenant]
+        waiters.popleft()
+        if waiters:
+            self.tenants.move_to_end(tenant)
+        else:
+            del self.tenants[tenant]
+
+
+class ProviderRateLimiter:
+    """Rate limiter that manages limits for different LLM providers
+    
+    Limits are enforced per provider deployment across the whole fleet through
+    DistributedRateLimiter. Waiters are queued rather than polling: one
+    dispatcher per deployment grants capacity in FIFO order within a tenant and
+    round-robin across tenants, sleeping exactly until the bucket can cover the
+    next request. The ordering is per process (see _FairQueue); only the limits
+    themselves are shared.
+    """
+    
+    def __init__(self, provider_limits: Optional[Dict[str, Dict[str, int]]] = None,
+                 backend: Optional[DistributedRateLimiter] = None):
         # Import settings here to avoid circular imports
         from src.common.config import settings
         
         # Configure rate limits per provider from settings
-        self.provider_limits = {
+        self.provider_limits = provider_limits or {
             "openai": {"rpm": settings.OPENAI_RPM, "tpm": settings.OPENAI_TPM},
             "azure_openai": {"rpm": settings.AZURE_RPM, "tpm": settings.AZURE_TPM},
             "anthropic": {"rpm": settings.ANTHROPIC_RPM, "tpm": settings.ANTHROPIC_TPM},
             "groq": {"rpm": settings.GROQ_RPM, "tpm": settings.GROQ_TPM},
             "aws_bedrock": {"rpm": settings.AWS_BEDROCK_RPM, "tpm": settings.AWS_BEDROCK_TPM}
         }
-        
-        # Initialize rate limiters
-        self.request_limiters: Dict[str, SlidingWindowRateLimiter] = {}
-        self.token_buckets: Dict[str, TokenBucket] = {}
-        
-        for provider, limits in self.provider_limits.items():
-            # Request rate limiter (sliding window)
-            self.request_limiters[provider] = SlidingWindowRateLimiter(
-                max_requests=limits["rpm"],
-                window_seconds=60
-            )
-            
-            # Token bucket for token-based limiting
-            self.token_buckets[provider] = TokenBucket(
-                capacity=limits["tpm"],
-                refill_rate=limits["tpm"],
-                refill_period=60.0
-            )
+        self.backend = backend or DistributedRateLimiter(
+            redis_url=settings.REDIS_URL if settings.LLM_RATE_LIMIT_DISTRIBUTED else None
+        )
+        self._queues: Dict[Tuple[str, str], _FairQueue] = {}
+    
+    async def _try(self, provider: str, deployment: str, tokens: int) -> float:
+        limits = self.provider_limits[provider]
+        return await self.backend.try_acquire(provider, deployment, limits["rpm"], limits["tpm"], tokens)
     
-    async def acquire(self, provider: str, estimated_tokens: int = 1000) -> bool:
-        """Acquire permission to make a request"""
-        if provider not in self.request_limiters:
+    async def _refund(self, provider: str, deployment: str, tokens: int):
+        limits = self.provider_limits[provider]
+        try:
+            await self.backend.refund(provider, deployment, limits["rpm"], limits["tpm"], tokens)
+        except Exception as e:
+            logger.error(f"Rate limiter refund failed for {provider}/{deployment}: {e}")
+    
+    async def acquire(self, provider: str, estimated_tokens: int = 1000,
+                      deployment: Optional[str] = None) -> bool:
+        """Acquire permission to make a request without waiting"""
+        if provider not in self.provider_limits:
             logger.warning(f"Unknown provider {provider}, allowing request")
             return True
         
-        # Check both request rate and token limits
-        request_allowed = await self.request_limiters[provider].acquire()
-        tokens_allowed = await self.token_buckets[provider].acquire(estimated_tokens)
-        
-        if not request_allowed or not tokens_allowed:
-            logger.info(f"Rate limit hit for {provider}: requests={request_allowed}, tokens={tokens_allowed}")
+        deployment = deployment or "default"
+        queue = self._queues.get((provider, deployment))
+        if queue is not None and queue.head() is not None:
+            # Don't jump ahead of queued waiters
             return False
         
+        wait = await self._try(provider, deployment, estimated_tokens)
+        if wait > 0:
+            logger.info(f"Rate limit hit for {provider}/{deployment}, capacity in {wait:.2f}s")
+            return False
         return True
     
     async def wait_and_acquire(
         self, 
         provider: str, 
         estimated_tokens: int = 1000,
-        max_wait: float = 30.0
+        max_wait: float = 30.0,
+        deployment: Optional[str] = None,
+        tenant_id: Optional[str] = None
     ) -> bool:
-        """Wait for rate limit to clear and acquire permission"""
-        if provider not in self.request_limiters:
+        """Queue for capacity and acquire permission, giving up after max_wait"""
+        if provider not in self.provider_limits:
             logger.warning(f"Unknown provider {provider}, allowing request")
             return True
         
-        start_time = time.time()
+        deployment = deployment or "default"
+        queue = self._queues.get((provider, deployment))
+        if queue is None or (queue.dispatcher is not None and queue.dispatcher.get_loop() is not asyncio.get_running_loop()):
+            # First waiter, or the previous event loop is gone
+            queue = self._queues[(provider, deployment)] = _FairQueue()
+        future = queue.push(tenant_id or "default", estimated_tokens)
+        if queue.dispatcher is None or queue.dispatcher.done():
+            queue.dispatcher = asyncio.create_task(self._dispatch(provider, deployment, queue))
         
-        while time.time() - start_time < max_wait:
-            # Try to acquire both limits
-            if await self.acquire(provider, estimated_tokens):
-                return True
-            
-            # Wait a bit before retrying
-            await asyncio.sleep(0.5)
-        
-        logger.warning(f"Rate limit wait timeout for {provider} after {max_wait}s")
-        return False
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout=max_wait)
+        except asyncio.TimeoutError:
+            if future.done() and not future.cancelled():
+                return future.result()
+            future.cancel()
+            logger.warning(f"Rate limit wait timeout for {provider}/{deployment} after {max_wait}s")
+            return False
+    
+    async def _dispatch(self, provider: str, deployment: str, queue: _FairQueue):
+        """Grant capacity to queued waiters in fair order until the queue drains"""
+        while True:
+            head = queue.head()
+            if head is None:
+                return
+            tenant, tokens, future = head
+            try:
+                wait = await self._try(provider, deployment, tokens)
+            except Exception as e:
+                logger.error(f"Rate limiter dispatch failed for {provider}/{deployment}: {e}")
+                wait = 1.0
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            queue.pop(tenant)
+            if future.done():
+                # The waiter timed out while the grant was in flight
+                await self._refund(provider, deployment, tokens)
+            else:
+                future.set_result(True)
+    
+    async def report_rate_limited(self, provider: str, deployment: Optional[str] = None) -> float:
+        """Record a provider 429 so every process backs off, returns the new limit scale"""
+        if provider not in self.provider_limits:
+            return 1.0
+        scale = await self.backend.reduce_limits(provider, deployment or "default")
+        logger.info(f"Reduced {provider}/{deployment or 'default'} rate limits to {scale:.0%} fleet-wide")
+        return scale
     
     def update_limits(self, provider: str, rpm: Optional[int] = None, tpm: Optional[int] = None):
-        """Update rate limits for a provider dynamically"""
+        """Update the base rate limits for a provider dynamically"""
         if provider not in self.provider_limits:
             logger.warning(f"Unknown provider {provider}")
             return
         
         if rpm is not None:
             self.provider_limits[provider]["rpm"] = rpm
-            self.request_limiters[provider] = SlidingWindowRateLimiter(
-                max_requests=rpm,
-                window_seconds=60
-            )
             logger.info(f"Updated {provider} RPM limit to {rpm}")
         
         if tpm is not None:
             self.provider_limits[provider]["tpm"] = tpm
-            self.token_buckets[provider] = TokenBucket(
-                capacity=tpm,
-                refill_rate=tpm,
-                refill_period=60.0
-            )
             logger.info(f"Updated {provider} TPM limit to {tpm}")
 
 
@@ -313,11 +547,9 @@ async def rate_limit_handler(
                 )
                 await asyncio.sleep(delay)
                 
-                # Optionally reduce provider limits if we keep hitting them
+                # Reduce provider limits fleet-wide if we keep hitting them
                 if attempt > 1:
-                    current_rpm = global_rate_limiter.provider_limits[provider]["rpm"]
-                    reduced_rpm = int(current_rpm * 0.8)  # Reduce by 20%
-                    global_rate_limiter.update_limits(provider, rpm=reduced_rpm)
+                    await global_rate_limiter.report_rate_limited(provider)
             else:
                 # Non-rate-limit error, re-raise
                 raise
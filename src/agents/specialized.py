@@ -17,6 +17,7 @@ import structlog
 
 from src.common.config import settings
 from src.agents.azure_llm_client import llm_client, LLMProvider
+from src.common.language_classifier import classify_code
 
 logger = structlog.get_logger()
 
@@ -289,18 +290,7 @@ Requirements:
     
     def _detect_language(self, code: str) -> str:
         """Detect programming language from code"""
-        if "import " in code and "def " in code:
-            return "python"
-        elif "const " in code or "function " in code or "=>" in code:
-            return "javascript"
-        elif "func " in code and "package " in code:
-            return "go"
-        elif "fn " in code and "let " in code:
-            return "rust"
-        elif "public class" in code or "public static" in code:
-            return "java"
-        else:
-            return "unknown"
+        return classify_code(code).language or "unknown"
     
     def _extract_features(self, code: str) -> List[str]:
         """Extract implemented features from code"""
@@ -16,6 +16,7 @@ from anthropic import AsyncAnthropic
 import structlog
 
 from src.common.config import settings
+from src.common.language_classifier import classify_code
 
 logger = structlog.get_logger()
 
@@ -296,38 +297,8 @@ Requirements:
     
     def _detect_language(self, code: str) -> str:
         """Detect programming language from code"""
-        # Count Python-specific patterns
-        python_score = 0
-        python_patterns = ['def ', 'import ', 'from ', 'class ', '__init__', 'self.', 'print(', 
-                          'if __name__', ':', 'elif ', 'except ', 'async def', 'await ']
-        for pattern in python_patterns:
-            if pattern in code:
-                python_score += 1
-        
-        # Count JavaScript-specific patterns  
-        js_score = 0
-        js_patterns = ['const ', 'let ', 'var ', '=>', 'console.', 'function(', 'require(',
-                      'module.exports', 'export ', 'import {', '})', ');']
-        for pattern in js_patterns:
-            if pattern in code:
-                js_score += 1
-        
-        # If Python score is higher or equal, prefer Python
-        if python_score >= js_score and python_score > 0:
-            return "python"
-        elif js_score > python_score:
-            return "javascript"
-        
-        # Other language checks
-        if 'package main' in code or ('func ' in code and 'package ' in code):
-            return "go"
-        elif ('fn main' in code) or ('fn ' in code and 'let mut' in code):
-            return "rust"
-        elif 'public class' in code or 'public static void main' in code:
-            return "java"
-        
         # Default to python for this use case
-        return "python"
+        return classify_code(code).language or "python"
     
     def _extract_features(self, code: str) -> List[str]:
         """Extract implemented features from code"""
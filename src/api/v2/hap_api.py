@@ -126,21 +126,19 @@ async def check_batch(
         if not hap_service.initialized:
             await hap_service.initialize()
         
-        results = []
         user_id = user.get("user_id", user.get("sub"))
         tenant_id = user.get("organization_id", "default")
         
-        for item in batch_request.items:
-            request = HAPCheckRequest(
+        results = await hap_service.check_content_batch([
+            HAPCheckRequest(
                 content=item.get("content", ""),
                 context=batch_request.context,
                 user_id=user_id,
                 tenant_id=tenant_id,
                 metadata=item.get("metadata", {})
             )
-            
-            result = await hap_service.check_content(request)
-            results.append(result)
+            for item in batch_request.items
+        ])
         
         return results
         
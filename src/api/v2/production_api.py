@@ -13,7 +13,7 @@ from uuid import UUID, uuid4
 
 from fastapi import APIRouter, HTTPException, Depends, Query, Header, Request, Response, BackgroundTasks
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi.responses import StreamingResponse, JSONResponse
+from fastapi.responses import JSONResponse
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel, Field, validator, constr, conint, confloat
 from slowapi import Limiter, _rate_limit_exceeded_handler
@@ -24,7 +24,9 @@ import structlog
 from src.common.models import ExecutionRequest, QLCapsule, ValidationReport
 from src.common.database import get_db
 from src.common.clerk_auth import get_current_user, require_permission
-from src.orchestrator.capsule_storage import CapsuleStorageService
+from src.common.error_handling import ValidationError
+from src.orchestrator.capsule_storage import AsyncCapsuleStorageService, get_async_capsule_storage
+from src.orchestrator.capsule_export import ARCHIVE_MEDIA_TYPES, archive_response
 from src.common.cost_calculator_persistent import get_cost_report, persistent_cost_calculator
 from sqlalchemy.orm import Session
 
@@ -293,6 +295,48 @@ def create_hateoas_links(capsule_id: str, base_url: str) -> List[Link]:
     ]
 
 
+# Storage statuses that aren't API statuses
+STORAGE_STATUS_MAP = {
+    "created": CapsuleStatus.pending,
+    "stored": CapsuleStatus.completed,
+}
+
+
+def capsule_status(status: Optional[str]) -> CapsuleStatus:
+    if status in STORAGE_STATUS_MAP:
+        return STORAGE_STATUS_MAP[status]
+    try:
+        return CapsuleStatus(status)
+    except ValueError:
+        return CapsuleStatus.completed
+
+
+def capsule_response(summary: Dict[str, Any], base_url: str,
+                     files_generated: Optional[int] = None) -> CapsuleResponse:
+    """API representation of a capsule summary from storage"""
+    manifest = summary["manifest"]
+    metadata = summary["metadata"]
+    return CapsuleResponse(
+        id=summary["id"],
+        project_name=manifest.get("name") or metadata.get("project_name") or "Unnamed",
+        description=manifest.get("description", ""),
+        status=capsule_status(summary["status"]),
+        created_at=datetime.fromisoformat(summary["created_at"]),
+        updated_at=datetime.fromisoformat(summary["updated_at"] or summary["created_at"]),
+        created_by=summary["user_id"],
+        organization_id=summary["tenant_id"],
+        validation_score=min(max(summary["confidence_score"] or 0, 0), 1),
+        metrics={
+            "files_generated": files_generated if files_generated is not None else summary["file_count"],
+            "total_size_bytes": summary["total_size_bytes"],
+            "test_coverage": metadata.get("test_coverage", 0),
+            "execution_time": summary["execution_duration"]
+        },
+        tags=manifest.get("tech_stack") or metadata.get("tech_stack") or [],
+        links=create_hateoas_links(summary["id"], base_url)
+    )
+
+
 async def track_request(request: Request, user: Dict[str, Any]):
     """Track API request for analytics"""
     logger.info(
@@ -440,60 +484,48 @@ async def create_capsule(
 async def list_capsules(
     request: Request,
     response: Response,
-    page: conint(ge=1) = Query(1, description="Page number"),
     per_page: conint(ge=1, le=100) = Query(20, description="Items per page"),
+    cursor: Optional[str] = Query(None, description="Cursor from the previous page's next link"),
     status: Optional[CapsuleStatus] = Query(None, description="Filter by status"),
-    tech_stack: Optional[List[str]] = Query(None, description="Filter by technology"),
-    search: Optional[str] = Query(None, description="Search in name and description"),
-    sort_by: str = Query("created_at", description="Sort field"),
-    sort_order: SortOrder = Query(SortOrder.desc, description="Sort order"),
+    sort_order: SortOrder = Query(SortOrder.desc, description="Sort order by creation time"),
     created_after: Optional[datetime] = Query(None, description="Filter by creation date"),
     created_before: Optional[datetime] = Query(None, description="Filter by creation date"),
-    db: Session = Depends(get_db),
+    storage: AsyncCapsuleStorageService = Depends(get_async_capsule_storage),
     user: Dict[str, Any] = Depends(get_current_user)
 ):
-    """List capsules with comprehensive filtering and pagination"""
+    """List capsule summaries for the caller's organization, keyset-paginated
+    
+    Only summary columns are read; file contents are never loaded for a listing.
+    """
     await track_request(request, user)
     
     try:
-        # In production, implement actual filtering logic
-        total = 42  # Mock total
-        pages = (total + per_page - 1) // per_page
+        storage_status = None
+        if status:
+            storage_status = next(
+                (name for name, mapped in STORAGE_STATUS_MAP.items() if mapped == status), status.value
+            )
+        page = await storage.list_capsules(
+            user["organization_id"] or user["tenant_id"],
+            limit=per_page,
+            cursor=cursor,
+            descending=sort_order == SortOrder.desc,
+            status=storage_status,
+            created_after=created_after,
+            created_before=created_before
+        )
         
         # Set cache headers
         response.headers["Cache-Control"] = "private, max-age=60"
         response.headers["Vary"] = "Authorization"
         
-        # Mock capsules
-        capsules = []
-        for i in range(min(per_page, total - (page - 1) * per_page)):
-            capsule_id = str(uuid4())
-            capsules.append(CapsuleResponse(
-                id=capsule_id,
-                project_name=f"Project {(page-1)*per_page + i + 1}",
-                description="Auto-generated project",
-                status=CapsuleStatus.completed,
-                created_at=datetime.now(timezone.utc),
-                updated_at=datetime.now(timezone.utc),
-                created_by=user["user_id"],
-                organization_id=user["organization_id"],
-                validation_score=0.85 + i * 0.01,
-                metrics={"files": 10 + i},
-                tags=["python", "api"],
-                links=create_hateoas_links(capsule_id, str(request.base_url))
-            ))
+        capsules = [capsule_response(summary, str(request.base_url)) for summary in page["capsules"]]
         
         # Build pagination links
         pagination_links = []
-        if page > 1:
+        if page["next_cursor"]:
             pagination_links.append(Link(
-                href=f"{request.url.include_query_params(page=page-1)}",
-                rel="prev",
-                method="GET"
-            ))
-        if page < pages:
-            pagination_links.append(Link(
-                href=f"{request.url.include_query_params(page=page+1)}",
+                href=f"{request.url.include_query_params(cursor=page['next_cursor'])}",
                 rel="next",
                 method="GET"
             ))
@@ -503,18 +535,14 @@ async def list_capsules(
             data=capsules,
             links=pagination_links,
             meta={
-                "pagination": PaginationMeta(
-                    total=total,
-                    page=page,
-                    per_page=per_page,
-                    pages=pages,
-                    has_next=page < pages,
-                    has_prev=page > 1
-                ),
+                "pagination": {
+                    "per_page": per_page,
+                    "count": len(capsules),
+                    "next_cursor": page["next_cursor"],
+                    "has_next": page["next_cursor"] is not None
+                },
                 "filters_applied": {
                     "status": status,
-                    "tech_stack": tech_stack,
-                    "search": search,
                     "date_range": {
                         "after": created_after,
                         "before": created_before
@@ -523,6 +551,18 @@ async def list_capsules(
             }
         )
         
+    except ValidationError as e:
+        return ApiResponse(
+            success=False,
+            errors=[
+                ErrorDetail(
+                    code="INVALID_CURSOR",
+                    message=str(e),
+                    field="cursor",
+                    severity=ErrorSeverity.low
+                )
+            ]
+        )
     except Exception as e:
         logger.error("Failed to list capsules", error=str(e))
         return ApiResponse(
@@ -550,7 +590,7 @@ async def get_capsule(
     capsule_id: str,
     include_files: bool = Query(False, description="Include file contents"),
     include_validation: bool = Query(True, description="Include validation report"),
-    db: Session = Depends(get_db),
+    storage: AsyncCapsuleStorageService = Depends(get_async_capsule_storage),
     user: Dict[str, Any] = Depends(get_current_user),
     if_none_match: Optional[str] = Header(None)
 ):
@@ -564,12 +604,10 @@ async def get_capsule(
             response.status_code = 304  # Not Modified
             return None
         
-        # Mock capsule retrieval
-        # In production, fetch from database
-        storage = CapsuleStorageService(db)
-        capsule = await storage.get_capsule(capsule_id)
+        # Summary columns only; files and the validation report are loaded if asked for
+        summary = await storage.get_capsule_summary(capsule_id)
         
-        if not capsule:
+        if not summary:
             return ApiResponse(
                 success=False,
                 errors=[
@@ -582,7 +620,7 @@ async def get_capsule(
             )
         
         # Check access permissions
-        if capsule.tenant_id != user["organization_id"]:
+        if summary["tenant_id"] != (user["organization_id"] or user["tenant_id"]):
             return ApiResponse(
                 success=False,
                 errors=[
@@ -595,24 +633,19 @@ async def get_capsule(
             )
         
         # Build response
-        capsule_data = CapsuleResponse(
-            id=capsule.id,
-            project_name=capsule.manifest.get("name", "Unnamed"),
-            description=capsule.manifest.get("description", ""),
-            status=CapsuleStatus.completed,
-            created_at=datetime.fromisoformat(capsule.created_at),
-            updated_at=datetime.now(timezone.utc),
-            created_by=user["user_id"],
-            organization_id=user["organization_id"],
-            validation_score=capsule.metadata.get("confidence_score", 0),
-            metrics={
-                "files_generated": len(capsule.source_code) + len(capsule.tests),
-                "test_coverage": capsule.metadata.get("test_coverage", 0),
-                "execution_time": capsule.metadata.get("execution_duration", 0)
-            },
-            tags=capsule.manifest.get("tech_stack", []),
-            links=create_hateoas_links(capsule_id, str(request.base_url))
-        )
+        capsule_data = capsule_response(summary, str(request.base_url))
+        meta = {
+            "include_files": include_files,
+            "include_validation": include_validation,
+            "access_level": "owner" if summary["user_id"] == user["user_id"] else "organization"
+        }
+        if include_files or include_validation:
+            # No paths means no blobs when only the validation report is wanted
+            capsule = await storage.get_capsule(capsule_id, paths=None if include_files else [])
+            if include_files and capsule:
+                meta["files"] = {"source_code": capsule.source_code, "tests": capsule.tests}
+            if include_validation and capsule and capsule.validation_report:
+                meta["validation_report"] = jsonable_encoder(capsule.validation_report)
         
         # Set cache headers
         response.headers["Cache-Control"] = "private, max-age=300"
@@ -622,11 +655,7 @@ async def get_capsule(
         return ApiResponse(
             success=True,
             data=capsule_data,
-            meta={
-                "include_files": include_files,
-                "include_validation": include_validation,
-                "access_level": "owner" if capsule.user_id == user["user_id"] else "organization"
-            }
+            meta=meta
         )
         
     except Exception as e:
@@ -654,37 +683,38 @@ async def export_capsule(
     request: Request,
     capsule_id: str,
     export_request: ExportRequest,
-    db: Session = Depends(get_db),
+    storage: AsyncCapsuleStorageService = Depends(get_async_capsule_storage),
     user: Dict[str, Any] = Depends(get_current_user)
 ):
     """Export capsule with streaming for large files"""
     await track_request(request, user)
     
     try:
-        # Get capsule
-        storage = CapsuleStorageService(db)
-        capsule = await storage.get_capsule(capsule_id)
+        format = export_request.format.value
+        if format not in ARCHIVE_MEDIA_TYPES:
+            raise HTTPException(status_code=400, detail=f"Format {format} cannot be exported as an archive")
         
-        if not capsule:
+        # Ownership is checked on the summary before any files are read
+        summary = await storage.get_capsule_summary(capsule_id)
+        
+        if not summary:
             raise HTTPException(status_code=404, detail="Capsule not found")
+        if summary["tenant_id"] != (user["organization_id"] or user["tenant_id"]):
+            raise HTTPException(status_code=403, detail="You don't have access to this capsule")
         
-        # Stream the export
-        async def generate():
-            # Mock streaming chunks
-            # In production, generate actual export
-            yield b"PK\x03\x04"  # ZIP header
-            yield b"... file contents ..."
-            
-        filename = f"capsule_{capsule_id}.{export_request.format.value}"
+        capsule = await storage.get_capsule(capsule_id)
+        if not export_request.include_tests:
+            capsule.tests = {}
+        if not export_request.include_docs:
+            capsule.documentation = ""
         
-        return StreamingResponse(
-            generate(),
-            media_type="application/octet-stream",
-            headers={
-                "Content-Disposition": f'attachment; filename="{filename}"',
-                "X-Content-Type-Options": "nosniff"
-            }
+        # Streamed as it is built; uncompressed tar can be resumed with Range
+        response = await archive_response(
+            capsule, format, f"capsule_{capsule_id}.{format}",
+            request.headers.get("range"), request.headers.get("if-range")
         )
+        response.headers["X-Content-Type-Options"] = "nosniff"
+        return response
         
     except HTTPException:
         raise
@@ -0,0 +1,282 @@
+"""
+Content-addressed blob store for capsule files
+
+Every file is stored once under the sha256 of its content. Capsules and
+versions keep only manifests of path -> hash, so identical files across
+capsules and unchanged files across versions share a single blob, and readers
+fetch only the files they ask for. Backends: the local filesystem, a
+PostgreSQL table, or any S3-compatible bucket, selected by STORAGE_BACKEND.
+
+The orchestrator and the Temporal workers both read and write capsules, so the
+store must be shared between them. PostgreSQL is the default; the filesystem
+backend only works when every process sees the same STORAGE_PATH.
+"""
+
+import asyncio
+import hashlib
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+import structlog
+
+from src.common.config import settings
+
+logger = structlog.get_logger()
+
+# Manifests group files the way capsules do
+MANIFEST_SECTIONS = ("source_code", "tests")
+
+
+def blob_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class BlobStore(ABC):
+    """Immutable blobs addressed by content hash"""
+
+    # Parallel requests for backends with per-blob round trips
+    concurrency = 16
+
+    @abstractmethod
+    async def exists(self, digest: str) -> bool:
+        ...
+
+    @abstractmethod
+    async def _write(self, digest: str, data: bytes) -> None:
+        ...
+
+    @abstractmethod
+    async def get(self, digest: str) -> Optional[bytes]:
+        ...
+
+    async def put(self, data: bytes) -> str:
+        """Store data once; returns its hash"""
+        digest = blob_hash(data)
+        if not await self.exists(digest):
+            await self._write(digest, data)
+        return digest
+
+    async def get_many(self, digests: Iterable[str]) -> Dict[str, bytes]:
+        unique = list(dict.fromkeys(digests))
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def fetch(digest: str):
+            async with semaphore:
+                return digest, await self.get(digest)
+
+        results = await asyncio.gather(*(fetch(d) for d in unique))
+        return {digest: data for digest, data in results if data is not None}
+
+    async def put_files(self, files: Dict[str, str]) -> Dict[str, str]:
+        """Store file contents; returns the path -> hash manifest"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def store(content: str):
+            async with semaphore:
+                return content, await self.put(content.encode("utf-8"))
+
+        # Files with identical content in one batch are written once
+        digests = dict(await asyncio.gather(*(store(c) for c in set(files.values()))))
+        return {path: digests[content] for path, content in files.items()}
+
+    async def get_files(self, manifest: Dict[str, str],
+                        paths: Optional[Iterable[str]] = None) -> Dict[str, str]:
+        """Read the files of a manifest, or only the requested paths"""
+        wanted = manifest if paths is None else {p: manifest[p] for p in paths if p in manifest}
+        blobs = await self.get_many(wanted.values())
+        missing = [path for path, digest in wanted.items() if digest not in blobs]
+        if missing:
+            logger.error("Blobs missing from store", paths=missing[:10], missing=len(missing))
+        return {path: blobs[digest].decode("utf-8") for path, digest in wanted.items() if digest in blobs}
+
+
+class FilesystemBlobStore(BlobStore):
+    """Blobs as files under root/ab/abcdef..., written atomically"""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest
+
+    async def exists(self, digest: str) -> bool:
+        return self._path(digest).exists()
+
+    async def _write(self, digest: str, data: bytes) -> None:
+        await asyncio.to_thread(self._write_sync, digest, data)
+
+    def _write_sync(self, digest: str, data: bytes) -> None:
+        path = self._path(digest)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Concurrent writers of the same blob write identical bytes; rename is atomic
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+
+    async def get(self, digest: str) -> Optional[bytes]:
+        path = self._path(digest)
+        try:
+            return await asyncio.to_thread(path.read_bytes)
+        except FileNotFoundError:
+            return None
+
+
+class PostgresBlobStore(BlobStore):
+    """Blobs as rows of the capsule_blobs table"""
+
+    def __init__(self, session_factory=None):
+        if session_factory is None:
+            from src.common.database import db_manager
+            session_factory = db_manager.get_session
+        self.session_factory = session_factory
+
+    async def exists(self, digest: str) -> bool:
+        return await asyncio.to_thread(self._exists_sync, digest)
+
+    def _exists_sync(self, digest: str) -> bool:
+        from src.common.database import BlobModel
+        with self.session_factory() as session:
+            return session.query(BlobModel.hash).filter(BlobModel.hash == digest).first() is not None
+
+    async def _write(self, digest: str, data: bytes) -> None:
+        await asyncio.to_thread(self._write_sync, digest, data)
+
+    def _write_sync(self, digest: str, data: bytes) -> None:
+        from sqlalchemy.dialects.postgresql import insert
+        from src.common.database import BlobModel
+        with self.session_factory() as session:
+            session.execute(
+                insert(BlobModel).values(hash=digest, size=len(data), data=data)
+                .on_conflict_do_nothing(index_elements=["hash"])
+            )
+            session.commit()
+
+    async def get(self, digest: str) -> Optional[bytes]:
+        blobs = await self.get_many([digest])
+        return blobs.get(digest)
+
+    async def get_many(self, digests: Iterable[str]) -> Dict[str, bytes]:
+        # One query instead of a round trip per blob
+        return await asyncio.to_thread(self._get_many_sync, list(dict.fromkeys(digests)))
+
+    def _get_many_sync(self, digests) -> Dict[str, bytes]:
+        from src.common.database import BlobModel
+        if not digests:
+            return {}
+        with self.session_factory() as session:
+            rows = session.query(BlobModel.hash, BlobModel.data).filter(BlobModel.hash.in_(digests)).all()
+        return {digest: bytes(data) for digest, data in rows}
+
+
+class S3BlobStore(BlobStore):
+    """Blobs as objects in an S3-compatible bucket"""
+
+    def __init__(self, bucket: str, region: str = "us-east-1", endpoint_url: Optional[str] = None,
+                 prefix: str = "blobs"):
+        import aioboto3
+        self.bucket = bucket
+        self.prefix = prefix
+        self.endpoint_url = endpoint_url
+        self.session = aioboto3.Session(region_name=region)
+
+    def _key(self, digest: str) -> str:
+        return f"{self.prefix}/{digest[:2]}/{digest}"
+
+    def _client(self):
+        return self.session.client("s3", endpoint_url=self.endpoint_url)
+
+    async def exists(self, digest: str) -> bool:
+        from botocore.exceptions import ClientError
+        async with self._client() as s3:
+            try:
+                await s3.head_object(Bucket=self.bucket, Key=self._key(digest))
+                return True
+            except ClientError:
+                return False
+
+    async def _write(self, digest: str, data: bytes) -> None:
+        async with self._client() as s3:
+            await s3.put_object(Bucket=self.bucket, Key=self._key(digest), Body=data)
+
+    async def get(self, digest: str) -> Optional[bytes]:
+        from botocore.exceptions import ClientError
+        async with self._client() as s3:
+            try:
+                response = await s3.get_object(Bucket=self.bucket, Key=self._key(digest))
+                return await response["Body"].read()
+            except ClientError:
+                return None
+
+
+async def store_capsule_files(store: BlobStore, source_code: Dict[str, str], tests: Dict[str, str],
+                              documentation: str = "") -> Dict[str, Any]:
+    """Store a capsule's files; returns its manifest
+
+    {"source_code": {path: hash}, "tests": {path: hash}, "documentation": hash or None}
+    """
+    source_manifest, test_manifest = await asyncio.gather(
+        store.put_files(source_code or {}), store.put_files(tests or {})
+    )
+    return {
+        "source_code": source_manifest,
+        "tests": test_manifest,
+        "documentation": await store.put(documentation.encode("utf-8")) if documentation else None,
+    }
+
+
+async def load_capsule_files(store: BlobStore, manifest: Dict[str, Any],
+                             paths: Optional[Iterable[str]] = None,
+                             include_documentation: bool = True) -> Dict[str, Any]:
+    """Read a capsule's files from its manifest, optionally only the given paths"""
+    wanted = set(paths) if paths is not None else None
+    sections = {
+        section: {
+            path: digest for path, digest in (manifest.get(section) or {}).items()
+            if wanted is None or path in wanted
+        }
+        for section in MANIFEST_SECTIONS
+    }
+    doc_hash = manifest.get("documentation") if include_documentation else None
+
+    digests = [d for files in sections.values() for d in files.values()]
+    blobs = await store.get_many(digests + ([doc_hash] if doc_hash else []))
+    missing = [d for d in digests if d not in blobs]
+    if missing:
+        logger.error("Blobs missing from store", missing=len(missing))
+
+    result = {
+        section: {path: blobs[d].decode("utf-8") for path, d in files.items() if d in blobs}
+        for section, files in sections.items()
+    }
+    result["documentation"] = blobs[doc_hash].decode("utf-8") if doc_hash in blobs else ""
+    return result
+
+
+_blob_store: Optional[BlobStore] = None
+
+
+def get_blob_store() -> BlobStore:
+    """Process-wide blob store for the configured STORAGE_BACKEND"""
+    global _blob_store
+    if _blob_store is None:
+        backend = settings.STORAGE_BACKEND
+        if backend == "s3" and settings.S3_BUCKET:
+            _blob_store = S3BlobStore(settings.S3_BUCKET, settings.S3_REGION, settings.S3_ENDPOINT_URL)
+        elif backend == "local":
+            _blob_store = FilesystemBlobStore(os.path.join(settings.STORAGE_PATH, "blobs"))
+        else:
+            if backend != "postgres":
+                # Falling back to local files would split blobs between services
+                logger.warning(f"No blob store for storage backend {backend}, using PostgreSQL")
+            _blob_store = PostgresBlobStore()
+    return _blob_store
@@ -78,6 +78,20 @@ class Settings(BaseSettings):
         description="Qdrant vector database URL"
     )
     QDRANT_API_KEY: Optional[str] = None
+    QDRANT_MAX_CONNECTIONS: int = Field(default=50, description="Max pooled connections to Qdrant")
+    EMBEDDING_CACHE_MAX_ENTRIES: int = Field(default=10000, description="In-process embedding LRU size")
+    EMBEDDING_CACHE_TTL_SECONDS: int = Field(default=7 * 24 * 3600, description="Embedding cache TTL")
+    EMBEDDING_BATCH_SIZE: int = Field(default=64, description="Max inputs per embeddings request")
+    EMBEDDING_BATCH_WAIT_MS: int = Field(default=10, description="Micro-batch window for embedding calls")
+    TIER_PERFORMANCE_HALF_LIFE_SECONDS: int = Field(default=7 * 24 * 3600, description="Decay half-life for tier performance aggregates")
+    VALIDATION_LOCAL_WORKERS: int = Field(default=2, description="Process pool size for local fast-path validators")
+    VALIDATION_CACHE_MAX_ENTRIES: int = Field(default=10000, description="In-process entries kept by the validation result cache")
+    VALIDATION_CACHE_TTL_SECONDS: int = Field(default=7 * 24 * 3600, description="Lifetime of cached validation results")
+    TIER_PERFORMANCE_CACHE_TTL_SECONDS: int = Field(default=60, description="Worker-side cache TTL for tier performance lookups")
+    FILE_ORGANIZER_CONCURRENCY: int = Field(default=8, description="Task outputs organized concurrently while building a capsule")
+    FILE_ORGANIZER_CACHE_TTL_SECONDS: int = Field(default=7 * 24 * 3600, description="Lifetime of cached file organization results")
+    RUNTIME_DEPENDENCY_LAYERS_ENABLED: bool = Field(default=True, description="Run capsule validation on cached dependency layer images")
+    RUNTIME_DEPENDENCY_LAYER_MAX_IMAGES: int = Field(default=200, description="Dependency layer images kept before the oldest are pruned")
     WEAVIATE_URL: str = Field(
         default="http://localhost:8080",
         description="Weaviate vector database URL"
@@ -104,6 +118,11 @@ class Settings(BaseSettings):
     VECTOR_MEMORY_PORT: int = Field(default=8003)
     SANDBOX_PORT: int = Field(default=8004)
     
+    # Pooled inter-service HTTP clients
+    SERVICE_CLIENT_MAX_CONNECTIONS: int = Field(default=20, description="Max connections per downstream service")
+    SERVICE_CLIENT_MAX_KEEPALIVE: int = Field(default=10, description="Idle keep-alive connections per service")
+    WORKER_METRICS_PORT: int = Field(default=0, description="Prometheus port for worker metrics (0 disables)")
+    
     # Security
     SECRET_KEY: str = Field(
         default="your-secret-key-here-change-in-production",
@@ -127,15 +146,19 @@ class Settings(BaseSettings):
     GROQ_TPM: int = Field(default=6000, description="Groq tokens per minute")
     AWS_BEDROCK_RPM: int = Field(default=200, description="AWS Bedrock requests per minute")
     AWS_BEDROCK_TPM: int = Field(default=400000, description="AWS Bedrock tokens per minute")
+    LLM_RATE_LIMIT_DISTRIBUTED: bool = Field(default=True, description="Share LLM rate limits across processes through Redis")
     
     # Storage
     STORAGE_BACKEND: str = Field(
-        default="local",
-        description="Storage backend (local, s3, gcs, azure)"
+        default="postgres",
+        description="Capsule blob storage (postgres, s3, local); local is only safe for a single process"
     )
     STORAGE_PATH: str = Field(default="/tmp/qlp-storage")
     S3_BUCKET: Optional[str] = None
     S3_REGION: str = Field(default="us-east-1")
+    S3_ENDPOINT_URL: Optional[str] = Field(default=None, description="Endpoint for S3-compatible stores such as MinIO")
+    EXPORT_CHUNK_SIZE: int = Field(default=256 * 1024, description="Bytes per chunk when streaming capsule archives")
+    EXPORT_CACHE_MAX_BYTES: int = Field(default=2 * 1024 ** 3, description="Disk kept for prebuilt archives of capsule versions")
     
     # Kubernetes
     K8S_IN_CLUSTER: bool = Field(
@@ -161,6 +184,10 @@ class Settings(BaseSettings):
     LLM_DEFAULT_TEMPERATURE: float = Field(default=0.3)
     LLM_MAX_TOKENS: int = Field(default=4000)
     LLM_TIMEOUT: int = Field(default=120)
+    LLM_CACHE_TTL_SECONDS: int = Field(default=3600, description="How long deterministic LLM responses are reused")
+    LLM_CACHE_MEMORY_ENTRIES: int = Field(default=2048, description="LLM responses kept in process in front of Redis")
+    LLM_SIMILARITY_CACHE_ENTRIES: int = Field(default=256, description="Prompt embeddings kept per similarity cache namespace")
+    LLM_CACHE_EMBEDDING_MODEL: str = Field(default="text-embedding-ada-002", description="Embedding model for the LLM similarity cache")
     
     # Test-Driven Development
     TDD_ENABLED: bool = Field(
@@ -257,6 +284,17 @@ class Settings(BaseSettings):
     GITHUB_TOKEN: Optional[str] = Field(default=None, description="GitHub personal access token")
     GITHUB_DEFAULT_BRANCH: str = Field(default="main", description="Default branch for GitHub repos")
     GITHUB_AUTO_CREATE_REPO: bool = Field(default=True, description="Auto-create GitHub repository")
+    GITHUB_BLOB_CONCURRENCY: int = Field(default=8, description="Parallel blob uploads per GitHub push")
+    GITHUB_INLINE_BLOB_BYTES: int = Field(default=16 * 1024, description="Files up to this size are sent inline in the tree request")
+    GITHUB_MAX_RATE_LIMIT_WAIT: float = Field(default=60.0, description="Longest wait in seconds for a GitHub rate limit to reset before retrying")
+    GITHUB_WEBHOOK_SECRET: Optional[str] = Field(default=None, description="Secret GitHub signs webhook deliveries with")
+    CI_POLL_MIN_INTERVAL: float = Field(default=15.0, description="Fallback workflow run polling interval in seconds after a change")
+    CI_POLL_MAX_INTERVAL: float = Field(default=120.0, description="Longest fallback polling interval in seconds while nothing changes")
+    
+    # LLM cost tracking
+    COST_FLUSH_INTERVAL: float = Field(default=2.0, description="Seconds between flushes of buffered LLM usage rows")
+    COST_FLUSH_BATCH_SIZE: int = Field(default=500, description="Buffered LLM usage rows that trigger an early flush")
+    COST_BUFFER_MAX_ROWS: int = Field(default=20000, description="Most LLM usage rows held in memory; tracking waits for a flush beyond this")
     
     # Universal Language Support
     DETECT_LANGUAGE_FROM_REQUIREMENTS: bool = Field(default=True, description="Auto-detect programming language")
@@ -2,9 +2,14 @@
 """
 Persistent Cost Calculator for LLM Usage
 Tracks and stores costs in PostgreSQL database
+
+Usage rows are buffered in memory and written in batches: one multi-row
+INSERT into llm_usage per flush, plus upserts of per-workflow, per-tenant-day
+and per-model-day rollup tables in the same transaction. Cost reports read
+the rollups by primary key instead of aggregating llm_usage.
 """
 
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
 from datetime import datetime, timezone, timedelta
 from decimal import Decimal
 import json
@@ -21,6 +26,84 @@ from src.common.cost_calculator import LLM_PRICING, EMBEDDING_PRICING, IMAGE_GEN
 
 logger = structlog.get_logger()
 
+USAGE_COLUMNS = (
+    "workflow_id", "tenant_id", "user_id", "task_id", "provider", "model",
+    "input_tokens", "output_tokens", "input_cost_usd", "output_cost_usd",
+    "latency_ms", "metadata", "created_at",
+)
+
+# Rows per INSERT statement, well under the driver's bind parameter limit
+INSERT_CHUNK_ROWS = 1000
+
+ROLLUP_TOTALS = """
+    request_count = {table}.request_count + excluded.request_count,
+    input_tokens = {table}.input_tokens + excluded.input_tokens,
+    output_tokens = {table}.output_tokens + excluded.output_tokens,
+    cost_usd = {table}.cost_usd + excluded.cost_usd"""
+
+UPSERT_WORKFLOW_ROLLUP = """
+    INSERT INTO llm_cost_workflow_rollups (
+        workflow_id, provider, model, tenant_id, request_count, input_tokens, output_tokens, cost_usd,
+        first_request, last_request
+    ) VALUES (
+        :workflow_id, :provider, :model, :tenant_id, :request_count, :input_tokens, :output_tokens, :cost_usd,
+        :first_request, :last_request
+    )
+    ON CONFLICT (workflow_id, provider, model) DO UPDATE SET""" + ROLLUP_TOTALS.format(table="llm_cost_workflow_rollups") + """,
+    first_request = CASE WHEN excluded.first_request < llm_cost_workflow_rollups.first_request
+                         THEN excluded.first_request ELSE llm_cost_workflow_rollups.first_request END,
+    last_request = CASE WHEN excluded.last_request > llm_cost_workflow_rollups.last_request
+                        THEN excluded.last_request ELSE llm_cost_workflow_rollups.last_request END
+"""
+
+UPSERT_TENANT_DAILY_ROLLUP = """
+    INSERT INTO llm_cost_tenant_daily_rollups (
+        tenant_id, usage_date, request_count, input_tokens, output_tokens, cost_usd
+    ) VALUES (
+        :tenant_id, :usage_date, :request_count, :input_tokens, :output_tokens, :cost_usd
+    )
+    ON CONFLICT (tenant_id, usage_date) DO UPDATE SET""" + ROLLUP_TOTALS.format(table="llm_cost_tenant_daily_rollups")
+
+UPSERT_MODEL_DAILY_ROLLUP = """
+    INSERT INTO llm_cost_model_daily_rollups (
+        usage_date, provider, model, request_count, input_tokens, output_tokens, cost_usd
+    ) VALUES (
+        :usage_date, :provider, :model, :request_count, :input_tokens, :output_tokens, :cost_usd
+    )
+    ON CONFLICT (usage_date, provider, model) DO UPDATE SET""" + ROLLUP_TOTALS.format(table="llm_cost_model_daily_rollups")
+
+
+def _rollup(rows: List[Dict[str, Any]], key_columns: Tuple[str, ...]) -> List[Dict[str, Any]]:
+    """Totals of usage rows per key, sorted by key so concurrent flushes lock rows in one order"""
+    totals: Dict[Tuple, Dict[str, Any]] = {}
+    for row in rows:
+        key = tuple(row[column] for column in key_columns)
+        total = totals.get(key)
+        if total is None:
+            total = totals[key] = {
+                **dict(zip(key_columns, key)),
+                "request_count": 0, "input_tokens": 0, "output_tokens": 0, "cost_usd": 0.0,
+                "first_request": row["created_at"], "last_request": row["created_at"],
+            }
+        total["request_count"] += 1
+        total["input_tokens"] += row["input_tokens"]
+        total["output_tokens"] += row["output_tokens"]
+        total["cost_usd"] += row["input_cost_usd"] + row["output_cost_usd"]
+        total["first_request"] = min(total["first_request"], row["created_at"])
+        total["last_request"] = max(total["last_request"], row["created_at"])
+    return [totals[key] for key in sorted(totals, key=lambda k: tuple(str(part) for part in k))]
+
+
+def _utc_date(value: datetime):
+    return (value.astimezone(timezone.utc) if value.tzinfo else value).date()
+
+
+def _iso(value) -> Optional[str]:
+    if value is None or isinstance(value, str):
+        return value
+    return value.isoformat()
+
+
 class PersistentCostCalculator:
     """Cost calculator with PostgreSQL persistence"""
     
@@ -36,12 +119,13 @@ class PersistentCostCalculator:
         
         logger.info(f"PersistentCostCalculator using database URL: {self.database_url.split('@')[1] if '@' in self.database_url else 'N/A'}")
         
+        # Pool sizing applies to PostgreSQL; other drivers choose their own pool
+        pool_options = {"pool_size": 10, "max_overflow": 20} if self.database_url.startswith("postgresql") else {}
         self.engine = create_async_engine(
             self.database_url,
-            pool_size=10,
-            max_overflow=20,
             pool_pre_ping=True,
-            echo=False
+            echo=False,
+            **pool_options
         )
         self.async_session = async_sessionmaker(self.engine, class_=AsyncSession, expire_on_commit=False)
         
@@ -49,6 +133,16 @@ class PersistentCostCalculator:
         self._recent_costs = []
         self._max_cache_size = 1000
         
+        # Usage rows waiting to be written
+        self.flush_interval = settings.COST_FLUSH_INTERVAL
+        self.flush_batch_size = settings.COST_FLUSH_BATCH_SIZE
+        self.max_buffer_rows = settings.COST_BUFFER_MAX_ROWS
+        self._buffer: List[Dict[str, Any]] = []
+        self._flush_lock = asyncio.Lock()
+        self._flush_wanted: Optional[asyncio.Event] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self.dropped_rows = 0
+        
     @asynccontextmanager
     async def get_db(self):
         """Get database session"""
@@ -105,55 +199,109 @@ class PersistentCostCalculator:
             "metadata": metadata or {}
         })
         
-        # Save to database
+        # Buffered; the flusher writes it with the next batch
+        self._buffer.append({
+            "workflow_id": workflow_id,
+            "tenant_id": tenant_id or "default",
+            "user_id": user_id,
+            "task_id": task_id,
+            "provider": provider,
+            "model": model,
+            "input_tokens": prompt_tokens,
+            "output_tokens": completion_tokens,
+            "input_cost_usd": cost_data["input_cost_usd"],
+            "output_cost_usd": cost_data["output_cost_usd"],
+            "latency_ms": latency_ms,
+            "metadata": json.dumps(metadata or {}),
+            "created_at": datetime.now(timezone.utc)
+        })
+        self._add_to_cache(cost_data)
+        
+        self._ensure_flusher()
+        if len(self._buffer) >= self.max_buffer_rows:
+            # Backpressure: the database is not keeping up
+            await self.flush()
+        elif len(self._buffer) >= self.flush_batch_size:
+            self._flush_wanted.set()
+        
+        return cost_data
+    
+    def _ensure_flusher(self):
+        if self._flusher is None or self._flusher.done():
+            self._flush_wanted = asyncio.Event()
+            self._flusher = asyncio.create_task(self._flush_periodically())
+    
+    async def _flush_periodically(self):
+        """Flush every flush_interval, or sooner once a batch is full"""
         try:
-            async with self.get_db() as session:
-                await session.execute(
-                    text("""
-                        INSERT INTO llm_usage (
-                            workflow_id, tenant_id, user_id, task_id,
-                            provider, model, input_tokens, output_tokens,
-                            input_cost_usd, output_cost_usd,
-                            latency_ms, metadata
-                        ) VALUES (
-                            :workflow_id, :tenant_id, :user_id, :task_id,
-                            :provider, :model, :input_tokens, :output_tokens,
-                            :input_cost_usd, :output_cost_usd,
-                            :latency_ms, :metadata
-                        )
-                    """),
-                    {
-                        "workflow_id": workflow_id,
-                        "tenant_id": tenant_id or "default",
-                        "user_id": user_id,
-                        "task_id": task_id,
-                        "provider": provider,
-                        "model": model,
-                        "input_tokens": prompt_tokens,
-                        "output_tokens": completion_tokens,
-                        "input_cost_usd": cost_data["input_cost_usd"],
-                        "output_cost_usd": cost_data["output_cost_usd"],
-                        "latency_ms": latency_ms,
-                        "metadata": json.dumps(metadata or {})
-                    }
-                )
-            
-            logger.info(
-                "LLM cost tracked to database",
-                workflow_id=workflow_id,
-                tenant_id=tenant_id,
-                model=model,
-                cost_usd=cost_data["total_cost_usd"]
+            while True:
+                try:
+                    await asyncio.wait_for(self._flush_wanted.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._flush_wanted.clear()
+                if self._buffer:
+                    await self.flush()
+        except asyncio.CancelledError:
+            # Loop shutdown: write what is buffered before going away
+            if self._buffer:
+                await self.flush()
+            raise
+    
+    async def flush(self) -> int:
+        """Write buffered usage rows and their rollups; returns the rows written
+        
+        On failure the rows go back to the front of the buffer for the next
+        flush, dropping the oldest beyond max_buffer_rows.
+        """
+        async with self._flush_lock:
+            rows, self._buffer = self._buffer, []
+            if not rows:
+                return 0
+            try:
+                async with self.get_db() as session:
+                    await self._write_rows(session, rows)
+            except Exception as e:
+                self._buffer[:0] = rows
+                overflow = len(self._buffer) - self.max_buffer_rows
+                if overflow > 0:
+                    del self._buffer[:overflow]
+                    self.dropped_rows += overflow
+                logger.error(f"Failed to save costs to database: {e}", rows=len(rows),
+                             buffered=len(self._buffer), dropped=max(overflow, 0))
+                return 0
+        
+        logger.info("LLM costs flushed to database", rows=len(rows))
+        return len(rows)
+    
+    async def _write_rows(self, session: AsyncSession, rows: List[Dict[str, Any]]) -> None:
+        for start in range(0, len(rows), INSERT_CHUNK_ROWS):
+            chunk = rows[start:start + INSERT_CHUNK_ROWS]
+            values = ", ".join(
+                "(" + ", ".join(f":{column}_{i}" for column in USAGE_COLUMNS) + ")"
+                for i in range(len(chunk))
+            )
+            params = {f"{column}_{i}": row[column] for i, row in enumerate(chunk) for column in USAGE_COLUMNS}
+            await session.execute(
+                text(f"INSERT INTO llm_usage ({', '.join(USAGE_COLUMNS)}) VALUES {values}"), params
             )
-            
-            # Add to cache
-            self._add_to_cache(cost_data)
-            
-        except Exception as e:
-            logger.error(f"Failed to save cost to database: {e}", exc_info=True)
-            # Don't fail the LLM call if cost tracking fails
         
-        return cost_data
+        for row in rows:
+            row["usage_date"] = row["created_at"].date()
+        workflow_rows = [row for row in rows if row["workflow_id"]]
+        # A workflow runs for a single tenant
+        workflow_tenants = {row["workflow_id"]: row["tenant_id"] for row in workflow_rows}
+        workflow_totals = _rollup(workflow_rows, ("workflow_id", "provider", "model"))
+        for total in workflow_totals:
+            total["tenant_id"] = workflow_tenants[total["workflow_id"]]
+        
+        for statement, totals in (
+            (UPSERT_WORKFLOW_ROLLUP, workflow_totals),
+            (UPSERT_TENANT_DAILY_ROLLUP, _rollup(rows, ("tenant_id", "usage_date"))),
+            (UPSERT_MODEL_DAILY_ROLLUP, _rollup(rows, ("usage_date", "provider", "model"))),
+        ):
+            if totals:
+                await session.execute(text(statement), totals)
     
     def _calculate_cost(
         self,
@@ -206,67 +354,50 @@ class PersistentCostCalculator:
             self._recent_costs.pop(0)
     
     async def get_workflow_cost(self, workflow_id: str) -> Optional[Dict[str, Any]]:
-        """Get cost for a specific workflow from database"""
+        """Get cost for a specific workflow from its rollup rows"""
         async with self.get_db() as session:
-            # Get aggregate data
             result = await session.execute(
                 text("""
-                    SELECT 
-                        COUNT(*) as request_count,
-                        COALESCE(SUM(input_tokens), 0) as total_input_tokens,
-                        COALESCE(SUM(output_tokens), 0) as total_output_tokens,
-                        COALESCE(SUM(total_cost_usd), 0) as total_cost_usd,
-                        MIN(created_at) as first_request,
-                        MAX(created_at) as last_request
-                    FROM llm_usage
-                    WHERE workflow_id = :workflow_id
-                """),
-                {"workflow_id": workflow_id}
-            )
-            
-            row = result.first()
-            if not row or row.request_count == 0:
-                return None
-            
-            # Get breakdown by model
-            model_result = await session.execute(
-                text("""
-                    SELECT 
-                        model,
-                        provider,
-                        COUNT(*) as count,
-                        SUM(input_tokens) as input_tokens,
-                        SUM(output_tokens) as output_tokens,
-                        SUM(total_cost_usd) as cost_usd
-                    FROM llm_usage
+                    SELECT model, provider, request_count, input_tokens, output_tokens, cost_usd,
+                           first_request, last_request
+                    FROM llm_cost_workflow_rollups
                     WHERE workflow_id = :workflow_id
-                    GROUP BY model, provider
                 """),
                 {"workflow_id": workflow_id}
             )
-            
-            model_breakdown = {}
-            for m in model_result:
-                key = f"{m.provider}/{m.model}"
-                model_breakdown[key] = {
-                    "count": m.count,
-                    "input_tokens": m.input_tokens,
-                    "output_tokens": m.output_tokens,
-                    "cost_usd": float(m.cost_usd)
-                }
-            
-            return {
-                "workflow_id": workflow_id,
-                "total_requests": row.request_count,
-                "total_input_tokens": row.total_input_tokens,
-                "total_output_tokens": row.total_output_tokens,
-                "total_tokens": row.total_input_tokens + row.total_output_tokens,
-                "total_cost_usd": float(row.total_cost_usd),
-                "first_request": row.first_request.isoformat() if row.first_request else None,
-                "last_request": row.last_request.isoformat() if row.last_request else None,
-                "model_breakdown": model_breakdown,
-                "average_cost_per_request": float(row.total_cost_usd / row.request_count) if row.request_count > 0 else 0
+            rows = result.all()
+        
+        if not rows:
+            return None
+        
+        model_breakdown = {}
+        for m in rows:
+            model_breakdown[f"{m.provider}/{m.model}"] = {
+                "count": m.request_count,
+                "input_tokens": m.input_tokens,
+                "output_tokens": m.output_tokens,
+                "cost_usd": float(m.cost_usd)
             }
+        
+        request_count = sum(m.request_count for m in rows)
+        total_input_tokens = sum(m.input_tokens for m in rows)
+        total_output_tokens = sum(m.output_tokens for m in rows)
+        total_cost = sum(float(m.cost_usd) for m in rows)
+        first_requests = [m.first_request for m in rows if m.first_request is not None]
+        last_requests = [m.last_request for m in rows if m.last_request is not None]
+        
+        return {
+            "workflow_id": workflow_id,
+            "total_requests": request_count,
+            "total_input_tokens": total_input_tokens,
+            "total_output_tokens": total_output_tokens,
+            "total_tokens": total_input_tokens + total_output_tokens,
+            "total_cost_usd": total_cost,
+            "first_request": _iso(min(first_requests)) if first_requests else None,
+            "last_request": _iso(max(last_requests)) if last_requests else None,
+            "model_breakdown": model_breakdown,
+            "average_cost_per_request": total_cost / request_count if request_count > 0 else 0
+        }
     
     async def get_tenant_costs(
         self, 
@@ -274,76 +405,94 @@ class PersistentCostCalculator:
         start_date: Optional[datetime] = None,
         end_date: Optional[datetime] = None
     ) -> Dict[str, Any]:
-        """Get costs for a tenant in date range"""
+        """Get costs for a tenant in date range
+        
+        Read from daily rollups, so the range covers whole UTC days.
+        """
         if not start_date:
             start_date = datetime.now(timezone.utc) - timedelta(days=30)
         if not end_date:
             end_date = datetime.now(timezone.utc)
         
         async with self.get_db() as session:
-            # Get aggregate data
             result = await session.execute(
                 text("""
-                    SELECT 
-                        COUNT(*) as request_count,
-                        COALESCE(SUM(input_tokens), 0) as total_input_tokens,
-                        COALESCE(SUM(output_tokens), 0) as total_output_tokens,
-                        COALESCE(SUM(total_cost_usd), 0) as total_cost_usd
-                    FROM llm_usage
-                    WHERE tenant_id = :tenant_id 
-                    AND created_at >= :start_date 
-                    AND created_at <= :end_date
+                    SELECT usage_date, request_count, input_tokens, output_tokens, cost_usd
+                    FROM llm_cost_tenant_daily_rollups
+                    WHERE tenant_id = :tenant_id
+                    AND usage_date >= :start_date
+                    AND usage_date <= :end_date
+                    ORDER BY usage_date
                 """),
                 {
                     "tenant_id": tenant_id,
-                    "start_date": start_date,
-                    "end_date": end_date
+                    "start_date": _utc_date(start_date),
+                    "end_date": _utc_date(end_date)
                 }
             )
-            
-            row = result.first()
-            
-            # Get daily breakdown
-            daily_result = await session.execute(
+            days = result.all()
+        
+        daily_costs = {_iso(day.usage_date): float(day.cost_usd) for day in days}
+        total_input_tokens = sum(day.input_tokens for day in days)
+        total_output_tokens = sum(day.output_tokens for day in days)
+        total_days = (end_date - start_date).days or 1
+        total_cost = sum(daily_costs.values())
+        
+        return {
+            "tenant_id": tenant_id,
+            "start_date": start_date.isoformat(),
+            "end_date": end_date.isoformat(),
+            "total_requests": sum(day.request_count for day in days),
+            "total_input_tokens": total_input_tokens,
+            "total_output_tokens": total_output_tokens,
+            "total_tokens": total_input_tokens + total_output_tokens,
+            "total_cost_usd": total_cost,
+            "average_daily_cost": total_cost / total_days,
+            "daily_breakdown": daily_costs,
+            "projected_monthly_cost": (total_cost / total_days * 30) if total_days > 0 else 0
+        }
+    
+    async def get_model_costs(
+        self,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+    ) -> Dict[str, Any]:
+        """Costs per model across tenants in date range, from daily rollups"""
+        if not start_date:
+            start_date = datetime.now(timezone.utc) - timedelta(days=30)
+        if not end_date:
+            end_date = datetime.now(timezone.utc)
+        
+        async with self.get_db() as session:
+            result = await session.execute(
                 text("""
-                    SELECT 
-                        DATE(created_at) as usage_date,
-                        SUM(total_cost_usd) as daily_cost
-                    FROM llm_usage
-                    WHERE tenant_id = :tenant_id 
-                    AND created_at >= :start_date 
-                    AND created_at <= :end_date
-                    GROUP BY DATE(created_at)
-                    ORDER BY usage_date
+                    SELECT provider, model,
+                           SUM(request_count) as request_count,
+                           SUM(input_tokens) as input_tokens,
+                           SUM(output_tokens) as output_tokens,
+                           SUM(cost_usd) as cost_usd
+                    FROM llm_cost_model_daily_rollups
+                    WHERE usage_date >= :start_date
+                    AND usage_date <= :end_date
+                    GROUP BY provider, model
                 """),
-                {
-                    "tenant_id": tenant_id,
-                    "start_date": start_date,
-                    "end_date": end_date
-                }
+                {"start_date": _utc_date(start_date), "end_date": _utc_date(end_date)}
             )
-            
-            daily_costs = {
-                row.usage_date.isoformat(): float(row.daily_cost)
-                for row in daily_result
-            }
-            
-            total_days = (end_date - start_date).days or 1
-            total_cost = float(row.total_cost_usd) if row else 0
-            
-            return {
-                "tenant_id": tenant_id,
-                "start_date": start_date.isoformat(),
-                "end_date": end_date.isoformat(),
-                "total_requests": row.request_count if row else 0,
-                "total_input_tokens": row.total_input_tokens if row else 0,
-                "total_output_tokens": row.total_output_tokens if row else 0,
-                "total_tokens": (row.total_input_tokens + row.total_output_tokens) if row else 0,
-                "total_cost_usd": total_cost,
-                "average_daily_cost": total_cost / total_days,
-                "daily_breakdown": daily_costs,
-                "projected_monthly_cost": (total_cost / total_days * 30) if total_days > 0 else 0
+            models = result.all()
+        
+        return {
+            "start_date": start_date.isoformat(),
+            "end_date": end_date.isoformat(),
+            "models": {
+                f"{m.provider}/{m.model}": {
+                    "count": m.request_count,
+                    "input_tokens": m.input_tokens,
+                    "output_tokens": m.output_tokens,
+                    "cost_usd": float(m.cost_usd)
+                }
+                for m in models
             }
+        }
     
     async def estimate_capsule_cost(self, complexity: str, tech_stack: List[str]) -> Dict[str, Any]:
         """Estimate cost for generating a capsule based on complexity"""
@@ -396,7 +545,15 @@ class PersistentCostCalculator:
         }
     
     async def close(self):
-        """Close database connections"""
+        """Write buffered costs and close database connections"""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except asyncio.CancelledError:
+                pass
+            self._flusher = None
+        await self.flush()
         await self.engine.dispose()
 
 
@@ -1,15 +1,23 @@
 """
 Production Database Models and Connection Management
 Handles persistent storage for capsules, versions, and delivery metadata
+
+Async request handlers use the asyncpg engine (get_async_db / AsyncCapsuleRepository)
+so database reads never block the event loop; workers and scripts keep the
+synchronous session. Large capsule columns are deferred and only loaded when a
+caller asks for them.
 """
 
 import os
-from sqlalchemy import create_engine, Column, String, Text, DateTime, Boolean, Float, Integer, JSON, ForeignKey, Index
+from sqlalchemy import create_engine, Column, String, Text, DateTime, Boolean, Float, Integer, JSON, ForeignKey, Index, LargeBinary
+from sqlalchemy import select, and_, or_
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session, relationship
+from sqlalchemy.orm import sessionmaker, Session, relationship, deferred, undefer_group
 from sqlalchemy.dialects.postgresql import UUID
 from datetime import datetime, timezone
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
 import uuid
 import json
 from contextlib import asynccontextmanager
@@ -28,14 +36,16 @@ class CapsuleModel(Base):
     tenant_id = Column(String(255), nullable=False, index=True)
     user_id = Column(String(255), nullable=False, index=True)
     
-    # Core content
+    # Core content; the "content" group is deferred so listings never load it
     manifest = Column(JSON, nullable=False, default={})
-    source_code = Column(JSON, nullable=False, default={})  # filename -> content
-    tests = Column(JSON, nullable=False, default={})  # filename -> content
-    documentation = Column(Text, default="")
+    # Files live in the blob store; rows stored before it keep them inline below
+    file_manifest = deferred(Column(JSON, nullable=True), group="content")  # {"source_code": {path: hash}, "tests": {...}, "documentation": hash}
+    source_code = deferred(Column(JSON, nullable=False, default={}), group="content")  # filename -> content
+    tests = deferred(Column(JSON, nullable=False, default={}), group="content")  # filename -> content
+    documentation = deferred(Column(Text, default=""), group="content")
     
     # Validation and deployment
-    validation_report = Column(JSON, nullable=True)
+    validation_report = deferred(Column(JSON, nullable=True), group="content")
     deployment_config = Column(JSON, nullable=False, default={})
     
     # Status and metrics
@@ -58,6 +68,9 @@ class CapsuleModel(Base):
     __table_args__ = (
         Index('idx_capsule_tenant_user', 'tenant_id', 'user_id'),
         Index('idx_capsule_created', 'created_at'),
+        # Keyset pagination of listings: (created_at, id) within a tenant or user
+        Index('idx_capsule_tenant_created_id', 'tenant_id', 'created_at', 'id'),
+        Index('idx_capsule_tenant_user_created_id', 'tenant_id', 'user_id', 'created_at', 'id'),
         Index('idx_capsule_status', 'status'),
     )
 
@@ -79,6 +92,7 @@ class CapsuleVersionModel(Base):
     
     # Changes tracking
     changes = Column(JSON, nullable=False, default=[])  # List of file changes
+    file_manifest = Column(JSON, nullable=True)  # Full path -> hash snapshot of this version
     files_added = Column(Integer, default=0)
     files_modified = Column(Integer, default=0)
     files_deleted = Column(Integer, default=0)
@@ -174,6 +188,16 @@ class CapsuleSignatureModel(Base):
     version = relationship("CapsuleVersionModel")
 
 
+class BlobModel(Base):
+    """Content-addressed file blobs for the postgres blob store backend"""
+    __tablename__ = "capsule_blobs"
+    
+    hash = Column(String(64), primary_key=True)
+    size = Column(Integer, nullable=False)
+    data = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+
+
 class DatabaseManager:
     """Production database connection and session management"""
     
@@ -188,6 +212,9 @@ class DatabaseManager:
             pool_recycle=3600
         )
         self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        # Created on first use so processes that never serve async requests don't need asyncpg
+        self._async_engine = None
+        self._async_session_factory = None
     
     def _build_database_url(self) -> str:
         """Build PostgreSQL connection URL from environment"""
@@ -205,6 +232,41 @@ class DatabaseManager:
             f"@{host}:{settings.POSTGRES_PORT}/{settings.POSTGRES_DB}"
         )
     
+    def _build_async_database_url(self) -> str:
+        """The same database through the asyncpg driver"""
+        url = make_url(self.database_url)
+        if not url.drivername.startswith("postgres"):
+            return self.database_url
+        query = dict(url.query)
+        # asyncpg takes ssl instead of libpq's sslmode
+        if "sslmode" in query:
+            query["ssl"] = query.pop("sslmode")
+        return url.set(drivername="postgresql+asyncpg", query=query).render_as_string(hide_password=False)
+    
+    def _init_async_engine(self):
+        if self._async_engine is None:
+            self._async_engine = create_async_engine(
+                self._build_async_database_url(),
+                echo=settings.DEBUG,
+                pool_size=20,
+                max_overflow=30,
+                pool_pre_ping=True,
+                pool_recycle=3600
+            )
+            self._async_session_factory = async_sessionmaker(
+                self._async_engine, expire_on_commit=False, autoflush=False
+            )
+    
+    @property
+    def async_engine(self):
+        self._init_async_engine()
+        return self._async_engine
+    
+    def get_async_session(self) -> AsyncSession:
+        """Get an async database session"""
+        self._init_async_engine()
+        return self._async_session_factory()
+    
     def create_tables(self):
         """Create all database tables"""
         Base.metadata.create_all(bind=self.engine)
@@ -245,6 +307,12 @@ def get_db() -> Session:
         db.close()
 
 
+async def get_async_db() -> AsyncSession:
+    """Async database dependency for FastAPI"""
+    async with db_manager.get_async_session() as db:
+        yield db
+
+
 # Helper functions for common database operations
 class CapsuleRepository:
     """Repository for capsule database operations"""
@@ -260,9 +328,12 @@ class CapsuleRepository:
         self.db.refresh(capsule)
         return capsule
     
-    def get_capsule(self, capsule_id: str) -> Optional[CapsuleModel]:
-        """Get capsule by ID"""
-        return self.db.query(CapsuleModel).filter(CapsuleModel.id == capsule_id).first()
+    def get_capsule(self, capsule_id: str, include_content: bool = True) -> Optional[CapsuleModel]:
+        """Get capsule by ID; include_content=False leaves files and validation unloaded"""
+        query = self.db.query(CapsuleModel).filter(CapsuleModel.id == capsule_id)
+        if include_content:
+            query = query.options(undefer_group("content"))
+        return query.first()
     
     def get_capsules_by_user(self, tenant_id: str, user_id: str, limit: int = 50) -> List[CapsuleModel]:
         """Get capsules for a specific user"""
@@ -274,6 +345,12 @@ class CapsuleRepository:
             .all()
         )
     
+    def get_capsule_summaries(self, tenant_id: str, user_id: Optional[str] = None, limit: int = 50,
+                              after: Optional[Tuple[datetime, Any]] = None,
+                              **filters) -> List[Any]:
+        """Summary rows for listings, newest first, keyset-paginated"""
+        return self.db.execute(capsule_summary_query(tenant_id, user_id, limit, after, **filters)).all()
+    
     def update_capsule(self, capsule_id: str, updates: Dict[str, Any]) -> Optional[CapsuleModel]:
         """Update capsule with new data"""
         capsule = self.get_capsule(capsule_id)
@@ -347,4 +424,106 @@ class CapsuleRepository:
                 delivery.delivered_at = datetime.now(timezone.utc)
             self.db.commit()
             self.db.refresh(delivery)
-        return delivery
\ No newline at end of file
+        return delivery
+
+
+# Columns a capsule listing returns; never the files, documentation or validation report
+CAPSULE_SUMMARY_COLUMNS = (
+    CapsuleModel.id,
+    CapsuleModel.request_id,
+    CapsuleModel.tenant_id,
+    CapsuleModel.user_id,
+    CapsuleModel.manifest,
+    CapsuleModel.status,
+    CapsuleModel.file_count,
+    CapsuleModel.total_size_bytes,
+    CapsuleModel.confidence_score,
+    CapsuleModel.execution_duration,
+    CapsuleModel.meta_data,
+    CapsuleModel.created_at,
+    CapsuleModel.updated_at,
+)
+
+
+def capsule_summary_query(
+    tenant_id: str,
+    user_id: Optional[str] = None,
+    limit: int = 50,
+    after: Optional[Tuple[datetime, Any]] = None,
+    descending: bool = True,
+    status: Optional[str] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None
+):
+    """Column-projected listing query ordered by (created_at, id)
+
+    after is the (created_at, id) of the last row of the previous page, so each
+    page is an index range scan instead of an OFFSET over every earlier row.
+    """
+    query = select(*CAPSULE_SUMMARY_COLUMNS).where(CapsuleModel.tenant_id == tenant_id)
+    if user_id:
+        query = query.where(CapsuleModel.user_id == user_id)
+    if status:
+        query = query.where(CapsuleModel.status == status)
+    if created_after:
+        query = query.where(CapsuleModel.created_at >= created_after)
+    if created_before:
+        query = query.where(CapsuleModel.created_at < created_before)
+    
+    if after is not None:
+        created_at, capsule_id = after
+        if descending:
+            query = query.where(or_(
+                CapsuleModel.created_at < created_at,
+                and_(CapsuleModel.created_at == created_at, CapsuleModel.id < capsule_id)
+            ))
+        else:
+            query = query.where(or_(
+                CapsuleModel.created_at > created_at,
+                and_(CapsuleModel.created_at == created_at, CapsuleModel.id > capsule_id)
+            ))
+    
+    if descending:
+        query = query.order_by(CapsuleModel.created_at.desc(), CapsuleModel.id.desc())
+    else:
+        query = query.order_by(CapsuleModel.created_at.asc(), CapsuleModel.id.asc())
+    return query.limit(limit)
+
+
+def _as_uuid(value: Any) -> Optional[uuid.UUID]:
+    try:
+        return value if isinstance(value, uuid.UUID) else uuid.UUID(str(value))
+    except ValueError:
+        return None
+
+
+class AsyncCapsuleRepository:
+    """Capsule reads for async request handlers"""
+    
+    def __init__(self, db: AsyncSession):
+        self.db = db
+    
+    async def get_capsule(self, capsule_id: str, include_content: bool = True) -> Optional[CapsuleModel]:
+        """Get capsule by ID; include_content=False leaves files and validation unloaded"""
+        capsule_uuid = _as_uuid(capsule_id)
+        if capsule_uuid is None:
+            return None
+        query = select(CapsuleModel).where(CapsuleModel.id == capsule_uuid)
+        if include_content:
+            query = query.options(undefer_group("content"))
+        return (await self.db.execute(query)).scalars().first()
+    
+    async def get_capsule_summaries(self, tenant_id: str, user_id: Optional[str] = None, limit: int = 50,
+                                    after: Optional[Tuple[datetime, Any]] = None,
+                                    **filters) -> List[Any]:
+        """Summary rows for listings, keyset-paginated"""
+        result = await self.db.execute(capsule_summary_query(tenant_id, user_id, limit, after, **filters))
+        return result.all()
+    
+    async def get_version(self, version_id: str) -> Optional[CapsuleVersionModel]:
+        """Get version by ID"""
+        version_uuid = _as_uuid(version_id)
+        if version_uuid is None:
+            return None
+        result = await self.db.execute(select(CapsuleVersionModel).where(CapsuleVersionModel.id == version_uuid))
+        return result.scalars().first()
@@ -4,12 +4,14 @@ Common dependencies for FastAPI endpoints
 from fastapi import Request, HTTPException
 from temporalio.client import Client
 
-def get_temporal_client(request: Request) -> Client:
-    """Get the shared Temporal client from app state"""
-    client = getattr(request.app.state, 'temporal_client', None)
-    if client is None:
+from src.common.temporal_cloud import TemporalUnavailableError, temporal_client_manager
+
+async def get_temporal_client(request: Request) -> Client:
+    """Get a client from the shared app-lifetime Temporal pool"""
+    try:
+        return await temporal_client_manager.get()
+    except TemporalUnavailableError:
         raise HTTPException(
             status_code=503,
             detail="Temporal service is not available. Please try again later."
-        )
-    return client
\ No newline at end of file
+        )
\ No newline at end of file
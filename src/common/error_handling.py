@@ -140,12 +140,23 @@ class EnhancedCircuitBreaker:
             self._on_failure()
         return False
     
+    def record_success(self):
+        """Record a successful call made outside call()/async_call()"""
+        self._on_success()
+    
+    def record_failure(self):
+        """Record a failed call made outside call()/async_call()"""
+        self._on_failure()
+    
     def _on_success(self):
         """Handle successful call"""
         self.total_calls += 1
         self.total_successes += 1
         
-        if self.state == "half-open":
+        if self.state == "closed":
+            # Only consecutive failures open the breaker
+            self.failure_count = 0
+        elif self.state == "half-open":
             self.success_count += 1
             if self.success_count >= self.success_threshold:
                 self._change_state("closed")
@@ -0,0 +1,362 @@
+"""
+Programming language classification shared by agents, shared context and capsule building
+
+Every pattern is compiled once at import. Code is scored from weighted features -
+file extension, shebang and token patterns - and descriptions from weighted
+keywords, and each classification comes with a confidence.
+"""
+
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class LanguageGuess:
+    """Best language for a piece of code or text, None when nothing scored high enough"""
+    language: Optional[str]
+    confidence: float = 0.0
+    score: int = 0
+    scores: Dict[str, int] = field(default_factory=dict)
+
+
+# Keywords, frameworks and extensions mentioned in task descriptions
+LANGUAGE_KEYWORDS = {
+    "python": {
+        "keywords": ["python", "py", "pip", "poetry", "conda", "venv", "virtualenv"],
+        "frameworks": ["flask", "django", "fastapi", "pandas", "numpy", "tensorflow", "pytorch", "scikit", "jupyter", "streamlit", "dash", "pytest"],
+        "extensions": [".py", ".pyx", ".pyw"],
+        "confidence": 10
+    },
+    "javascript": {
+        "keywords": ["javascript", "js", "node", "nodejs", "npm", "yarn", "pnpm"],
+        "frameworks": ["express", "react", "vue", "angular", "next", "nuxt", "svelte", "webpack", "babel", "jest", "mocha"],
+        "extensions": [".js", ".mjs", ".jsx"],
+        "confidence": 10
+    },
+    "typescript": {
+        "keywords": ["typescript", "ts", "tsx", "type-safe", "typed"],
+        "frameworks": ["angular", "nest", "nestjs", "next.js", "deno", "@types"],
+        "extensions": [".ts", ".tsx", ".d.ts"],
+        "confidence": 12  # Higher than JS to prefer TS when both match
+    },
+    "java": {
+        "keywords": ["java", "jvm", "maven", "gradle", "ant"],
+        "frameworks": ["spring", "springboot", "hibernate", "struts", "junit", "mockito", "tomcat", "jetty"],
+        "extensions": [".java", ".jar", ".class"],
+        "confidence": 10
+    },
+    "go": {
+        "keywords": ["go", "golang", "gopher"],
+        "frameworks": ["gin", "echo", "fiber", "gorilla", "chi", "beego", "iris", "revel"],
+        "extensions": [".go"],
+        "confidence": 10
+    },
+    "rust": {
+        "keywords": ["rust", "cargo", "rustc", "rustup", "crate"],
+        "frameworks": ["actix", "rocket", "warp", "tokio", "serde", "diesel", "yew"],
+        "extensions": [".rs"],
+        "confidence": 10
+    },
+    "cpp": {
+        "keywords": ["c++", "cpp", "cplusplus"],
+        "frameworks": ["boost", "qt", "cmake", "stl", "opencv"],
+        "extensions": [".cpp", ".cc", ".cxx", ".hpp", ".h++"],
+        "confidence": 9
+    },
+    "c": {
+        "keywords": ["c language", "ansi c", "embedded c", "pure c"],
+        "frameworks": ["gtk", "opengl", "sdl"],
+        "extensions": [".c", ".h"],
+        "confidence": 8  # Lower than C++ to avoid false positives
+    },
+    "csharp": {
+        "keywords": ["c#", "csharp", "dotnet", ".net"],
+        "frameworks": ["asp.net", "blazor", "xamarin", "unity", "entityframework", "wpf", "winforms"],
+        "extensions": [".cs", ".csx"],
+        "confidence": 10
+    },
+    "php": {
+        "keywords": ["php"],
+        "frameworks": ["laravel", "symfony", "codeigniter", "wordpress", "drupal", "composer", "yii", "slim"],
+        "extensions": [".php", ".phtml"],
+        "confidence": 10
+    },
+    "ruby": {
+        "keywords": ["ruby", "rb", "gem", "bundler"],
+        "frameworks": ["rails", "sinatra", "rspec", "rake", "capistrano"],
+        "extensions": [".rb", ".erb"],
+        "confidence": 10
+    },
+    "swift": {
+        "keywords": ["swift", "ios", "macos", "watchos", "tvos"],
+        "frameworks": ["swiftui", "uikit", "cocoapods", "carthage", "spm", "vapor"],
+        "extensions": [".swift"],
+        "confidence": 10
+    },
+    "kotlin": {
+        "keywords": ["kotlin", "kt"],
+        "frameworks": ["android", "ktor", "spring", "coroutines", "compose"],
+        "extensions": [".kt", ".kts"],
+        "confidence": 10
+    },
+    "scala": {
+        "keywords": ["scala"],
+        "frameworks": ["akka", "play", "spark", "cats", "zio", "sbt"],
+        "extensions": [".scala", ".sc"],
+        "confidence": 10
+    },
+    "r": {
+        "keywords": ["r language", "rlang", "rstats"],
+        "frameworks": ["tidyverse", "ggplot", "shiny", "dplyr", "caret"],
+        "extensions": [".r", ".rmd"],
+        "confidence": 10
+    },
+    "sql": {
+        "keywords": ["sql", "query", "database"],
+        "frameworks": ["mysql", "postgresql", "sqlite", "oracle", "sqlserver", "mariadb"],
+        "extensions": [".sql"],
+        "confidence": 8
+    },
+    "shell": {
+        "keywords": ["bash", "shell", "sh", "zsh", "fish", "script"],
+        "frameworks": ["unix", "linux", "posix"],
+        "extensions": [".sh", ".bash", ".zsh"],
+        "confidence": 7
+    }
+}
+
+# Token patterns in code, with the weight each adds to its language when present.
+# Patterns lead with a literal wherever they can so the regex engine can skip
+# ahead to it: line starts are matched as '\n' (code is scanned with one
+# prepended) rather than '^', and context before the literal is checked with a
+# lookbehind placed after it
+CODE_FEATURES: Dict[str, List[Tuple[str, int]]] = {
+    "python": [
+        (r'\n[ \t]*def\s+\w+\s*\(', 10),  # Function definition
+        (r'\n[ \t]*class\s+\w+[^{]*:\s*$', 10),  # Class definition
+        (r'\n[ \t]*import\s+\w+', 8),  # Import statement
+        (r'\n[ \t]*from\s+[\w.]+\s+import', 8),
+        (r'if\s+__name__\s*==\s*["\']__main__["\']', 10),
+        (r'print\s*\(', 5),
+        (r'\n[ \t]*@\w+', 7),  # Decorators
+        (r':\s*$', 3),  # Colon at end of line
+        (r'self\.', 7),  # Self reference
+    ],
+    "javascript": [
+        (r'function\s+\w+\s*\(', 10),
+        (r'const\s+\w+\s*=', 8),
+        (r'let\s+\w+\s*=', 8),
+        (r'var\s+\w+\s*=', 7),
+        (r'=>', 8),  # Arrow functions
+        (r'console\.log\s*\(', 7),
+        (r'module\.exports', 8),
+        (r'require\s*\(', 8),
+        (r'async\s+function', 8),
+        (r'\.then\s*\(', 7),
+    ],
+    "typescript": [
+        (r':[ \t]*(?:string|number|boolean|void|any(?!\())\b', 10),  # Type annotations
+        (r'interface\s+\w+\s*\{', 10),
+        (r'\n[ \t]*type\s+\w+\s*=', 10),
+        (r'<(?<=\w<)\w+(?:\[\])?>', 8),  # Generics
+        (r'export\s+(?:interface|type)\s', 9),
+        (r'implements\s+\w+', 9),
+    ],
+    "java": [
+        (r'public\s+class\s+\w+', 10),
+        (r'private\s+\w+\s+\w+', 8),
+        (r'public\s+static\s+void\s+main', 10),
+        (r'import\s+java\.', 9),
+        (r'System\.out\.println', 8),
+        (r'@Override', 7),
+        (r'new\s+\w+\s*\(', 6),
+    ],
+    "go": [
+        (r'\npackage\s+\w+', 10),
+        (r'func\s+(?:\(\w+\s+\*?\w+\)\s*)?\w+\s*\(', 10),
+        (r'import\s+\(', 8),
+        (r'fmt\.Print', 8),
+        (r':=', 9),  # Short variable declaration
+        (r'go\s+func', 8),
+    ],
+    "rust": [
+        (r'fn\s+\w+\s*[(<]', 10),
+        (r'let\s+mut\s+', 9),
+        (r'impl\s+\w+', 8),
+        (r'pub\s+fn', 8),
+        (r'use\s+\w+::', 8),
+        (r'println!\s*\(', 7),
+        (r'match\s+\w+\s*\{', 8),
+    ],
+    "cpp": [
+        (r'#include\s*<\w+>', 10),
+        (r'using\s+namespace\s+std', 9),
+        (r'int\s+main\s*\(', 10),
+        (r'(?:cout|cerr)\s*<<', 8),
+        (r'class\s+\w+\s*\{', 8),
+        (r'std::', 7),
+    ],
+    "csharp": [
+        (r'\n[ \t]*using\s+System[\w.]*;', 10),
+        (r'\n[ \t]*namespace\s+[\w.]+', 8),
+        (r'public\s+(?:async\s+)?(?:Task|void|string|int)\s+\w+\s*\(', 6),
+        (r'Console\.WriteLine', 8),
+    ],
+    "php": [
+        (r'<\?php', 20),
+        (r'\$\w+\s*=', 5),
+    ],
+}
+
+# How much a file's extension and shebang count for, against token features
+EXTENSION_WEIGHT = 30
+SHEBANG_WEIGHT = 25
+# Token features are searched for in the head of the code only; imports,
+# package lines and the first definitions settle the language long before this
+SCAN_CHARS = 8192
+# Scores at or above this are a confident classification
+CONFIDENT_SCORE = 30
+MIN_CODE_SCORE = 10
+MIN_DESCRIPTION_SCORE = 5
+
+# Extensions that name more than one language; token features decide between them
+AMBIGUOUS_EXTENSIONS = {".h": ("c", "cpp")}
+
+EXTENSIONS: Dict[str, str] = {
+    ext: language
+    for language, spec in LANGUAGE_KEYWORDS.items()
+    for ext in spec["extensions"]
+    if ext not in AMBIGUOUS_EXTENSIONS and ext not in (".jar", ".class", ".d.ts")
+}
+
+# Documentation, data and markup files are never source code, whatever they quote
+NON_CODE_EXTENSIONS = frozenset({
+    ".md", ".rst", ".txt", ".json", ".yaml", ".yml", ".toml", ".ini", ".cfg", ".lock",
+    ".html", ".css", ".xml", ".csv", ".env", ".svg", ".png", ".jpg", ".gif",
+})
+
+SHEBANG_INTERPRETERS = {
+    "python": "python", "node": "javascript", "deno": "typescript", "ts-node": "typescript",
+    "bash": "shell", "sh": "shell", "zsh": "shell", "ruby": "ruby", "php": "php",
+}
+
+SHEBANG = re.compile(r'#!\s*(?:/usr/bin/env\s+(?:-\S+\s+)*)?(?:\S*/)?([a-z-]+)')
+
+# (language, weight, compiled pattern) for every code feature
+COMPILED_FEATURES: List[Tuple[str, int, re.Pattern]] = [
+    (language, weight, re.compile(pattern, re.MULTILINE))
+    for language, features in CODE_FEATURES.items()
+    for pattern, weight in features
+]
+
+
+def _description_terms() -> Dict[str, List[Tuple[str, int]]]:
+    """Term -> [(language, weight)] for every description keyword, framework and extension"""
+    terms: Dict[str, List[Tuple[str, int]]] = {}
+    for language, spec in LANGUAGE_KEYWORDS.items():
+        confidence = spec["confidence"]
+        for term in spec["keywords"]:
+            # Exact language name gets highest score
+            terms.setdefault(term, []).append((language, confidence if term == language else confidence // 2))
+        for term in spec["frameworks"]:
+            terms.setdefault(term, []).append((language, confidence // 3))
+        for term in spec["extensions"]:
+            terms.setdefault(term, []).append((language, confidence // 4))
+    return terms
+
+
+DESCRIPTION_TERMS = _description_terms()
+
+# All description terms as one pattern, longest first so 'nodejs' wins over 'node'.
+# Words must stand alone ('go' is not found in 'google'); extensions may follow a name
+DESCRIPTION_MATCHER = re.compile(
+    r'(?<![a-z0-9])(?:' + '|'.join(
+        re.escape(term) for term in sorted(DESCRIPTION_TERMS, key=len, reverse=True)
+        if not term.startswith('.') or term == '.net'
+    ) + r')(?![a-z0-9])'
+    + r'|(?:' + '|'.join(
+        re.escape(term) for term in sorted(DESCRIPTION_TERMS, key=len, reverse=True)
+        if term.startswith('.') and term != '.net'
+    ) + r')(?![a-z0-9])'
+)
+
+
+def _best(scores: Dict[str, int], min_score: int) -> LanguageGuess:
+    if not scores:
+        return LanguageGuess(language=None)
+    language = max(scores, key=scores.get)
+    score = scores[language]
+    if score < min_score:
+        return LanguageGuess(language=None, score=score, scores=scores)
+    # Share of all the evidence, scaled down while the evidence itself is thin
+    confidence = (score / sum(scores.values())) * min(1.0, score / CONFIDENT_SCORE)
+    return LanguageGuess(language=language, confidence=round(confidence, 3), score=score, scores=scores)
+
+
+def language_for_path(path: str) -> Optional[str]:
+    """Language a file's extension names, if it names exactly one"""
+    return EXTENSIONS.get(os.path.splitext(path)[1].lower())
+
+
+def classify_code(code: str, path: Optional[str] = None, min_score: int = MIN_CODE_SCORE) -> LanguageGuess:
+    """Classify source code, using its path when there is one"""
+    scores: Dict[str, int] = {}
+
+    if path:
+        ext = os.path.splitext(path)[1].lower()
+        if ext in EXTENSIONS:
+            language = EXTENSIONS[ext]
+            return LanguageGuess(language=language, confidence=1.0, score=EXTENSION_WEIGHT,
+                                 scores={language: EXTENSION_WEIGHT})
+        if ext in NON_CODE_EXTENSIONS:
+            return LanguageGuess(language=None)
+        for language in AMBIGUOUS_EXTENSIONS.get(ext, ()):
+            scores[language] = EXTENSION_WEIGHT // 2
+
+    if not code:
+        return _best(scores, min_score)
+
+    if code.startswith('#!'):
+        match = SHEBANG.match(code)
+        interpreter = match.group(1) if match else None
+        if interpreter in SHEBANG_INTERPRETERS:
+            language = SHEBANG_INTERPRETERS[interpreter]
+            scores[language] = scores.get(language, 0) + SHEBANG_WEIGHT
+
+    text = "\n" + code[:SCAN_CHARS]
+    for language, weight, pattern in COMPILED_FEATURES:
+        if pattern.search(text):
+            scores[language] = scores.get(language, 0) + weight
+
+    return _best(scores, min_score)
+
+
+def classify_files(files: Mapping[str, str]) -> Dict[str, LanguageGuess]:
+    """Classify every file of a capsule tree in one call.
+
+    Files whose extension names a single language, or marks them as
+    documentation or data, are settled without reading their content; only
+    the rest are scanned.
+    """
+    return {path: classify_code(content, path=path) for path, content in files.items()}
+
+
+def classify_description(
+    text: str,
+    languages: Optional[Iterable[str]] = None,
+    min_score: int = MIN_DESCRIPTION_SCORE
+) -> LanguageGuess:
+    """Classify a task description by the languages, frameworks and file types it mentions"""
+    if not text:
+        return LanguageGuess(language=None)
+
+    allowed = set(languages) if languages is not None else None
+    scores: Dict[str, int] = {}
+    for term in set(DESCRIPTION_MATCHER.findall(text.lower())):
+        for language, weight in DESCRIPTION_TERMS[term]:
+            if allowed is None or language in allowed:
+                scores[language] = scores.get(language, 0) + weight
+
+    return _best({language: score for language, score in scores.items() if score > 0}, min_score)
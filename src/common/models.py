@@ -209,6 +209,10 @@ class AgentMetrics(BaseModel):
     average_execution_time: float
     total_executions: int
     last_updated: str = Field(default_factory=lambda: datetime.utcnow().isoformat())
+    # Outcome of the execution that produced this update, for incremental aggregates
+    complexity: Optional[str] = None
+    last_success: Optional[bool] = None
+    last_execution_time: Optional[float] = None
 
 
 class MemoryEntry(BaseModel):
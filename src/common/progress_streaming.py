@@ -1,7 +1,8 @@
 #!/usr/bin/env python3
 """
 Progress streaming implementation for real-time updates
-Provides WebSocket and SSE (Server-Sent Events) support for streaming progress
+Provides WebSocket and SSE (Server-Sent Events) support for streaming progress,
+fanned out across orchestrator replicas through Redis Streams
 """
 
 import asyncio
@@ -9,15 +10,17 @@ import json
 import time
 import uuid
 from datetime import datetime
-from typing import Dict, Any, Optional, List, AsyncGenerator, Callable
+from typing import Dict, Any, Optional, AsyncGenerator, Callable, Deque, Set, Tuple
 from enum import Enum
 import structlog
 from fastapi import WebSocket, WebSocketDisconnect
 from fastapi.responses import StreamingResponse
-from collections import defaultdict
+from collections import defaultdict, deque
 from dataclasses import dataclass, asdict
 import weakref
 
+from src.common.config import settings
+
 logger = structlog.get_logger(__name__)
 
 
@@ -69,220 +72,385 @@ class ProgressEvent:
         return f"id: {self.id}\nevent: {self.type.value}\ndata: {data}\n\n"
 
 
+# Events that only report current state; a newer one supersedes a buffered older one
+COALESCIBLE_EVENTS = {
+    ProgressEventType.ACTIVITY_PROGRESS.value,
+    ProgressEventType.TASK_PROGRESS.value,
+    ProgressEventType.METRICS_UPDATE.value,
+    ProgressEventType.STATUS_UPDATE.value,
+}
+
+# Events that end a stream and are never dropped for slow consumers
+TERMINAL_EVENTS = {
+    ProgressEventType.WORKFLOW_COMPLETED.value,
+    ProgressEventType.WORKFLOW_FAILED.value,
+}
+
+
+def _stream_id_order(stream_id: str) -> Tuple[int, int]:
+    """Sort key for Redis stream IDs ("<ms>-<seq>")"""
+    ms, _, seq = stream_id.partition("-")
+    return int(ms), int(seq or 0)
+
+
+class ProgressSubscriber:
+    """A single client's bounded event buffer
+    
+    When the client falls behind, a state-only event replaces the buffered
+    event it supersedes; failing that, the oldest non-terminal event is dropped.
+    A slow client therefore only loses intermediate progress, never blocks the
+    publisher or other clients, and always sees the terminal event.
+    """
+    
+    def __init__(self, workflow_id: str, max_buffer: int = 256, last_event_id: Optional[str] = None):
+        self.workflow_id = workflow_id
+        self.max_buffer = max_buffer
+        self.last_id = last_event_id
+        self.buffer: Deque[Tuple[str, Dict[str, Any]]] = deque()
+        self.dropped = 0
+        self.coalesced = 0
+        self.closed = False
+        self._ready = asyncio.Event()
+    
+    @staticmethod
+    def _coalesce_key(event: Dict[str, Any]) -> Tuple:
+        # Batch result updates carry different tasks each, so one batch never supersedes another
+        data = event.get("data") or {}
+        return event.get("type"), event.get("task_id"), event.get("activity_id"), data.get("batch_index")
+    
+    def offer(self, stream_id: str, event: Dict[str, Any]) -> None:
+        """Buffer an event, skipping anything at or before the client's position"""
+        if self.last_id is not None and _stream_id_order(stream_id) <= _stream_id_order(self.last_id):
+            return
+        self.last_id = stream_id
+        
+        if len(self.buffer) >= self.max_buffer:
+            self._make_room(event)
+        self.buffer.append((stream_id, event))
+        self._ready.set()
+    
+    def _make_room(self, event: Dict[str, Any]) -> None:
+        if event.get("type") in COALESCIBLE_EVENTS:
+            key = self._coalesce_key(event)
+            for i, (_, buffered) in enumerate(self.buffer):
+                if self._coalesce_key(buffered) == key:
+                    del self.buffer[i]
+                    self.coalesced += 1
+                    return
+        for i, (_, buffered) in enumerate(self.buffer):
+            if buffered.get("type") not in TERMINAL_EVENTS:
+                del self.buffer[i]
+                self.dropped += 1
+                return
+    
+    async def get(self, timeout: float) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Next buffered (stream_id, event), or None on timeout or close"""
+        while not self.buffer:
+            if self.closed:
+                return None
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                return None
+        return self.buffer.popleft()
+    
+    def close(self) -> None:
+        self.closed = True
+        self._ready.set()
+
+
 class ProgressStreamManager:
-    """Manages progress streaming connections and event distribution"""
+    """Fans progress events out to WebSocket and SSE clients on every replica
     
-    def __init__(self):
-        # Store active connections by workflow ID
-        self._websocket_connections: Dict[str, List[WebSocket]] = defaultdict(list)
-        self._sse_queues: Dict[str, List[asyncio.Queue]] = defaultdict(list)
+    Events are appended to a Redis stream per workflow. Each replica runs one
+    reader that XREADs the streams its own clients follow and copies entries
+    into per-client bounded buffers, so events published on any replica (or by
+    a worker) reach every client. Stream IDs double as event IDs, so clients
+    resume with Last-Event-ID. Without Redis the manager fans out in-process.
+    """
+    
+    def __init__(self, redis_url: Optional[str] = None, max_buffer: int = 256,
+                 stream_maxlen: int = 1000, stream_ttl: int = 24 * 3600,
+                 key_prefix: str = "qlp:progress:"):
+        self.redis_url = redis_url
+        self.max_buffer = max_buffer
+        self.stream_maxlen = stream_maxlen
+        self.stream_ttl = stream_ttl
+        self.key_prefix = key_prefix
+        self._redis = None
+        
+        self._subscribers: Dict[str, Set[ProgressSubscriber]] = defaultdict(set)
+        # Last stream ID the reader has fanned out, per followed workflow
+        self._cursors: Dict[str, str] = {}
+        self._lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        self._websockets: Dict[WebSocket, Tuple[ProgressSubscriber, asyncio.Task]] = {}
         
-        # Store recent events for late joiners (last 100 events per workflow)
-        self._event_history: Dict[str, List[ProgressEvent]] = defaultdict(list)
+        # In-process history when Redis is not configured
+        self._event_history: Dict[str, Deque[Tuple[str, Dict[str, Any]]]] = {}
         self._history_limit = 100
+        self._local_seq = 0
         
         # Metrics
         self._connection_count = 0
         self._event_count = 0
+        self._dropped_from_closed = 0
         
-        # Cleanup task
+        self._reader_task = None
         self._cleanup_task = None
     
+    def _get_redis(self):
+        if self._redis is None and self.redis_url:
+            try:
+                import redis.asyncio as redis
+                self._redis = redis.from_url(self.redis_url, decode_responses=True)
+            except Exception as e:
+                logger.warning("Progress streaming falling back to in-process fan-out", error=str(e))
+                self.redis_url = None
+        return self._redis
+    
+    def _stream_key(self, workflow_id: str) -> str:
+        return f"{self.key_prefix}{workflow_id}"
+    
     async def start(self):
-        """Start the manager and cleanup task"""
-        self._cleanup_task = asyncio.create_task(self._cleanup_inactive_connections())
-        logger.info("Progress stream manager started")
+        """Start the stream reader and cleanup task"""
+        if self._get_redis() is not None:
+            self._reader_task = asyncio.create_task(self._read_streams())
+        self._cleanup_task = asyncio.create_task(self._cleanup_history())
+        logger.info("Progress stream manager started",
+                   backend="redis" if self._redis is not None else "local")
     
     async def stop(self):
-        """Stop the manager and cleanup"""
-        if self._cleanup_task:
-            self._cleanup_task.cancel()
+        """Stop the manager and close every client"""
+        for task in (self._reader_task, self._cleanup_task):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._reader_task = self._cleanup_task = None
+        
+        for websocket in list(self._websockets):
+            await self.disconnect_websocket(websocket)
             try:
-                await self._cleanup_task
-            except asyncio.CancelledError:
+                await websocket.close()
+            except Exception:
                 pass
-        
-        # Close all connections
-        for workflow_id in list(self._websocket_connections.keys()):
-            await self._close_workflow_connections(workflow_id)
+        for subscribers in list(self._subscribers.values()):
+            for subscriber in list(subscribers):
+                subscriber.close()
         
         logger.info("Progress stream manager stopped")
     
-    async def _cleanup_inactive_connections(self):
-        """Periodically clean up inactive connections"""
+    async def _cleanup_history(self):
+        """Forget in-process history for workflows nobody follows"""
         while True:
             try:
-                await asyncio.sleep(60)  # Check every minute
-                
-                # Clean up closed WebSocket connections
-                for workflow_id, connections in list(self._websocket_connections.items()):
-                    active_connections = []
-                    for ws in connections:
-                        try:
-                            # Send ping to check if connection is alive
-                            await ws.send_json({"type": "ping"})
-                            active_connections.append(ws)
-                        except:
-                            logger.debug("Removing inactive WebSocket connection",
-                                       workflow_id=workflow_id)
-                    
-                    if active_connections:
-                        self._websocket_connections[workflow_id] = active_connections
-                    else:
-                        del self._websocket_connections[workflow_id]
-                
-                # Clean up old event history (older than 1 hour)
-                cutoff_time = datetime.utcnow().timestamp() - 3600
-                for workflow_id, events in list(self._event_history.items()):
-                    self._event_history[workflow_id] = [
-                        e for e in events 
-                        if e.timestamp.timestamp() > cutoff_time
-                    ]
-                    if not self._event_history[workflow_id]:
+                await asyncio.sleep(3600)
+                for workflow_id in list(self._event_history):
+                    if workflow_id not in self._subscribers:
                         del self._event_history[workflow_id]
-                
             except asyncio.CancelledError:
                 break
             except Exception as e:
                 logger.error("Error in cleanup task", error=e)
     
-    async def connect_websocket(self, websocket: WebSocket, workflow_id: str) -> None:
+    async def _read_streams(self):
+        """Copy new entries of every followed stream into local subscriber buffers"""
+        while True:
+            try:
+                if not self._cursors:
+                    self._wake.clear()
+                    await self._wake.wait()
+                    continue
+                
+                streams = {self._stream_key(wf): cursor for wf, cursor in self._cursors.items()}
+                # Short block so newly followed workflows join the read promptly
+                response = await self._redis.xread(streams, block=1000, count=100)
+                
+                async with self._lock:
+                    for key, entries in response or []:
+                        workflow_id = key[len(self.key_prefix):]
+                        if workflow_id not in self._cursors:
+                            continue
+                        for stream_id, fields in entries:
+                            self._cursors[workflow_id] = stream_id
+                            self._deliver(workflow_id, stream_id, json.loads(fields["event"]))
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error("Progress stream read failed", error=str(e))
+                await asyncio.sleep(1)
+    
+    def _deliver(self, workflow_id: str, stream_id: str, event: Dict[str, Any]) -> None:
+        for subscriber in self._subscribers.get(workflow_id, ()):
+            subscriber.offer(stream_id, event)
+    
+    async def subscribe(self, workflow_id: str, last_event_id: Optional[str] = None) -> ProgressSubscriber:
+        """Follow a workflow from last_event_id (or its beginning), replaying what was missed"""
+        subscriber = ProgressSubscriber(workflow_id, self.max_buffer, last_event_id)
+        
+        async with self._lock:
+            self._subscribers[workflow_id].add(subscriber)
+            redis_client = self._get_redis()
+            if redis_client is None:
+                for stream_id, event in self._event_history.get(workflow_id, ()):
+                    subscriber.offer(stream_id, event)
+                return subscriber
+            
+            entries = []
+            try:
+                start = f"({last_event_id}" if last_event_id else "-"
+                entries = await redis_client.xrange(self._stream_key(workflow_id), min=start, max="+")
+            except Exception as e:
+                logger.warning("Progress replay failed", workflow_id=workflow_id, error=str(e))
+            for stream_id, fields in entries:
+                subscriber.offer(stream_id, json.loads(fields["event"]))
+            
+            if workflow_id not in self._cursors:
+                self._cursors[workflow_id] = entries[-1][0] if entries else (last_event_id or "0-0")
+                self._wake.set()
+        return subscriber
+    
+    async def unsubscribe(self, subscriber: ProgressSubscriber) -> None:
+        subscriber.close()
+        self._dropped_from_closed += subscriber.dropped
+        async with self._lock:
+            subscribers = self._subscribers.get(subscriber.workflow_id)
+            if subscribers is None:
+                return
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del self._subscribers[subscriber.workflow_id]
+                self._cursors.pop(subscriber.workflow_id, None)
+    
+    async def connect_websocket(self, websocket: WebSocket, workflow_id: str,
+                                last_event_id: Optional[str] = None) -> None:
         """Connect a WebSocket client for workflow updates"""
         await websocket.accept()
-        self._websocket_connections[workflow_id].append(websocket)
+        subscriber = await self.subscribe(workflow_id, last_event_id)
+        sender = asyncio.create_task(self._pump_websocket(websocket, subscriber))
+        self._websockets[websocket] = (subscriber, sender)
         self._connection_count += 1
         
         logger.info("WebSocket connected",
                    workflow_id=workflow_id,
                    total_connections=self._connection_count)
-        
-        # Send history to new connection
-        if workflow_id in self._event_history:
-            for event in self._event_history[workflow_id]:
-                try:
-                    await websocket.send_json(event.to_dict())
-                except:
-                    break
     
-    async def disconnect_websocket(self, websocket: WebSocket, workflow_id: str) -> None:
+    async def _pump_websocket(self, websocket: WebSocket, subscriber: ProgressSubscriber) -> None:
+        """Send one client's buffer; a slow socket only backs up its own buffer"""
+        try:
+            while True:
+                item = await subscriber.get(timeout=30)
+                if item is None:
+                    if subscriber.closed:
+                        break
+                    await websocket.send_json({"type": "ping"})
+                    continue
+                stream_id, event = item
+                await websocket.send_json({**event, "event_id": stream_id})
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.debug("WebSocket send failed", workflow_id=subscriber.workflow_id, error=str(e))
+    
+    async def disconnect_websocket(self, websocket: WebSocket, workflow_id: Optional[str] = None) -> None:
         """Disconnect a WebSocket client"""
-        if workflow_id in self._websocket_connections:
-            if websocket in self._websocket_connections[workflow_id]:
-                self._websocket_connections[workflow_id].remove(websocket)
-                self._connection_count -= 1
-                
-                if not self._websocket_connections[workflow_id]:
-                    del self._websocket_connections[workflow_id]
+        entry = self._websockets.pop(websocket, None)
+        if entry is None:
+            return
+        subscriber, sender = entry
+        sender.cancel()
+        await self.unsubscribe(subscriber)
+        self._connection_count -= 1
         
         logger.info("WebSocket disconnected",
-                   workflow_id=workflow_id,
+                   workflow_id=subscriber.workflow_id,
                    remaining_connections=self._connection_count)
     
-    def create_sse_stream(self, workflow_id: str) -> AsyncGenerator[str, None]:
-        """Create an SSE stream for workflow updates"""
-        queue = asyncio.Queue()
-        self._sse_queues[workflow_id].append(queue)
+    def create_sse_stream(self, workflow_id: str, last_event_id: Optional[str] = None,
+                          keepalive_seconds: float = 15.0) -> AsyncGenerator[str, None]:
+        """Create an SSE stream for workflow updates, resumable from last_event_id"""
         
         async def stream_generator():
+            subscriber = await self.subscribe(workflow_id, last_event_id)
+            self._connection_count += 1
             try:
-                # Send history first
-                if workflow_id in self._event_history:
-                    for event in self._event_history[workflow_id]:
-                        yield event.to_sse()
-                
-                # Stream new events
                 while True:
-                    event = await queue.get()
-                    if event is None:  # Sentinel to close stream
+                    item = await subscriber.get(timeout=keepalive_seconds)
+                    if item is None:
+                        if subscriber.closed:
+                            break
+                        yield ": keepalive\n\n"
+                        continue
+                    stream_id, event = item
+                    yield f"id: {stream_id}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+                    if event["type"] in TERMINAL_EVENTS:
                         break
-                    yield event.to_sse()
-                    
             finally:
-                if workflow_id in self._sse_queues:
-                    if queue in self._sse_queues[workflow_id]:
-                        self._sse_queues[workflow_id].remove(queue)
-                    if not self._sse_queues[workflow_id]:
-                        del self._sse_queues[workflow_id]
+                self._connection_count -= 1
+                await self.unsubscribe(subscriber)
         
         return stream_generator()
     
-    async def publish_event(self, event: ProgressEvent) -> None:
-        """Publish a progress event to all subscribers"""
+    async def publish_event(self, event: ProgressEvent) -> Optional[str]:
+        """Publish a progress event to subscribers on every replica; returns its event ID"""
         self._event_count += 1
+        if not event.workflow_id:
+            return None
+        payload = event.to_dict()
         
-        # Add to history
-        if event.workflow_id:
-            history = self._event_history[event.workflow_id]
-            history.append(event)
-            # Keep only recent events
-            if len(history) > self._history_limit:
-                self._event_history[event.workflow_id] = history[-self._history_limit:]
-        
-        # Send to WebSocket connections
-        if event.workflow_id in self._websocket_connections:
-            disconnected = []
-            for ws in self._websocket_connections[event.workflow_id]:
-                try:
-                    await ws.send_json(event.to_dict())
-                except:
-                    disconnected.append(ws)
-            
-            # Remove disconnected clients
-            for ws in disconnected:
-                await self.disconnect_websocket(ws, event.workflow_id)
+        stream_id = None
+        redis_client = self._get_redis()
+        if redis_client is not None:
+            try:
+                key = self._stream_key(event.workflow_id)
+                stream_id = await redis_client.xadd(
+                    key, {"event": json.dumps(payload)},
+                    maxlen=self.stream_maxlen, approximate=True
+                )
+                await redis_client.expire(key, self.stream_ttl)
+            except Exception as e:
+                logger.warning("Progress publish to Redis failed, delivering locally", error=str(e))
+                stream_id = None
         
-        # Send to SSE queues
-        if event.workflow_id in self._sse_queues:
-            for queue in self._sse_queues[event.workflow_id]:
-                try:
-                    await queue.put(event)
-                except:
-                    pass
+        if stream_id is None:
+            # In-process fan-out; Redis-backed subscribers get events from the reader
+            self._local_seq += 1
+            stream_id = f"0-{self._local_seq}"
+            history = self._event_history.setdefault(event.workflow_id, deque(maxlen=self._history_limit))
+            history.append((stream_id, payload))
+            self._deliver(event.workflow_id, stream_id, payload)
         
         # Log high-level events
-        if event.type in [ProgressEventType.WORKFLOW_COMPLETED, 
-                         ProgressEventType.WORKFLOW_FAILED]:
+        if event.type.value in TERMINAL_EVENTS:
             logger.info("Workflow event published",
                        event_type=event.type.value,
                        workflow_id=event.workflow_id,
-                       subscribers=len(self._websocket_connections.get(event.workflow_id, [])))
-    
-    async def _close_workflow_connections(self, workflow_id: str) -> None:
-        """Close all connections for a workflow"""
-        # Close WebSockets
-        if workflow_id in self._websocket_connections:
-            for ws in self._websocket_connections[workflow_id]:
-                try:
-                    await ws.close()
-                except:
-                    pass
-            del self._websocket_connections[workflow_id]
-        
-        # Close SSE streams
-        if workflow_id in self._sse_queues:
-            for queue in self._sse_queues[workflow_id]:
-                await queue.put(None)  # Sentinel to close
-            del self._sse_queues[workflow_id]
+                       local_subscribers=len(self._subscribers.get(event.workflow_id, ())))
+        return stream_id
     
     def get_metrics(self) -> Dict[str, Any]:
         """Get streaming metrics"""
+        subscribers = [s for subs in self._subscribers.values() for s in subs]
         return {
+            "backend": "redis" if self._redis is not None else "local",
             "active_connections": self._connection_count,
             "total_events_published": self._event_count,
-            "workflows_tracked": len(self._event_history),
-            "websocket_connections_by_workflow": {
-                wf_id: len(conns) 
-                for wf_id, conns in self._websocket_connections.items()
+            "workflows_tracked": len(self._subscribers),
+            "subscribers_by_workflow": {
+                wf_id: len(subs) for wf_id, subs in self._subscribers.items()
             },
-            "sse_streams_by_workflow": {
-                wf_id: len(queues) 
-                for wf_id, queues in self._sse_queues.items()
-            }
+            "buffered_events": sum(len(s.buffer) for s in subscribers),
+            "dropped_events": self._dropped_from_closed + sum(s.dropped for s in subscribers),
+            "coalesced_events": sum(s.coalesced for s in subscribers)
         }
 
 
 # Global instance
-progress_manager = ProgressStreamManager()
+progress_manager = ProgressStreamManager(redis_url=settings.REDIS_URL)
 
 
 class ProgressReporter:
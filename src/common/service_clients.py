@@ -0,0 +1,314 @@
+"""
+Pooled HTTP clients for inter-service calls
+
+Keeps one keep-alive connection pool per downstream service for the lifetime
+of the process instead of opening a fresh httpx.AsyncClient per call, and
+applies a shared retry and circuit breaker policy to every request.
+"""
+import asyncio
+import importlib.util
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+import httpx
+from prometheus_client import Counter, Gauge, Histogram
+
+from src.common.config import settings
+from src.common.error_handling import CircuitBreakerError, RetryStrategy, get_circuit_breaker
+
+logger = logging.getLogger(__name__)
+
+# HTTP/2 needs the optional h2 package and is only negotiated over TLS
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# Prometheus metrics for sizing the pools under load
+pool_requests_in_use = Gauge(
+    'qlp_service_client_requests_in_use',
+    'Requests currently holding a pool slot',
+    ['service']
+)
+
+pool_idle_connections = Gauge(
+    'qlp_service_client_idle_connections',
+    'Idle keep-alive connections in the pool',
+    ['service']
+)
+
+pool_wait_seconds = Histogram(
+    'qlp_service_client_pool_wait_seconds',
+    'Time spent waiting for a free pool slot',
+    ['service'],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+)
+
+service_request_duration = Histogram(
+    'qlp_service_client_request_duration_seconds',
+    'Inter-service request duration in seconds',
+    ['service', 'method']
+)
+
+service_request_retries = Counter(
+    'qlp_service_client_retries_total',
+    'Retried inter-service requests',
+    ['service', 'reason']
+)
+
+
+@dataclass
+class ServiceConfig:
+    """Connection settings for one downstream service"""
+    name: str
+    base_url: str
+    timeout: float
+    connect_timeout: float = 10.0
+    max_connections: int = 20
+    max_keepalive_connections: int = 10
+    keepalive_expiry: float = 30.0
+
+
+class ServiceClient:
+    """Keep-alive HTTP client for a single downstream service"""
+
+    def __init__(self, config: ServiceConfig, retry_strategy: Optional[RetryStrategy] = None):
+        self.config = config
+        self.retry_strategy = retry_strategy or RetryStrategy(max_attempts=3, initial_delay=1.0, max_delay=10.0)
+        self.circuit_breaker = get_circuit_breaker(config.name)
+        self._client: Optional[httpx.AsyncClient] = None
+        self._slots = asyncio.Semaphore(config.max_connections)
+        self._in_use = 0
+        self._total_requests = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.config.base_url,
+                timeout=httpx.Timeout(self.config.timeout, connect=self.config.connect_timeout),
+                limits=httpx.Limits(
+                    max_connections=self.config.max_connections,
+                    max_keepalive_connections=self.config.max_keepalive_connections,
+                    keepalive_expiry=self.config.keepalive_expiry
+                ),
+                http2=HTTP2_AVAILABLE and self.config.base_url.startswith("https://")
+            )
+        return self._client
+
+    async def request(self, method: str, path: str, *,
+                      retry: Optional[bool] = None,
+                      on_attempt: Optional[Callable[[int, int], None]] = None,
+                      **kwargs) -> httpx.Response:
+        """
+        Send a request through the pool.
+
+        5xx responses and connect/timeout errors are retried with backoff; the
+        last 5xx response is returned to the caller rather than raised. Only
+        GET and HEAD are retried by default, since retrying a POST may repeat
+        its side effects; pass retry=True for POSTs that are safe to repeat.
+        The circuit breaker sees one outcome per call, not one per attempt.
+        """
+        if self.circuit_breaker.is_open():
+            recovery_time = self.circuit_breaker.recovery_timeout
+            raise CircuitBreakerError(self.config.name, recovery_time)
+
+        if retry is None:
+            retry = method.upper() in ("GET", "HEAD")
+        max_attempts = self.retry_strategy.max_attempts if retry else 1
+        for attempt in range(1, max_attempts + 1):
+            if on_attempt:
+                on_attempt(attempt, max_attempts)
+            try:
+                response = await self._send(method, path, **kwargs)
+            except (httpx.TimeoutException, httpx.ConnectError) as e:
+                if attempt >= max_attempts:
+                    self.circuit_breaker.record_failure()
+                    raise
+                service_request_retries.labels(service=self.config.name, reason=type(e).__name__).inc()
+                logger.warning(f"{self.config.name} {method} {path} failed ({e}), retrying")
+                await asyncio.sleep(self.retry_strategy.calculate_delay(attempt))
+                continue
+
+            if response.status_code >= 500:
+                if attempt < max_attempts:
+                    service_request_retries.labels(service=self.config.name, reason=str(response.status_code)).inc()
+                    logger.warning(f"{self.config.name} returned {response.status_code}, retrying")
+                    await asyncio.sleep(self.retry_strategy.calculate_delay(attempt))
+                    continue
+                self.circuit_breaker.record_failure()
+            else:
+                self.circuit_breaker.record_success()
+            return response
+
+    async def get(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", path, **kwargs)
+
+    async def post(self, path: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", path, **kwargs)
+
+    @asynccontextmanager
+    async def stream(self, method: str, path: str, **kwargs) -> AsyncIterator[httpx.Response]:
+        """
+        Stream a response through the pool.
+
+        Not retried, since the caller may already have consumed part of the body.
+        """
+        if self.circuit_breaker.is_open():
+            raise CircuitBreakerError(self.config.name, self.circuit_breaker.recovery_timeout)
+
+        async with self._slot(method):
+            try:
+                async with self.client.stream(method, path, **kwargs) as response:
+                    if response.status_code >= 500:
+                        self.circuit_breaker.record_failure()
+                    else:
+                        self.circuit_breaker.record_success()
+                    yield response
+            except (httpx.TimeoutException, httpx.ConnectError):
+                self.circuit_breaker.record_failure()
+                raise
+
+    async def _send(self, method: str, path: str, **kwargs) -> httpx.Response:
+        async with self._slot(method):
+            return await self.client.request(method, path, **kwargs)
+
+    @asynccontextmanager
+    async def _slot(self, method: str):
+        """Hold a pool slot, recording wait time, concurrency and duration"""
+        wait_start = time.monotonic()
+        async with self._slots:
+            waited = time.monotonic() - wait_start
+            self._total_wait += waited
+            self._max_wait = max(self._max_wait, waited)
+            pool_wait_seconds.labels(service=self.config.name).observe(waited)
+
+            self._in_use += 1
+            self._total_requests += 1
+            pool_requests_in_use.labels(service=self.config.name).set(self._in_use)
+            start = time.monotonic()
+            try:
+                yield
+            finally:
+                self._in_use -= 1
+                pool_requests_in_use.labels(service=self.config.name).set(self._in_use)
+                service_request_duration.labels(service=self.config.name, method=method).observe(
+                    time.monotonic() - start
+                )
+
+    def _connection_counts(self) -> Dict[str, int]:
+        """Open/idle connection counts from the underlying httpcore pool"""
+        pool = getattr(getattr(self._client, "_transport", None), "_pool", None)
+        connections = list(getattr(pool, "connections", []) or [])
+        idle = sum(1 for conn in connections if conn.is_idle())
+        return {"open": len(connections), "idle": idle}
+
+    def get_metrics(self) -> Dict[str, Any]:
+        counts = self._connection_counts()
+        pool_idle_connections.labels(service=self.config.name).set(counts["idle"])
+        return {
+            "service": self.config.name,
+            "base_url": self.config.base_url,
+            "max_connections": self.config.max_connections,
+            "in_use": self._in_use,
+            "open_connections": counts["open"],
+            "idle_connections": counts["idle"],
+            "total_requests": self._total_requests,
+            "avg_wait_seconds": self._total_wait / max(self._total_requests, 1),
+            "max_wait_seconds": self._max_wait,
+            "circuit_breaker": self.circuit_breaker.state
+        }
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+def default_service_configs() -> Dict[str, ServiceConfig]:
+    """Downstream services used by the Temporal worker"""
+    max_connections = settings.SERVICE_CLIENT_MAX_CONNECTIONS
+    keepalive = settings.SERVICE_CLIENT_MAX_KEEPALIVE
+    return {
+        "agent-factory": ServiceConfig(
+            name="agent-factory",
+            base_url=f"http://agent-factory:{settings.AGENT_FACTORY_PORT}",
+            timeout=180.0,
+            max_connections=max_connections,
+            max_keepalive_connections=keepalive
+        ),
+        "vector-memory": ServiceConfig(
+            name="vector-memory",
+            base_url=f"http://vector-memory:{settings.VECTOR_MEMORY_PORT}",
+            timeout=30.0,
+            max_connections=max_connections,
+            max_keepalive_connections=keepalive
+        ),
+        "validation-mesh": ServiceConfig(
+            name="validation-mesh",
+            base_url=f"http://validation-mesh:{settings.VALIDATION_MESH_PORT}",
+            timeout=120.0,
+            max_connections=max_connections,
+            max_keepalive_connections=keepalive
+        ),
+        "orchestrator": ServiceConfig(
+            name="orchestrator",
+            base_url=f"http://orchestrator:{settings.ORCHESTRATOR_PORT}",
+            timeout=300.0,
+            max_connections=max_connections,
+            max_keepalive_connections=keepalive
+        ),
+        "sandbox": ServiceConfig(
+            name="sandbox",
+            base_url=f"http://execution-sandbox:{settings.SANDBOX_PORT}",
+            timeout=120.0,
+            max_connections=max_connections,
+            max_keepalive_connections=keepalive
+        ),
+    }
+
+
+class ServiceClientRegistry:
+    """Process-wide registry holding one pooled client per service"""
+
+    def __init__(self, configs: Optional[Dict[str, ServiceConfig]] = None):
+        self._configs = configs
+        self._clients: Dict[str, ServiceClient] = {}
+
+    def __getitem__(self, service: str) -> ServiceClient:
+        if service not in self._clients:
+            if self._configs is None:
+                self._configs = default_service_configs()
+            if service not in self._configs:
+                raise KeyError(f"Unknown service: {service}")
+            self._clients[service] = ServiceClient(self._configs[service])
+        return self._clients[service]
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {name: client.get_metrics() for name, client in self._clients.items()}
+
+    async def aclose(self):
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+
+
+_registry: Optional[ServiceClientRegistry] = None
+
+
+def get_service_clients() -> ServiceClientRegistry:
+    """Get the process-wide service client registry"""
+    global _registry
+    if _registry is None:
+        _registry = ServiceClientRegistry()
+    return _registry
+
+
+async def close_service_clients():
+    """Close all pooled connections, e.g. on worker shutdown"""
+    global _registry
+    if _registry is not None:
+        await _registry.aclose()
+        _registry = None
@@ -1,7 +1,11 @@
 """
 Temporal Cloud connection helper with API key authentication
 """
+import asyncio
 import os
+import random
+from datetime import timedelta
+from typing import List, Optional
 from temporalio.client import Client, TLSConfig
 import structlog
 
@@ -57,4 +61,133 @@ async def create_temporal_client(server: str = None, namespace: str = None):
     if namespace:
         os.environ['TEMPORAL_NAMESPACE'] = namespace
     
-    return await get_temporal_client()
\ No newline at end of file
+    return await get_temporal_client()
+
+
+class TemporalUnavailableError(RuntimeError):
+    """No healthy Temporal connection is available"""
+
+
+class TemporalClientManager:
+    """
+    App-lifetime pool of Temporal clients shared by every API endpoint
+    
+    Each client owns its own gRPC channel, so a small pool spreads high request
+    fan-out over several HTTP/2 connections. Connections are health-checked in
+    the background and reconnected with exponential backoff; requests are routed
+    round-robin over the healthy ones and never pay for a TLS handshake.
+    """
+    
+    def __init__(self, pool_size: Optional[int] = None, health_interval: Optional[float] = None,
+                 max_backoff: float = 30.0, connect=None):
+        self.pool_size = max(1, pool_size or int(os.getenv('TEMPORAL_CLIENT_POOL_SIZE', '2')))
+        self.health_interval = health_interval or float(os.getenv('TEMPORAL_HEALTH_INTERVAL_SECONDS', '15'))
+        self.max_backoff = max_backoff
+        self._connect = connect or get_temporal_client
+        self._clients: List[Optional[Client]] = [None] * self.pool_size
+        self._connected = asyncio.Event()
+        self._next = 0
+        self._reconnecting: set = set()
+        self._tasks: List[asyncio.Task] = []
+    
+    @property
+    def is_connected(self) -> bool:
+        return any(client is not None for client in self._clients)
+    
+    async def start(self):
+        """Connect the pool; slots that fail keep retrying in the background"""
+        results = await asyncio.gather(
+            *(self._connect() for _ in range(self.pool_size)), return_exceptions=True
+        )
+        for slot, result in enumerate(results):
+            if isinstance(result, BaseException):
+                logger.error(f"Temporal connection {slot} failed, retrying in background", error=str(result))
+                self._schedule_reconnect(slot)
+            else:
+                self._clients[slot] = result
+        self._update_connected()
+        self._tasks.append(asyncio.create_task(self._health_loop()))
+        logger.info("Temporal client pool started", pool_size=self.pool_size,
+                    connected=sum(client is not None for client in self._clients))
+    
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        self._reconnecting.clear()
+        self._clients = [None] * self.pool_size
+        self._connected.clear()
+    
+    async def get(self, timeout: float = 5.0) -> Client:
+        """Return a healthy client, waiting briefly if every connection is down"""
+        if not self.is_connected:
+            try:
+                await asyncio.wait_for(self._connected.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                raise TemporalUnavailableError("Temporal service is not available")
+        
+        for _ in range(self.pool_size):
+            client = self._clients[self._next % self.pool_size]
+            self._next += 1
+            if client is not None:
+                return client
+        raise TemporalUnavailableError("Temporal service is not available")
+    
+    def get_stats(self) -> dict:
+        return {
+            "pool_size": self.pool_size,
+            "connected": sum(client is not None for client in self._clients),
+            "reconnecting": len(self._reconnecting)
+        }
+    
+    def _update_connected(self):
+        if self.is_connected:
+            self._connected.set()
+        else:
+            self._connected.clear()
+    
+    def _schedule_reconnect(self, slot: int):
+        if slot not in self._reconnecting:
+            self._reconnecting.add(slot)
+            self._tasks.append(asyncio.create_task(self._reconnect(slot)))
+    
+    async def _reconnect(self, slot: int):
+        delay = 0.5
+        try:
+            while True:
+                await asyncio.sleep(delay * (0.5 + random.random() / 2))
+                try:
+                    self._clients[slot] = await self._connect()
+                    self._update_connected()
+                    logger.info(f"Temporal connection {slot} re-established")
+                    return
+                except Exception as e:
+                    delay = min(self.max_backoff, delay * 2)
+                    logger.warning(f"Temporal reconnect {slot} failed, next attempt in ~{delay:.1f}s", error=str(e))
+        finally:
+            self._reconnecting.discard(slot)
+    
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            self._tasks = [task for task in self._tasks if not task.done()]
+            for slot, client in enumerate(self._clients):
+                if client is None:
+                    continue
+                try:
+                    await client.service_client.check_health(timeout=timedelta(seconds=5))
+                except Exception as e:
+                    logger.warning(f"Temporal connection {slot} unhealthy, reconnecting", error=str(e))
+                    self._clients[slot] = None
+                    self._update_connected()
+                    self._schedule_reconnect(slot)
+
+
+# Shared by the orchestrator API; started and stopped with the app
+temporal_client_manager = TemporalClientManager()
+
+
+async def get_shared_temporal_client() -> Client:
+    """Get a pooled app-lifetime Temporal client"""
+    return await temporal_client_manager.get()
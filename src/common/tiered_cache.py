@@ -0,0 +1,132 @@
+"""
+Two-tier cache: an in-process LRU with TTL in front of Redis
+
+Lookups are answered from the process when possible and from Redis, shared
+by every replica, otherwise; a Redis hit is kept locally for the rest of its
+TTL. Values are stored in Redis as JSON (or whatever ``encode`` produces, as
+bytes when ``binary`` is set) and held locally as decoded. Without Redis, or
+when a Redis call fails, the cache carries on with the local tier alone.
+"""
+
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+import structlog
+
+logger = structlog.get_logger()
+
+
+class TieredCache:
+    """Values by key: in-process LRU with TTL, then Redis"""
+
+    def __init__(
+        self,
+        name: str,
+        max_entries: int = 2048,
+        ttl_seconds: int = 3600,
+        redis_url: Optional[str] = None,
+        encode: Callable[[Any], Any] = json.dumps,
+        decode: Callable[[Any], Any] = json.loads,
+        binary: bool = False
+    ):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.encode = encode
+        self.decode = decode
+        self._lru: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._redis = None
+        self.evictions = 0
+
+        if redis_url:
+            try:
+                import redis.asyncio as redis
+                self._redis = redis.from_url(redis_url, decode_responses=not binary)
+            except Exception as e:
+                logger.warning(f"{name} running without Redis: {e}")
+
+    def __len__(self) -> int:
+        return len(self._lru)
+
+    def get_local(self, key: str) -> Optional[Any]:
+        entry = self._lru.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._lru[key]
+            return None
+        self._lru.move_to_end(key)
+        return value
+
+    def put_local(self, key: str, value: Any, ttl_seconds: Optional[int] = None):
+        self._lru[key] = (time.monotonic() + (ttl_seconds or self.ttl_seconds), value)
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+            self.evictions += 1
+
+    async def get(self, key: str) -> Optional[Any]:
+        value = self.get_local(key)
+        if value is not None or self._redis is None:
+            return value
+        try:
+            raw = await self._redis.get(key)
+        except Exception as e:
+            logger.warning(f"{self.name} Redis lookup failed: {e}")
+            return None
+        if raw is None:
+            return None
+        value = self.decode(raw)
+        self.put_local(key, value)
+        return value
+
+    async def put(self, key: str, value: Any, ttl_seconds: Optional[int] = None):
+        ttl_seconds = ttl_seconds or self.ttl_seconds
+        self.put_local(key, value, ttl_seconds)
+        if self._redis is None:
+            return
+        try:
+            await self._redis.setex(key, ttl_seconds, self.encode(value))
+        except Exception as e:
+            logger.warning(f"{self.name} Redis store failed: {e}")
+
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """Values by key in one Redis round trip; missing keys are absent from the result"""
+        found: Dict[str, Any] = {}
+        remote = []
+        for key in keys:
+            value = self.get_local(key)
+            if value is not None:
+                found[key] = value
+            elif key not in remote:
+                remote.append(key)
+        if not remote or self._redis is None:
+            return found
+        try:
+            values = await self._redis.mget(remote)
+        except Exception as e:
+            logger.warning(f"{self.name} Redis lookup failed: {e}")
+            return found
+        for key, raw in zip(remote, values):
+            if raw is not None:
+                found[key] = self.decode(raw)
+                self.put_local(key, found[key])
+        return found
+
+    async def put_many(self, items: Dict[str, Any], ttl_seconds: Optional[int] = None):
+        """Store values by key in both tiers, pipelined into one Redis round trip"""
+        ttl_seconds = ttl_seconds or self.ttl_seconds
+        for key, value in items.items():
+            self.put_local(key, value, ttl_seconds)
+        if self._redis is None or not items:
+            return
+        try:
+            pipe = self._redis.pipeline(transaction=False)
+            for key, value in items.items():
+                pipe.setex(key, ttl_seconds, self.encode(value))
+            await pipe.execute()
+        except Exception as e:
+            logger.warning(f"{self.name} Redis store failed: {e}")
@@ -0,0 +1,175 @@
+"""
+Embedding cache and micro-batcher for the vector memory service
+
+Embeddings are keyed by (model, sha256(text)) and cached in an in-process LRU
+in front of a Redis tier. Concurrent single-text lookups are merged into one
+multi-input embeddings request.
+"""
+
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Set
+
+import numpy as np
+import structlog
+
+from src.common.tiered_cache import TieredCache
+
+logger = structlog.get_logger()
+
+EmbedFn = Callable[[List[str]], Awaitable[List[List[float]]]]
+
+
+def embedding_key(model: str, text: str) -> str:
+    """Content-hash cache key for an embedding"""
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return f"qlp:embedding:{model}:{digest}"
+
+
+class EmbeddingCache:
+    """Two-tier embedding cache: in-process LRU with TTL, then Redis"""
+
+    def __init__(self, model: str, max_entries: int = 10000, ttl_seconds: int = 7 * 24 * 3600,
+                 redis_url: Optional[str] = None):
+        self.model = model
+        # Vectors go to Redis as packed float32 bytes
+        self.store = TieredCache(
+            "Embedding cache", max_entries=max_entries, ttl_seconds=ttl_seconds, redis_url=redis_url,
+            encode=lambda vector: np.asarray(vector, dtype=np.float32).tobytes(),
+            decode=lambda raw: np.frombuffer(raw, dtype=np.float32).tolist(),
+            binary=True
+        )
+        self.stats = {"memory_hits": 0, "redis_hits": 0, "misses": 0}
+
+    async def get_many(self, texts: Sequence[str]) -> Dict[str, List[float]]:
+        """Return cached vectors by text; missing texts are absent from the result"""
+        found: Dict[str, List[float]] = {}
+        remote: Dict[str, str] = {}
+        for text in dict.fromkeys(texts):
+            key = embedding_key(self.model, text)
+            vector = self.store.get_local(key)
+            if vector is not None:
+                self.stats["memory_hits"] += 1
+                found[text] = vector
+            else:
+                remote[key] = text
+
+        if remote:
+            from_redis = await self.store.get_many(remote)
+            for key, vector in from_redis.items():
+                found[remote[key]] = vector
+            self.stats["redis_hits"] += len(from_redis)
+            self.stats["misses"] += len(remote) - len(from_redis)
+        return found
+
+    async def put_many(self, items: Dict[str, List[float]]):
+        """Store vectors by text in both tiers"""
+        await self.store.put_many({embedding_key(self.model, text): vector for text, vector in items.items()})
+
+    def get_stats(self) -> Dict[str, float]:
+        lookups = self.stats["memory_hits"] + self.stats["redis_hits"] + self.stats["misses"]
+        hits = self.stats["memory_hits"] + self.stats["redis_hits"]
+        return {
+            **self.stats,
+            "evictions": self.store.evictions,
+            "entries": len(self.store),
+            "hit_rate": hits / lookups if lookups else 0.0
+        }
+
+
+class EmbeddingBatcher:
+    """
+    Merges concurrent embedding requests into multi-input calls.
+
+    Callers await ``embed``; requests arriving within ``max_wait_ms`` of each
+    other (or until ``max_batch_size`` is reached) share a single request.
+    """
+
+    def __init__(self, embed_fn: EmbedFn, max_batch_size: int = 64, max_wait_ms: int = 10,
+                 max_batch_chars: int = 400_000):
+        self.embed_fn = embed_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_batch_chars = max_batch_chars
+        self._pending: "OrderedDict[str, List[asyncio.Future]]" = OrderedDict()
+        self._pending_chars = 0
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        # Batches in flight; the loop holds tasks only weakly
+        self._batches: Set[asyncio.Task] = set()
+        self.requests_sent = 0
+        self.inputs_embedded = 0
+
+    async def embed(self, text: str) -> List[float]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if text in self._pending:
+            self._pending[text].append(future)
+        else:
+            self._pending[text] = [future]
+            self._pending_chars += len(text)
+
+        if len(self._pending) >= self.max_batch_size or self._pending_chars >= self.max_batch_chars:
+            self._flush_now()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_wait, self._flush_now)
+        return await future
+
+    def _flush_now(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, OrderedDict()
+        self._pending_chars = 0
+        task = asyncio.ensure_future(self._run_batch(batch))
+        self._batches.add(task)
+        task.add_done_callback(self._batch_done)
+
+    def _batch_done(self, task: asyncio.Task):
+        self._batches.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("Embedding batch failed", error=str(task.exception()))
+
+    async def _run_batch(self, batch: "OrderedDict[str, List[asyncio.Future]]"):
+        texts = list(batch)
+        try:
+            vectors = await self.embed_many(texts)
+        except Exception as e:
+            for futures in batch.values():
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+        for text, vector in zip(texts, vectors):
+            for future in batch[text]:
+                if not future.done():
+                    future.set_result(vector)
+
+    async def embed_many(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts directly, chunked by batch size and character budget"""
+        vectors: List[List[float]] = []
+        chunk: List[str] = []
+        chunk_chars = 0
+        for text in texts:
+            if chunk and (len(chunk) >= self.max_batch_size or chunk_chars + len(text) > self.max_batch_chars):
+                vectors.extend(await self._call(chunk))
+                chunk, chunk_chars = [], 0
+            chunk.append(text)
+            chunk_chars += len(text)
+        if chunk:
+            vectors.extend(await self._call(chunk))
+        return vectors
+
+    async def _call(self, texts: List[str]) -> List[List[float]]:
+        self.requests_sent += 1
+        self.inputs_embedded += len(texts)
+        return await self.embed_fn(texts)
+
+    def get_stats(self) -> Dict[str, float]:
+        return {
+            "requests_sent": self.requests_sent,
+            "inputs_embedded": self.inputs_embedded,
+            "avg_batch_size": self.inputs_embedded / self.requests_sent if self.requests_sent else 0.0
+        }
@@ -17,7 +17,8 @@ import os
 from src.common.structured_logging import setup_logging, LogContext, log_operation
 from src.common.logging_middleware import setup_request_logging
 from src.common.logging_decorators import log_function, measure_performance
-from qdrant_client import QdrantClient
+import httpx
+from qdrant_client import AsyncQdrantClient
 from qdrant_client.models import (
     Distance, 
     VectorParams, 
@@ -40,6 +41,9 @@ from src.common.models import (
     MemoryEntry
 )
 from src.common.config import settings
+from src.common.language_classifier import language_for_path
+from src.memory.embedding_cache import EmbeddingBatcher, EmbeddingCache
+from src.memory.tier_performance import TierPerformanceAggregate
 
 # Setup structured logging
 logger = setup_logging(
@@ -84,7 +88,15 @@ qdrant_url = os.getenv('QDRANT_CLOUD_URL') or settings.QDRANT_URL
 qdrant_api_key = os.getenv('QDRANT_CLOUD_API_KEY') or settings.QDRANT_API_KEY
 
 logger.info(f"Initializing Qdrant client with URL: {qdrant_url}")
-qdrant_client = QdrantClient(url=qdrant_url, api_key=qdrant_api_key)
+# Async client so searches never block the event loop; keep-alive pool for connection reuse
+qdrant_client = AsyncQdrantClient(
+    url=qdrant_url,
+    api_key=qdrant_api_key,
+    limits=httpx.Limits(
+        max_connections=settings.QDRANT_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.QDRANT_MAX_CONNECTIONS
+    )
+)
 
 # Collection names
 COLLECTIONS = {
@@ -98,6 +110,9 @@ COLLECTIONS = {
 # Vector dimensions (OpenAI embeddings)
 VECTOR_DIM = 1536
 
+# Embedding model (also the Azure deployment name)
+EMBEDDING_MODEL = "text-embedding-ada-002"
+
 
 class VectorMemoryService:
     """Core vector memory functionality"""
@@ -106,6 +121,21 @@ class VectorMemoryService:
         self.openai = openai_client
         self.qdrant = qdrant_client
         self.collections = COLLECTIONS
+        self.embedding_cache = EmbeddingCache(
+            model=EMBEDDING_MODEL,
+            max_entries=settings.EMBEDDING_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.EMBEDDING_CACHE_TTL_SECONDS,
+            redis_url=settings.REDIS_URL
+        )
+        self.embedding_batcher = EmbeddingBatcher(
+            self._create_embeddings,
+            max_batch_size=settings.EMBEDDING_BATCH_SIZE,
+            max_wait_ms=settings.EMBEDDING_BATCH_WAIT_MS
+        )
+        self.tier_performance = TierPerformanceAggregate(
+            half_life_seconds=settings.TIER_PERFORMANCE_HALF_LIFE_SECONDS,
+            redis_url=settings.REDIS_URL
+        )
         
     async def initialize_collections(self):
         """Create Qdrant collections if they don't exist with optimized payload indexing"""
@@ -156,15 +186,18 @@ class VectorMemoryService:
             ]
         }
         
+        # List existing collections once rather than per collection
+        collections = await self.qdrant.get_collections()
+        existing_collections = {c.name for c in collections.collections}
+        
         for name, collection_name in self.collections.items():
             try:
                 # Check if collection exists
-                collections = self.qdrant.get_collections()
-                collection_exists = any(c.name == collection_name for c in collections.collections)
+                collection_exists = collection_name in existing_collections
                 
                 if not collection_exists:
                     # Create collection
-                    self.qdrant.create_collection(
+                    await self.qdrant.create_collection(
                         collection_name=collection_name,
                         vectors_config=VectorParams(
                             size=VECTOR_DIM,
@@ -179,7 +212,7 @@ class VectorMemoryService:
                 if name in collection_indexes:
                     for field_name, field_type in collection_indexes[name]:
                         try:
-                            self.qdrant.create_payload_index(
+                            await self.qdrant.create_payload_index(
                                 collection_name=collection_name,
                                 field_name=field_name,
                                 field_schema=field_type
@@ -193,26 +226,45 @@ class VectorMemoryService:
                 logger.error(f"Error initializing collection {collection_name}: {e}")
                 raise
     
+    async def _create_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Call OpenAI or Azure OpenAI with a multi-input embeddings request"""
+        response = await self.openai.embeddings.create(
+            model=EMBEDDING_MODEL,
+            input=texts
+        )
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)]
+    
     async def get_embedding(self, text: str) -> List[float]:
-        """Get embedding vector for text using OpenAI or Azure OpenAI"""
+        """Get embedding vector for text, served from cache or a shared micro-batch"""
         try:
-            # Use deployment name for Azure or model name for OpenAI
-            if hasattr(settings, 'AZURE_OPENAI_ENDPOINT') and settings.AZURE_OPENAI_ENDPOINT:
-                # For Azure, use the deployment name from your Azure OpenAI resource
-                model = "text-embedding-ada-002"  # Your Azure deployment name
-            else:
-                # For OpenAI, use the model name
-                model = "text-embedding-ada-002"
-                
-            response = await self.openai.embeddings.create(
-                model=model,
-                input=text
-            )
-            return response.data[0].embedding
+            cached = await self.embedding_cache.get_many([text])
+            if text in cached:
+                return cached[text]
+            
+            embedding = await self.embedding_batcher.embed(text)
+            await self.embedding_cache.put_many({text: embedding})
+            return embedding
         except Exception as e:
             logger.error(f"Error getting embedding: {e}")
             raise
     
+    async def get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Get embedding vectors for many texts with a single request for the cache misses"""
+        try:
+            embeddings = await self.embedding_cache.get_many(texts)
+            missing = list(dict.fromkeys(t for t in texts if t not in embeddings))
+            
+            if missing:
+                vectors = await self.embedding_batcher.embed_many(missing)
+                new_embeddings = dict(zip(missing, vectors))
+                await self.embedding_cache.put_many(new_embeddings)
+                embeddings.update(new_embeddings)
+            
+            return [embeddings[t] for t in texts]
+        except Exception as e:
+            logger.error(f"Error getting embeddings: {e}")
+            raise
+    
     async def search_similar_requests(self, description: str, limit: int = 5, filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         """Search for similar past requests with optional filtering"""
         try:
@@ -235,7 +287,7 @@ class VectorMemoryService:
                     filter_conditions = Filter(must=must_conditions)
             
             # Search in executions collection with filters
-            search_result = self.qdrant.search(
+            search_result = await self.qdrant.search(
                 collection_name=self.collections["executions"],
                 query_vector=query_vector,
                 query_filter=filter_conditions,
@@ -265,6 +317,41 @@ class VectorMemoryService:
             logger.error(f"Error searching similar requests: {e}")
             return []
     
+    async def search_similar_executions(self, query: str, tenant_id: str, task_type: Optional[str] = None,
+                                        limit: int = 3, similarity_threshold: float = 0.7) -> List[Dict[str, Any]]:
+        """Search one tenant's past task executions"""
+        try:
+            query_vector = await self.get_embedding(query)
+            
+            must_conditions = [FieldCondition(key="tenant_id", match=MatchValue(value=tenant_id))]
+            if task_type:
+                must_conditions.append(FieldCondition(key="task.type", match=MatchValue(value=task_type)))
+            filter_conditions = Filter(must=must_conditions)
+            
+            search_result = await self.qdrant.search(
+                collection_name=self.collections["executions"],
+                query_vector=query_vector,
+                query_filter=filter_conditions,
+                limit=limit,
+                with_payload=True,
+                score_threshold=similarity_threshold
+            )
+            
+            return [
+                {
+                    "id": point.id,
+                    "similarity": point.score,
+                    "task": point.payload.get("task", {}),
+                    "result": point.payload.get("result", {}),
+                    "created_at": point.payload.get("created_at")
+                }
+                for point in search_result
+            ]
+            
+        except Exception as e:
+            logger.error(f"Error searching similar executions: {e}")
+            return []
+    
     async def search_code_patterns(self, query: str, limit: int = 5, language: Optional[str] = None, min_success_rate: Optional[float] = None) -> List[Dict[str, Any]]:
         """Search for similar code patterns with language and quality filtering"""
         try:
@@ -289,7 +376,7 @@ class VectorMemoryService:
             
             filter_conditions = Filter(must=must_conditions) if must_conditions else None
             
-            search_result = self.qdrant.search(
+            search_result = await self.qdrant.search(
                 collection_name=self.collections["code_patterns"],
                 query_vector=query_vector,
                 query_filter=filter_conditions,
@@ -348,7 +435,7 @@ class VectorMemoryService:
                 }
             )
             
-            self.qdrant.upsert(
+            await self.qdrant.upsert(
                 collection_name=self.collections["executions"],
                 points=[point]
             )
@@ -360,88 +447,78 @@ class VectorMemoryService:
             raise
     
     async def get_task_performance(self, task_type: str, complexity: str) -> Optional[Dict[str, Any]]:
-        """Get historical performance data for task type"""
+        """Get historical performance data for task type from the tier aggregate"""
         try:
-            # Search for similar tasks
-            query = f"task_type:{task_type} complexity:{complexity}"
-            
-            result = self.qdrant.scroll(
-                collection_name=self.collections["agent_decisions"],
-                scroll_filter=Filter(
-                    must=[
-                        FieldCondition(
-                            key="task_type",
-                            match=MatchValue(value=task_type)
-                        ),
-                        FieldCondition(
-                            key="complexity",
-                            match=MatchValue(value=complexity)
-                        )
-                    ]
-                ),
-                limit=100,
-                with_payload=True
-            )
-            
-            if not result[0]:
-                return None
-            
-            # Aggregate performance data
-            performances = []
-            for point in result[0]:
-                payload = point.payload
-                performances.append({
-                    "tier": payload.get("agent_tier"),
-                    "success": payload.get("success", False),
-                    "execution_time": payload.get("execution_time", 0)
-                })
-            
-            # Calculate best tier
-            tier_stats = {}
-            for perf in performances:
-                tier = perf["tier"]
-                if tier not in tier_stats:
-                    tier_stats[tier] = {"success_count": 0, "total_count": 0, "total_time": 0}
-                
-                tier_stats[tier]["total_count"] += 1
-                if perf["success"]:
-                    tier_stats[tier]["success_count"] += 1
-                tier_stats[tier]["total_time"] += perf["execution_time"]
-            
-            # Find optimal tier
-            best_tier = None
-            best_success_rate = 0
-            
-            for tier, stats in tier_stats.items():
-                success_rate = stats["success_count"] / stats["total_count"]
-                if success_rate > best_success_rate:
-                    best_success_rate = success_rate
-                    best_tier = tier
-            
-            return {
-                "optimal_tier": best_tier,
-                "success_rate": best_success_rate,
-                "sample_size": len(performances),
-                "tier_stats": tier_stats
-            }
+            await self._ensure_tier_performance(task_type, complexity)
+            return self.tier_performance.get(task_type, complexity)
             
         except Exception as e:
             logger.error(f"Error getting task performance: {e}")
             return None
     
+    async def _ensure_tier_performance(self, task_type: str, complexity: str):
+        """Make the aggregate for a key current, seeding it on first use"""
+        if not self.tier_performance.is_loaded(task_type, complexity):
+            if not await self.tier_performance.load(task_type, complexity):
+                await self._seed_tier_performance(task_type, complexity)
+    
+    async def _seed_tier_performance(self, task_type: str, complexity: str):
+        """Build the aggregate for a key from stored agent decisions (once per key)"""
+        if not await self.tier_performance.claim_seed(task_type, complexity):
+            # Another replica is seeding it; serve what it has stored so far
+            if not await self.tier_performance.load(task_type, complexity):
+                self.tier_performance.mark_loaded(task_type, complexity)
+            return
+        
+        result = await self.qdrant.scroll(
+            collection_name=self.collections["agent_decisions"],
+            scroll_filter=Filter(
+                must=[
+                    FieldCondition(
+                        key="task_type",
+                        match=MatchValue(value=task_type)
+                    ),
+                    FieldCondition(
+                        key="complexity",
+                        match=MatchValue(value=complexity)
+                    )
+                ]
+            ),
+            limit=100,
+            with_payload=True
+        )
+        
+        self.tier_performance.mark_loaded(task_type, complexity)
+        for point in result[0]:
+            payload = point.payload
+            tier = payload.get("agent_tier") or payload.get("tier")
+            if not tier:
+                continue
+            if "success" in payload:
+                success = bool(payload["success"])
+                execution_time = payload.get("execution_time", 0)
+            elif payload.get("last_success") is not None:
+                success = bool(payload["last_success"])
+                execution_time = payload.get("last_execution_time") or 0
+            else:
+                continue
+            self.tier_performance.record(task_type, complexity, tier, success, execution_time)
+        
+        await self.tier_performance.persist(task_type, complexity)
+    
     async def store_capsule(self, capsule: QLCapsule):
         """Store a QLCapsule with its code patterns"""
         try:
-            # Store each code file as a pattern
-            for filename, code in capsule.source_code.items():
-                # Create description
-                description = f"Code from {filename} for request: {capsule.request_id}"
-                
-                # Get embedding
-                embedding = await self.get_embedding(f"{description}\n\n{code}")
-                
-                # Store as code pattern
-                point = PointStruct(
+            # Store each code file as a pattern, embedding all files in one request
+            files = list(capsule.source_code.items())
+            descriptions = [f"Code from {filename} for request: {capsule.request_id}" for filename, _ in files]
+            embeddings = await self.get_embeddings(
+                [f"{description}\n\n{code}" for description, (_, code) in zip(descriptions, files)]
+            )
+            
+            score = capsule.validation_report.confidence_score if capsule.validation_report and capsule.validation_report.confidence_score is not None else 0.5
+            points = [
+                PointStruct(
                     id=str(uuid4()),
                     vector=embedding,
                     payload={
@@ -451,16 +528,19 @@ class VectorMemoryService:
                         "description": description,
                         "code": code,
                         "language": self._detect_language(filename),
-                        "validation_score": capsule.validation_report.confidence_score if capsule.validation_report and capsule.validation_report.confidence_score is not None else 0.5,
+                        "validation_score": score,
                         "created_at": capsule.created_at,
                         "usage_count": 0,
-                        "success_rate": capsule.validation_report.confidence_score if capsule.validation_report and capsule.validation_report.confidence_score is not None else 0.5
+                        "success_rate": score
                     }
                 )
-                
-                self.qdrant.upsert(
+                for (filename, code), description, embedding in zip(files, descriptions, embeddings)
+            ]
+            
+            if points:
+                await self.qdrant.upsert(
                     collection_name=self.collections["code_patterns"],
-                    points=[point]
+                    points=points
                 )
             
             logger.info(f"Stored capsule {capsule.id} with {len(capsule.source_code)} code patterns")
@@ -476,6 +556,12 @@ class VectorMemoryService:
             text = f"Agent {metrics.tier} for {metrics.task_type}: success_rate={metrics.success_rate}"
             embedding = await self.get_embedding(text)
             
+            # Seed the tier aggregate before this execution is stored, so seeding
+            # does not count it a second time
+            fold = metrics.complexity and metrics.last_success is not None
+            if fold:
+                await self._ensure_tier_performance(metrics.task_type, metrics.complexity)
+            
             # Store metrics
             point = PointStruct(
                 id=str(uuid4()),
@@ -487,15 +573,29 @@ class VectorMemoryService:
                     "success_rate": metrics.success_rate,
                     "average_execution_time": metrics.average_execution_time,
                     "total_executions": metrics.total_executions,
-                    "last_updated": metrics.last_updated
+                    "last_updated": metrics.last_updated,
+                    "complexity": metrics.complexity,
+                    "last_success": metrics.last_success,
+                    "last_execution_time": metrics.last_execution_time
                 }
             )
             
-            self.qdrant.upsert(
+            await self.qdrant.upsert(
                 collection_name=self.collections["agent_decisions"],
                 points=[point]
             )
             
+            # Fold this execution into the tier aggregate
+            if fold:
+                self.tier_performance.record(
+                    metrics.task_type,
+                    metrics.complexity,
+                    metrics.tier.value,
+                    metrics.last_success,
+                    metrics.last_execution_time or 0.0
+                )
+                await self.tier_performance.persist(metrics.task_type, metrics.complexity)
+            
             logger.info(f"Stored metrics for agent {metrics.agent_id}")
             
         except Exception as e:
@@ -527,7 +627,7 @@ Stack Trace: {error_context.get('stack_trace', '')[:500]}
                 }
             )
             
-            self.qdrant.upsert(
+            await self.qdrant.upsert(
                 collection_name=self.collections["error_patterns"],
                 points=[point]
             )
@@ -539,26 +639,7 @@ Stack Trace: {error_context.get('stack_trace', '')[:500]}
     
     def _detect_language(self, filename: str) -> str:
         """Detect programming language from filename"""
-        extension_map = {
-            '.py': 'python',
-            '.js': 'javascript',
-            '.ts': 'typescript',
-            '.go': 'go',
-            '.java': 'java',
-            '.cpp': 'cpp',
-            '.c': 'c',
-            '.rs': 'rust',
-            '.rb': 'ruby',
-            '.php': 'php',
-            '.swift': 'swift',
-            '.kt': 'kotlin'
-        }
-        
-        for ext, lang in extension_map.items():
-            if filename.endswith(ext):
-                return lang
-        
-        return 'unknown'
+        return language_for_path(filename) or 'unknown'
     
     async def optimize_collections(self):
         """Optimize existing collections by updating configuration and indexes"""
@@ -575,14 +656,14 @@ Stack Trace: {error_context.get('stack_trace', '')[:500]}
         for name, collection_name in self.collections.items():
             try:
                 # Update collection configuration
-                self.qdrant.update_collection(
+                await self.qdrant.update_collection(
                     collection_name=collection_name,
                     optimizer_config=optimizers_config
                 )
                 logger.info(f"Updated optimizer config for {collection_name}")
                 
                 # Force re-indexing if needed
-                collection_info = self.qdrant.get_collection(collection_name)
+                collection_info = await self.qdrant.get_collection(collection_name)
                 if collection_info.points_count > 1000:
                     # Recreate indexes to ensure optimization
                     logger.info(f"Re-indexing {collection_name} with {collection_info.points_count} points")
@@ -597,10 +678,19 @@ Stack Trace: {error_context.get('stack_trace', '')[:500]}
             successful_ids = []
             failed_patterns = []
             
-            # Process patterns in parallel for embedding generation
-            import asyncio
+            embedding_texts = [
+                f"{p.get('description', '')}\n\n{p.get('code', '')}" for p in patterns
+            ]
+            
+            # Embed every pattern in one batched request; fall back to per-pattern
+            # embedding so one bad input does not fail the whole batch
+            try:
+                batch_embeddings = await self.get_embeddings(embedding_texts)
+            except Exception as e:
+                logger.warning(f"Batched embedding failed, embedding patterns individually: {e}")
+                batch_embeddings = None
             
-            async def process_pattern(pattern):
+            async def process_pattern(pattern, embedding_text, embedding):
                 try:
                     # Extract data
                     code = pattern.get("code", "")
@@ -608,9 +698,8 @@ Stack Trace: {error_context.get('stack_trace', '')[:500]}
                     language = pattern.get("language", "python")
                     metadata = pattern.get("metadata", {})
                     
-                    # Generate embedding
-                    embedding_text = f"{description}\n\n{code}"
-                    embedding = await self.get_embedding(embedding_text)
+                    if embedding is None:
+                        embedding = await self.get_embedding(embedding_text)
                     
                     # Create point
                     point_id = str(uuid4())
@@ -632,8 +721,11 @@ Stack Trace: {error_context.get('stack_trace', '')[:500]}
                 except Exception as e:
                     return None, None, {"pattern": pattern, "error": str(e)}
             
-            # Process all patterns concurrently
-            tasks = [process_pattern(p) for p in patterns]
+            # Build points, embedding any leftovers concurrently
+            tasks = [
+                process_pattern(p, text, batch_embeddings[i] if batch_embeddings else None)
+                for i, (p, text) in enumerate(zip(patterns, embedding_texts))
+            ]
             results = await asyncio.gather(*tasks)
             
             # Collect successful points and failures
@@ -646,7 +738,7 @@ Stack Trace: {error_context.get('stack_trace', '')[:500]}
             
             # Batch insert successful points
             if points:
-                self.qdrant.upsert(
+                await self.qdrant.upsert(
                     collection_name=self.collections["code_patterns"],
                     points=points,
                     wait=True  # Wait for operation to complete
@@ -667,9 +759,8 @@ Stack Trace: {error_context.get('stack_trace', '')[:500]}
     async def batch_search_patterns(self, queries: List[str], limit: int = 5) -> List[List[Dict[str, Any]]]:
         """Batch search for multiple queries efficiently"""
         try:
-            # Generate embeddings for all queries in parallel
-            tasks = [self.get_embedding(q) for q in queries]
-            query_vectors = await asyncio.gather(*tasks)
+            # Generate embeddings for all queries in one request
+            query_vectors = await self.get_embeddings(queries)
             
             # Perform batch search
             from qdrant_client.models import SearchRequest
@@ -685,7 +776,7 @@ Stack Trace: {error_context.get('stack_trace', '')[:500]}
             ]
             
             # Execute batch search
-            batch_results = self.qdrant.search_batch(
+            batch_results = await self.qdrant.search_batch(
                 collection_name=self.collections["code_patterns"],
                 requests=search_requests
             )
@@ -732,7 +823,7 @@ Stack Trace: {error_context.get('stack_trace', '')[:500]}
                     
                     if "increment_usage" in update:
                         # For incrementing usage, we need to fetch current value
-                        points = self.qdrant.retrieve(
+                        points = await self.qdrant.retrieve(
                             collection_name=self.collections["code_patterns"],
                             ids=[point_id],
                             with_payload=True
@@ -749,7 +840,7 @@ Stack Trace: {error_context.get('stack_trace', '')[:500]}
                     
                     # Apply updates
                     if payload_updates:
-                        self.qdrant.set_payload(
+                        await self.qdrant.set_payload(
                             collection_name=self.collections["code_patterns"],
                             payload=payload_updates,
                             points=[point_id]
@@ -781,6 +872,12 @@ async def startup_event():
     await memory_service.initialize_collections()
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release pooled Qdrant connections"""
+    await memory_service.qdrant.close()
+
+
 @app.post("/search/requests")
 async def search_requests(query: Dict[str, Any]):
     """Search for similar past requests with optional filtering"""
@@ -792,6 +889,23 @@ async def search_requests(query: Dict[str, Any]):
     return results
 
 
+@app.post("/search/similar")
+async def search_similar(query: Dict[str, Any]):
+    """Search for similar past task executions of one tenant"""
+    tenant_id = query.get("tenant_id")
+    if not tenant_id:
+        raise HTTPException(status_code=400, detail="tenant_id is required")
+    
+    results = await memory_service.search_similar_executions(
+        query.get("query", ""),
+        tenant_id,
+        task_type=query.get("task_type"),
+        limit=query.get("limit", 3),
+        similarity_threshold=query.get("similarity_threshold", 0.7)
+    )
+    return {"results": results}
+
+
 @app.post("/search/code")
 async def search_code(query: Dict[str, Any]):
     """Search for similar code patterns with filtering"""
@@ -863,7 +977,7 @@ async def health_check():
     """Health check endpoint"""
     try:
         # Check Qdrant connection
-        collections = memory_service.qdrant.get_collections()
+        collections = await memory_service.qdrant.get_collections()
         return {
             "status": "healthy",
             "service": "vector-memory",
@@ -884,13 +998,18 @@ async def get_stats():
     try:
         stats = {}
         for name, collection_name in COLLECTIONS.items():
-            collection_info = memory_service.qdrant.get_collection(collection_name)
+            collection_info = await memory_service.qdrant.get_collection(collection_name)
             stats[name] = {
                 "vectors_count": collection_info.vectors_count,
                 "points_count": collection_info.points_count
             }
         
-        return {"status": "success", "stats": stats}
+        return {
+            "status": "success",
+            "stats": stats,
+            "embedding_cache": memory_service.embedding_cache.get_stats(),
+            "embedding_batcher": memory_service.embedding_batcher.get_stats()
+        }
         
     except Exception as e:
         logger.error(f"Error getting stats: {e}")
@@ -950,7 +1069,7 @@ async def store_code_pattern(pattern: Dict[str, Any]):
             }
         )
         
-        memory_service.qdrant.upsert(
+        await memory_service.qdrant.upsert(
             collection_name=COLLECTIONS["code_patterns"],
             points=[point]
         )
@@ -997,7 +1116,7 @@ async def store_execution_pattern(data: Dict[str, Any]):
             }
         )
         
-        memory_service.qdrant.upsert(
+        await memory_service.qdrant.upsert(
             collection_name=COLLECTIONS["executions"],
             points=[point]
         )
@@ -1034,7 +1153,7 @@ async def store_validation_pattern(data: Dict[str, Any]):
             }
         )
         
-        memory_service.qdrant.upsert(
+        await memory_service.qdrant.upsert(
             collection_name=COLLECTIONS["agent_decisions"],
             points=[point]
         )
@@ -1072,7 +1191,7 @@ async def store_capsule_pattern(data: Dict[str, Any]):
             }
         )
         
-        memory_service.qdrant.upsert(
+        await memory_service.qdrant.upsert(
             collection_name=COLLECTIONS["executions"],
             points=[point]
         )
@@ -1205,7 +1324,7 @@ async def get_indexes():
         for name, collection_name in COLLECTIONS.items():
             try:
                 # Get collection info
-                collection = memory_service.qdrant.get_collection(collection_name)
+                collection = await memory_service.qdrant.get_collection(collection_name)
                 
                 # Note: Qdrant doesn't expose index details via API
                 # This is a placeholder for index information
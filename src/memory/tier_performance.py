@@ -0,0 +1,233 @@
+"""
+Incrementally maintained tier performance aggregates
+
+Keeps decayed execution counts, success counts and latency sums per
+(task_type, complexity, tier) so tier selection is an O(1) lookup instead of a
+Qdrant scroll. Aggregates live in process memory in front of a Redis tier
+shared by all vector memory replicas: each replica adds its executions to
+Redis with an atomic decay-and-add script, and re-reads a key once its copy
+is older than ``reload_seconds``.
+"""
+
+import math
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import structlog
+
+logger = structlog.get_logger()
+
+# Relative cost per tier, used by the worker to trade success rate against cost
+TIER_RELATIVE_COST = {"T0": 0.1, "T1": 0.3, "T2": 0.6, "T3": 1.0}
+
+COUNTERS = ("count", "successes", "latency_sum", "updated_at")
+
+# Set by the replica that seeds a key from stored agent decisions
+SEED_FIELD = "_seeded"
+
+# Decay one tier's counters to ARGV[1] and add a batch of executions, atomically,
+# so replicas recording at the same time never overwrite each other's counts.
+# Counters are stored as "<tier>:<counter>" fields.
+RECORD_SCRIPT = """
+local now = tonumber(ARGV[1])
+local half_life = tonumber(ARGV[2])
+local tier = ARGV[3]
+local state = redis.call('HMGET', KEYS[1], tier .. ':count', tier .. ':successes',
+                         tier .. ':latency_sum', tier .. ':updated_at')
+local count = tonumber(state[1]) or 0
+local successes = tonumber(state[2]) or 0
+local latency_sum = tonumber(state[3]) or 0
+local updated_at = tonumber(state[4])
+if updated_at and half_life > 0 and now > updated_at then
+  local factor = math.pow(0.5, (now - updated_at) / half_life)
+  count = count * factor
+  successes = successes * factor
+  latency_sum = latency_sum * factor
+end
+if updated_at and updated_at > now then
+  now = updated_at
+end
+count = count + tonumber(ARGV[5])
+successes = successes + tonumber(ARGV[4])
+latency_sum = latency_sum + tonumber(ARGV[6])
+local values = {tostring(count), tostring(successes), tostring(latency_sum), tostring(now)}
+redis.call('HSET', KEYS[1], tier .. ':count', values[1], tier .. ':successes', values[2],
+           tier .. ':latency_sum', values[3], tier .. ':updated_at', values[4])
+return values
+"""
+
+
+@dataclass
+class TierStats:
+    """Decayed counters for one (task_type, complexity, tier)"""
+    count: float = 0.0
+    successes: float = 0.0
+    latency_sum: float = 0.0
+    updated_at: Optional[float] = None
+
+    def decay(self, now: float, half_life: float):
+        """Scale counters down by the time elapsed since the last update"""
+        if self.updated_at is not None and half_life > 0 and now > self.updated_at:
+            factor = math.pow(0.5, (now - self.updated_at) / half_life)
+            self.count *= factor
+            self.successes *= factor
+            self.latency_sum *= factor
+        self.updated_at = now
+
+    def to_dict(self, tier: str) -> Dict[str, Any]:
+        count = self.count or 1.0
+        return {
+            "success_rate": self.successes / count if self.count else 0.0,
+            "avg_execution_time": self.latency_sum / count if self.count else 0.0,
+            "relative_cost": TIER_RELATIVE_COST.get(tier, 1.0),
+            "samples": round(self.count, 3)
+        }
+
+
+class TierPerformanceAggregate:
+    """Time-decayed success/latency aggregates keyed by (task_type, complexity)"""
+
+    def __init__(self, half_life_seconds: float = 7 * 24 * 3600, redis_url: Optional[str] = None,
+                 reload_seconds: float = 30.0):
+        self.half_life = half_life_seconds
+        self.reload_seconds = reload_seconds
+        self._stats: Dict[Tuple[str, str], Dict[str, TierStats]] = {}
+        self._loaded_at: Dict[Tuple[str, str], float] = {}
+        # Executions recorded locally and not yet added to Redis, per key and tier
+        self._pending: Dict[Tuple[str, str], Dict[str, List[float]]] = {}
+        self._redis = None
+
+        if redis_url:
+            try:
+                import redis.asyncio as redis
+                self._redis = redis.from_url(redis_url, decode_responses=True)
+            except Exception as e:
+                logger.warning(f"Tier performance aggregate running without Redis: {e}")
+
+    @staticmethod
+    def _redis_key(task_type: str, complexity: str) -> str:
+        return f"qlp:tier_performance:{task_type}:{complexity}"
+
+    def is_loaded(self, task_type: str, complexity: str) -> bool:
+        """True while the local copy of a key is fresh enough to serve"""
+        key = (task_type, complexity)
+        if key not in self._stats:
+            return False
+        if self._redis is None:
+            return True
+        return time.monotonic() - self._loaded_at.get(key, 0.0) < self.reload_seconds
+
+    def record(self, task_type: str, complexity: str, tier: str, success: bool,
+               execution_time: float, samples: float = 1.0, now: Optional[float] = None):
+        """Fold one or more executions into the aggregate"""
+        self.record_batch(task_type, complexity, tier, successes=samples if success else 0.0,
+                          total=samples, latency_sum=execution_time * samples, now=now)
+
+    def record_batch(self, task_type: str, complexity: str, tier: str, successes: float,
+                     total: float, latency_sum: float, now: Optional[float] = None):
+        now = time.time() if now is None else now
+        stats = self._stats.setdefault((task_type, complexity), {}).setdefault(tier, TierStats())
+        stats.decay(now, self.half_life)
+        stats.count += total
+        stats.successes += successes
+        stats.latency_sum += latency_sum
+
+        if self._redis is not None:
+            self._add_pending((task_type, complexity), tier, successes, total, latency_sum, now)
+
+    def _add_pending(self, key: Tuple[str, str], tier: str, successes: float, total: float,
+                     latency_sum: float, now: float):
+        pending = self._pending.setdefault(key, {}).setdefault(tier, [0.0, 0.0, 0.0, now])
+        pending[0] += successes
+        pending[1] += total
+        pending[2] += latency_sum
+        pending[3] = max(pending[3], now)
+
+    def mark_loaded(self, task_type: str, complexity: str):
+        """Remember that a key has been loaded even if it has no samples"""
+        self._stats.setdefault((task_type, complexity), {})
+        self._loaded_at[(task_type, complexity)] = time.monotonic()
+
+    def get(self, task_type: str, complexity: str, now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Current performance for a key, or None when nothing has been recorded"""
+        tiers = self._stats.get((task_type, complexity))
+        if not tiers:
+            return None
+
+        now = time.time() if now is None else now
+        tier_performance = {}
+        for tier, stats in tiers.items():
+            stats.decay(now, self.half_life)
+            tier_performance[tier] = stats.to_dict(tier)
+
+        optimal_tier, best = max(tier_performance.items(), key=lambda item: item[1]["success_rate"])
+        return {
+            "optimal_tier": optimal_tier,
+            "success_rate": best["success_rate"],
+            "sample_size": round(sum(s.count for s in tiers.values()), 3),
+            "tier_performance": tier_performance,
+            "tier_stats": {
+                tier: {
+                    "success_count": round(stats.successes, 3),
+                    "total_count": round(stats.count, 3),
+                    "total_time": round(stats.latency_sum, 3)
+                }
+                for tier, stats in tiers.items()
+            }
+        }
+
+    async def load(self, task_type: str, complexity: str) -> bool:
+        """Load a key from Redis into memory; returns True once the key has been seeded"""
+        if self._redis is None:
+            return False
+        try:
+            raw = await self._redis.hgetall(self._redis_key(task_type, complexity))
+        except Exception as e:
+            logger.warning(f"Tier performance Redis load failed: {e}")
+            return False
+        # Executions can be added before the key is seeded; only the seed marker
+        # says the stored history has been folded in
+        if SEED_FIELD not in raw:
+            return False
+
+        tiers: Dict[str, TierStats] = {}
+        for field, value in raw.items():
+            tier, _, counter = field.partition(":")
+            if counter in COUNTERS:
+                setattr(tiers.setdefault(tier, TierStats()), counter, float(value))
+        self._stats[(task_type, complexity)] = tiers
+        self._loaded_at[(task_type, complexity)] = time.monotonic()
+        return True
+
+    async def claim_seed(self, task_type: str, complexity: str) -> bool:
+        """Claim seeding a key that Redis does not have yet; False when another replica has"""
+        if self._redis is None:
+            return True
+        try:
+            return bool(await self._redis.hsetnx(self._redis_key(task_type, complexity), SEED_FIELD, "1"))
+        except Exception as e:
+            logger.warning(f"Tier performance Redis seed claim failed: {e}")
+            return True
+
+    async def persist(self, task_type: str, complexity: str):
+        """Add the executions recorded since the last persist to the shared counters in Redis"""
+        pending = self._pending.pop((task_type, complexity), None)
+        if self._redis is None or not pending:
+            return
+
+        key = self._redis_key(task_type, complexity)
+        tiers = self._stats.setdefault((task_type, complexity), {})
+        for tier, (successes, total, latency_sum, now) in pending.items():
+            try:
+                values = await self._redis.eval(
+                    RECORD_SCRIPT, 1, key, now, self.half_life, tier, successes, total, latency_sum
+                )
+            except Exception as e:
+                logger.warning(f"Tier performance Redis store failed: {e}")
+                # Kept for the next persist
+                self._add_pending((task_type, complexity), tier, successes, total, latency_sum, now)
+                continue
+            # Redis now holds every replica's executions for this tier
+            count, successes, latency_sum, updated_at = (float(v) for v in values)
+            tiers[tier] = TierStats(count=count, successes=successes, latency_sum=latency_sum, updated_at=updated_at)
@@ -5,6 +5,8 @@ Content moderation module for HAP detection
 from .hap_service import (
     hap_service,
     check_content,
+    check_content_batch,
+    screening_record,
     HAPCheckRequest,
     HAPCheckResult,
     Severity,
@@ -15,6 +17,8 @@ from .hap_service import (
 __all__ = [
     "hap_service",
     "check_content", 
+    "check_content_batch",
+    "screening_record",
     "HAPCheckRequest",
     "HAPCheckResult",
     "Severity",
@@ -5,13 +5,14 @@ Provides content moderation capabilities for the QuantumLayer Platform.
 """
 
 import re
+import json
 import hashlib
 import asyncio
 from typing import Dict, List, Optional, Set, Tuple, Any
 from datetime import datetime, timedelta
 from enum import Enum
 import unicodedata
-from collections import defaultdict
+from collections import OrderedDict, defaultdict
 
 import httpx
 from pydantic import BaseModel, Field
@@ -97,15 +98,147 @@ class HAPCheckResult(BaseModel):
     processing_time_ms: float = 0.0
 
 
+# Rule patterns per category, tried in order; the first one that matches decides
+# how the category is scored. Each is an alternation of lowercase terms matched as
+# whole words
+RULE_PATTERNS: Dict[Category, List[str]] = {
+    Category.HATE_SPEECH: [
+        # Racial slurs (simplified for example)
+        r'racist|discrimination|slur',
+    ],
+    Category.ABUSE: [
+        # Threats and harassment
+        r'kill|hurt|harm|threat|die',
+        r'doxx|dox|address|personal\s+info',
+    ],
+    Category.PROFANITY: [
+        # Common profanity patterns (including censored versions)
+        r'f[*@#u]ck|sh[*@#i]t|b[*@#i]tch',
+        r'stupid|idiot|dumb',  # Mild insults
+    ],
+    Category.VIOLENCE: [
+        r'violence|assault|attack|weapon',
+    ],
+    Category.SELF_HARM: [
+        r'suicide|self[\s-]?harm|cut\s+myself',
+    ]
+}
+
+# Known profanity, matched against whitespace-separated words
+# In production, load from file or database
+PROFANITY_TERMS = frozenset({
+    "damn", "hell", "crap", "bastard",  # Mild
+    "stupid", "idiot", "dumb", "moron",  # Insults
+})
+
+# Words that on their own mark text as technical
+TECHNICAL_TERMS = frozenset({
+    # Programming constructs
+    "process", "thread", "service", "daemon", "worker", "job", "task",
+    "command", "bash", "shell", "terminal", "cli", "cmd", "powershell",
+    "function", "method", "class", "module", "package", "library",
+    "variable", "parameter", "argument", "config", "setting",
+    "error", "exception", "debug", "log", "trace", "stack",
+    "server", "client", "api", "endpoint", "request", "response",
+    "database", "query", "table", "index", "schema",
+    "git", "commit", "branch", "merge", "pull", "push",
+
+    # E-commerce and business terms
+    "review", "moderation", "workflow", "compliance", "pci",
+    "cart", "checkout", "payment", "order", "inventory",
+    "product", "catalog", "category", "analytics", "dashboard",
+    "admin", "customer", "user", "management", "interface",
+    "caching", "monitoring", "logging",
+    "microservice", "architecture", "backend", "frontend",
+})
+
+# Other technical indicators, matched against lowercased text
+TECHNICAL_PATTERNS = [
+    r'\brate.?limit\b',
+
+    # Code syntax patterns
+    r'[a-z_]\w*\s*\(',  # Function calls
+    r'{\s*["\']?\w+["\']?\s*:',  # JSON/dict syntax
+    r'\[\s*\d+\s*\]',  # Array indexing
+    r'->\s*\w+',  # Arrow functions/pointers
+    r'::\w+',  # Scope resolution
+    r'\$\w+',  # Variables (bash, PHP, etc)
+    r'#include|import|require|use',  # Import statements
+
+    # Command line patterns
+    r'^\s*\$\s+',  # Shell prompt
+    r'^\s*>\s+',  # Command prompt
+    r'sudo\s+',  # Admin commands
+    r'\s+-+\w+',  # Command flags
+    r'\|\s*\w+',  # Pipe commands
+
+    # File paths and extensions
+    r'/\w+/\w+',  # Unix paths
+    r'\\\w+\\\w+',  # Windows paths
+    r'\.\w{1,4}$',  # File extensions
+    r'\.(py|js|java|cpp|go|rs|rb|php|sh|yaml|json|xml|html|css)$'
+]
+
+# (category, compiled rule) for every rule, in the order rules are tried
+RULES: List[Tuple[Category, re.Pattern]] = [
+    (category, re.compile(rf'\b(?:{pattern})\b'))
+    for category, patterns in RULE_PATTERNS.items()
+    for pattern in patterns
+]
+
+# Every rule folded into one alternation, so a single scan of lowercased text finds
+# the hits of all categories. The lookahead keeps matches zero-width, so overlapping
+# hits such as 'harm' inside 'self-harm' are all reported. Which rule a hit belongs
+# to is only worked out for the (rare) hits themselves.
+RULE_MATCHER = re.compile(
+    r'\b(?=(' + '|'.join(p for patterns in RULE_PATTERNS.values() for p in patterns) + r')\b)'
+)
+TECHNICAL_MATCHER = re.compile(
+    '|'.join(f'(?:{pattern})' for pattern in TECHNICAL_PATTERNS),
+    re.MULTILINE
+)
+WORD = re.compile(r'\w+')
+CODE_COMMENT_LINE = re.compile(r'^\s*(//|#|/\*|\*|--)')
+REPEATED_CHARS = re.compile(r'(.)\1{2,}')
+LEET_TABLE = str.maketrans({
+    '@': 'a', '4': 'a', '3': 'e', '1': 'i', '0': 'o',
+    '5': 's', '7': 't', '+': 't', '$': 's'
+})
+
+
+def scan_rules(text: str) -> Dict[int, str]:
+    """First hit of each rule (by index into RULES) in one pass over lowercased text"""
+    hits: Dict[int, str] = {}
+    seen: Set[str] = set()
+    for match in RULE_MATCHER.finditer(text):
+        word = match.group(1)
+        if word in seen:
+            continue
+        seen.add(word)
+        for index, (_, rule) in enumerate(RULES):
+            if rule.fullmatch(word):
+                hits.setdefault(index, word)
+                break
+    return hits
+
+
+def content_digest(content: str) -> str:
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
 class HAPService:
     """Main HAP detection service"""
     
+    # Results kept in process, in front of Redis
+    memo_size = 1024
+    
     def __init__(self):
         self.redis_client = None
         self.db_engine = None
         self.ml_pipeline = None
-        self.rule_patterns = self._load_rule_patterns()
-        self.profanity_list = self._load_profanity_list()
+        self.rule_patterns = RULES
+        self.profanity_list = PROFANITY_TERMS
+        self._memo: "OrderedDict[str, HAPCheckResult]" = OrderedDict()
         self.initialized = False
         
     async def initialize(self):
@@ -138,107 +271,25 @@ class HAPService:
         self.initialized = True
         logger.info("HAP service initialized")
     
-    def _load_rule_patterns(self) -> Dict[Category, List[re.Pattern]]:
-        """Load regex patterns for rule-based detection"""
-        patterns = {
-            Category.HATE_SPEECH: [
-                # Racial slurs (simplified for example)
-                re.compile(r'\b(racist|discrimination|slur)\b', re.IGNORECASE),
-            ],
-            Category.ABUSE: [
-                # Threats and harassment
-                re.compile(r'\b(kill|hurt|harm|threat|die)\b', re.IGNORECASE),
-                re.compile(r'\b(doxx|dox|address|personal\s+info)\b', re.IGNORECASE),
-            ],
-            Category.PROFANITY: [
-                # Common profanity patterns (including censored versions)
-                re.compile(r'\b(f[*@#u]ck|sh[*@#i]t|b[*@#i]tch)\b', re.IGNORECASE),
-                re.compile(r'\b(stupid|idiot|dumb)\b', re.IGNORECASE),  # Mild insults
-            ],
-            Category.VIOLENCE: [
-                re.compile(r'\b(violence|assault|attack|weapon)\b', re.IGNORECASE),
-            ],
-            Category.SELF_HARM: [
-                re.compile(r'\b(suicide|self[\s-]?harm|cut\s+myself)\b', re.IGNORECASE),
-            ]
-        }
-        return patterns
-    
-    def _load_profanity_list(self) -> Set[str]:
-        """Load list of known profanity"""
-        # In production, load from file or database
-        return {
-            "damn", "hell", "crap", "bastard",  # Mild
-            "stupid", "idiot", "dumb", "moron",  # Insults
-            # Add more as needed
-        }
-    
     def _normalize_text(self, text: str) -> str:
         """Normalize text for consistent checking"""
         # Remove unicode variations
         text = unicodedata.normalize('NFKD', text)
         
         # Convert leetspeak
-        leet_map = {
-            '@': 'a', '4': 'a', '3': 'e', '1': 'i', '0': 'o',
-            '5': 's', '7': 't', '+': 't', '$': 's'
-        }
-        for leet, normal in leet_map.items():
-            text = text.replace(leet, normal)
+        text = text.translate(LEET_TABLE)
         
         # Remove repeated characters
-        text = re.sub(r'(.)\1{2,}', r'\1\1', text)
+        text = REPEATED_CHARS.sub(r'\1\1', text)
         
         return text.lower().strip()
     
     def _is_technical_context(self, text: str) -> bool:
         """Detect if text is in technical/programming context"""
-        technical_indicators = [
-            # Programming constructs
-            r'\b(process|thread|service|daemon|worker|job|task)\b',
-            r'\b(command|bash|shell|terminal|cli|cmd|powershell)\b',
-            r'\b(function|method|class|module|package|library)\b',
-            r'\b(variable|parameter|argument|config|setting)\b',
-            r'\b(error|exception|debug|log|trace|stack)\b',
-            r'\b(server|client|api|endpoint|request|response)\b',
-            r'\b(database|query|table|index|schema)\b',
-            r'\b(git|commit|branch|merge|pull|push)\b',
-            
-            # E-commerce and business terms
-            r'\b(review|moderation|workflow|compliance|pci)\b',
-            r'\b(cart|checkout|payment|order|inventory)\b',
-            r'\b(product|catalog|category|analytics|dashboard)\b',
-            r'\b(admin|customer|user|management|interface)\b',
-            r'\b(rate.?limit|caching|monitoring|logging)\b',
-            r'\b(microservice|architecture|backend|frontend)\b',
-            
-            # Code syntax patterns
-            r'[a-zA-Z_]\w*\s*\(',  # Function calls
-            r'{\s*["\']?\w+["\']?\s*:',  # JSON/dict syntax
-            r'\[\s*\d+\s*\]',  # Array indexing
-            r'->\s*\w+',  # Arrow functions/pointers
-            r'::\w+',  # Scope resolution
-            r'\$\w+',  # Variables (bash, PHP, etc)
-            r'#include|import|require|use',  # Import statements
-            
-            # Command line patterns
-            r'^\s*\$\s+',  # Shell prompt
-            r'^\s*>\s+',  # Command prompt
-            r'sudo\s+',  # Admin commands
-            r'\s+-+\w+',  # Command flags
-            r'\|\s*\w+',  # Pipe commands
-            
-            # File paths and extensions
-            r'/\w+/\w+',  # Unix paths
-            r'\\\w+\\\w+',  # Windows paths
-            r'\.\w{1,4}$',  # File extensions
-            r'\.(py|js|java|cpp|go|rs|rb|php|sh|yaml|json|xml|html|css)$'
-        ]
-        
         # Check if any technical indicator is present
-        for pattern in technical_indicators:
-            if re.search(pattern, text, re.IGNORECASE | re.MULTILINE):
-                return True
+        lowered = text.lower()
+        if not TECHNICAL_TERMS.isdisjoint(WORD.findall(lowered)) or TECHNICAL_MATCHER.search(lowered):
+            return True
         
         # Check for code-like formatting
         lines = text.split('\n')
@@ -248,7 +299,7 @@ class HAPService:
             if line.startswith(('    ', '\t')):
                 code_line_count += 1
             # Comments
-            if re.match(r'^\s*(//|#|/\*|\*|--)', line):
+            if CODE_COMMENT_LINE.match(line):
                 code_line_count += 1
         
         # If more than 30% of lines look like code, it's technical
@@ -262,14 +313,44 @@ class HAPService:
         request: HAPCheckRequest
     ) -> HAPCheckResult:
         """Main content checking method"""
-        start_time = asyncio.get_event_loop().time()
-        
         # Check cache first
         cache_key = self._get_cache_key(request.content)
         cached_result = await self._get_cached_result(cache_key)
         if cached_result:
             return cached_result
         
+        result = await self._check_uncached(request)
+        
+        # Cache result
+        await self._cache_result(cache_key, result)
+        
+        return result
+    
+    async def check_content_batch(
+        self,
+        requests: List[HAPCheckRequest]
+    ) -> List[HAPCheckResult]:
+        """Check many items at once, e.g. every file of a capsule.
+        
+        The cache is read and written in one round trip each, and identical
+        content within the batch is only screened once.
+        """
+        cache_keys = [self._get_cache_key(request.content) for request in requests]
+        results = await self._get_cached_results(list(dict.fromkeys(cache_keys)))
+        
+        fresh: Dict[str, HAPCheckResult] = {}
+        for request, cache_key in zip(requests, cache_keys):
+            if cache_key not in results:
+                results[cache_key] = fresh[cache_key] = await self._check_uncached(request)
+        
+        await self._cache_results(fresh)
+        
+        return [results[cache_key] for cache_key in cache_keys]
+    
+    async def _check_uncached(self, request: HAPCheckRequest) -> HAPCheckResult:
+        """Run the checks for content that is not cached"""
+        start_time = asyncio.get_event_loop().time()
+        
         # Normalize content
         normalized = self._normalize_text(request.content)
         
@@ -279,7 +360,6 @@ class HAPService:
         # If critical severity, return immediately
         if rule_result.severity == Severity.CRITICAL:
             await self._log_violation(request, rule_result)
-            await self._cache_result(cache_key, rule_result)
             return rule_result
         
         # ML-based check for ambiguous cases
@@ -303,9 +383,6 @@ class HAPService:
         if rule_result.severity != Severity.CLEAN:
             await self._log_violation(request, rule_result)
         
-        # Cache result
-        await self._cache_result(cache_key, rule_result)
-        
         return rule_result
     
     async def _rule_based_check(
@@ -318,8 +395,19 @@ class HAPService:
         max_severity = Severity.CLEAN
         explanations = []
         
-        # Check if this is technical content
-        is_technical = self._is_technical_context(original)
+        # One scan of the normalized text finds the hits of every rule; the
+        # original is only scanned for rules the normalized text missed
+        hits = scan_rules(normalized)
+        lowered = original.lower()
+        if len(hits) < len(RULES) and lowered != normalized:
+            for index, word in scan_rules(lowered).items():
+                hits.setdefault(index, word)
+        
+        words = normalized.split()
+        profane_words = [w for w in words if w in self.profanity_list]
+        
+        # Check if this is technical content (only matters when something was found)
+        is_technical = bool(hits or profane_words) and self._is_technical_context(original)
         
         # Define technical term adjustments
         technical_adjustments = {
@@ -339,38 +427,37 @@ class HAPService:
         }
         
         # Check against patterns
-        for category, patterns in self.rule_patterns.items():
-            for pattern in patterns:
-                match = pattern.search(normalized) or pattern.search(original)
-                if match:
-                    # Extract the matched word
-                    matched_word = match.group(0).lower().strip()
-                    
-                    # Check if this is a technical term that should be adjusted
-                    if is_technical and matched_word in technical_adjustments:
-                        # Apply technical context severity
-                        adjusted_severity = technical_adjustments[matched_word]['technical']
-                        if adjusted_severity != Severity.CLEAN:
-                            categories.append(category)
-                            explanations.append(f"Detected {category.value} (technical context: '{matched_word}')")
-                            max_severity = max(max_severity, adjusted_severity)
-                    else:
-                        # Original severity logic
-                        categories.append(category)
-                        explanations.append(f"Detected {category.value}")
-                        
-                        # Set severity based on category
-                        if category in [Category.HATE_SPEECH, Category.VIOLENCE]:
-                            max_severity = max(max_severity, Severity.HIGH)
-                        elif category in [Category.ABUSE, Category.SELF_HARM]:
-                            max_severity = max(max_severity, Severity.HIGH)
-                        else:
-                            max_severity = max(max_severity, Severity.MEDIUM)
-                    break
+        decided: Set[Category] = set()
+        for index, (category, _) in enumerate(RULES):
+            if category in decided or index not in hits:
+                continue
+            decided.add(category)
+            
+            # Extract the matched word
+            matched_word = hits[index].strip()
+            
+            # Check if this is a technical term that should be adjusted
+            if is_technical and matched_word in technical_adjustments:
+                # Apply technical context severity
+                adjusted_severity = technical_adjustments[matched_word]['technical']
+                if adjusted_severity != Severity.CLEAN:
+                    categories.append(category)
+                    explanations.append(f"Detected {category.value} (technical context: '{matched_word}')")
+                    max_severity = max(max_severity, adjusted_severity)
+            else:
+                # Original severity logic
+                categories.append(category)
+                explanations.append(f"Detected {category.value}")
+                
+                # Set severity based on category
+                if category in [Category.HATE_SPEECH, Category.VIOLENCE]:
+                    max_severity = max(max_severity, Severity.HIGH)
+                elif category in [Category.ABUSE, Category.SELF_HARM]:
+                    max_severity = max(max_severity, Severity.HIGH)
+                else:
+                    max_severity = max(max_severity, Severity.MEDIUM)
         
         # Check profanity list with context awareness
-        words = normalized.split()
-        profane_words = [w for w in words if w in self.profanity_list]
         if profane_words:
             # In technical context, mild insults might be variable names or comments
             if is_technical and all(w in ['stupid', 'idiot', 'dumb', 'dummy'] for w in profane_words):
@@ -488,41 +575,60 @@ class HAPService:
     
     def _get_cache_key(self, content: str) -> str:
         """Generate cache key for content"""
-        content_hash = hashlib.sha256(content.encode()).hexdigest()
-        return f"hap:check:{content_hash}"
+        return f"hap:check:{content_digest(content)}"
+    
+    def _remember(self, cache_key: str, result: HAPCheckResult):
+        self._memo[cache_key] = result
+        self._memo.move_to_end(cache_key)
+        while len(self._memo) > self.memo_size:
+            self._memo.popitem(last=False)
     
     async def _get_cached_result(self, cache_key: str) -> Optional[HAPCheckResult]:
         """Get cached check result"""
-        if not self.redis_client:
-            return None
+        return (await self._get_cached_results([cache_key])).get(cache_key)
+    
+    async def _get_cached_results(self, cache_keys: List[str]) -> Dict[str, HAPCheckResult]:
+        """Get cached check results, from memory first and then one Redis round trip"""
+        results = {}
+        for cache_key in cache_keys:
+            if cache_key in self._memo:
+                self._memo.move_to_end(cache_key)
+                results[cache_key] = self._memo[cache_key]
+        
+        missing = [cache_key for cache_key in cache_keys if cache_key not in results]
+        if not missing or not self.redis_client:
+            return results
             
         try:
-            cached = await self.redis_client.get(cache_key)
-            if cached:
-                import json
-                data = json.loads(cached)
-                return HAPCheckResult(**data)
+            for cache_key, cached in zip(missing, await self.redis_client.mget(missing)):
+                if cached:
+                    results[cache_key] = HAPCheckResult(**json.loads(cached))
+                    self._remember(cache_key, results[cache_key])
         except Exception as e:
             logger.error(f"Cache retrieval error: {e}")
         
-        return None
+        return results
     
     async def _cache_result(self, cache_key: str, result: HAPCheckResult):
         """Cache check result"""
-        if not self.redis_client:
+        await self._cache_results({cache_key: result})
+    
+    async def _cache_results(self, results: Dict[str, HAPCheckResult]):
+        """Cache check results, writing them to Redis in one pipeline"""
+        for cache_key, result in results.items():
+            self._remember(cache_key, result)
+        
+        if not results or not self.redis_client:
             return
             
         try:
-            import json
-            ttl = 3600 * 24  # 24 hours for clean, 1 hour for violations
-            if result.severity != Severity.CLEAN:
-                ttl = 3600
-                
-            await self.redis_client.setex(
-                cache_key,
-                ttl,
-                json.dumps(result.dict())
-            )
+            pipe = self.redis_client.pipeline(transaction=False)
+            for cache_key, result in results.items():
+                ttl = 3600 * 24  # 24 hours for clean, 1 hour for violations
+                if result.severity != Severity.CLEAN:
+                    ttl = 3600
+                pipe.setex(cache_key, ttl, json.dumps(result.dict()))
+            await pipe.execute()
         except Exception as e:
             logger.error(f"Cache storage error: {e}")
     
@@ -554,7 +660,7 @@ class HAPService:
                         "severity": result.severity.value,
                         "categories": [c.value for c in result.categories],
                         "confidence": result.confidence,
-                        "content_hash": hashlib.sha256(request.content.encode()).hexdigest(),
+                        "content_hash": content_digest(request.content),
                         "explanation": result.explanation
                     }
                 )
@@ -614,13 +720,26 @@ class HAPService:
 hap_service = HAPService()
 
 
+def screening_record(content: str, result: HAPCheckResult) -> Dict[str, Any]:
+    """Serializable record of a check, so later stages of the same request can reuse it"""
+    return {"content_hash": content_digest(content), "result": result.model_dump(mode="json")}
+
+
 async def check_content(
     content: str,
     context: str = "user_request",
     user_id: Optional[str] = None,
-    tenant_id: Optional[str] = None
+    tenant_id: Optional[str] = None,
+    previous: Optional[Dict[str, Any]] = None
 ) -> HAPCheckResult:
-    """Convenience function for content checking"""
+    """Convenience function for content checking
+    
+    Pass the screening_record() of an earlier check of the same request as
+    `previous` to reuse its result instead of screening the content again.
+    """
+    if previous and previous.get("content_hash") == content_digest(content):
+        return HAPCheckResult(**previous["result"])
+    
     if not hap_service.initialized:
         await hap_service.initialize()
         
@@ -631,4 +750,25 @@ async def check_content(
         tenant_id=tenant_id
     )
     
-    return await hap_service.check_content(request)
\ No newline at end of file
+    return await hap_service.check_content(request)
+
+
+async def check_content_batch(
+    contents: List[str],
+    context: str = "capsule_content",
+    user_id: Optional[str] = None,
+    tenant_id: Optional[str] = None
+) -> List[HAPCheckResult]:
+    """Convenience function for checking many items, e.g. capsule files or marketing posts"""
+    if not hap_service.initialized:
+        await hap_service.initialize()
+    
+    return await hap_service.check_content_batch([
+        HAPCheckRequest(
+            content=content,
+            context=CheckContext(context),
+            user_id=user_id,
+            tenant_id=tenant_id
+        )
+        for content in contents
+    ])
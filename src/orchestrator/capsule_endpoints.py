@@ -5,6 +5,7 @@ Capsule generation endpoints with PostgreSQL storage
 from fastapi import APIRouter, HTTPException, Depends
 from sqlalchemy.orm import Session
 from src.common.database import get_db
+from src.common.error_handling import ValidationError
 from src.common.models import QLCapsule, ExecutionRequest
 from src.orchestrator.capsule_storage import CapsuleStorageService
 from pydantic import BaseModel
@@ -136,25 +137,30 @@ async def list_user_capsules(
     tenant_id: str,
     user_id: str,
     limit: int = 50,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db)
 ) -> Dict[str, Any]:
-    """List capsules for a user from PostgreSQL"""
+    """List capsules for a user from PostgreSQL, newest first; pass next_cursor back for the next page"""
     
     try:
         storage_service = CapsuleStorageService(db)
-        capsules = await storage_service.list_capsules(
+        page = await storage_service.list_capsules(
             tenant_id=tenant_id,
             user_id=user_id,
-            limit=limit
+            limit=limit,
+            cursor=cursor
         )
         
         return {
             "tenant_id": tenant_id,
             "user_id": user_id,
-            "capsules": capsules,
-            "count": len(capsules)
+            "capsules": page["capsules"],
+            "count": len(page["capsules"]),
+            "next_cursor": page["next_cursor"]
         }
         
+    except ValidationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Failed to list capsules", error=str(e))
         raise HTTPException(status_code=500, detail=f"Failed to list capsules: {str(e)}")
\ No newline at end of file
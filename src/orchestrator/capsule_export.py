@@ -1,20 +1,31 @@
 """
 QLCapsule Export and Streaming Services
 Production-ready export functionality with multiple formats
+
+Archives are generated as streams: entries are framed and compressed one chunk
+at a time in worker threads, so a download holds a few chunks in memory no
+matter how large the capsule is, and its first bytes go out immediately.
+Uncompressed tarballs have a layout that is known before writing, so they can
+be served from any byte offset (HTTP Range / resume). Archives of immutable
+capsule versions are built once into a disk cache and served from there.
 """
 
-from typing import Dict, Any, List, Optional, AsyncIterator
+from typing import Dict, Any, List, Optional, AsyncIterator, Iterator, Tuple, Union
 from pathlib import Path
 import asyncio
+import hashlib
+import os
 import tarfile
 import zipfile
+import zlib
 import json
 import yaml
-from io import BytesIO
 import tempfile
-from datetime import datetime
+from datetime import datetime, timezone
 import structlog
+from fastapi.responses import Response, StreamingResponse
 
+from src.common.config import settings
 from src.common.models import QLCapsule
 from src.common.error_handling import handle_errors, QLPError, ErrorSeverity
 
@@ -27,132 +38,289 @@ def json_serial(obj):
 
 logger = structlog.get_logger()
 
+# Bump when archive contents change so prebuilt archives are rebuilt
+ARCHIVE_VERSION = "1"
+
+ARCHIVE_MEDIA_TYPES = {
+    "zip": "application/zip",
+    "tar": "application/x-tar",
+    "tar.gz": "application/gzip",
+}
+
+
+def _zip_entries(capsule: QLCapsule) -> List[Tuple[str, str]]:
+    """Files of a ZIP export, in order; contents are the capsule's own strings"""
+    entries = list(capsule.source_code.items()) + list(capsule.tests.items())
+    entries.append(("README.md", capsule.documentation))
+    entries.append(("qlp-manifest.json", json.dumps(capsule.manifest, indent=2, default=json_serial)))
+    
+    if capsule.validation_report:
+        entries.append((
+            "validation-report.json",
+            json.dumps(capsule.validation_report.dict(), indent=2, default=json_serial)
+        ))
+    
+    if capsule.deployment_config:
+        # Kubernetes manifests
+        if "kubernetes" in capsule.deployment_config:
+            k8s_config = capsule.deployment_config["kubernetes"]
+            for key in ("deployment", "service", "ingress"):
+                if key in k8s_config:
+                    entries.append((f"k8s/{key}.yaml", k8s_config[key]))
+        
+        # Terraform configuration
+        if "terraform" in capsule.deployment_config:
+            tf_config = capsule.deployment_config["terraform"]
+            for key in ("main", "variables"):
+                if key in tf_config:
+                    entries.append((f"terraform/{key}.tf", tf_config[key]))
+    
+    metadata = {
+        "capsule_id": capsule.id,
+        "request_id": capsule.request_id,
+        "exported_at": datetime.utcnow().isoformat(),
+        "export_format": "zip",
+        "metadata": capsule.metadata
+    }
+    entries.append(("qlp-metadata.json", json.dumps(metadata, indent=2, default=json_serial)))
+    return entries
+
+
+def _tar_entries(capsule: QLCapsule) -> List[Tuple[str, str]]:
+    """Files of a TAR export, in order; deterministic for a given capsule"""
+    entries = list(capsule.source_code.items()) + list(capsule.tests.items())
+    entries.append(("README.md", capsule.documentation))
+    entries.append(("qlp-manifest.json", json.dumps(capsule.manifest, indent=2, default=json_serial)))
+    
+    if capsule.validation_report:
+        entries.append((
+            "validation-report.json",
+            json.dumps(capsule.validation_report.dict(), indent=2, default=json_serial)
+        ))
+    
+    if capsule.deployment_config:
+        if "kubernetes" in capsule.deployment_config:
+            for key, content in capsule.deployment_config["kubernetes"].items():
+                # Convert to YAML string for complex objects
+                if not isinstance(content, str):
+                    content = yaml.dump(content, default_flow_style=False)
+                entries.append((f"k8s/{key}.yaml", content))
+        
+        if "terraform" in capsule.deployment_config:
+            for key, content in capsule.deployment_config["terraform"].items():
+                # Convert to JSON string for complex objects
+                if not isinstance(content, str):
+                    content = json.dumps(content, indent=2, default=json_serial)
+                entries.append((f"terraform/{key}.tf", content))
+    return entries
+
+
+def _encoded_chunks(content: str, chunk_size: int) -> Iterator[bytes]:
+    """UTF-8 encoding of content, a slice at a time, never the whole file at once"""
+    for start in range(0, len(content), chunk_size):
+        yield content[start:start + chunk_size].encode("utf-8")
+
+
+def _capsule_mtime(capsule: QLCapsule) -> int:
+    """Entry timestamps come from the capsule so its tarball is byte-for-byte repeatable"""
+    try:
+        created_at = datetime.fromisoformat(capsule.created_at)
+    except (TypeError, ValueError):
+        return 0
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return int(created_at.timestamp())
+
+
+class TarLayout:
+    """Byte layout of an uncompressed tarball, known before any of it is written
+    
+    Segments are (offset, size, data) where data is header/padding bytes or a
+    file's content string, so any byte range of the archive can be produced
+    without generating what comes before it. Building a layout reads every
+    file once, so do it off the event loop.
+    """
+    
+    def __init__(self, entries: List[Tuple[str, str]], mtime: int = 0,
+                 chunk_size: int = 256 * 1024):
+        self.chunk_size = chunk_size
+        self.segments: List[Tuple[int, int, Union[bytes, str]]] = []
+        digest = hashlib.sha256(ARCHIVE_VERSION.encode())
+        offset = 0
+        
+        def add(data: Union[bytes, str], size: int):
+            nonlocal offset
+            if size:
+                self.segments.append((offset, size, data))
+                offset += size
+        
+        for name, content in entries:
+            size = 0
+            for chunk in _encoded_chunks(content, chunk_size):
+                size += len(chunk)
+                digest.update(chunk)
+            info = tarfile.TarInfo(name=name)
+            info.size = size
+            info.mtime = mtime
+            header = info.tobuf(tarfile.PAX_FORMAT, "utf-8", "surrogateescape")
+            digest.update(header)
+            add(header, len(header))
+            add(content, size)
+            add(tarfile.NUL * (-size % tarfile.BLOCKSIZE), -size % tarfile.BLOCKSIZE)
+        
+        # End-of-archive blocks, then padding to a whole record, as tarfile writes them
+        add(tarfile.NUL * (2 * tarfile.BLOCKSIZE), 2 * tarfile.BLOCKSIZE)
+        add(tarfile.NUL * (-offset % tarfile.RECORDSIZE), -offset % tarfile.RECORDSIZE)
+        self.size = offset
+        self.etag = digest.hexdigest()[:32]
+    
+    def iter_bytes(self, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        """Bytes [start, end) of the archive in pieces of at most chunk_size"""
+        end = self.size if end is None else min(end, self.size)
+        for offset, size, data in self.segments:
+            if offset + size <= start:
+                continue
+            if offset >= end:
+                break
+            if isinstance(data, bytes):
+                yield data[max(start - offset, 0):end - offset]
+                continue
+            
+            position = offset
+            for chunk in _encoded_chunks(data, self.chunk_size):
+                chunk_end = position + len(chunk)
+                if chunk_end > start and position < end:
+                    yield chunk[max(start - position, 0):end - position]
+                position = chunk_end
+                if position >= end:
+                    break
+
+
+class _Sink:
+    """Write-only file object that collects output until drained"""
+    
+    def __init__(self):
+        self.buffer = bytearray()
+    
+    def write(self, data) -> int:
+        self.buffer += data
+        return len(data)
+    
+    def flush(self):
+        pass
+    
+    def drain(self) -> bytes:
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+
+def _zip_stream(entries: List[Tuple[str, str]], chunk_size: int) -> Iterator[bytes]:
+    """ZIP archive of entries, yielded as it is compressed
+    
+    The sink cannot seek, so zipfile writes sizes and CRCs in data descriptors
+    after each entry instead of going back to patch the local headers.
+    """
+    sink = _Sink()
+    date_time = datetime.now().timetuple()[:6]
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for name, content in entries:
+            info = zipfile.ZipInfo(name, date_time=date_time)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            # UTF-8 is at most 4 bytes per character; only huge files need ZIP64 up front
+            with zf.open(info, 'w', force_zip64=len(content) * 4 > zipfile.ZIP64_LIMIT) as dest:
+                for chunk in _encoded_chunks(content, chunk_size):
+                    dest.write(chunk)
+                    if len(sink.buffer) >= chunk_size:
+                        yield sink.drain()
+            if len(sink.buffer) >= chunk_size:
+                yield sink.drain()
+    yield sink.drain()
+
+
+def _tar_stream(layout: TarLayout, compress: bool = False, start: int = 0,
+                end: Optional[int] = None) -> Iterator[bytes]:
+    """Bytes [start, end) of a tarball, gzip-compressed if asked, in chunks"""
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16) if compress else None
+    buffer = bytearray()
+    for piece in layout.iter_bytes(start, end):
+        buffer += piece
+        if len(buffer) >= layout.chunk_size:
+            out = compressor.compress(bytes(buffer)) if compressor else bytes(buffer)
+            buffer.clear()
+            if out:
+                yield out
+    out = bytes(buffer)
+    if compressor:
+        out = compressor.compress(out) + compressor.flush()
+    if out:
+        yield out
+
+
+def _file_stream(f, chunk_size: int, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+    """Bytes [start, end) of an open file; closes it when done"""
+    with f:
+        f.seek(start)
+        remaining = (end if end is not None else os.fstat(f.fileno()).st_size) - start
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+async def _iterate_in_thread(iterator: Iterator[bytes]) -> AsyncIterator[bytes]:
+    """Drive a blocking chunk generator from worker threads, one chunk at a time"""
+    done = object()
+    while True:
+        chunk = await asyncio.to_thread(next, iterator, done)
+        if chunk is done:
+            return
+        yield chunk
+
+
+def _archive_stream(capsule: QLCapsule, format: str, chunk_size: int) -> Iterator[bytes]:
+    """Blocking chunk generator for a whole archive"""
+    if format == "zip":
+        return _zip_stream(_zip_entries(capsule), chunk_size)
+    if format in ("tar", "tar.gz"):
+        layout = TarLayout(_tar_entries(capsule), _capsule_mtime(capsule), chunk_size)
+        return _tar_stream(layout, compress=format == "tar.gz")
+    raise QLPError(f"Unsupported format: {format}", severity=ErrorSeverity.MEDIUM)
+
+
+def _normalize_format(format: str) -> str:
+    return "tar.gz" if format in ("tgz", "gz") else format
+
 
 class CapsuleExporter:
     """Export QLCapsules in various formats"""
     
     @handle_errors
     async def export_as_zip(self, capsule: QLCapsule) -> bytes:
-        """Export capsule as ZIP archive"""
-        output = BytesIO()
+        """Export capsule as ZIP archive
         
-        with zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as zf:
-            # Add source files
-            for path, content in capsule.source_code.items():
-                zf.writestr(path, content)
-            
-            # Add test files
-            for path, content in capsule.tests.items():
-                zf.writestr(path, content)
-            
-            # Add documentation
-            zf.writestr("README.md", capsule.documentation)
-            
-            # Add manifest
-            zf.writestr("qlp-manifest.json", json.dumps(capsule.manifest, indent=2, default=json_serial))
-            
-            # Add validation report
-            if capsule.validation_report:
-                zf.writestr(
-                    "validation-report.json",
-                    json.dumps(capsule.validation_report.dict(), indent=2, default=json_serial)
-                )
-            
-            # Add deployment configuration
-            if capsule.deployment_config:
-                # Kubernetes manifests
-                if "kubernetes" in capsule.deployment_config:
-                    k8s_config = capsule.deployment_config["kubernetes"]
-                    if "deployment" in k8s_config:
-                        zf.writestr("k8s/deployment.yaml", k8s_config["deployment"])
-                    if "service" in k8s_config:
-                        zf.writestr("k8s/service.yaml", k8s_config["service"])
-                    if "ingress" in k8s_config:
-                        zf.writestr("k8s/ingress.yaml", k8s_config["ingress"])
-                
-                # Terraform configuration
-                if "terraform" in capsule.deployment_config:
-                    tf_config = capsule.deployment_config["terraform"]
-                    if "main" in tf_config:
-                        zf.writestr("terraform/main.tf", tf_config["main"])
-                    if "variables" in tf_config:
-                        zf.writestr("terraform/variables.tf", tf_config["variables"])
-            
-            # Add metadata
-            metadata = {
-                "capsule_id": capsule.id,
-                "request_id": capsule.request_id,
-                "exported_at": datetime.utcnow().isoformat(),
-                "export_format": "zip",
-                "metadata": capsule.metadata
-            }
-            zf.writestr("qlp-metadata.json", json.dumps(metadata, indent=2, default=json_serial))
-        
-        output.seek(0)
+        Builds the whole archive in memory; downloads should stream with
+        CapsuleStreamer instead.
+        """
+        data = b"".join([chunk async for chunk in CapsuleStreamer().stream_capsule(capsule, "zip")])
         logger.info(f"Exported capsule as ZIP: {capsule.id}")
-        return output.read()
+        return data
     
     @handle_errors
     async def export_as_tar(self, capsule: QLCapsule, compression: str = "gz") -> bytes:
-        """Export capsule as TAR archive"""
-        output = BytesIO()
-        mode = f'w:{compression}' if compression else 'w'
-        
-        with tarfile.open(fileobj=output, mode=mode) as tar:
-            # Helper to add content as file
-            def add_file(name: str, content: str):
-                data = content.encode('utf-8')
-                info = tarfile.TarInfo(name=name)
-                info.size = len(data)
-                info.mtime = int(datetime.utcnow().timestamp())
-                tar.addfile(info, BytesIO(data))
-            
-            # Add all source files
-            for path, content in capsule.source_code.items():
-                add_file(path, content)
-            
-            # Add all test files
-            for path, content in capsule.tests.items():
-                add_file(path, content)
-            
-            # Add documentation
-            add_file("README.md", capsule.documentation)
-            
-            # Add manifest
-            add_file("qlp-manifest.json", json.dumps(capsule.manifest, indent=2, default=json_serial))
-            
-            # Add validation report
-            if capsule.validation_report:
-                add_file(
-                    "validation-report.json",
-                    json.dumps(capsule.validation_report.dict(), indent=2, default=json_serial)
-                )
-            
-            # Add deployment configs
-            if capsule.deployment_config:
-                if "kubernetes" in capsule.deployment_config:
-                    k8s = capsule.deployment_config["kubernetes"]
-                    for key, content in k8s.items():
-                        # Convert content to string if it's not already
-                        if isinstance(content, str):
-                            add_file(f"k8s/{key}.yaml", content)
-                        else:
-                            # Convert to YAML string for complex objects
-                            add_file(f"k8s/{key}.yaml", yaml.dump(content, default_flow_style=False))
-                
-                if "terraform" in capsule.deployment_config:
-                    tf = capsule.deployment_config["terraform"]
-                    for key, content in tf.items():
-                        # Convert content to string if it's not already
-                        if isinstance(content, str):
-                            add_file(f"terraform/{key}.tf", content)
-                        else:
-                            # Convert to JSON string for complex objects
-                            add_file(f"terraform/{key}.tf", json.dumps(content, indent=2, default=json_serial))
+        """Export capsule as TAR archive
         
-        output.seek(0)
+        Builds the whole archive in memory; downloads should stream with
+        CapsuleStreamer instead.
+        """
+        format = "tar.gz" if compression == "gz" else "tar"
+        if compression not in ("gz", None, ""):
+            raise QLPError(f"Unsupported compression: {compression}", severity=ErrorSeverity.MEDIUM)
+        data = b"".join([chunk async for chunk in CapsuleStreamer().stream_capsule(capsule, format)])
         logger.info(f"Exported capsule as TAR: {capsule.id}")
-        return output.read()
+        return data
     
     @handle_errors
     async def export_as_docker_image(self, capsule: QLCapsule, registry: Optional[str] = None) -> str:
@@ -600,36 +768,29 @@ class CapsuleStreamer:
         self,
         capsule: QLCapsule,
         format: str = "tar.gz",
-        chunk_size: int = 8192
+        chunk_size: Optional[int] = None
     ) -> AsyncIterator[bytes]:
-        """Stream capsule in chunks"""
-        
-        # Create exporter
-        exporter = CapsuleExporter()
+        """Stream capsule as an archive, generated while it is sent"""
+        chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+        chunks = await asyncio.to_thread(_archive_stream, capsule, _normalize_format(format), chunk_size)
         
-        # Export to desired format
-        if format == "zip":
-            archive_data = await exporter.export_as_zip(capsule)
-        elif format.startswith("tar"):
-            compression = format.split(".")[-1] if "." in format else None
-            archive_data = await exporter.export_as_tar(capsule, compression)
-        else:
-            raise QLPError(f"Unsupported format: {format}", severity=ErrorSeverity.MEDIUM)
-        
-        # Stream in chunks
-        total_size = len(archive_data)
-        offset = 0
-        
-        while offset < total_size:
-            chunk = archive_data[offset:offset + chunk_size]
+        total_size = 0
+        async for chunk in _iterate_in_thread(chunks):
+            total_size += len(chunk)
             yield chunk
-            offset += chunk_size
-            
-            # Allow other tasks to run
-            await asyncio.sleep(0)
         
         logger.info(f"Streamed capsule {capsule.id}: {total_size} bytes")
     
+    async def tar_layout(self, capsule: QLCapsule, chunk_size: Optional[int] = None) -> TarLayout:
+        """Size, ETag and byte layout of the capsule's uncompressed tarball"""
+        return await asyncio.to_thread(
+            TarLayout, _tar_entries(capsule), _capsule_mtime(capsule), chunk_size or settings.EXPORT_CHUNK_SIZE
+        )
+    
+    def stream_tar_range(self, layout: TarLayout, start: int = 0, end: Optional[int] = None) -> AsyncIterator[bytes]:
+        """Bytes [start, end) of an uncompressed tarball, e.g. to resume a download"""
+        return _iterate_in_thread(_tar_stream(layout, start=start, end=end))
+    
     async def stream_capsule_files(
         self,
         capsule: QLCapsule,
@@ -704,4 +865,162 @@ class CapsuleStreamer:
             ".tfvars": "terraform"
         }
         
-        return type_map.get(ext, "text")
\ No newline at end of file
+        return type_map.get(ext, "text")
+
+
+class ExportCache:
+    """Prebuilt archives of immutable capsule versions on local disk
+    
+    Archives are built once per key and format, written atomically, and the
+    least recently served are removed once the cache exceeds max_bytes.
+    """
+    
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        # Concurrent requests for the same archive build it once
+        self._building: Dict[str, asyncio.Lock] = {}
+    
+    def path_for(self, key: str, format: str) -> Path:
+        name = hashlib.sha256(f"{ARCHIVE_VERSION}:{key}:{format}".encode()).hexdigest()[:32]
+        return self.root / f"{name}.{format}"
+    
+    async def get_or_build(self, key: str, capsule: QLCapsule, format: str,
+                           chunk_size: Optional[int] = None) -> Path:
+        path = self.path_for(key, format)
+        lock = self._building.setdefault(path.name, asyncio.Lock())
+        async with lock:
+            if path.exists():
+                # Serving counts as use for pruning
+                await asyncio.to_thread(os.utime, path)
+            else:
+                await asyncio.to_thread(self._build, path, capsule, format,
+                                        chunk_size or settings.EXPORT_CHUNK_SIZE)
+                await asyncio.to_thread(self._prune, path)
+        self._building.pop(path.name, None)
+        return path
+    
+    def _build(self, path: Path, capsule: QLCapsule, format: str, chunk_size: int):
+        self.root.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in _archive_stream(capsule, format, chunk_size):
+                    f.write(chunk)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+        logger.info("Built cached capsule archive", capsule_id=capsule.id, format=format,
+                    size=path.stat().st_size)
+    
+    def _prune(self, keep: Path):
+        archives = [p for p in self.root.iterdir() if p.is_file() and not p.name.startswith(".tmp-")]
+        total = sum(p.stat().st_size for p in archives)
+        for archive in sorted(archives, key=lambda p: p.stat().st_mtime):
+            if total <= self.max_bytes:
+                break
+            if archive != keep:
+                total -= archive.stat().st_size
+                # Downloads already reading the file keep their open handle
+                archive.unlink(missing_ok=True)
+
+
+export_cache = ExportCache(Path(settings.STORAGE_PATH) / "exports", settings.EXPORT_CACHE_MAX_BYTES)
+
+
+def version_cache_key(version_hash: str, capsule: QLCapsule) -> str:
+    """Cache key of a version's archive: its files plus the capsule data archives include"""
+    digest = hashlib.sha256(version_hash.encode())
+    digest.update(json.dumps(
+        [capsule.manifest, capsule.deployment_config, capsule.metadata,
+         capsule.validation_report.dict() if capsule.validation_report else None],
+        sort_keys=True, default=json_serial
+    ).encode())
+    return digest.hexdigest()
+
+
+class RangeNotSatisfiableError(QLPError):
+    """Range header outside the archive"""
+
+
+def parse_byte_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """[start, end) of a single-range Range header; None means send everything"""
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, _, last = spec.strip().partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = int(last) + 1 if last else size
+        else:
+            start, end = max(size - int(last), 0), size
+    except ValueError:
+        return None
+    end = min(end, size)
+    if start >= end:
+        raise RangeNotSatisfiableError(f"Range {header} not satisfiable for {size} bytes",
+                                       severity=ErrorSeverity.LOW)
+    return start, end
+
+
+async def archive_response(
+    capsule: QLCapsule,
+    format: str,
+    filename: str,
+    range_header: Optional[str] = None,
+    if_range: Optional[str] = None,
+    cache_key: Optional[str] = None,
+    chunk_size: Optional[int] = None
+) -> Response:
+    """HTTP response streaming a capsule archive
+    
+    Plain tarballs, and any archive with a cache_key (an immutable version),
+    have a known size and ETag and honour Range/If-Range; other archives are
+    streamed as they are generated.
+    """
+    format = _normalize_format(format)
+    if format not in ARCHIVE_MEDIA_TYPES:
+        raise QLPError(f"Unsupported format: {format}", severity=ErrorSeverity.MEDIUM)
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    media_type = ARCHIVE_MEDIA_TYPES[format]
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    streamer = CapsuleStreamer()
+    
+    archive_file = None
+    if cache_key is not None:
+        path = await export_cache.get_or_build(cache_key, capsule, format, chunk_size)
+        archive_file = await asyncio.to_thread(open, path, "rb")
+        size = os.fstat(archive_file.fileno()).st_size
+        etag = path.stem
+        headers["Cache-Control"] = "private, max-age=31536000, immutable"
+        body = lambda start, end: _iterate_in_thread(_file_stream(archive_file, chunk_size, start, end))
+    elif format == "tar":
+        layout = await streamer.tar_layout(capsule, chunk_size)
+        size, etag = layout.size, layout.etag
+        body = lambda start, end: streamer.stream_tar_range(layout, start, end)
+    else:
+        headers["Accept-Ranges"] = "none"
+        return StreamingResponse(streamer.stream_capsule(capsule, format, chunk_size),
+                                 media_type=media_type, headers=headers)
+    
+    headers["ETag"] = f'"{etag}"'
+    headers["Accept-Ranges"] = "bytes"
+    byte_range = None
+    # A resume against a different archive gets the whole new one
+    if range_header and (not if_range or if_range.strip() == headers["ETag"]):
+        try:
+            byte_range = parse_byte_range(range_header, size)
+        except RangeNotSatisfiableError:
+            if archive_file:
+                archive_file.close()
+            return Response(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+    
+    start, end = byte_range or (0, size)
+    headers["Content-Length"] = str(end - start)
+    if byte_range:
+        headers["Content-Range"] = f"bytes {start}-{end - 1}/{size}"
+    return StreamingResponse(body(start, end), status_code=206 if byte_range else 200,
+                             media_type=media_type, headers=headers)
@@ -3,28 +3,137 @@ Production Capsule Storage Service
 Handles persistent storage and retrieval of QLCapsules with proper database integration
 """
 
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from datetime import datetime, timezone
+import base64
 import hashlib
 import json
-from uuid import uuid4
+from uuid import UUID, uuid4
 import structlog
 
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from fastapi import Depends
-from src.common.database import CapsuleRepository, CapsuleModel, CapsuleVersionModel, get_db
+from src.common.blob_store import BlobStore, get_blob_store, load_capsule_files, store_capsule_files
+from src.common.database import (
+    AsyncCapsuleRepository, CapsuleRepository, CapsuleModel, CapsuleVersionModel, get_async_db, get_db
+)
 from src.common.models import QLCapsule, ExecutionRequest, ValidationReport
-from src.common.error_handling import QLPError, ErrorSeverity, handle_errors
+from src.common.error_handling import QLPError, ErrorSeverity, ValidationError, handle_errors
 
 logger = structlog.get_logger()
 
 
+def encode_cursor(created_at: datetime, capsule_id: Any) -> str:
+    """Opaque keyset cursor for the row a page ended on"""
+    raw = json.dumps([created_at.isoformat(), str(capsule_id)])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, capsule_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), UUID(capsule_id)
+    except (ValueError, TypeError) as e:
+        raise ValidationError(f"Invalid pagination cursor: {e}", field="cursor", value=cursor)
+
+
+def _json_field(value: Any, default: Any) -> Any:
+    """JSON columns come back parsed, except from rows written as strings by old code"""
+    if isinstance(value, str):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return default
+    return value if value is not None else default
+
+
+def capsule_summary(row: Any) -> Dict[str, Any]:
+    """Listing entry for a capsule summary row or model"""
+    return {
+        'id': str(row.id),
+        'request_id': row.request_id,
+        'tenant_id': row.tenant_id,
+        'user_id': row.user_id,
+        'manifest': _json_field(row.manifest, {}),
+        'status': row.status,
+        'file_count': row.file_count,
+        'total_size_bytes': row.total_size_bytes,
+        'confidence_score': row.confidence_score,
+        'execution_duration': row.execution_duration,
+        'created_at': row.created_at.isoformat() if row.created_at else None,
+        'updated_at': row.updated_at.isoformat() if row.updated_at else None,
+        'metadata': _json_field(row.meta_data, {})
+    }
+
+
+def _summary_page(rows: List[Any], limit: int) -> Dict[str, Any]:
+    return {
+        'capsules': [capsule_summary(row) for row in rows],
+        # A full page may have more after it; the cursor resumes after its last row
+        'next_cursor': encode_cursor(rows[-1].created_at, rows[-1].id) if len(rows) == limit else None
+    }
+
+
+async def _load_files(blob_store: BlobStore, capsule_model: CapsuleModel,
+                      paths: Optional[List[str]] = None) -> Dict[str, Any]:
+    """source_code/tests/documentation of a capsule row, optionally only some paths"""
+    if capsule_model.file_manifest:
+        return await load_capsule_files(
+            blob_store, capsule_model.file_manifest, paths,
+            include_documentation=paths is None
+        )
+    
+    # Rows stored before the blob store carry their files inline
+    files = {}
+    for section in ('source_code', 'tests'):
+        content = _json_field(getattr(capsule_model, section), {})
+        if paths is not None:
+            content = {path: content[path] for path in paths if path in content}
+        files[section] = content
+    files['documentation'] = (capsule_model.documentation or "") if paths is None else ""
+    return files
+
+
+def _capsule_from_model(capsule_model: CapsuleModel, files: Dict[str, Any]) -> QLCapsule:
+    validation_report = None
+    if capsule_model.validation_report:
+        try:
+            validation_report = ValidationReport(**dict(capsule_model.validation_report))
+        except Exception as e:
+            logger.error("Failed to load validation report", capsule_id=str(capsule_model.id), error=str(e))
+            raise
+    
+    return QLCapsule(
+        id=str(capsule_model.id),
+        request_id=capsule_model.request_id,
+        manifest=_json_field(capsule_model.manifest, {}),
+        source_code=files['source_code'] or {},
+        tests=files['tests'] or {},
+        documentation=files['documentation'],
+        validation_report=validation_report,
+        deployment_config=_json_field(capsule_model.deployment_config, {}),
+        metadata=_json_field(capsule_model.meta_data, {}),
+        created_at=(
+            capsule_model.created_at.isoformat()
+            if isinstance(capsule_model.created_at, datetime)
+            else capsule_model.created_at or datetime.utcnow().isoformat()
+        )
+    )
+
+
 class CapsuleStorageService:
-    """Production service for capsule storage and retrieval"""
+    """Production service for capsule storage and retrieval
+    
+    File contents go to the content-addressed blob store; capsule and version
+    rows keep only path -> hash manifests.
+    """
     
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, blob_store: Optional[BlobStore] = None):
         self.db = db
         self.repository = CapsuleRepository(db)
+        self.blob_store = blob_store or get_blob_store()
     
     @handle_errors
     async def store_capsule(
@@ -36,7 +145,7 @@ class CapsuleStorageService:
         """Store a capsule in the database"""
         
         # Check if capsule already exists
-        existing = self.repository.get_capsule(str(capsule.id))
+        existing = self.repository.get_capsule(str(capsule.id), include_content=False)
         if existing and not overwrite:
             raise QLPError(
                 f"Capsule {capsule.id} already exists. Use overwrite=True to replace.",
@@ -49,6 +158,11 @@ class CapsuleStorageService:
         total_size += sum(len(content.encode('utf-8')) for content in capsule.tests.values())
         total_size += len(capsule.documentation.encode('utf-8'))
         
+        # Files already in the store (shared with other capsules) are not written again
+        file_manifest = await store_capsule_files(
+            self.blob_store, capsule.source_code, capsule.tests, capsule.documentation
+        )
+        
         # Prepare capsule data for database
         capsule_data = {
             'id': capsule.id,
@@ -56,9 +170,10 @@ class CapsuleStorageService:
             'tenant_id': request.tenant_id,
             'user_id': request.user_id,
             'manifest': capsule.manifest,
-            'source_code': capsule.source_code,
-            'tests': capsule.tests,
-            'documentation': capsule.documentation,
+            'file_manifest': file_manifest,
+            'source_code': {},
+            'tests': {},
+            'documentation': "",
             'validation_report': json.loads(capsule.validation_report.model_dump_json()) if capsule.validation_report else None,
             'deployment_config': capsule.deployment_config,
             'confidence_score': capsule.metadata.get('confidence_score', 0.0),
@@ -90,132 +205,69 @@ class CapsuleStorageService:
         
         return str(stored_capsule.id)
     
+    async def _load_files(self, capsule_model: CapsuleModel,
+                          paths: Optional[List[str]] = None) -> Dict[str, Any]:
+        return await _load_files(self.blob_store, capsule_model, paths)
+    
     @handle_errors
-    async def get_capsule(self, capsule_id: str) -> Optional[QLCapsule]:
-        """Retrieve a capsule from storage"""
+    async def get_capsule(self, capsule_id: str, paths: Optional[List[str]] = None) -> Optional[QLCapsule]:
+        """Retrieve a capsule from storage, with all files or only the given paths"""
         
         capsule_model = self.repository.get_capsule(capsule_id)
         if not capsule_model:
             logger.warning("Capsule not found", capsule_id=capsule_id)
             return None
         
-        # Convert database model to QLCapsule
-        validation_report = None
-        if capsule_model.validation_report:
-            try:
-                # Create a copy of the validation report data
-                vr_data = dict(capsule_model.validation_report)
-                logger.info(f"ValidationReport data: {vr_data}")
-                logger.info(f"created_at in vr_data: {'created_at' in vr_data}")
-                if 'created_at' in vr_data:
-                    logger.info(f"created_at type: {type(vr_data['created_at'])}, value: {vr_data['created_at']}")
-                validation_report = ValidationReport(**vr_data)
-            except Exception as e:
-                logger.error(f"Failed to create ValidationReport: {str(e)}")
-                logger.error(f"ValidationReport data: {capsule_model.validation_report}")
-                raise
-        
-        # Parse JSON fields if they're strings
-        source_code = capsule_model.source_code
-        if isinstance(source_code, str):
-            try:
-                source_code = json.loads(source_code)
-            except:
-                source_code = {}
-        
-        tests = capsule_model.tests
-        if isinstance(tests, str):
-            try:
-                tests = json.loads(tests)
-            except:
-                tests = {}
-        
-        manifest = capsule_model.manifest
-        if isinstance(manifest, str):
-            try:
-                manifest = json.loads(manifest)
-            except:
-                manifest = {}
-        
-        deployment_config = capsule_model.deployment_config
-        if isinstance(deployment_config, str):
-            try:
-                deployment_config = json.loads(deployment_config)
-            except:
-                deployment_config = {}
-        
-        metadata = capsule_model.meta_data
-        if isinstance(metadata, str):
-            try:
-                metadata = json.loads(metadata)
-            except:
-                metadata = {}
-        
-        # Handle created_at - convert datetime to string if needed
-        created_at_str = None
-        if capsule_model.created_at:
-            if isinstance(capsule_model.created_at, str):
-                created_at_str = capsule_model.created_at
-            else:
-                created_at_str = capsule_model.created_at.isoformat()
-        
-        capsule = QLCapsule(
-            id=str(capsule_model.id),
-            request_id=capsule_model.request_id,
-            manifest=manifest or {},
-            source_code=source_code or {},
-            tests=tests or {},
-            documentation=capsule_model.documentation or "",
-            validation_report=validation_report,
-            deployment_config=deployment_config or {},
-            metadata=metadata or {},
-            created_at=created_at_str or datetime.utcnow().isoformat()
-        )
+        files = await self._load_files(capsule_model, paths)
+        capsule = _capsule_from_model(capsule_model, files)
         
         logger.info("Retrieved capsule", capsule_id=capsule_id)
         return capsule
     
+    @handle_errors
+    async def get_capsule_files(self, capsule_id: str, paths: Optional[List[str]] = None) -> Optional[Dict[str, str]]:
+        """Source and test files of a capsule by path, fetching only the requested ones"""
+        
+        capsule_model = self.repository.get_capsule(capsule_id)
+        if not capsule_model:
+            return None
+        files = await self._load_files(capsule_model, paths)
+        return {**files['source_code'], **files['tests']}
+    
     @handle_errors
     async def list_capsules(
         self,
         tenant_id: str,
         user_id: str,
         limit: int = 50,
-        offset: int = 0
-    ) -> List[Dict[str, Any]]:
-        """List capsules for a user"""
+        cursor: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """List capsule summaries for a user, newest first
         
-        capsules = self.repository.get_capsules_by_user(tenant_id, user_id, limit)
+        Returns {"capsules": [...], "next_cursor": str or None}; pass
+        next_cursor back to get the following page.
+        """
         
-        result = []
-        for capsule in capsules:
-            result.append({
-                'id': str(capsule.id),
-                'request_id': capsule.request_id,
-                'status': capsule.status,
-                'file_count': capsule.file_count,
-                'total_size_bytes': capsule.total_size_bytes,
-                'confidence_score': capsule.confidence_score,
-                'created_at': capsule.created_at.isoformat(),
-                'updated_at': capsule.updated_at.isoformat(),
-                'metadata': capsule.meta_data
-            })
+        rows = self.repository.get_capsule_summaries(
+            tenant_id, user_id, limit, decode_cursor(cursor) if cursor else None
+        )
+        page = _summary_page(rows, limit)
         
         logger.info(
             "Listed capsules",
             tenant_id=tenant_id,
             user_id=user_id,
-            count=len(result)
+            count=len(page['capsules'])
         )
         
-        return result
+        return page
     
     @handle_errors
     async def delete_capsule(self, capsule_id: str, user_id: str, tenant_id: str) -> bool:
         """Delete a capsule (with authorization check)"""
         
         # First verify ownership
-        capsule = self.repository.get_capsule(capsule_id)
+        capsule = self.repository.get_capsule(capsule_id, include_content=False)
         if not capsule:
             logger.warning("Capsule not found for deletion", capsule_id=capsule_id)
             return False
@@ -248,26 +300,27 @@ class CapsuleStorageService:
         
         # Get the latest version number for this capsule
         existing_versions = self.repository.get_capsule_versions(capsule_id, branch, 1)
-        next_version = 1
-        if existing_versions:
-            next_version = existing_versions[0].version_number + 1
+        parent = existing_versions[0] if existing_versions else None
+        next_version = parent.version_number + 1 if parent else 1
         
         # Calculate version hash based on content
         content_hash = self._calculate_content_hash(capsule)
         
-        # Calculate changes (simplified for now - could be enhanced with diff)
-        changes = []
-        for file_path in capsule.source_code.keys():
-            changes.append({
-                'path': file_path,
-                'type': 'modified',
-                'size': len(capsule.source_code[file_path])
-            })
+        # Only files that changed add blobs; the rest are shared with earlier versions
+        file_manifest = await store_capsule_files(
+            self.blob_store, capsule.source_code, capsule.tests, capsule.documentation
+        )
+        changes = self._diff_manifests(
+            parent.file_manifest if parent else {}, file_manifest,
+            {**capsule.source_code, **capsule.tests}
+        )
         
         version_data = {
             'capsule_id': capsule_id,
             'version_number': next_version,
             'version_hash': content_hash,
+            'parent_version_id': parent.id if parent else None,
+            'file_manifest': file_manifest,
             'author': author,
             'message': message,
             'branch': branch,
@@ -319,6 +372,63 @@ class CapsuleStorageService:
             'created_at': version.created_at.isoformat()
         }
     
+    @handle_errors
+    async def get_version_files(self, version_id: str, paths: Optional[List[str]] = None) -> Optional[Dict[str, str]]:
+        """Files of a specific version by path, fetching only the requested ones"""
+        
+        version = self.repository.get_version(version_id)
+        if not version or not version.file_manifest:
+            return None
+        files = await load_capsule_files(self.blob_store, version.file_manifest, paths, include_documentation=False)
+        return {**files['source_code'], **files['tests']}
+
+    @handle_errors
+    async def get_version_capsule(self, version_id: str) -> Optional[QLCapsule]:
+        """The capsule with the files of a specific version, e.g. to export it"""
+
+        version = self.repository.get_version(version_id)
+        if not version or not version.file_manifest:
+            return None
+        capsule_model = self.repository.get_capsule(str(version.capsule_id))
+        if not capsule_model:
+            return None
+        files = await load_capsule_files(self.blob_store, version.file_manifest)
+        return _capsule_from_model(capsule_model, files)
+
+    @staticmethod
+    def _diff_manifests(
+        old: Optional[Dict[str, Any]],
+        new: Dict[str, Any],
+        contents: Dict[str, str]
+    ) -> List[Dict[str, Any]]:
+        """File changes between two capsule manifests
+        
+        A parent without a manifest (stored before the blob store) has an
+        unknown baseline, so every current file is reported as modified.
+        """
+        def flatten(manifest):
+            return {path: digest for section in ('source_code', 'tests')
+                    for path, digest in (manifest.get(section) or {}).items()}
+        
+        new_files = flatten(new)
+        if old is None:
+            return [{'path': path, 'type': 'modified', 'size': len(contents.get(path, ''))}
+                    for path in new_files]
+        
+        old_files = flatten(old)
+        changes = []
+        for path, digest in new_files.items():
+            if path not in old_files:
+                changes.append({'path': path, 'type': 'added', 'hash': digest,
+                                'size': len(contents.get(path, ''))})
+            elif old_files[path] != digest:
+                changes.append({'path': path, 'type': 'modified', 'hash': digest,
+                                'old_hash': old_files[path], 'size': len(contents.get(path, ''))})
+        for path, digest in old_files.items():
+            if path not in new_files:
+                changes.append({'path': path, 'type': 'deleted', 'old_hash': digest})
+        return changes
+    
     @handle_errors
     async def get_version_history(
         self,
@@ -419,8 +529,9 @@ class CapsuleStorageService:
         deliveries = self.repository.get_capsule_deliveries(capsule_id)
         
         # Calculate language breakdown
+        source_code = (await self._load_files(capsule))['source_code']
         languages = {}
-        for file_path, content in capsule.source_code.items():
+        for file_path, content in source_code.items():
             ext = file_path.split('.')[-1].lower()
             if ext not in languages:
                 languages[ext] = {'files': 0, 'lines': 0}
@@ -445,7 +556,7 @@ class CapsuleStorageService:
     async def update_capsule_metadata(self, capsule_id: str, metadata: Dict[str, Any]) -> bool:
         """Update capsule metadata"""
         try:
-            capsule = self.repository.get_capsule(capsule_id)
+            capsule = self.repository.get_capsule(capsule_id, include_content=False)
             if not capsule:
                 return False
             
@@ -463,7 +574,85 @@ class CapsuleStorageService:
             return False
 
 
-# Factory function for dependency injection
+class AsyncCapsuleStorageService:
+    """Capsule reads for async request handlers, without blocking the event loop
+    
+    Listings and ownership checks read only summary columns; files are fetched
+    from the blob store only when asked for. Writes go through
+    CapsuleStorageService.
+    """
+    
+    def __init__(self, db: AsyncSession, blob_store: Optional[BlobStore] = None):
+        self.db = db
+        self.repository = AsyncCapsuleRepository(db)
+        self.blob_store = blob_store or get_blob_store()
+    
+    @handle_errors
+    async def get_capsule(self, capsule_id: str, paths: Optional[List[str]] = None) -> Optional[QLCapsule]:
+        """Retrieve a capsule with all files or only the given paths"""
+        
+        capsule_model = await self.repository.get_capsule(capsule_id)
+        if not capsule_model:
+            logger.warning("Capsule not found", capsule_id=capsule_id)
+            return None
+        
+        files = await _load_files(self.blob_store, capsule_model, paths)
+        return _capsule_from_model(capsule_model, files)
+    
+    @handle_errors
+    async def get_capsule_summary(self, capsule_id: str) -> Optional[Dict[str, Any]]:
+        """Summary of a capsule, including its owner, without files or validation report"""
+        
+        capsule_model = await self.repository.get_capsule(capsule_id, include_content=False)
+        return capsule_summary(capsule_model) if capsule_model else None
+    
+    @handle_errors
+    async def get_capsule_files(self, capsule_id: str, paths: Optional[List[str]] = None) -> Optional[Dict[str, str]]:
+        """Source and test files of a capsule by path, fetching only the requested ones"""
+        
+        capsule_model = await self.repository.get_capsule(capsule_id)
+        if not capsule_model:
+            return None
+        files = await _load_files(self.blob_store, capsule_model, paths)
+        return {**files['source_code'], **files['tests']}
+    
+    @handle_errors
+    async def list_capsules(
+        self,
+        tenant_id: str,
+        user_id: Optional[str] = None,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        **filters
+    ) -> Dict[str, Any]:
+        """List capsule summaries for a tenant (or one of its users), newest first
+        
+        Filters: descending, status, created_after, created_before. Returns
+        {"capsules": [...], "next_cursor": str or None}.
+        """
+        
+        rows = await self.repository.get_capsule_summaries(
+            tenant_id, user_id, limit, decode_cursor(cursor) if cursor else None, **filters
+        )
+        return _summary_page(rows, limit)
+    
+    @handle_errors
+    async def get_version_files(self, version_id: str, paths: Optional[List[str]] = None) -> Optional[Dict[str, str]]:
+        """Files of a specific version by path, fetching only the requested ones"""
+        
+        version = await self.repository.get_version(version_id)
+        if not version or not version.file_manifest:
+            return None
+        files = await load_capsule_files(self.blob_store, version.file_manifest, paths, include_documentation=False)
+        return {**files['source_code'], **files['tests']}
+
+
+# Factory functions for dependency injection
 def get_capsule_storage(db: Session = Depends(get_db)) -> CapsuleStorageService:
     """Get capsule storage service instance"""
-    return CapsuleStorageService(db)
\ No newline at end of file
+    return CapsuleStorageService(db)
+
+
+def get_async_capsule_storage(db: AsyncSession = Depends(get_async_db)) -> AsyncCapsuleStorageService:
+    """Get async capsule storage service instance"""
+    return AsyncCapsuleStorageService(db)
\ No newline at end of file
@@ -1,6 +1,11 @@
 """
 QLCapsule Versioning and History Tracking System
 Production-ready versioning infrastructure with Git-like semantics
+
+File contents live in the content-addressed blob store and each version keeps
+a path -> hash snapshot, so a version only adds blobs for the files it changed.
+Versions are persisted one file each next to a small refs file, so a change
+writes the new version and the refs instead of the whole history.
 """
 
 from typing import Dict, Any, List, Optional, Set
@@ -14,6 +19,7 @@ import aiofiles
 from enum import Enum
 import structlog
 
+from src.common.blob_store import BlobStore, get_blob_store
 from src.common.models import QLCapsule
 from src.common.error_handling import (
     QLPError,
@@ -61,6 +67,7 @@ class CapsuleVersion:
     capsule_hash: str
     metadata: Dict[str, Any] = field(default_factory=dict)
     tags: List[str] = field(default_factory=list)
+    files: Dict[str, str] = field(default_factory=dict)  # path -> blob hash of every file
 
 
 @dataclass
@@ -76,9 +83,10 @@ class VersionHistory:
 class CapsuleVersionManager:
     """Manages versioning and history for QLCapsules"""
     
-    def __init__(self, storage_path: Path):
+    def __init__(self, storage_path: Path, blob_store: Optional[BlobStore] = None):
         self.storage_path = Path(storage_path)
         self.storage_path.mkdir(parents=True, exist_ok=True)
+        self.blob_store = blob_store or get_blob_store()
         self.histories: Dict[str, VersionHistory] = {}
         self._lock = asyncio.Lock()
     
@@ -94,25 +102,26 @@ class CapsuleVersionManager:
             # Calculate capsule hash
             capsule_hash = await self._calculate_capsule_hash(capsule)
             
+            # Store file contents; the returned hashes identify them in every version
+            files = await self._store_files(capsule)
+            
             # Create file changes for all files
             changes = []
             # Process source code files
             for file_path, content in capsule.source_code.items():
-                file_hash = hashlib.sha256(content.encode()).hexdigest()
                 changes.append(FileChange(
                     path=file_path,
                     change_type=ChangeType.CREATED,
-                    new_hash=file_hash,
+                    new_hash=files[file_path],
                     metadata={"size": len(content), "type": "source"}
                 ))
             
             # Process test files
             for file_path, content in capsule.tests.items():
-                file_hash = hashlib.sha256(content.encode()).hexdigest()
                 changes.append(FileChange(
                     path=file_path,
                     change_type=ChangeType.CREATED,
-                    new_hash=file_hash,
+                    new_hash=files[file_path],
                     metadata={"size": len(content), "type": "test"}
                 ))
             
@@ -128,7 +137,8 @@ class CapsuleVersionManager:
                 metadata={
                     "files_count": len(changes),
                     "confidence_score": capsule.metadata.get('confidence_score', 0)
-                }
+                },
+                files=files
             )
             
             # Initialize history
@@ -141,7 +151,8 @@ class CapsuleVersionManager:
             )
             
             self.histories[capsule.id] = history
-            await self._persist_history(history)
+            await self._persist_version(history.capsule_id, version)
+            await self._persist_refs(history)
             
             logger.info(
                 "Created initial version",
@@ -162,7 +173,7 @@ class CapsuleVersionManager:
     ) -> CapsuleVersion:
         """Create a new version of a capsule"""
         async with self._lock:
-            history = self.histories.get(capsule.id)
+            history = self.histories.get(capsule.id) or await self._load_history(capsule.id)
             if not history:
                 raise VersioningError(
                     f"No version history found for capsule {capsule.id}",
@@ -180,8 +191,9 @@ class CapsuleVersionManager:
                     severity=ErrorSeverity.HIGH
                 )
             
-            # Calculate changes
-            changes = await self._calculate_changes(capsule, parent)
+            # Calculate changes; only changed files add blobs to the store
+            files = await self._store_files(capsule)
+            changes = await self._calculate_changes(files, parent)
             if not changes:
                 logger.warning(
                     "No changes detected",
@@ -204,7 +216,8 @@ class CapsuleVersionManager:
                     "files_count": len(changes),
                     "confidence_score": capsule.metadata.get('confidence_score', 0),
                     "branch": branch or history.current_branch
-                }
+                },
+                files=files
             )
             
             # Update history
@@ -217,7 +230,8 @@ class CapsuleVersionManager:
                 history.head = version.version_id
                 history.branches[history.current_branch] = version.version_id
             
-            await self._persist_history(history)
+            await self._persist_version(history.capsule_id, version)
+            await self._persist_refs(history)
             
             logger.info(
                 "Created new version",
@@ -300,7 +314,7 @@ class CapsuleVersionManager:
     ) -> str:
         """Create a new branch"""
         async with self._lock:
-            history = self.histories.get(capsule_id)
+            history = self.histories.get(capsule_id) or await self._load_history(capsule_id)
             if not history:
                 raise VersioningError(
                     f"No version history found for capsule {capsule_id}",
@@ -325,7 +339,7 @@ class CapsuleVersionManager:
             
             # Create branch
             history.branches[branch_name] = from_version
-            await self._persist_history(history)
+            await self._persist_refs(history)
             
             logger.info(
                 "Created branch",
@@ -347,7 +361,7 @@ class CapsuleVersionManager:
     ) -> CapsuleVersion:
         """Merge two versions (three-way merge)"""
         async with self._lock:
-            history = self.histories.get(capsule_id)
+            history = self.histories.get(capsule_id) or await self._load_history(capsule_id)
             if not history:
                 raise VersioningError(
                     f"No version history found for capsule {capsule_id}",
@@ -372,6 +386,10 @@ class CapsuleVersionManager:
             merged_changes = await self._three_way_merge(
                 common_ancestor, source, target
             )
+            merged_files = dict(self._version_files(target))
+            for change in merged_changes:
+                if change.new_hash:
+                    merged_files[change.path] = change.new_hash
             
             # Create merge version
             merge_version = CapsuleVersion(
@@ -387,11 +405,20 @@ class CapsuleVersionManager:
                     "source_version": source_version,
                     "target_version": target_version,
                     "common_ancestor": common_ancestor.version_id if common_ancestor else None
-                }
+                },
+                files=merged_files
             )
             
             history.versions.append(merge_version)
-            await self._persist_history(history)
+            # The merge lands on whichever branches (and HEAD) pointed at the target
+            for name, tip in history.branches.items():
+                if tip == target_version:
+                    history.branches[name] = merge_version.version_id
+            if history.head == target_version:
+                history.head = merge_version.version_id
+            
+            await self._persist_version(history.capsule_id, merge_version)
+            await self._persist_refs(history)
             
             logger.info(
                 "Created merge version",
@@ -413,7 +440,7 @@ class CapsuleVersionManager:
     ) -> None:
         """Add a tag to a version"""
         async with self._lock:
-            history = self.histories.get(capsule_id)
+            history = self.histories.get(capsule_id) or await self._load_history(capsule_id)
             if not history:
                 raise VersioningError(
                     f"No version history found for capsule {capsule_id}",
@@ -433,7 +460,7 @@ class CapsuleVersionManager:
                 if message:
                     version.metadata[f"tag_{tag}_message"] = message
                 
-                await self._persist_history(history)
+                await self._persist_version(history.capsule_id, version)
                 
                 logger.info(
                     "Tagged version",
@@ -467,7 +494,20 @@ class CapsuleVersionManager:
         
         # Calculate diff
         return await self._calculate_diff(v1, v2)
-    
+
+    @handle_errors
+    async def get_files(
+        self,
+        capsule_id: str,
+        version_id: Optional[str] = None,
+        paths: Optional[List[str]] = None
+    ) -> Dict[str, str]:
+        """Read the files of a version (HEAD by default), or only the given paths"""
+        version = await self.get_version(capsule_id, version_id)
+        if not version:
+            return {}
+        return await self.blob_store.get_files(self._version_files(version), paths)
+
     # Helper methods
     
     async def _calculate_capsule_hash(self, capsule: QLCapsule) -> str:
@@ -490,32 +530,30 @@ class CapsuleVersionManager:
         
         return hasher.hexdigest()
     
+    async def _store_files(self, capsule: QLCapsule) -> Dict[str, str]:
+        """Store the capsule's files as blobs; returns the path -> hash snapshot"""
+        return await self.blob_store.put_files({**capsule.source_code, **capsule.tests})
+    
+    def _version_files(self, version: CapsuleVersion) -> Dict[str, str]:
+        """Path -> hash of every file in a version"""
+        if version.files:
+            return version.files
+        # Versions written before snapshots only know the files they changed
+        return {
+            change.path: change.new_hash
+            for change in version.changes
+            if change.change_type != ChangeType.DELETED
+        }
+    
     async def _calculate_changes(
         self,
-        capsule: QLCapsule,
+        current_files: Dict[str, str],
         parent_version: CapsuleVersion
     ) -> List[FileChange]:
-        """Calculate changes between capsule and parent version"""
+        """Calculate changes between the capsule's files and the parent version"""
         changes = []
         
-        # Build parent file map
-        parent_files = {
-            change.path: change.new_hash
-            for change in parent_version.changes
-            if change.change_type != ChangeType.DELETED
-        }
-        
-        # Check current files
-        current_files = {}
-        # Process source code files
-        for file_path, content in capsule.source_code.items():
-            file_hash = hashlib.sha256(content.encode()).hexdigest()
-            current_files[file_path] = file_hash
-        
-        # Process test files
-        for file_path, content in capsule.tests.items():
-            file_hash = hashlib.sha256(content.encode()).hexdigest()
-            current_files[file_path] = file_hash
+        parent_files = self._version_files(parent_version)
         
         # Compare files
         for file_path, file_hash in current_files.items():
@@ -581,21 +619,9 @@ class CapsuleVersionManager:
         merged_changes = []
         
         # Build file maps
-        ancestor_files = {}
-        if ancestor:
-            for change in ancestor.changes:
-                if change.change_type != ChangeType.DELETED:
-                    ancestor_files[change.path] = change.new_hash
-        
-        source_files = {}
-        for change in source.changes:
-            if change.change_type != ChangeType.DELETED:
-                source_files[change.path] = change.new_hash
-        
-        target_files = {}
-        for change in target.changes:
-            if change.change_type != ChangeType.DELETED:
-                target_files[change.path] = change.new_hash
+        ancestor_files = self._version_files(ancestor) if ancestor else {}
+        source_files = self._version_files(source)
+        target_files = self._version_files(target)
         
         # Merge logic
         all_paths = set(source_files.keys()) | set(target_files.keys())
@@ -655,17 +681,8 @@ class CapsuleVersionManager:
         diff = []
         
         # Build file maps
-        files1 = {
-            change.path: change.new_hash
-            for change in version1.changes
-            if change.change_type != ChangeType.DELETED
-        }
-        
-        files2 = {
-            change.path: change.new_hash
-            for change in version2.changes
-            if change.change_type != ChangeType.DELETED
-        }
+        files1 = self._version_files(version1)
+        files2 = self._version_files(version2)
         
         # Compare files
         all_paths = set(files1.keys()) | set(files2.keys())
@@ -713,83 +730,115 @@ class CapsuleVersionManager:
             f"{datetime.now().isoformat()}-{id(self)}".encode()
         ).hexdigest()[:16]
     
-    async def _persist_history(self, history: VersionHistory) -> None:
-        """Persist version history to storage"""
-        history_file = self.storage_path / f"{history.capsule_id}_history.json"
-        
-        # Convert to dict for serialization
-        history_dict = {
+    def _history_dir(self, capsule_id: str) -> Path:
+        return self.storage_path / capsule_id
+    
+    async def _persist_version(self, capsule_id: str, version: CapsuleVersion) -> None:
+        """Write one version; versions are never rewritten except to add tags"""
+        versions_dir = self._history_dir(capsule_id) / "versions"
+        versions_dir.mkdir(parents=True, exist_ok=True)
+        async with aiofiles.open(versions_dir / f"{version.version_id}.json", 'w') as f:
+            await f.write(json.dumps(self._version_to_dict(version), indent=2))
+    
+    async def _persist_refs(self, history: VersionHistory) -> None:
+        """Write branches and HEAD"""
+        history_dir = self._history_dir(history.capsule_id)
+        history_dir.mkdir(parents=True, exist_ok=True)
+        refs = {
             "capsule_id": history.capsule_id,
-            "versions": [
-                {
-                    "version_id": v.version_id,
-                    "parent_version": v.parent_version,
-                    "timestamp": v.timestamp.isoformat(),
-                    "author": v.author,
-                    "message": v.message,
-                    "changes": [
-                        {
-                            "path": c.path,
-                            "change_type": c.change_type.value,
-                            "old_hash": c.old_hash,
-                            "new_hash": c.new_hash,
-                            "diff": c.diff,
-                            "metadata": c.metadata
-                        }
-                        for c in v.changes
-                    ],
-                    "capsule_hash": v.capsule_hash,
-                    "metadata": v.metadata,
-                    "tags": v.tags
-                }
-                for v in history.versions
-            ],
             "branches": history.branches,
             "current_branch": history.current_branch,
             "head": history.head
         }
-        
-        async with aiofiles.open(history_file, 'w') as f:
-            await f.write(json.dumps(history_dict, indent=2))
+        async with aiofiles.open(history_dir / "refs.json", 'w') as f:
+            await f.write(json.dumps(refs, indent=2))
+    
+    @staticmethod
+    def _version_to_dict(version: CapsuleVersion) -> Dict[str, Any]:
+        return {
+            "version_id": version.version_id,
+            "parent_version": version.parent_version,
+            "timestamp": version.timestamp.isoformat(),
+            "author": version.author,
+            "message": version.message,
+            "changes": [
+                {
+                    "path": c.path,
+                    "change_type": c.change_type.value,
+                    "old_hash": c.old_hash,
+                    "new_hash": c.new_hash,
+                    "diff": c.diff,
+                    "metadata": c.metadata
+                }
+                for c in version.changes
+            ],
+            "capsule_hash": version.capsule_hash,
+            "metadata": version.metadata,
+            "tags": version.tags,
+            "files": version.files
+        }
+    
+    @staticmethod
+    def _version_from_dict(v_dict: Dict[str, Any]) -> CapsuleVersion:
+        changes = [
+            FileChange(
+                path=c["path"],
+                change_type=ChangeType(c["change_type"]),
+                old_hash=c["old_hash"],
+                new_hash=c["new_hash"],
+                diff=c["diff"],
+                metadata=c["metadata"]
+            )
+            for c in v_dict["changes"]
+        ]
+        
+        return CapsuleVersion(
+            version_id=v_dict["version_id"],
+            parent_version=v_dict["parent_version"],
+            timestamp=datetime.fromisoformat(v_dict["timestamp"]),
+            author=v_dict["author"],
+            message=v_dict["message"],
+            changes=changes,
+            capsule_hash=v_dict["capsule_hash"],
+            metadata=v_dict["metadata"],
+            tags=v_dict["tags"],
+            files=v_dict.get("files") or {}
+        )
     
     async def _load_history(self, capsule_id: str) -> Optional[VersionHistory]:
-        """Load version history from storage"""
-        history_file = self.storage_path / f"{capsule_id}_history.json"
-        
-        if not history_file.exists():
-            return None
+        """Load version history from storage, migrating a legacy whole-history file"""
+        history_dir = self._history_dir(capsule_id)
+        refs_file = history_dir / "refs.json"
+        legacy_file = self.storage_path / f"{capsule_id}_history.json"
         
         try:
-            async with aiofiles.open(history_file, 'r') as f:
-                history_dict = json.loads(await f.read())
+            history_dict = None
+            version_dicts = {}
+            if refs_file.exists():
+                async with aiofiles.open(refs_file, 'r') as f:
+                    history_dict = json.loads(await f.read())
+                for version_file in (history_dir / "versions").glob("*.json"):
+                    async with aiofiles.open(version_file, 'r') as f:
+                        v_dict = json.loads(await f.read())
+                    version_dicts[v_dict["version_id"]] = v_dict
+            
+            legacy_versions = []
+            if legacy_file.exists():
+                # Whole-history file written before per-version storage
+                async with aiofiles.open(legacy_file, 'r') as f:
+                    legacy_dict = json.loads(await f.read())
+                legacy_versions = [v for v in legacy_dict["versions"] if v["version_id"] not in version_dicts]
+                # Refs written since the last legacy write are newer
+                history_dict = history_dict or legacy_dict
+            
+            if history_dict is None:
+                return None
             
-            # Convert back to objects
-            versions = []
-            for v_dict in history_dict["versions"]:
-                changes = [
-                    FileChange(
-                        path=c["path"],
-                        change_type=ChangeType(c["change_type"]),
-                        old_hash=c["old_hash"],
-                        new_hash=c["new_hash"],
-                        diff=c["diff"],
-                        metadata=c["metadata"]
-                    )
-                    for c in v_dict["changes"]
-                ]
-                
-                version = CapsuleVersion(
-                    version_id=v_dict["version_id"],
-                    parent_version=v_dict["parent_version"],
-                    timestamp=datetime.fromisoformat(v_dict["timestamp"]),
-                    author=v_dict["author"],
-                    message=v_dict["message"],
-                    changes=changes,
-                    capsule_hash=v_dict["capsule_hash"],
-                    metadata=v_dict["metadata"],
-                    tags=v_dict["tags"]
-                )
-                versions.append(version)
+            migrated = [self._version_from_dict(v_dict) for v_dict in legacy_versions]
+            versions = sorted(
+                [self._version_from_dict(v_dict) for v_dict in version_dicts.values()] + migrated,
+                key=lambda v: v.timestamp
+            )
             
             history = VersionHistory(
                 capsule_id=history_dict["capsule_id"],
@@ -799,6 +848,14 @@ class CapsuleVersionManager:
                 head=history_dict["head"]
             )
             
+            if legacy_file.exists():
+                # Versions first: refs.json marks the per-version layout as complete
+                for version in migrated:
+                    await self._persist_version(capsule_id, version)
+                await self._persist_refs(history)
+                legacy_file.rename(legacy_file.with_name(legacy_file.name + ".migrated"))
+                logger.info("Migrated legacy version history", capsule_id=capsule_id, versions=len(migrated))
+            
             self.histories[capsule_id] = history
             return history
             
@@ -808,4 +865,4 @@ class CapsuleVersionManager:
                 capsule_id=capsule_id,
                 error=str(e)
             )
-            return None
\ No newline at end of file
+            return None
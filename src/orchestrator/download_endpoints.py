@@ -5,8 +5,8 @@ API endpoints for downloading and exporting capsules
 
 import io
 from typing import Optional
-from fastapi import APIRouter, HTTPException, Query, Response, Depends
-from fastapi.responses import StreamingResponse, FileResponse
+from fastapi import APIRouter, HTTPException, Header, Query, Response, Depends
+from fastapi.responses import FileResponse
 import zipfile
 import tarfile
 from sqlalchemy.orm import Session
@@ -15,7 +15,7 @@ from src.common.models import QLCapsule
 from src.common.auth import get_current_user
 from src.common.database import get_db
 from src.orchestrator.capsule_storage import CapsuleStorageService as PostgresCapsuleStorage
-from src.orchestrator.capsule_export import CapsuleExporter, CapsuleStreamer
+from src.orchestrator.capsule_export import ARCHIVE_MEDIA_TYPES, CapsuleExporter, archive_response, version_cache_key
 
 
 router = APIRouter(prefix="/api/capsules", tags=["capsule-download"])
@@ -118,95 +118,109 @@ async def get_capsule_details(
         raise HTTPException(status_code=500, detail=f"Failed to get capsule: {str(e)}")
 
 
+def _archive_name(capsule: QLCapsule, format: str) -> str:
+    name = capsule.manifest.get('name', 'unnamed').lower().replace(' ', '-')
+    return f"{name}_capsule.{format}"
+
+
 @router.get("/{capsule_id}/download")
 async def download_capsule(
     capsule_id: str,
     format: str = Query("zip", description="Download format: zip, tar, tar.gz"),
+    range: Optional[str] = Header(None),
+    if_range: Optional[str] = Header(None),
     user: dict = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Download a capsule in the specified format"""
+    """Download a capsule in the specified format
+    
+    The archive is streamed as it is built; tar downloads can be resumed with Range.
+    """
     storage = PostgresCapsuleStorage(db)
-    exporter = CapsuleExporter()
     
     try:
+        if format not in ARCHIVE_MEDIA_TYPES:
+            raise HTTPException(status_code=400, detail=f"Unsupported format: {format}")
+        
         # Fetch capsule
         capsule = await storage.get_capsule(capsule_id)
         
         if not capsule:
             raise HTTPException(status_code=404, detail=f"Capsule {capsule_id} not found")
-        manifest = capsule.manifest
-        name = manifest.get('name', 'unnamed').lower().replace(' ', '-')
         
-        if format == "zip":
-            # Export as ZIP
-            zip_data = await exporter.export_as_zip(capsule)
-            
-            return Response(
-                content=zip_data,
-                media_type="application/zip",
-                headers={
-                    "Content-Disposition": f'attachment; filename="{name}_capsule.zip"'
-                }
-            )
+        return await archive_response(capsule, format, _archive_name(capsule, format), range, if_range)
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to download capsule: {str(e)}")
+
+
+@router.get("/{capsule_id}/versions/{version_id}/download")
+async def download_capsule_version(
+    capsule_id: str,
+    version_id: str,
+    format: str = Query("zip", description="Download format: zip, tar, tar.gz"),
+    range: Optional[str] = Header(None),
+    if_range: Optional[str] = Header(None),
+    user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Download a stored version of a capsule
+    
+    Versions never change, so their archives are built once, cached, and
+    served with Range support in every format.
+    """
+    storage = PostgresCapsuleStorage(db)
+    
+    try:
+        if format not in ARCHIVE_MEDIA_TYPES:
+            raise HTTPException(status_code=400, detail=f"Unsupported format: {format}")
         
-        elif format in ["tar", "tar.gz"]:
-            # Export as TAR
-            compression = "gz" if format == "tar.gz" else None
-            tar_data = await exporter.export_as_tar(capsule, compression)
-            
-            media_type = "application/gzip" if compression else "application/x-tar"
-            extension = ".tar.gz" if compression else ".tar"
-            
-            return Response(
-                content=tar_data,
-                media_type=media_type,
-                headers={
-                    "Content-Disposition": f'attachment; filename="{name}_capsule{extension}"'
-                }
-            )
+        version = await storage.get_version(version_id)
+        if not version or version["capsule_id"] != capsule_id:
+            raise HTTPException(status_code=404, detail=f"Version {version_id} not found")
         
-        else:
-            raise HTTPException(status_code=400, detail=f"Unsupported format: {format}")
+        capsule = await storage.get_version_capsule(version_id)
+        if not capsule:
+            raise HTTPException(status_code=404, detail=f"Files of version {version_id} not found")
+        
+        return await archive_response(
+            capsule, format, _archive_name(capsule, format), range, if_range,
+            cache_key=version_cache_key(version["version_hash"], capsule)
+        )
     
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to download capsule: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to download capsule version: {str(e)}")
 
 
 @router.get("/{capsule_id}/stream")
 async def stream_capsule(
     capsule_id: str,
-    format: str = Query("tar.gz", description="Stream format: tar.gz"),
-    chunk_size: int = Query(1024*1024, description="Chunk size in bytes"),
+    format: str = Query("tar.gz", description="Stream format: zip, tar, tar.gz"),
+    chunk_size: int = Query(256*1024, description="Chunk size in bytes"),
+    range: Optional[str] = Header(None),
+    if_range: Optional[str] = Header(None),
     user: dict = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Stream a large capsule in chunks"""
     storage = PostgresCapsuleStorage(db)
-    streamer = CapsuleStreamer()
     
     try:
+        if format not in ARCHIVE_MEDIA_TYPES:
+            raise HTTPException(status_code=400, detail=f"Unsupported format: {format}")
+        
         # Fetch capsule
         capsule = await storage.get_capsule(capsule_id)
         
         if not capsule:
             raise HTTPException(status_code=404, detail=f"Capsule {capsule_id} not found")
-        manifest = capsule.manifest
-        name = manifest.get('name', 'unnamed').lower().replace(' ', '-')
-        
-        # Create async generator for streaming
-        async def generate():
-            async for chunk in streamer.stream_capsule(capsule, format, chunk_size):
-                yield chunk
         
-        return StreamingResponse(
-            generate(),
-            media_type="application/gzip",
-            headers={
-                "Content-Disposition": f'attachment; filename="{name}_capsule.tar.gz"'
-            }
+        return await archive_response(
+            capsule, format, _archive_name(capsule, format), range, if_range, chunk_size=chunk_size
         )
     
     except HTTPException:
@@ -24,9 +24,16 @@ from src.agents.advanced_generation import (
     EnhancedCodeGenerator,
     GenerationStrategy
 )
+from src.common.language_classifier import classify_files
 
 logger = structlog.get_logger()
 
+# Display names for languages whose name does not title-case cleanly
+LANGUAGE_NAMES = {
+    "javascript": "JavaScript", "typescript": "TypeScript", "cpp": "C++", "csharp": "C#",
+    "php": "PHP", "sql": "SQL",
+}
+
 
 class EnhancedCapsuleGenerator:
     """Generate complete QLCapsules with all project files"""
@@ -975,21 +982,11 @@ curl -X POST http://localhost:8000/api/endpoint \
     
     def _detect_languages(self, files: Dict[str, str]) -> List[str]:
         """Detect programming languages used"""
-        languages = set()
-        
-        for path in files.keys():
-            if path.endswith('.py'):
-                languages.add('Python')
-            elif path.endswith(('.js', '.jsx')):
-                languages.add('JavaScript')
-            elif path.endswith(('.ts', '.tsx')):
-                languages.add('TypeScript')
-            elif path.endswith('.go'):
-                languages.add('Go')
-            elif path.endswith('.java'):
-                languages.add('Java')
-        
-        return sorted(languages)
+        guesses = classify_files(files)
+        return sorted({
+            LANGUAGE_NAMES.get(guess.language, guess.language.title())
+            for guess in guesses.values() if guess.language
+        })
     
     def _detect_frameworks(self, files: Dict[str, str]) -> List[str]:
         """Detect frameworks used"""
@@ -18,8 +18,7 @@ from src.common.models import ExecutionRequest, QLCapsule
 from src.orchestrator.capsule_storage import CapsuleStorageService
 from src.orchestrator.intelligent_capsule_generator import IntelligentCapsuleGenerator
 from src.orchestrator.enhanced_github_integration import EnhancedGitHubIntegration
-from src.common.config import settings
-from temporalio.client import Client
+from src.common.temporal_cloud import get_shared_temporal_client
 
 logger = structlog.get_logger()
 
@@ -90,7 +89,7 @@ async def generate_enterprise_project(
         )
         
         # Start Temporal workflow
-        temporal_client = await Client.connect(settings.TEMPORAL_SERVER)
+        temporal_client = await get_shared_temporal_client()
         workflow_id = f"enterprise-{exec_request.id}"
         
         logger.info(
@@ -1,9 +1,11 @@
 """
 GitHub Actions Monitor and Auto-Fixer
 Monitors CI/CD runs, analyzes failures, and automatically fixes issues
+
+Runs are awaited through the process-wide WorkflowRunWatcher, which one
+task shares between every monitored repository.
 """
 
-import asyncio
 import json
 import logging
 import re
@@ -16,6 +18,7 @@ import structlog
 
 from src.agents.azure_llm_client import llm_client
 from src.common.config import settings
+from src.orchestrator.workflow_run_watcher import WorkflowRunWatcher, ci_watcher
 
 logger = structlog.get_logger()
 
@@ -71,7 +74,8 @@ class FixAttempt:
 class GitHubActionsMonitor:
     """Monitor and auto-fix GitHub Actions workflows"""
     
-    def __init__(self, github_token: str, owner: str, repo: str):
+    def __init__(self, github_token: str, owner: str, repo: str,
+                 watcher: Optional[WorkflowRunWatcher] = None):
         self.token = github_token
         self.owner = owner
         self.repo = repo
@@ -82,6 +86,7 @@ class GitHubActionsMonitor:
         }
         self.max_fix_attempts = 5
         self.fix_history: List[FixAttempt] = []
+        self.watcher = watcher or ci_watcher
     
     async def monitor_and_fix_workflow(
         self,
@@ -103,32 +108,26 @@ class GitHubActionsMonitor:
         start_time = datetime.utcnow()
         timeout = timedelta(minutes=timeout_minutes)
         attempts = 0
+        handled_run_id = None
+        run = None
         
         logger.info(f"Starting GitHub Actions monitoring for {self.owner}/{self.repo}")
         
         while (datetime.utcnow() - start_time) < timeout and attempts < self.max_fix_attempts:
+            # Wait for the latest run to complete, skipping the one a fix was made for
+            remaining = (timeout - (datetime.utcnow() - start_time)).total_seconds()
+            latest = await self.watcher.wait_for_completed_run(
+                self.owner, self.repo, self.headers, workflow_file,
+                timeout=remaining, exclude_run_id=handled_run_id
+            )
+            if not latest:
+                logger.warning("No completed workflow run before the timeout")
+                break
+            run = latest
             attempts += 1
-            
-            # Get latest workflow run
-            run = await self._get_latest_workflow_run(workflow_file)
-            if not run:
-                logger.warning("No workflow runs found")
-                await asyncio.sleep(30)
-                continue
-            
-            status = WorkflowStatus(run["status"])
             conclusion = run.get("conclusion")
             
-            logger.info(
-                f"Workflow run {run['id']} - Status: {status.value}, "
-                f"Conclusion: {conclusion}"
-            )
-            
-            # Wait if still running
-            if status in [WorkflowStatus.QUEUED, WorkflowStatus.IN_PROGRESS]:
-                logger.info("Workflow still running, waiting...")
-                await asyncio.sleep(30)
-                continue
+            logger.info(f"Workflow run {run['id']} completed - Conclusion: {conclusion}")
             
             # Check if successful
             if conclusion == "success":
@@ -170,9 +169,9 @@ class GitHubActionsMonitor:
                         logger.error(f"Failed to apply fix: {fix_attempt.error}")
                 
                 if fixes_applied:
-                    # Wait for new workflow to start
+                    # The fix's push triggers a new run
                     logger.info("Fixes applied, waiting for new workflow run...")
-                    await asyncio.sleep(60)
+                    handled_run_id = run["id"]
                 else:
                     logger.error("No fixes could be applied")
                     break
@@ -185,7 +184,7 @@ class GitHubActionsMonitor:
             "success": False,
             "attempts": attempts,
             "fix_history": self.fix_history,
-            "final_run_id": run["id"] if 'run' in locals() else None,
+            "final_run_id": run["id"] if run else None,
             "duration": (datetime.utcnow() - start_time).total_seconds(),
             "reason": "timeout" if attempts < self.max_fix_attempts else "max_attempts"
         }
@@ -5,18 +5,22 @@ GitHub API endpoints for pushing capsules to repositories
 """
 
 import os
+import hmac
+import hashlib
 import json
 from typing import Optional
 from datetime import datetime
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, Request
 from pydantic import BaseModel, Field
 import structlog
 
+from src.common.config import settings
 from src.common.database import get_db
 from src.common.auth import get_current_user
 from src.orchestrator.github_integration import GitHubService
 from src.orchestrator.github_integration_v2 import GitHubIntegrationV2
 from src.orchestrator.enhanced_github_integration import EnhancedGitHubIntegration
+from src.orchestrator.workflow_run_watcher import ci_watcher
 
 logger = structlog.get_logger()
 
@@ -460,6 +464,43 @@ async def check_github_token(
         }
 
 
+# Deliveries that can change a workflow run's state
+CI_WEBHOOK_EVENTS = {"workflow_run", "check_suite"}
+
+
+@router.post("/webhook")
+async def github_webhook(
+    request: Request,
+    x_github_event: str = Header(...),
+    x_hub_signature_256: Optional[str] = Header(None)
+):
+    """Receive GitHub webhook deliveries that wake CI monitors
+    
+    Events only trigger an immediate poll of the repository's runs, so run
+    state always comes from the API. With GITHUB_WEBHOOK_SECRET set, unsigned
+    or wrongly signed deliveries are rejected.
+    """
+    body = await request.body()
+    
+    if settings.GITHUB_WEBHOOK_SECRET:
+        expected = "sha256=" + hmac.new(
+            settings.GITHUB_WEBHOOK_SECRET.encode(), body, hashlib.sha256
+        ).hexdigest()
+        if not x_hub_signature_256 or not hmac.compare_digest(expected, x_hub_signature_256):
+            raise HTTPException(status_code=401, detail="Invalid webhook signature")
+    
+    if x_github_event not in CI_WEBHOOK_EVENTS:
+        return {"accepted": False, "event": x_github_event}
+    
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON payload")
+    
+    await ci_watcher.publish_event(x_github_event, payload)
+    return {"accepted": True, "event": x_github_event}
+
+
 @router.post("/push-and-deploy")
 async def push_and_deploy_capsule(
     request: GitHubPushRequest,
@@ -2,23 +2,36 @@
 """
 GitHub Integration v2 - Using Git Data API for atomic commits
 Creates all files in a single commit to avoid conflicts
+
+Blob SHAs are computed locally, so blobs the repository already has are never
+re-sent; small files go inline in the tree request and the rest are uploaded
+in parallel over one pooled session that waits out GitHub rate limits.
 """
 
 import os
 import base64
+import hashlib
 import json
-from typing import Dict, Any, Optional, List
+import time
+from typing import Dict, Any, Optional, List, Set, Tuple
 from datetime import datetime
 import aiohttp
 import asyncio
 from pathlib import Path
 import structlog
 
+from src.common.config import settings
 from src.common.models import QLCapsule
 
 logger = structlog.get_logger()
 
 
+def git_blob_sha(content: str) -> str:
+    """SHA git gives the blob of content, the same one GitHub returns"""
+    data = content.encode("utf-8")
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
 class GitHubIntegrationV2:
     """Improved GitHub integration using Git Data API"""
     
@@ -33,6 +46,72 @@ class GitHubIntegrationV2:
             "Accept": "application/vnd.github.v3+json"
         }
         self._token_validated = False
+        
+        # Git Data API requests share one pooled session
+        self.blob_concurrency = settings.GITHUB_BLOB_CONCURRENCY
+        self.inline_blob_bytes = settings.GITHUB_INLINE_BLOB_BYTES
+        # Inlined content per tree request, well under GitHub's payload limit
+        self.max_inline_tree_bytes = 4 * 1024 * 1024
+        self.max_retries = 5
+        self.max_rate_limit_wait = settings.GITHUB_MAX_RATE_LIMIT_WAIT
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._rate_limited_until = 0.0
+    
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.blob_concurrency * 2),
+                timeout=aiohttp.ClientTimeout(total=60)
+            )
+        return self._session
+    
+    async def close(self):
+        """Close the pooled session"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+    
+    async def _rate_limit_wait(self, response: aiohttp.ClientResponse) -> Optional[float]:
+        """Seconds to wait before retrying a rate-limited response, None if it was not"""
+        if response.status not in (403, 429):
+            return None
+        
+        retry_after = response.headers.get("Retry-After")
+        if retry_after:
+            wait = float(retry_after)
+        elif response.headers.get("X-RateLimit-Remaining") == "0":
+            wait = float(response.headers.get("X-RateLimit-Reset", 0)) - time.time()
+        elif response.status == 429 or "rate limit" in (await response.text()).lower():
+            # Secondary limits without headers: GitHub asks for at least a minute
+            wait = 60.0
+        else:
+            return None
+        return min(max(wait, 1.0), self.max_rate_limit_wait)
+    
+    async def _request(self, method: str, path: str, **kwargs) -> Tuple[int, Any]:
+        """Request over the pooled session, retrying after rate limits
+        
+        Returns the status and the JSON body (text if the body is not JSON).
+        A rate limit seen by one request pauses all requests of this integration.
+        """
+        session = self._get_session()
+        for attempt in range(self.max_retries + 1):
+            delay = self._rate_limited_until - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            
+            async with session.request(
+                method, f"{self.api_base}{path}", headers=self.headers, **kwargs
+            ) as response:
+                wait = await self._rate_limit_wait(response)
+                if wait is None or attempt == self.max_retries:
+                    try:
+                        return response.status, await response.json(content_type=None)
+                    except ValueError:
+                        return response.status, await response.text()
+            
+            logger.warning("GitHub rate limit hit, waiting", path=path, wait_seconds=wait)
+            self._rate_limited_until = max(self._rate_limited_until, time.monotonic() + wait)
     
     async def create_repository(
         self,
@@ -131,79 +210,127 @@ class GitHubIntegrationV2:
         self,
         owner: str,
         repo: str,
-        files: Dict[str, str]
+        files: Dict[str, str],
+        existing_blobs: Optional[Set[str]] = None
     ) -> str:
-        """Create a tree with all files"""
+        """Create a tree with all files
         
+        Files whose blob is in existing_blobs are referenced by SHA without
+        being sent, small files are inlined in the tree request, and the rest
+        are uploaded in parallel, once per distinct content.
+        """
+        existing_blobs = existing_blobs or set()
+        inline_budget = self.max_inline_tree_bytes
         tree = []
+        uploads = {}
+        reused = inlined = 0
+        
         for path, content in files.items():
-            # Create blob for file content
-            blob_data = {
-                "content": content,
-                "encoding": "utf-8"
+            entry = {
+                "path": path,
+                "mode": "100644",  # Regular file
+                "type": "blob"
             }
-            
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.api_base}/repos/{owner}/{repo}/git/blobs",
-                    headers=self.headers,
-                    json=blob_data
-                ) as response:
-                    if response.status == 201:
-                        blob = await response.json()
-                        tree.append({
-                            "path": path,
-                            "mode": "100644",  # Regular file
-                            "type": "blob",
-                            "sha": blob["sha"]
-                        })
-                    else:
-                        error = await response.text()
-                        raise Exception(f"Failed to create blob for {path}: {error}")
+            sha = git_blob_sha(content)
+            size = len(content.encode("utf-8"))
+            if sha in existing_blobs:
+                entry["sha"] = sha
+                reused += 1
+            elif size <= self.inline_blob_bytes and size <= inline_budget:
+                entry["content"] = content
+                inline_budget -= size
+                inlined += 1
+            else:
+                entry["sha"] = sha
+                uploads[sha] = content
+            tree.append(entry)
+        
+        created = await self._create_blobs(owner, repo, uploads)
+        for entry in tree:
+            if entry.get("sha") in created:
+                entry["sha"] = created[entry["sha"]]
+        
+        logger.info("Prepared tree", files=len(files), reused=reused, inlined=inlined, uploaded=len(uploads))
         
         # Create tree
-        tree_data = {"tree": tree}
+        status, tree_result = await self._request(
+            "POST", f"/repos/{owner}/{repo}/git/trees", json={"tree": tree}
+        )
+        if status == 201:
+            return tree_result["sha"]
+        raise Exception(f"Failed to create tree: {tree_result}")
+    
+    async def _create_blobs(self, owner: str, repo: str, contents: Dict[str, str]) -> Dict[str, str]:
+        """Upload blobs with bounded concurrency; maps local SHA to GitHub's"""
+        semaphore = asyncio.Semaphore(self.blob_concurrency)
         
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                f"{self.api_base}/repos/{owner}/{repo}/git/trees",
-                headers=self.headers,
-                json=tree_data
-            ) as response:
-                if response.status == 201:
-                    tree_result = await response.json()
-                    return tree_result["sha"]
-                else:
-                    error = await response.text()
-                    raise Exception(f"Failed to create tree: {error}")
+        async def create(sha: str, content: str):
+            async with semaphore:
+                status, blob = await self._request(
+                    "POST", f"/repos/{owner}/{repo}/git/blobs",
+                    json={"content": content, "encoding": "utf-8"}
+                )
+            if status != 201:
+                raise Exception(f"Failed to create blob {sha}: {blob}")
+            return sha, blob["sha"]
+        
+        return dict(await asyncio.gather(*(create(sha, content) for sha, content in contents.items())))
     
-    async def create_initial_commit(
+    async def get_branch_head(self, owner: str, repo: str, branch: str) -> Optional[Dict[str, str]]:
+        """Commit and tree SHAs at the tip of a branch, None if it has no commits"""
+        status, ref = await self._request("GET", f"/repos/{owner}/{repo}/git/ref/heads/{branch}")
+        if status != 200:
+            # 404 for a missing branch, 409 for a repository without commits
+            return None
+        
+        commit_sha = ref["object"]["sha"]
+        status, commit = await self._request("GET", f"/repos/{owner}/{repo}/git/commits/{commit_sha}")
+        if status != 200:
+            raise Exception(f"Failed to get commit {commit_sha}: {commit}")
+        return {"commit_sha": commit_sha, "tree_sha": commit["tree"]["sha"]}
+    
+    async def get_tree_blobs(self, owner: str, repo: str, tree_sha: str) -> Set[str]:
+        """SHAs of all blobs in a tree, to skip uploading unchanged files"""
+        status, tree = await self._request(
+            "GET", f"/repos/{owner}/{repo}/git/trees/{tree_sha}", params={"recursive": "1"}
+        )
+        if status != 200:
+            logger.warning(f"Could not read tree {tree_sha}, uploading all files")
+            return set()
+        return {entry["sha"] for entry in tree.get("tree", []) if entry.get("type") == "blob"}
+    
+    async def create_commit(
         self,
         owner: str,
         repo: str,
         tree_sha: str,
-        message: str
+        message: str,
+        parents: Optional[List[str]] = None
     ) -> str:
-        """Create the initial commit"""
+        """Create a commit of tree_sha on top of parents"""
         
         commit_data = {
             "message": message,
             "tree": tree_sha,
-            "parents": []  # No parents for initial commit
+            "parents": parents or []
         }
         
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                f"{self.api_base}/repos/{owner}/{repo}/git/commits",
-                headers=self.headers,
-                json=commit_data
-            ) as response:
-                if response.status == 201:
-                    commit = await response.json()
-                    return commit["sha"]
-                else:
-                    error = await response.text()
-                    raise Exception(f"Failed to create commit: {error}")
+        status, commit = await self._request(
+            "POST", f"/repos/{owner}/{repo}/git/commits", json=commit_data
+        )
+        if status == 201:
+            return commit["sha"]
+        raise Exception(f"Failed to create commit: {commit}")
+    
+    async def create_initial_commit(
+        self,
+        owner: str,
+        repo: str,
+        tree_sha: str,
+        message: str
+    ) -> str:
+        """Create the initial commit"""
+        return await self.create_commit(owner, repo, tree_sha, message)
     
     async def update_reference(
         self,
@@ -214,63 +341,39 @@ class GitHubIntegrationV2:
     ) -> bool:
         """Update the reference to point to the new commit"""
         
-        ref_data = {
-            "sha": commit_sha,
-            "force": False
-        }
-        
-        async with aiohttp.ClientSession() as session:
-            # First try to create the reference
-            async with session.post(
-                f"{self.api_base}/repos/{owner}/{repo}/git/refs",
-                headers=self.headers,
-                json={"ref": ref, "sha": commit_sha}
-            ) as response:
-                if response.status == 201:
-                    return True
-                elif response.status == 422:
-                    # Reference exists, update it
-                    async with session.patch(
-                        f"{self.api_base}/repos/{owner}/{repo}/git/{ref}",
-                        headers=self.headers,
-                        json=ref_data
-                    ) as update_response:
-                        return update_response.status == 200
-                else:
-                    error = await response.text()
-                    logger.error(f"Failed to create/update reference: {error}")
-                    return False
+        # First try to create the reference
+        status, error = await self._request(
+            "POST", f"/repos/{owner}/{repo}/git/refs", json={"ref": ref, "sha": commit_sha}
+        )
+        if status == 201:
+            return True
+        elif status == 422:
+            # Reference exists, update it
+            status, error = await self._request(
+                "PATCH", f"/repos/{owner}/{repo}/git/{ref}", json={"sha": commit_sha, "force": False}
+            )
+            if status == 200:
+                return True
+        logger.error(f"Failed to create/update reference: {error}")
+        return False
     
-    async def _is_repo_empty(self, owner: str, repo: str) -> bool:
-        """Check if repository is empty (no commits)"""
-        try:
-            async with aiohttp.ClientSession() as session:
-                # Try to get the default branch
-                async with session.get(
-                    f"{self.api_base}/repos/{owner}/{repo}",
-                    headers=self.headers
-                ) as response:
-                    if response.status == 200:
-                        repo_data = await response.json()
-                        # Check if default branch exists
-                        default_branch = repo_data.get('default_branch')
-                        if not default_branch:
-                            return True
-                        
-                        # Try to get commits
-                        async with session.get(
-                            f"{self.api_base}/repos/{owner}/{repo}/commits",
-                            headers=self.headers
-                        ) as commits_response:
-                            if commits_response.status == 404 or commits_response.status == 409:
-                                return True
-                            elif commits_response.status == 200:
-                                commits = await commits_response.json()
-                                return len(commits) == 0
-                    return True
-        except Exception as e:
-            logger.debug(f"Error checking if repo is empty: {e}")
-            return True  # Assume empty on error
+    async def _initialize_repository(self, owner: str, repo: str, branch: str,
+                                     path: str, content: str) -> None:
+        """Create the first commit of an empty repository
+        
+        The Git Data API cannot write to a repository without commits, so a
+        single file goes through the contents API first.
+        """
+        status, result = await self._request(
+            "PUT", f"/repos/{owner}/{repo}/contents/{path}",
+            json={
+                "message": "Initial commit",
+                "content": base64.b64encode(content.encode("utf-8")).decode("ascii"),
+                "branch": branch
+            }
+        )
+        if status not in (200, 201):
+            raise Exception(f"Failed to initialize repository {owner}/{repo}: {result}")
     
     async def push_capsule_atomic(
         self,
@@ -364,57 +467,48 @@ class GitHubIntegrationV2:
             owner = repo['owner']['login']
             repo_name = repo['name']
             
+            branch = repo.get('default_branch') or settings.GITHUB_DEFAULT_BRANCH
+            
             try:
-                # Check if repository is empty
-                is_empty = await self._is_repo_empty(owner, repo_name)
+                head = await self.get_branch_head(owner, repo_name, branch)
+                if head is None:
+                    logger.info("Repository is empty, creating its first commit")
+                    await self._initialize_repository(owner, repo_name, branch, ".gitignore", files[".gitignore"])
+                    head = await self.get_branch_head(owner, repo_name, branch)
+                    if head is None:
+                        raise Exception(f"Branch {branch} missing after initializing {owner}/{repo_name}")
                 
-                if is_empty:
-                    # For empty repos, fall back to regular file creation
-                    logger.info("Repository is empty, using regular file creation method")
-                    
-                    # Use the parent class's push method which handles empty repos
-                    from . import github_integration
-                    legacy_integration = github_integration.GitHubIntegration(self.token)
-                    legacy_integration.headers = self.headers
-                    
-                    result = await legacy_integration.push_capsule(
-                        capsule, repo_name, repo['private']
-                    )
-                    
-                    return {
-                        "repository_url": result["repository_url"],
-                        "clone_url": result["clone_url"],
-                        "ssh_url": result["ssh_url"],
-                        "owner": owner,
-                        "name": repo_name,
-                        "private": repo['private'],
-                        "files_created": result["files_created"],
-                        "commit_sha": "initial"
-                    }
+                # Create tree with all files, reusing blobs the repository already has
+                existing_blobs = await self.get_tree_blobs(owner, repo_name, head["tree_sha"])
+                tree_sha = await self.create_tree(owner, repo_name, files, existing_blobs)
+                
+                if tree_sha == head["tree_sha"]:
+                    # Nothing changed since the last push
+                    logger.info(f"Capsule already up to date at {repo['html_url']}")
+                    commit_sha = head["commit_sha"]
                 else:
-                    # Repository has commits, use atomic approach
-                    # Create tree with all files
-                    tree_sha = await self.create_tree(owner, repo_name, files)
-                    
                     # Create commit
                     commit_message = f"Update: {capsule.manifest.get('name', 'QLCapsule')}\n\nGenerated by Quantum Layer Platform"
-                    commit_sha = await self.create_initial_commit(owner, repo_name, tree_sha, commit_message)
+                    commit_sha = await self.create_commit(
+                        owner, repo_name, tree_sha, commit_message, [head["commit_sha"]]
+                    )
                     
-                    # Update main branch reference
-                    await self.update_reference(owner, repo_name, commit_sha)
+                    # Update branch reference
+                    if not await self.update_reference(owner, repo_name, commit_sha, f"refs/heads/{branch}"):
+                        raise Exception(f"Failed to update {branch} of {owner}/{repo_name}")
                     
                     logger.info(f"Successfully pushed capsule to {repo['html_url']}")
-                    
-                    return {
-                        "repository_url": repo['html_url'],
-                        "clone_url": repo['clone_url'],
-                        "ssh_url": repo['ssh_url'],
-                        "owner": owner,
-                        "name": repo_name,
-                        "private": repo['private'],
-                        "files_created": len(files),
-                        "commit_sha": commit_sha
-                    }
+                
+                return {
+                    "repository_url": repo['html_url'],
+                    "clone_url": repo['clone_url'],
+                    "ssh_url": repo['ssh_url'],
+                    "owner": owner,
+                    "name": repo_name,
+                    "private": repo['private'],
+                    "files_created": len(files),
+                    "commit_sha": commit_sha
+                }
                 
             except Exception as e:
                 logger.error(f"Failed to push capsule: {e}")
@@ -423,6 +517,8 @@ class GitHubIntegrationV2:
         except Exception as e:
             logger.error(f"Failed to push capsule: {e}")
             raise
+        finally:
+            await self.close()
     
     def _generate_gitignore(self, capsule: QLCapsule) -> str:
         """Generate appropriate .gitignore file"""
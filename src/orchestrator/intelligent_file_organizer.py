@@ -1,21 +1,44 @@
 """
 Intelligent File Organization using LLM
 Universal file categorization and organization for any language/framework
+
+Unambiguous outputs (a Python module, or a Python test file) are organized by
+deterministic rules; the LLM handles the rest, and its answers are cached by
+content hash so retried or repeated capsules don't pay for them again.
 """
 
+import ast
+import hashlib
 import json
 import logging
-from typing import Dict, Any, List, Optional, Tuple
+import re
+import sys
+from typing import Dict, Any, Iterable, List, Optional, Tuple
 from dataclasses import dataclass
 from enum import Enum
 
 import structlog
 from openai import AsyncOpenAI, AsyncAzureOpenAI
+from prometheus_client import Counter
 
 from src.common.config import settings
+from src.common.tiered_cache import TieredCache
 
 logger = structlog.get_logger()
 
+# Bump to invalidate cached organizations, e.g. when the prompt changes
+ORGANIZER_VERSION = "1"
+
+FILE_CATEGORIES = ('source_files', 'test_files', 'doc_files', 'config_files', 'script_files')
+
+TEST_TASK_TYPES = {'test_creation', 'test_generation'}
+
+file_organizer_requests = Counter(
+    'qlp_file_organizer_requests_total',
+    'Task outputs organized, by how the organization was obtained',
+    ['method']
+)
+
 
 class FileType(Enum):
     SOURCE = "source"
@@ -38,6 +61,7 @@ class FileAnalysis:
     suggested_files: List[Dict[str, Any]]
     language_insights: Dict[str, Any]
     confidence: float
+    fallback: bool = False
 
 
 class IntelligentFileOrganizer:
@@ -248,67 +272,245 @@ IMPORTANT:
             contains_documentation=False,
             suggested_files=suggested_files,
             language_insights={},
-            confidence=0.3
+            confidence=0.3,
+            fallback=True
         )
 
 
+def _strip_code_fence(code: str) -> str:
+    stripped = code.strip()
+    if stripped.startswith("```"):
+        lines = stripped.split("\n")[1:]
+        if lines and lines[-1].strip() == "```":
+            lines = lines[:-1]
+        return "\n".join(lines)
+    return code
+
+
+def _module_slug(task_context: Dict[str, Any]) -> str:
+    slug = re.sub(r"\W+", "_", str(task_context.get('task_id') or "")).strip("_").lower()
+    if not slug:
+        return "module"
+    return slug if slug[0].isalpha() else f"task_{slug}"
+
+
+def python_module_imports(codes: Iterable[str]) -> Dict[str, List[str]]:
+    """
+    Names the given outputs import from each local module
+    
+    Covers ``from calculator import add`` and ``import calculator`` followed by
+    ``calculator.add``; standard library and relative imports are skipped.
+    """
+    imports: Dict[str, set] = {}
+    for code in codes:
+        try:
+            tree = ast.parse(_strip_code_fence(code))
+        except (SyntaxError, ValueError):
+            continue
+        aliases = {}
+        for node in ast.walk(tree):
+            if isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                if node.module.split(".")[0] not in sys.stdlib_module_names:
+                    imports.setdefault(node.module, set()).update(a.name for a in node.names if a.name != "*")
+            elif isinstance(node, ast.Import):
+                for alias in node.names:
+                    if alias.name.split(".")[0] not in sys.stdlib_module_names:
+                        aliases[alias.asname or alias.name] = alias.name
+                        imports.setdefault(alias.name, set())
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Attribute):
+                target = ast.unparse(node.value) if isinstance(node.value, (ast.Name, ast.Attribute)) else None
+                if target in aliases:
+                    imports[aliases[target]].add(node.attr)
+    return {module: sorted(names) for module, names in imports.items()}
+
+
+def _module_filename(tree: ast.Module, project_context: Dict[str, Any]) -> Optional[str]:
+    """
+    File name of a module, from the module other outputs import its names from
+    
+    None when no module or more than one fits, e.g. when nothing imports it yet.
+    """
+    defined = set()
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            defined.add(node.name)
+        elif isinstance(node, (ast.Assign, ast.AnnAssign)):
+            targets = node.targets if isinstance(node, ast.Assign) else [node.target]
+            defined.update(t.id for t in targets if isinstance(t, ast.Name))
+    
+    candidates = [
+        module for module, names in (project_context.get('python_imports') or {}).items()
+        if names and set(names) <= defined
+    ]
+    if len(candidates) != 1:
+        return None
+    return candidates[0].replace(".", "/") + ".py"
+
+
+def _is_test_definition(node: ast.AST) -> bool:
+    if isinstance(node, ast.ClassDef):
+        return node.name.startswith("Test")
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+        if node.name.startswith("test"):
+            return True
+        # pytest fixtures belong with the tests that use them
+        return any("fixture" in ast.unparse(decorator) for decorator in node.decorator_list)
+    return False
+
+
+def organize_with_rules(
+    code: str,
+    task_context: Dict[str, Any],
+    project_context: Dict[str, Any]
+) -> Optional[Dict[str, Dict[str, str]]]:
+    """
+    Organize an output without the LLM when the answer is obvious
+    
+    Handles single-file Python modules and Python test files whose tests follow
+    the test_*/Test* naming. A module is named after the module the other
+    outputs import its names from (``project_context['python_imports']``, see
+    python_module_imports), so the tests' imports resolve. Returns None for
+    anything ambiguous (mixed tests and implementation, modules nothing
+    imports by name, other languages, unparsable code), which the LLM decides.
+    """
+    language = (task_context.get('language') or project_context.get('language') or '').lower()
+    if language not in ('python', 'py'):
+        return None
+    
+    code = _strip_code_fence(code)
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError):
+        return None
+    
+    definitions = [
+        node for node in tree.body
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))
+    ]
+    tests = [node for node in definitions if _is_test_definition(node)]
+    implementation = [node for node in definitions if not _is_test_definition(node)]
+    is_test_task = (
+        task_context.get('type', '').lower() in TEST_TASK_TYPES
+        or task_context.get('metadata', {}).get('tdd_phase') == 'test_generation'
+    )
+    
+    files = {category: {} for category in FILE_CATEGORIES}
+    slug = _module_slug(task_context)
+    if tests and not implementation:
+        files['test_files'][f"{slug}.py" if slug.startswith("test") else f"test_{slug}.py"] = code
+    elif implementation and not tests and not is_test_task:
+        filename = _module_filename(tree, project_context)
+        if filename is None:
+            return None
+        files['source_files'][filename] = code
+    else:
+        return None
+    return files
+
+
+class OrganizationCache:
+    """LLM file organizations keyed by content hash: in-process LRU, then Redis"""
+    
+    def __init__(self, max_entries: int = 2048, ttl_seconds: int = 7 * 24 * 3600,
+                 redis_url: Optional[str] = None):
+        self.store = TieredCache("File organization cache", max_entries=max_entries,
+                                 ttl_seconds=ttl_seconds, redis_url=redis_url)
+    
+    @staticmethod
+    def key(code: str, task_context: Dict[str, Any], project_context: Dict[str, Any]) -> str:
+        shape = "\x00".join([
+            str(task_context.get('type', '')),
+            str(task_context.get('language', '')),
+            str(project_context.get('language', '')),
+            str(project_context.get('architecture_pattern', '')),
+            code
+        ])
+        digest = hashlib.sha256(shape.encode("utf-8")).hexdigest()
+        return f"qlp:organizer:{ORGANIZER_VERSION}:{digest}"
+    
+    async def get(self, key: str) -> Optional[Dict[str, Dict[str, str]]]:
+        return await self.store.get(key)
+    
+    async def put(self, key: str, files: Dict[str, Dict[str, str]]):
+        await self.store.put(key, files)
+
+
+organization_cache = OrganizationCache(
+    ttl_seconds=settings.FILE_ORGANIZER_CACHE_TTL_SECONDS,
+    redis_url=settings.REDIS_URL
+)
+
+_organizer: Optional[IntelligentFileOrganizer] = None
+
+
+def _get_organizer() -> IntelligentFileOrganizer:
+    """One organizer (and LLM connection pool) per process"""
+    global _organizer
+    if _organizer is None:
+        _organizer = IntelligentFileOrganizer()
+    return _organizer
+
+
 async def organize_code_intelligently(
     code: str,
     task_context: Dict[str, Any],
     project_context: Dict[str, Any]
 ) -> Dict[str, Any]:
     """
-    Main function to organize code intelligently using LLM
+    Main function to organize code intelligently
+    
+    Tries the deterministic rules first, then the content-hash cache, and only
+    then asks the LLM.
     
     Returns dict with:
     - source_files: Dict[filename, content]
     - test_files: Dict[filename, content]
     - doc_files: Dict[filename, content]
     - config_files: Dict[filename, content]
-    - analysis: The full FileAnalysis object
+    - script_files: Dict[filename, content]
+    - analysis: The full FileAnalysis object (LLM organizations only)
+    - method: "rules", "cache" or "llm"
     """
     
-    organizer = IntelligentFileOrganizer()
-    analysis = await organizer.analyze_and_organize_code(
+    files = organize_with_rules(code, task_context, project_context)
+    if files is not None:
+        file_organizer_requests.labels(method="rules").inc()
+        return {**files, 'analysis': None, 'method': 'rules', 'success': True}
+    
+    cache_key = OrganizationCache.key(code, task_context, project_context)
+    files = await organization_cache.get(cache_key)
+    if files is not None:
+        file_organizer_requests.labels(method="cache").inc()
+        return {**files, 'analysis': None, 'method': 'cache', 'success': True}
+    
+    file_organizer_requests.labels(method="llm").inc()
+    analysis = await _get_organizer().analyze_and_organize_code(
         code, task_context, project_context
     )
     
     # Organize files by type
-    source_files = {}
-    test_files = {}
-    doc_files = {}
-    config_files = {}
-    script_files = {}
+    files = {category: {} for category in FILE_CATEGORIES}
+    category_by_type = {
+        'test': 'test_files',
+        'documentation': 'doc_files',
+        'config': 'config_files',
+        'script': 'script_files'
+    }
     
     for file_info in analysis.suggested_files:
-        filename = file_info['filename']
-        content = file_info['content']
-        file_type = file_info.get('file_type', 'source')
-        
-        if file_type == 'test':
-            test_files[filename] = content
-        elif file_type == 'documentation':
-            doc_files[filename] = content
-        elif file_type == 'config':
-            config_files[filename] = content
-        elif file_type == 'script':
-            script_files[filename] = content
-        else:
-            source_files[filename] = content
+        category = category_by_type.get(file_info.get('file_type', 'source'), 'source_files')
+        files[category][file_info['filename']] = file_info['content']
+    
+    # A failed LLM call yields a placeholder organization; let the next run retry it
+    if not analysis.fallback:
+        await organization_cache.put(cache_key, files)
     
     logger.info(
-        f"Organized code into {len(source_files)} source, "
-        f"{len(test_files)} test, {len(doc_files)} doc files",
+        f"Organized code into {len(files['source_files'])} source, "
+        f"{len(files['test_files'])} test, {len(files['doc_files'])} doc files",
         confidence=analysis.confidence,
         language=analysis.language_insights.get('detected_language', 'unknown')
     )
     
-    return {
-        'source_files': source_files,
-        'test_files': test_files,
-        'doc_files': doc_files,
-        'config_files': config_files,
-        'script_files': script_files,
-        'analysis': analysis,
-        'success': True
-    }
\ No newline at end of file
+    return {**files, 'analysis': analysis, 'method': 'llm', 'success': True}
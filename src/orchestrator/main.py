@@ -12,7 +12,7 @@ import time
 import os
 from uuid import UUID, uuid4
 
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Header
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from fastapi.encoders import jsonable_encoder
@@ -22,7 +22,11 @@ from temporalio.client import Client
 from temporalio.worker import Worker
 from temporalio.client import WorkflowHandle
 # from temporalio.exceptions import WorkflowNotFoundError  # Not available in this version
-from src.common.temporal_cloud import get_temporal_client as get_temporal_client_cloud
+from src.common.temporal_cloud import (
+    get_temporal_client as get_temporal_client_cloud,
+    get_shared_temporal_client,
+    temporal_client_manager
+)
 import structlog
 from src.common.structured_logging import setup_logging, LogContext, log_api_request
 from src.common.logging_middleware import setup_request_logging
@@ -49,6 +53,7 @@ from src.memory.client import VectorMemoryClient
 from src.agents.client import AgentFactoryClient
 from src.validation.client import ValidationMeshClient
 from src.orchestrator.github_actions_integration import GitHubActionsIntegration, integrate_ci_confidence
+from src.orchestrator.workflow_status import terminal_snapshot, workflow_status_store
 # from src.orchestrator.aitl_endpoints import include_aitl_routes
 from src.nlp.extended_advanced_patterns import ExtendedAdvancedUniversalNLPEngine
 from src.orchestrator.progress_endpoints import register_progress_endpoints
@@ -86,14 +91,17 @@ async def startup_event():
     """Initialize shared resources at startup"""
     with LogContext(event="startup", phase="temporal_connection"):
         logger.info("Starting up orchestrator, connecting to Temporal")
-    try:
-        app.state.temporal_client = await get_temporal_client_cloud()
-        logger.info("Connected to Temporal successfully", 
-                   temporal_address=os.getenv("TEMPORAL_ADDRESS", "temporal:7233"))
-    except Exception as e:
-        logger.error("Failed to connect to Temporal", error=e)
-        # Don't raise, allow app to start but log the error
-        app.state.temporal_client = None
+    # Failed connections keep retrying in the background; the app starts regardless
+    await temporal_client_manager.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release shared resources"""
+    await temporal_client_manager.stop()
+    # Write LLM costs still buffered in memory
+    from src.common.cost_calculator_persistent import persistent_cost_calculator
+    await persistent_cost_calculator.close()
 
 # Setup production middleware (includes CORS, security headers, monitoring, etc.)
 setup_middleware(app)
@@ -1552,10 +1560,11 @@ async def execute_request(request: ExecutionRequest):
     """
     try:
         # HAP Content Check
-        from src.moderation import check_content, CheckContext, Severity
+        from src.moderation import check_content, screening_record, CheckContext, Severity
         
+        hap_content = f"{request.description} {request.requirements or ''}"
         hap_result = await check_content(
-            content=f"{request.description} {request.requirements or ''}",
+            content=hap_content,
             context=CheckContext.USER_REQUEST,
             user_id=request.user_id,
             tenant_id=request.tenant_id
@@ -1590,8 +1599,8 @@ async def execute_request(request: ExecutionRequest):
                 severity=hap_result.severity,
                 categories=hap_result.categories
             )
-        # Initialize Temporal client
-        temporal_client = await get_temporal_client_cloud()
+        # Shared app-lifetime Temporal client
+        temporal_client = await get_shared_temporal_client()
         
         # Start workflow
         handle = await temporal_client.start_workflow(
@@ -1604,7 +1613,8 @@ async def execute_request(request: ExecutionRequest):
                 "requirements": request.requirements,
                 "constraints": request.constraints,
                 "metadata": request.metadata,
-                "tier_override": request.tier_override  # Pass tier override to workflow
+                "tier_override": request.tier_override,  # Pass tier override to workflow
+                "hap_check": screening_record(hap_content, hap_result)  # Reused by decomposition
             },
             id=f"qlp-execution-{request.id}",
             task_queue=settings.TEMPORAL_TASK_QUEUE
@@ -1625,7 +1635,7 @@ async def execute_request(request: ExecutionRequest):
 async def get_status(workflow_id: str):
     """Get workflow execution status"""
     try:
-        temporal_client = await get_temporal_client_cloud()
+        temporal_client = await get_shared_temporal_client()
         handle = temporal_client.get_workflow_handle(workflow_id)
         
         description = await handle.describe()
@@ -1646,7 +1656,7 @@ async def get_status(workflow_id: str):
 async def approve_execution(workflow_id: str):
     """Approve a workflow execution plan"""
     try:
-        temporal_client = await get_temporal_client_cloud()
+        temporal_client = await get_shared_temporal_client()
         handle = temporal_client.get_workflow_handle(workflow_id)
         
         await handle.signal("human_approval", True)
@@ -1661,12 +1671,13 @@ async def approve_execution(workflow_id: str):
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    temporal_status = "connected" if hasattr(app.state, 'temporal_client') and app.state.temporal_client else "disconnected"
+    temporal_status = "connected" if temporal_client_manager.is_connected else "disconnected"
     return {
         "status": "healthy", 
         "service": "meta-orchestrator",
         "temporal_status": temporal_status,
-        "temporal_server": settings.TEMPORAL_SERVER
+        "temporal_server": settings.TEMPORAL_SERVER,
+        "temporal_pool": temporal_client_manager.get_stats()
     }
 
 @app.post("/test-marketing-no-auth")
@@ -1715,14 +1726,11 @@ async def test_marketing_no_auth(
 async def test_temporal_marketing():
     """Test Temporal connection for marketing workflows"""
     try:
-        # First, check if we have a client in app state
-        has_client = hasattr(app.state, 'temporal_client')
-        client_exists = has_client and app.state.temporal_client is not None
+        client_exists = temporal_client_manager.is_connected
         
-        logger.info(f"Testing Temporal - has_client: {has_client}, client_exists: {client_exists}")
+        logger.info(f"Testing Temporal - pool: {temporal_client_manager.get_stats()}")
         
-        # Try creating a new client for this test
-        temporal_client = await get_temporal_client_cloud()
+        temporal_client = await get_shared_temporal_client()
         
         # Try to start a simple marketing workflow
         from src.orchestrator.marketing_workflow import MarketingWorkflowRequest, MarketingWorkflow
@@ -1762,42 +1770,95 @@ async def test_temporal_marketing():
             "status": "error",
             "error": str(e),
             "type": type(e).__name__,
-            "app_state_client": hasattr(app.state, 'temporal_client') and app.state.temporal_client is not None
+            "app_state_client": temporal_client_manager.is_connected
         }
 
 
+@app.get("/workflow/result/{workflow_id}")
+async def get_workflow_result(workflow_id: str):
+    """Full result of a completed workflow, stored once when it finished"""
+    result = await workflow_status_store.get_result(workflow_id)
+    if result is not None:
+        return result
+    
+    try:
+        temporal_client = await get_shared_temporal_client()
+        handle = temporal_client.get_workflow_handle(workflow_id)
+        describe = await handle.describe()
+    except Exception as e:
+        logger.error(f"Failed to describe workflow: {e}")
+        raise HTTPException(status_code=404, detail=f"Result not found for workflow: {workflow_id}")
+    
+    # Only completed workflows have a result; don't block on running ones
+    if describe.status.name != "COMPLETED":
+        raise HTTPException(
+            status_code=409,
+            detail=f"Workflow {workflow_id} is {describe.status.name}, no result available"
+        )
+    
+    try:
+        result = await handle.result()
+    except Exception as e:
+        logger.error(f"Failed to get workflow result: {e}")
+        raise HTTPException(status_code=404, detail=f"Result not found for workflow: {workflow_id}")
+    
+    await workflow_status_store.put_terminal(workflow_id, terminal_snapshot(
+        workflow_id, result,
+        started_at=describe.start_time.isoformat() if describe.start_time else None,
+        completed_at=describe.close_time.isoformat() if describe.close_time else None
+    ), result)
+    return result
+
+
 @app.get("/workflow/status/{workflow_id}")
 async def get_workflow_status(workflow_id: str):
     """
     Check the status of a running workflow
     
+    Finished workflows are answered from the stored status snapshot and running
+    ones from the workflow's progress query, so polls don't read workflow
+    history. Completed results are summarized; the full result is served by
+    reference from result_url.
+    
     Returns:
-        - status: "running", "completed", "failed", "not_found"
-        - result: The workflow result if completed
+        - status: "running", "completed", "partial" (some tasks failed), "failed", "not_found"
+        - result: Progress while running, the result summary once finished
+        - result_url: Where to fetch the full result once completed
         - error: Error message if failed
         - started_at: When the workflow started
         - workflow_id: The workflow ID
     """
     try:
-        temporal_client = await get_temporal_client_cloud()
+        snapshot = await workflow_status_store.get_snapshot(workflow_id)
+        if snapshot is not None:
+            return snapshot
+        
+        temporal_client = await get_shared_temporal_client()
         handle = temporal_client.get_workflow_handle(workflow_id)
         
-        # Get workflow description
+        try:
+            progress = await handle.query("get_status", rpc_timeout=timedelta(seconds=5))
+        except Exception:
+            # Not a projected workflow, not found, or already closed
+            progress = None
+        
+        if isinstance(progress, dict) and progress.get("current_stage") != "finished":
+            return {
+                "status": "running",
+                "workflow_id": workflow_id,
+                "started_at": progress.get("started_at"),
+                "workflow_status": "RUNNING",
+                "result": progress
+            }
+        
+        # Workflows without a snapshot: describe once and store the terminal state
         try:
             describe = await handle.describe()
             
             # Check if workflow is completed
             if describe.status.name == "COMPLETED":
                 try:
-                    # Get the result
                     result = await handle.result()
-                    return {
-                        "status": "completed",
-                        "workflow_id": workflow_id,
-                        "started_at": describe.start_time.isoformat() if describe.start_time else None,
-                        "completed_at": describe.close_time.isoformat() if describe.close_time else None,
-                        "result": result
-                    }
                 except Exception as e:
                     return {
                         "status": "completed",
@@ -1806,6 +1867,11 @@ async def get_workflow_status(workflow_id: str):
                         "completed_at": describe.close_time.isoformat() if describe.close_time else None,
                         "error": f"Failed to get result: {str(e)}"
                     }
+                return await workflow_status_store.put_terminal(workflow_id, terminal_snapshot(
+                    workflow_id, result,
+                    started_at=describe.start_time.isoformat() if describe.start_time else None,
+                    completed_at=describe.close_time.isoformat() if describe.close_time else None
+                ), result)
             
             elif describe.status.name == "FAILED":
                 return {
@@ -2958,8 +3024,8 @@ async def generate_complete_with_github(request: GitHubExecutionRequest):
             }
         }
         
-        # Initialize Temporal client
-        temporal_client = await get_temporal_client_cloud()
+        # Shared app-lifetime Temporal client
+        temporal_client = await get_shared_temporal_client()
         
         # Start workflow
         handle = await temporal_client.start_workflow(
@@ -3008,8 +3074,8 @@ async def generate_complete_with_github_sync(request: GitHubExecutionRequest):
             }
         }
         
-        # Initialize Temporal client
-        temporal_client = await get_temporal_client_cloud()
+        # Shared app-lifetime Temporal client
+        temporal_client = await get_shared_temporal_client()
         
         # Start workflow
         handle = await temporal_client.start_workflow(
@@ -3623,13 +3689,17 @@ async def deliver_capsule_advanced(
 async def stream_capsule(
     capsule_id: str,
     format: str = "tar.gz",
-    chunk_size: int = 8192,
+    chunk_size: int = 256 * 1024,
+    range: Optional[str] = Header(None),
+    if_range: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
     """Stream capsule as archive"""
     try:
-        from fastapi.responses import StreamingResponse
-        from src.orchestrator.capsule_export import CapsuleStreamer
+        from src.orchestrator.capsule_export import ARCHIVE_MEDIA_TYPES, archive_response
+        
+        if format not in ARCHIVE_MEDIA_TYPES:
+            raise HTTPException(status_code=400, detail=f"Unsupported format: {format}")
         
         # Get capsule from storage
         storage_service = get_capsule_storage(db)
@@ -3638,22 +3708,9 @@ async def stream_capsule(
         if not capsule:
             raise HTTPException(status_code=404, detail="Capsule not found")
         
-        streamer = CapsuleStreamer()
-        
-        # Determine content type
-        content_type = {
-            "tar.gz": "application/gzip",
-            "tar": "application/x-tar",
-            "zip": "application/zip"
-        }.get(format, "application/octet-stream")
-        
-        # Stream the capsule
-        return StreamingResponse(
-            streamer.stream_capsule(capsule, format, chunk_size),
-            media_type=content_type,
-            headers={
-                "Content-Disposition": f"attachment; filename=capsule-{capsule_id}.{format}"
-            }
+        # Stream the capsule as the archive is built; tar supports Range
+        return await archive_response(
+            capsule, format, f"capsule-{capsule_id}.{format}", range, if_range, chunk_size=chunk_size
         )
         
     except HTTPException:
@@ -3671,8 +3728,7 @@ async def export_capsule(
 ):
     """Export capsule in specific format"""
     try:
-        from src.orchestrator.capsule_export import CapsuleExporter
-        from fastapi.responses import Response
+        from src.orchestrator.capsule_export import CapsuleExporter, archive_response
         
         # Get capsule from storage
         storage_service = get_capsule_storage(db)
@@ -3683,27 +3739,11 @@ async def export_capsule(
         
         exporter = CapsuleExporter()
         
-        if format == "zip":
-            data = await exporter.export_as_zip(capsule)
-            return Response(
-                content=data,
-                media_type="application/zip",
-                headers={
-                    "Content-Disposition": f"attachment; filename=capsule-{capsule_id}.zip"
-                }
-            )
+        if format in ["zip", "tar", "tar.gz"]:
+            return await archive_response(capsule, format, f"capsule-{capsule_id}.{format}")
         elif format == "helm":
             helm_chart = await exporter.export_as_helm_chart(capsule)
             return JSONResponse(content=helm_chart)
-        elif format in ["tar", "tar.gz"]:
-            data = await exporter.export_as_tar(capsule)
-            return Response(
-                content=data,
-                media_type="application/x-tar" if format == "tar" else "application/gzip",
-                headers={
-                    "Content-Disposition": f"attachment; filename=capsule-{capsule_id}.{format}"
-                }
-            )
         elif format == "terraform":
             tf_files = await exporter.export_as_terraform(capsule)
             return JSONResponse(content=tf_files)
@@ -3833,9 +3873,9 @@ async def create_capsule_version(
         storage_path = Path("/app/capsule_versions")
         version_manager = CapsuleVersionManager(storage_path)
         
-        # Check if this is the first version (initial creation)
-        history = version_manager.histories.get(capsule_id)
-        if not history:
+        # Check if this is the first version (initial creation); history lives on disk
+        head = await version_manager.get_version(capsule_id)
+        if not head:
             # Create initial version for new capsule
             version = await version_manager.create_initial_version(
                 capsule=capsule,
@@ -5,7 +5,7 @@ Provides WebSocket and SSE endpoints for real-time workflow updates
 """
 
 from typing import Optional
-from fastapi import WebSocket, WebSocketDisconnect, Query, HTTPException
+from fastapi import WebSocket, WebSocketDisconnect, Query, HTTPException, Header
 from fastapi.responses import StreamingResponse
 import structlog
 
@@ -20,16 +20,18 @@ from src.common.structured_logging import LogContext
 logger = structlog.get_logger(__name__)
 
 
-async def websocket_progress_endpoint(websocket: WebSocket, workflow_id: str):
+async def websocket_progress_endpoint(websocket: WebSocket, workflow_id: str,
+                                      last_event_id: Optional[str] = Query(None)):
     """
     WebSocket endpoint for streaming workflow progress
     
     Connect with: ws://localhost:8000/ws/progress/{workflow_id}
+    Resume with ?last_event_id=<event_id of the last message received>
     """
     with LogContext(workflow_id=workflow_id, connection_type="websocket"):
         try:
             # Connect the websocket
-            await progress_manager.connect_websocket(websocket, workflow_id)
+            await progress_manager.connect_websocket(websocket, workflow_id, last_event_id)
             logger.info("WebSocket client connected for progress updates")
             
             # Keep the connection open
@@ -52,18 +54,22 @@ async def websocket_progress_endpoint(websocket: WebSocket, workflow_id: str):
 async def sse_progress_endpoint(
     workflow_id: str,
     user_id: Optional[str] = Query(None),
-    tenant_id: Optional[str] = Query(None)
+    tenant_id: Optional[str] = Query(None),
+    last_event_id: Optional[str] = Query(None),
+    last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID")
 ):
     """
     Server-Sent Events endpoint for streaming workflow progress
     
     Connect with: GET /progress/stream/{workflow_id}
+    Reconnecting clients resume after the Last-Event-ID header (or last_event_id
+    query parameter). The stream ends after the workflow's terminal event.
     """
     with LogContext(workflow_id=workflow_id, user_id=user_id, tenant_id=tenant_id):
         logger.info("SSE client connected for progress updates")
         
         # Create the event stream
-        event_stream = progress_manager.create_sse_stream(workflow_id)
+        event_stream = progress_manager.create_sse_stream(workflow_id, last_event_id_header or last_event_id)
         
         return StreamingResponse(
             event_stream,
@@ -9,6 +9,8 @@ from datetime import datetime
 from enum import Enum
 import json
 
+from src.common.language_classifier import classify_description
+
 
 class ArchitecturePattern(Enum):
     """Common architecture patterns"""
@@ -386,6 +388,10 @@ class SharedContext:
         )
 
 
+# Languages a shared context can be built for
+CONTEXT_LANGUAGES = ("python", "javascript", "typescript", "java", "go", "rust")
+
+
 class ContextBuilder:
     """Builder for creating shared context from requests"""
     
@@ -452,47 +458,11 @@ class ContextBuilder:
     @staticmethod
     def _detect_language(description: str, requirements: Optional[str] = None) -> str:
         """Intelligently detect primary language from description"""
-        text = f"{description} {requirements or ''}".lower()
-        
-        # Check for explicit TypeScript mentions first (higher priority)
-        if "typescript" in text or " ts " in text:
-            return "typescript"
-        
-        # Language detection patterns with weighted scoring
-        language_patterns = {
-            "python": ["python", "django", "flask", "fastapi", "pandas", "numpy", "pytest", "pip"],
-            "javascript": ["javascript", "js", "node", "nodejs", "express", "npm", "yarn"],
-            "typescript": ["typescript", "ts", "angular", "nest", "nestjs", "tsx", "type-safe", "@types"],
-            "java": ["java", "spring", "hibernate", "maven", "gradle", "junit"],
-            "go": ["go", "golang", "gin", "gorilla", "gopher"],
-            "rust": ["rust", "cargo", "actix", "tokio", "crate"]
-        }
-        
-        # Score each language with weighted patterns
-        scores = {}
-        for lang, patterns in language_patterns.items():
-            score = 0
-            for pattern in patterns:
-                if pattern in text:
-                    # Give higher weight to more specific patterns
-                    weight = 2 if len(pattern) > 4 else 1
-                    score += weight
-            scores[lang] = score
-        
-        # Special handling for React/Vue/Angular which could be JS or TS
-        if any(framework in text for framework in ["react", "vue"]):
-            # If TypeScript indicators are present, prefer TypeScript
-            if any(indicator in text for indicator in ["typescript", "ts", "tsx", "type", "@types"]):
-                scores["typescript"] = scores.get("typescript", 0) + 3
-            else:
-                scores["javascript"] = scores.get("javascript", 0) + 2
-        
-        # Angular strongly suggests TypeScript
-        if "angular" in text:
-            scores["typescript"] = scores.get("typescript", 0) + 3
-        
-        # Return language with highest score, default to python
-        return max(scores, key=scores.get) if max(scores.values()) > 0 else "python"
+        guess = classify_description(
+            f"{description} {requirements or ''}", languages=CONTEXT_LANGUAGES, min_score=1
+        )
+        # Default to python when nothing points anywhere
+        return guess.language or "python"
     
     @staticmethod
     def _detect_architecture_pattern(description: str, requirements: Optional[str] = None) -> ArchitecturePattern:
@@ -0,0 +1,166 @@
+"""
+Dataflow Task Scheduler for QLP Workflows
+
+Replaces level-synchronous batch execution with a ready-queue scheduler:
+each task becomes runnable as soon as its own dependencies have completed,
+instead of waiting for the slowest task of the previous batch.
+
+This module is pure Python with no I/O, clocks or randomness so it can be
+used safely inside Temporal workflow code and replays deterministically.
+"""
+
+from typing import Dict, List, Any, Set
+
+# Default cap on concurrently running task pipelines per workflow
+DEFAULT_MAX_PARALLEL_TASKS = 5
+
+# Relative cost estimates used to weight the critical path
+COMPLEXITY_WEIGHTS = {
+    "trivial": 1,
+    "simple": 1,
+    "medium": 2,
+    "complex": 3,
+    "meta": 4,
+}
+
+
+def estimate_task_cost(task: Dict[str, Any]) -> int:
+    """Estimate the relative cost of a task from its complexity"""
+    return COMPLEXITY_WEIGHTS.get(task.get("complexity", "simple"), 1)
+
+
+def compute_critical_path_priorities(tasks: List[Dict[str, Any]],
+                                     dependencies: Dict[str, List[str]]) -> Dict[str, int]:
+    """
+    Compute the longest remaining chain (by estimated cost) starting at each task.
+
+    A task's priority is its own cost plus the largest priority among the tasks
+    that depend on it, so tasks that gate long chains are started first.
+    Dependencies on unknown task ids are ignored. Tasks on a cycle keep only
+    their own cost.
+    """
+    task_ids = [t["task_id"] for t in tasks]
+    known = set(task_ids)
+    cost = {t["task_id"]: estimate_task_cost(t) for t in tasks}
+
+    dependents: Dict[str, List[str]] = {task_id: [] for task_id in task_ids}
+    remaining_dependents = {task_id: 0 for task_id in task_ids}
+    for task_id in task_ids:
+        for dep in dependencies.get(task_id, []):
+            if dep in known and dep != task_id:
+                dependents[dep].append(task_id)
+                remaining_dependents[dep] += 1
+
+    # Reverse topological pass: start from sinks and walk towards roots
+    priorities: Dict[str, int] = {}
+    stack = [task_id for task_id in task_ids if remaining_dependents[task_id] == 0]
+    while stack:
+        current = stack.pop()
+        longest_tail = max((priorities[d] for d in dependents[current]), default=0)
+        priorities[current] = cost[current] + longest_tail
+        for dep in dependencies.get(current, []):
+            if dep in known and dep != current:
+                remaining_dependents[dep] -= 1
+                if remaining_dependents[dep] == 0:
+                    stack.append(dep)
+
+    for task_id in task_ids:
+        priorities.setdefault(task_id, cost[task_id])
+
+    return priorities
+
+
+class DataflowScheduler:
+    """
+    Ready-queue scheduler over a task dependency graph.
+
+    The caller drives execution: ``take_ready`` hands out tasks whose
+    dependencies have all completed (highest critical-path priority first,
+    original task order as tie-breaker), and ``mark_completed`` /
+    ``mark_failed`` report outcomes. Tasks that depend on a failed task are
+    never handed out and are reported via ``skipped``.
+    """
+
+    def __init__(self, tasks: List[Dict[str, Any]],
+                 dependencies: Dict[str, List[str]],
+                 max_parallel: int = DEFAULT_MAX_PARALLEL_TASKS):
+        self.max_parallel = max(1, int(max_parallel))
+        self._tasks = {t["task_id"]: t for t in tasks}
+        self._order = {t["task_id"]: idx for idx, t in enumerate(tasks)}
+        self.priorities = compute_critical_path_priorities(tasks, dependencies)
+
+        self._pending_deps: Dict[str, Set[str]] = {}
+        self._dependents: Dict[str, List[str]] = {task_id: [] for task_id in self._tasks}
+        for task_id in self._tasks:
+            deps = {
+                dep for dep in dependencies.get(task_id, [])
+                if dep in self._tasks and dep != task_id
+            }
+            self._pending_deps[task_id] = deps
+            for dep in deps:
+                self._dependents[dep].append(task_id)
+
+        self._ready: List[str] = [task_id for task_id, deps in self._pending_deps.items() if not deps]
+        self.running: Set[str] = set()
+        self.completed: Set[str] = set()
+        self.failed: Set[str] = set()
+        self.skipped: Set[str] = set()
+
+    def _sort_key(self, task_id: str):
+        return (-self.priorities[task_id], self._order[task_id])
+
+    @property
+    def available_slots(self) -> int:
+        return max(0, self.max_parallel - len(self.running))
+
+    def take_ready(self) -> List[Dict[str, Any]]:
+        """Pop as many ready tasks as free slots allow, highest priority first"""
+        self._ready.sort(key=self._sort_key)
+        slots = self.available_slots
+        taken, self._ready = self._ready[:slots], self._ready[slots:]
+        self.running.update(taken)
+        return [self._tasks[task_id] for task_id in taken]
+
+    def mark_completed(self, task_id: str) -> List[str]:
+        """Record a successful task and return the ids that became ready"""
+        self.running.discard(task_id)
+        self.completed.add(task_id)
+        newly_ready = []
+        for dependent in self._dependents[task_id]:
+            deps = self._pending_deps[dependent]
+            deps.discard(task_id)
+            if not deps and dependent not in self.skipped:
+                self._ready.append(dependent)
+                newly_ready.append(dependent)
+        return newly_ready
+
+    def mark_failed(self, task_id: str) -> List[str]:
+        """Record a failed task and return the transitive dependents now skipped"""
+        self.running.discard(task_id)
+        self.failed.add(task_id)
+        newly_skipped = []
+        stack = list(self._dependents[task_id])
+        while stack:
+            dependent = stack.pop()
+            if dependent in self.skipped:
+                continue
+            self.skipped.add(dependent)
+            newly_skipped.append(dependent)
+            stack.extend(self._dependents[dependent])
+        newly_skipped.sort(key=self._order.__getitem__)
+        return newly_skipped
+
+    def order_of(self, task_id: str) -> int:
+        """Position of a task in the original decomposition order"""
+        return self._order[task_id]
+
+    @property
+    def finished(self) -> bool:
+        """True when nothing is running and nothing more can be started"""
+        return not self.running and not self._ready
+
+    def blocked(self) -> List[str]:
+        """Tasks that were never started (dependency cycle or failed ancestor)"""
+        started = self.completed | self.failed | self.running | set(self._ready)
+        return [task_id for task_id in sorted(self._tasks, key=self._order.__getitem__)
+                if task_id not in started]
@@ -12,11 +12,12 @@ import warnings
 
 from fastapi import APIRouter, HTTPException, BackgroundTasks
 from pydantic import BaseModel, Field
-from temporalio.client import Client
 import structlog
 
 from src.common.models import ExecutionRequest
 from src.common.config import settings
+from src.common.temporal_cloud import get_shared_temporal_client
+from src.orchestrator.workflow_status import workflow_status_store
 
 logger = structlog.get_logger()
 
@@ -191,8 +192,7 @@ async def unified_execute(
         })
     
     try:
-        # Initialize Temporal client
-        temporal_client = await Client.connect(settings.TEMPORAL_SERVER)
+        temporal_client = await get_shared_temporal_client()
         
         # Determine workflow based on mode and options
         workflow_name = "QLPWorkflow"
@@ -249,7 +249,7 @@ async def get_workflow_status(workflow_id: str):
     """Get workflow status (replaces multiple status endpoints)"""
     
     try:
-        temporal_client = await Client.connect(settings.TEMPORAL_SERVER)
+        temporal_client = await get_shared_temporal_client()
         
         # Get workflow handle
         handle = temporal_client.get_workflow_handle(workflow_id)
@@ -298,11 +298,19 @@ async def get_workflow_result(workflow_id: str):
     """Get workflow result (replaces capsule retrieval)"""
     
     try:
-        temporal_client = await Client.connect(settings.TEMPORAL_SERVER)
-        handle = temporal_client.get_workflow_handle(workflow_id)
-        
-        # Get result
-        result = await handle.result()
+        # Stored once when the workflow finished; fall back to Temporal for older runs
+        result = await workflow_status_store.get_result(workflow_id)
+        if result is None:
+            temporal_client = await get_shared_temporal_client()
+            handle = temporal_client.get_workflow_handle(workflow_id)
+            description = await handle.describe()
+            # Only completed workflows have a result; don't block on running ones
+            if description.status.name != "COMPLETED":
+                raise HTTPException(
+                    status_code=409,
+                    detail=f"Workflow {workflow_id} is {description.status.name}, no result available"
+                )
+            result = await handle.result()
         
         # Format result based on type
         if isinstance(result, dict) and "capsule_id" in result:
@@ -316,6 +324,8 @@ async def get_workflow_result(workflow_id: str):
         
         return result
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Failed to get workflow result: {e}")
         raise HTTPException(
@@ -329,7 +339,7 @@ async def cancel_workflow(workflow_id: str):
     """Cancel a running workflow"""
     
     try:
-        temporal_client = await Client.connect(settings.TEMPORAL_SERVER)
+        temporal_client = await get_shared_temporal_client()
         handle = temporal_client.get_workflow_handle(workflow_id)
         
         await handle.cancel()
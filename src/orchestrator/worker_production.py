@@ -5,6 +5,7 @@ No mocks, fully integrated with all services
 import asyncio
 import logging
 import json
+import re
 from datetime import timedelta, datetime, timezone
 from typing import Dict, List, Any, Optional, Tuple
 from dataclasses import dataclass, field, asdict
@@ -13,6 +14,8 @@ from temporalio.client import Client
 from temporalio.worker import Worker
 from temporalio.common import RetryPolicy
 from uuid import uuid4
+
+from src.orchestrator.task_scheduler import DataflowScheduler, DEFAULT_MAX_PARALLEL_TASKS
 # httpx import moved inside activities to avoid workflow sandbox issues
 
 # Configure logging
@@ -31,6 +34,9 @@ HEARTBEAT_INTERVAL = 20  # Send heartbeat every 20 seconds (more frequent)
 # Workflow configuration
 MAX_WORKFLOW_DURATION = timedelta(hours=3)  # Maximum workflow duration
 WORKFLOW_TASK_TIMEOUT = timedelta(minutes=10)  # Timeout for workflow tasks
+DATAFLOW_SCHEDULER_PATCH = "dataflow-task-scheduler"  # Guards the switch away from batch execution
+CAPSULE_RUNTIME_VALIDATION_PATCH = "capsule-runtime-validation"  # Guards re-enabling sandbox test runs
+STATUS_PROJECTION_PATCH = "workflow-status-projection"  # Guards publishing terminal status snapshots
 
 # Service call timeouts
 SERVICE_CALL_TIMEOUT = 180.0  # 3 minutes for service calls
@@ -155,7 +161,7 @@ class WorkflowResult:
 @activity.defn
 async def decompose_request_activity(request: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], Dict[str, List[str]], Dict[str, Any]]:
     """Decompose NLP request into tasks with dependencies and create shared context"""
-    import httpx
+    from ..common.service_clients import get_service_clients
     from ..common.config import settings
     from .shared_context import ContextBuilder
     from ..moderation import check_content, CheckContext, Severity
@@ -165,12 +171,13 @@ async def decompose_request_activity(request: Dict[str, Any]) -> Tuple[List[Dict
     # Send initial heartbeat
     activity.heartbeat("Starting request decomposition")
     
-    # HAP Content Check
+    # HAP Content Check, reusing the one /execute already ran for this request
     hap_result = await check_content(
-        content=f"{request['description']} {request.get('requirements', '')}",
+        content=f"{request['description']} {request.get('requirements') or ''}",
         context=CheckContext.USER_REQUEST,
         user_id=request.get("user_id"),
-        tenant_id=request.get("tenant_id")
+        tenant_id=request.get("tenant_id"),
+        previous=request.get("hap_check")
     )
     
     # Use configurable threshold for request blocking
@@ -198,113 +205,154 @@ async def decompose_request_activity(request: Dict[str, Any]) -> Tuple[List[Dict
     activity.logger.info(f"Architecture pattern: {shared_context.architecture_pattern}")
     activity.logger.info(f"Main file: {shared_context.file_structure.main_file_name}")
     
-    async with httpx.AsyncClient(timeout=300.0) as client:  # 5 minutes for unified optimization
-        # First, check vector memory for similar past requests
-        activity.heartbeat("Searching for similar requests...")
-        memory_response = await client.post(
-            f"http://vector-memory:{settings.VECTOR_MEMORY_PORT}/search/requests",
-            json={
-                "description": request["description"],
-                "limit": 5
-            }
-        )
-        
-        similar_requests = []
-        if memory_response.status_code == 200:
-            # Memory service returns a list directly
-            response_data = memory_response.json()
-            similar_requests = response_data if isinstance(response_data, list) else response_data.get("results", [])
-            activity.logger.info(f"Found {len(similar_requests)} similar past requests")
-        
-        # Decompose with unified optimization and context from similar requests
-        activity.heartbeat("Running unified optimization decomposition...")
-        response = await client.post(
-            f"http://orchestrator:{settings.ORCHESTRATOR_PORT}/decompose/unified-optimization",
-            json={
-                "description": request["description"],
-                "tenant_id": request["tenant_id"],
-                "user_id": request["user_id"],
-                "requirements": request.get("requirements"),
-                "constraints": request.get("constraints"),
-                "similar_requests": similar_requests
-            }
-        )
-        
-        if response.status_code != 200:
-            raise Exception(f"Decomposition failed: {response.status_code} - {response.text}")
-        
-        data = response.json()
-        tasks = data.get("tasks", [])
-        dependencies = data.get("dependencies", {})
-        
-        # Store decomposition for future learning
-        await client.post(
-            f"http://vector-memory:{settings.VECTOR_MEMORY_PORT}/store/decomposition",
-            json={
-                "request": request,
-                "tasks": tasks,
-                "dependencies": dependencies
-            }
-        )
-        
-        # Use shared context for language consistency
-        execution_context = {
-            "preferred_language": shared_context.file_structure.primary_language,
-            "main_file_name": shared_context.file_structure.main_file_name,
-            "architecture_pattern": shared_context.architecture_pattern,
-            "project_structure": shared_context.project_structure,
-            "sandbox_target": True,
-            "output_format": "code",
-            "quality_standards": shared_context.quality_context.quality_standards,
-            "validation_requirements": shared_context.quality_context.validation_requirements,
-            "security_requirements": shared_context.quality_context.security_requirements
+    clients = get_service_clients()
+    # First, check vector memory for similar past requests
+    activity.heartbeat("Searching for similar requests...")
+    memory_response = await clients["vector-memory"].post(
+        "/search/requests",
+        json={
+            "description": request["description"],
+            "limit": 5
+        },
+        retry=True  # Read-only search
+    )
+    
+    similar_requests = []
+    if memory_response.status_code == 200:
+        # Memory service returns a list directly
+        response_data = memory_response.json()
+        similar_requests = response_data if isinstance(response_data, list) else response_data.get("results", [])
+        activity.logger.info(f"Found {len(similar_requests)} similar past requests")
+    
+    # Decompose with unified optimization and context from similar requests
+    activity.heartbeat("Running unified optimization decomposition...")
+    response = await clients["orchestrator"].post(
+        "/decompose/unified-optimization",
+        json={
+            "description": request["description"],
+            "tenant_id": request["tenant_id"],
+            "user_id": request["user_id"],
+            "requirements": request.get("requirements"),
+            "constraints": request.get("constraints"),
+            "similar_requests": similar_requests
         }
-        
-        # Convert to workflow-safe format with shared context
-        workflow_tasks = []
-        for task in tasks:
-            task_id = task.get("id")
-            task_dependencies = dependencies.get(task_id, [])
-            
-            # Add task dependencies to shared context
-            for dep in task_dependencies:
-                shared_context.dependency_context.add_dependency(task_id, dep)
-            
-            # Get context for this specific task
-            task_context = shared_context.get_context_for_task(task_id)
-            task_context.update(execution_context)  # Merge execution context
-            
-            # Check for tier override in request
-            task_metadata = task.get("metadata", {})
-            if request.get("tier_override"):
-                task_metadata["tier_override"] = request["tier_override"]
-            
-            workflow_tasks.append({
-                "task_id": task_id,
-                "type": task.get("type"),
-                "description": task.get("description"),
-                "complexity": task.get("complexity", "simple"),
-                "dependencies": task_dependencies,
-                "context": task_context,
-                "metadata": task_metadata
-            })
-        
-        # Update shared context progress
-        shared_context.update_progress(
-            "decomposition", 
-            "decomposition_completed", 
-            {"tasks_created": len(workflow_tasks), "dependencies_mapped": len(dependencies)}
-        )
-        
-        return workflow_tasks, dependencies, shared_context.to_dict()
+    )
+    
+    if response.status_code != 200:
+        raise Exception(f"Decomposition failed: {response.status_code} - {response.text}")
+    
+    data = response.json()
+    tasks = data.get("tasks", [])
+    dependencies = data.get("dependencies", {})
+    
+    # Store decomposition for future learning
+    await clients["vector-memory"].post(
+        "/store/decomposition",
+        json={
+            "request": request,
+            "tasks": tasks,
+            "dependencies": dependencies
+        }
+    )
+    
+    # Use shared context for language consistency
+    execution_context = {
+        "preferred_language": shared_context.file_structure.primary_language,
+        "main_file_name": shared_context.file_structure.main_file_name,
+        "architecture_pattern": shared_context.architecture_pattern,
+        "project_structure": shared_context.project_structure,
+        "sandbox_target": True,
+        "output_format": "code",
+        "quality_standards": shared_context.quality_context.quality_standards,
+        "validation_requirements": shared_context.quality_context.validation_requirements,
+        "security_requirements": shared_context.quality_context.security_requirements
+    }
+    
+    # Convert to workflow-safe format with shared context
+    workflow_tasks = []
+    for task in tasks:
+        task_id = task.get("id")
+        task_dependencies = dependencies.get(task_id, [])
+        
+        # Add task dependencies to shared context
+        for dep in task_dependencies:
+            shared_context.dependency_context.add_dependency(task_id, dep)
+        
+        # Get context for this specific task
+        task_context = shared_context.get_context_for_task(task_id)
+        task_context.update(execution_context)  # Merge execution context
+        
+        # Check for tier override in request
+        task_metadata = task.get("metadata", {})
+        if request.get("tier_override"):
+            task_metadata["tier_override"] = request["tier_override"]
+        
+        workflow_tasks.append({
+            "task_id": task_id,
+            "type": task.get("type"),
+            "description": task.get("description"),
+            "complexity": task.get("complexity", "simple"),
+            "dependencies": task_dependencies,
+            "context": task_context,
+            "metadata": task_metadata
+        })
+    
+    # Update shared context progress
+    shared_context.update_progress(
+        "decomposition", 
+        "decomposition_completed", 
+        {"tasks_created": len(workflow_tasks), "dependencies_mapped": len(dependencies)}
+    )
+    
+    return workflow_tasks, dependencies, shared_context.to_dict()
+
+
+# Worker-side cache of tier performance lookups: (type, complexity) -> (expires_at, data)
+_task_performance_cache: Dict[Tuple[str, str], Tuple[float, Optional[Dict[str, Any]]]] = {}
+_task_performance_inflight: Dict[Tuple[str, str], "asyncio.Future"] = {}
+
+
+async def get_task_performance(task_type: str, complexity: str) -> Optional[Dict[str, Any]]:
+    """
+    Fetch tier performance from vector memory with a short-TTL cache.
+
+    Concurrent lookups for the same key share one request, so a workflow wave
+    makes one call per distinct (type, complexity) rather than one per task.
+    """
+    import time
+    from ..common.config import settings
+    from ..common.service_clients import get_service_clients
+    
+    key = (task_type, complexity)
+    cached = _task_performance_cache.get(key)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+    
+    if key in _task_performance_inflight:
+        return await asyncio.shield(_task_performance_inflight[key])
+    
+    async def fetch() -> Optional[Dict[str, Any]]:
+        try:
+            response = await get_service_clients()["vector-memory"].get(
+                "/performance/task",
+                params={"type": task_type, "complexity": complexity}
+            )
+            data = response.json() if response.status_code == 200 else None
+            _task_performance_cache[key] = (
+                time.monotonic() + settings.TIER_PERFORMANCE_CACHE_TTL_SECONDS, data
+            )
+            return data
+        finally:
+            _task_performance_inflight.pop(key, None)
+    
+    future = asyncio.ensure_future(fetch())
+    _task_performance_inflight[key] = future
+    return await asyncio.shield(future)
 
 
 @activity.defn
 async def select_agent_tier_activity(task: Dict[str, Any]) -> str:
     """Select appropriate agent tier based on task complexity and historical performance"""
-    import httpx
-    from ..common.config import settings
-    
     activity.logger.info(f"Selecting agent tier for task: {task['task_id']}")
     
     # Check for tier override in task metadata
@@ -321,105 +369,79 @@ async def select_agent_tier_activity(task: Dict[str, Any]) -> str:
             activity.logger.info(f"Using preferred tier: {preferred_tier}")
             return preferred_tier
     
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        # Get historical performance data
-        perf_response = await client.get(
-            f"http://vector-memory:{settings.VECTOR_MEMORY_PORT}/performance/task",
-            params={
-                "type": task["type"],
-                "complexity": task["complexity"]
-            }
-        )
-        
-        if perf_response.status_code == 200:
-            perf_data = perf_response.json()
-            # Use performance data to select optimal tier
-            tier_performance = perf_data.get("tier_performance", {})
-            
-            # Select tier with best success rate and reasonable cost
-            best_tier = "T0"  # Default
-            best_score = 0
-            
-            for tier, metrics in tier_performance.items():
-                # Score = success_rate * 0.7 + (1 - relative_cost) * 0.3
-                success_rate = metrics.get("success_rate", 0)
-                relative_cost = metrics.get("relative_cost", 1)
-                score = success_rate * 0.7 + (1 - relative_cost) * 0.3
-                
-                if score > best_score:
-                    best_score = score
-                    best_tier = tier
-            
-            activity.logger.info(f"Selected tier {best_tier} based on historical performance")
-            return best_tier
-        
-        # Fallback to complexity-based selection
-        complexity_to_tier = {
-            "trivial": "T0",
-            "simple": "T0",
-            "medium": "T1",
-            "complex": "T2",
-            "meta": "T3"
-        }
-        
-        return complexity_to_tier.get(task["complexity"], "T1")
+    # Get historical performance data (cached per task type and complexity)
+    perf_data = await get_task_performance(task["type"], task["complexity"])
+    
+    if perf_data and perf_data.get("tier_performance"):
+        # Use performance data to select optimal tier
+        tier_performance = perf_data["tier_performance"]
+        
+        # Select tier with best success rate and reasonable cost
+        best_tier = "T0"  # Default
+        best_score = 0
+        
+        for tier, metrics in tier_performance.items():
+            # Score = success_rate * 0.7 + (1 - relative_cost) * 0.3
+            success_rate = metrics.get("success_rate", 0)
+            relative_cost = metrics.get("relative_cost", 1)
+            score = success_rate * 0.7 + (1 - relative_cost) * 0.3
+            
+            if score > best_score:
+                best_score = score
+                best_tier = tier
+        
+        activity.logger.info(f"Selected tier {best_tier} based on historical performance")
+        return best_tier
+    
+    # Fallback to complexity-based selection
+    complexity_to_tier = {
+        "trivial": "T0",
+        "simple": "T0",
+        "medium": "T1",
+        "complex": "T2",
+        "meta": "T3"
+    }
+    
+    return complexity_to_tier.get(task["complexity"], "T1")
 
 
-async def call_agent_factory(client: Any, execution_input: Dict[str, Any]) -> Any:
-    """Call agent factory with retry protection, heartbeats, and circuit breaker"""
-    max_retries = 3
-    retry_delay = 1
+async def call_agent_factory(execution_input: Dict[str, Any]) -> Any:
+    """Call agent factory through the pooled client with heartbeats during the call"""
+    from ..common.service_clients import get_service_clients
     
-    for attempt in range(max_retries):
-        try:
-            # Send heartbeat before each attempt
-            if activity.in_activity():
-                activity.heartbeat(f"Agent factory call attempt {attempt + 1}/{max_retries}")
-            
-            # Add request ID for tracing
-            request_id = execution_input.get('request_id', 'unknown')
-            activity.logger.info(f"Calling agent factory for request {request_id}, attempt {attempt + 1}")
-            
-            # Start async heartbeat task
-            heartbeat_task = None
-            if activity.in_activity():
-                heartbeat_task = asyncio.create_task(_send_periodic_heartbeats("agent_factory", HEARTBEAT_INTERVAL))
-            
+    request_id = execution_input.get('request_id', 'unknown')
+    
+    def on_attempt(attempt: int, max_attempts: int):
+        # Send heartbeat before each attempt
+        if activity.in_activity():
+            activity.heartbeat(f"Agent factory call attempt {attempt}/{max_attempts}")
+        activity.logger.info(f"Calling agent factory for request {request_id}, attempt {attempt}")
+    
+    # Keep heartbeating while the agent generates
+    heartbeat_task = None
+    if activity.in_activity():
+        heartbeat_task = asyncio.create_task(_send_periodic_heartbeats("agent_factory", HEARTBEAT_INTERVAL))
+    
+    try:
+        response = await get_service_clients()["agent-factory"].post(
+            "/execute",
+            json=execution_input,
+            timeout=SERVICE_CALL_TIMEOUT,
+            retry=True,  # Generation stores nothing; safe to repeat
+            on_attempt=on_attempt
+        )
+        activity.logger.info(f"Agent factory responded with status {response.status_code}")
+        return response
+    except Exception as e:
+        activity.logger.error(f"Agent factory call failed: {str(e)}")
+        raise
+    finally:
+        if heartbeat_task:
+            heartbeat_task.cancel()
             try:
-                response = await client.post(
-                    f"http://agent-factory:{settings.AGENT_FACTORY_PORT}/execute",
-                    json=execution_input,
-                    timeout=SERVICE_CALL_TIMEOUT
-                )
-                
-                # Log response time
-                activity.logger.info(f"Agent factory responded with status {response.status_code}")
-                
-                if response.status_code >= 500 and attempt < max_retries - 1:
-                    activity.logger.warning(f"Agent factory returned {response.status_code}, retrying...")
-                    await asyncio.sleep(retry_delay * (2 ** attempt))
-                    continue
-                    
-                return response
-                
-            finally:
-                # Cancel heartbeat task
-                if heartbeat_task:
-                    heartbeat_task.cancel()
-                    try:
-                        await heartbeat_task
-                    except asyncio.CancelledError:
-                        pass
-                        
-        except (httpx.TimeoutException, httpx.ConnectError) as e:
-            activity.logger.error(f"Agent factory call failed: {str(e)}")
-            if attempt < max_retries - 1:
-                await asyncio.sleep(retry_delay * (2 ** attempt))
-                continue
-            raise
-        except Exception as e:
-            activity.logger.error(f"Unexpected error calling agent factory: {str(e)}")
-            raise
+                await heartbeat_task
+            except asyncio.CancelledError:
+                pass
 
 
 async def _send_periodic_heartbeats(service_name: str, interval: int):
@@ -433,98 +455,30 @@ async def _send_periodic_heartbeats(service_name: str, interval: int):
             break
 
 
-async def call_validation_service(client: Any, validation_input: Dict[str, Any]) -> Any:
-    """Call validation service with retry protection and heartbeats"""
-    import httpx
-    from ..common.config import settings
+async def call_validation_service(validation_input: Dict[str, Any]) -> Any:
+    """Call validation service through the pooled client with heartbeats per attempt"""
+    from ..common.service_clients import get_service_clients
     
-    max_retries = 3
-    retry_delay = 1
+    def on_attempt(attempt: int, max_attempts: int):
+        if activity.in_activity():
+            activity.heartbeat(f"Validation service call attempt {attempt}/{max_attempts}")
     
-    for attempt in range(max_retries):
-        try:
-            # Send heartbeat before each attempt
-            if activity.in_activity():
-                activity.heartbeat(f"Validation service call attempt {attempt + 1}/{max_retries}")
-            
-            response = await client.post(
-                f"http://validation-mesh:{settings.VALIDATION_MESH_PORT}/validate/code",
-                json=validation_input,
-                timeout=120.0
-            )
-            if response.status_code >= 500 and attempt < max_retries - 1:
-                await asyncio.sleep(retry_delay * (2 ** attempt))
-                continue
-            return response
-        except (httpx.TimeoutException, httpx.ConnectError) as e:
-            if attempt < max_retries - 1:
-                await asyncio.sleep(retry_delay * (2 ** attempt))
-                continue
-            raise
+    return await get_service_clients()["validation-mesh"].post(
+        "/validate/code",
+        json=validation_input,
+        retry=True,  # Validation stores nothing; safe to repeat
+        on_attempt=on_attempt
+    )
 
 
 @activity.defn
 async def execute_task_activity(task: Dict[str, Any], tier: str, request_id: str, shared_context_dict: Dict[str, Any]) -> Dict[str, Any]:
     """Execute a single task using the selected agent tier with TDD integration"""
-    import httpx
-    from ..common.config import settings
-    
     activity.logger.info(f"Executing task {task['task_id']} with tier {tier}")
     
     # Send heartbeat for task start
     activity.heartbeat(f"Starting task execution: {task['task_id']}")
     
-    # Check cache for similar tasks first
-    async with httpx.AsyncClient(timeout=30.0) as cache_client:
-        try:
-            # Search for similar patterns in vector memory
-            activity.logger.info(f"Checking cache for similar task type: {task.get('type')}")
-            
-            similar_response = await cache_client.post(
-                f"http://vector-memory:{settings.VECTOR_MEMORY_PORT}/search/similar",
-                json={
-                    "query": task.get('description', ''),
-                    "task_type": task.get('type'),
-                    "limit": 3,
-                    "similarity_threshold": 0.85  # High threshold for code reuse
-                }
-            )
-            
-            if similar_response.status_code == 200:
-                similar_results = similar_response.json()
-                
-                # Check if we have a highly similar task result we can adapt
-                if similar_results.get('results'):
-                    best_match = similar_results['results'][0]
-                    similarity_score = best_match.get('similarity', 0)
-                    
-                    if similarity_score > 0.85:
-                        activity.logger.info(f"Found cached result with {similarity_score:.2%} similarity")
-                        
-                        # Use cached result directly if very similar
-                        if similarity_score > 0.95 and best_match.get('result'):
-                            cached_result = best_match.get('result', {})
-                            if cached_result.get('output') and cached_result.get('status') == 'completed':
-                                activity.logger.info("Using cached result directly (>95% similarity)")
-                                
-                                # Return cached result with updated task_id
-                                return {
-                                    "task_id": task["task_id"],
-                                    "status": "completed",
-                                    "output_type": cached_result.get('output_type', 'code'),
-                                    "output": cached_result.get('output'),
-                                    "execution_time": 0.5,  # Near-instant from cache
-                                    "confidence_score": min(similarity_score * 0.98, 0.95),
-                                    "agent_tier_used": tier,
-                                    "metadata": {
-                                        "cached": True,
-                                        "cache_similarity": similarity_score,
-                                        "cache_hit": True
-                                    }
-                                }
-        except Exception as e:
-            activity.logger.warning(f"Cache check failed: {e}, proceeding with normal execution")
-    
     # Extract language context and enhance task description
     preferred_language = task.get("context", {}).get("preferred_language", "python")
     activity.logger.info(f"Task {task['task_id']} enforcing language: {preferred_language}")
@@ -585,179 +539,179 @@ Respond only with code and brief inline comments. No explanations or mixed langu
 
 async def _execute_standard(task: Dict[str, Any], tier: str, request_id: str, shared_context_dict: Dict[str, Any]) -> Dict[str, Any]:
     """Execute task using standard agent approach"""
-    import httpx
+    from ..common.service_clients import get_service_clients
     from ..common.config import settings
     
     # Send heartbeat for standard execution start
     activity.heartbeat(f"Starting standard execution for task: {task['task_id']}")
     
-    async with httpx.AsyncClient(timeout=300.0) as client:
-        # Execute via agent service
-        start_time = datetime.now(timezone.utc)
-        
-        # Step 3: Inject language metadata into agent input for LLM logging
-        context = task.get("context", {}).copy()
-        preferred_language = task.get("meta", {}).get("preferred_language", "python")
-        context["preferred_language"] = preferred_language
-        
-        # Add cost tracking context
-        context["workflow_id"] = request_id  # Use request_id as workflow_id
-        context["tenant_id"] = shared_context_dict.get("tenant_id", "default")
-        context["user_id"] = shared_context_dict.get("user_id")
-        context["request_id"] = request_id
-        
-        execution_input = {
-            "task": {
-                "id": task.get("task_id", task.get("id", "")),
-                "type": task.get("type", "code_generation"),
-                "description": task.get("description", ""),
-                "complexity": task.get("complexity", "medium"),
-                "status": task.get("status", "pending"),
-                "metadata": task.get("metadata", {}),
-                "meta": task.get("meta", {})  # Include structured metadata
-            },
-            "tier": tier,
-            "context": context,
-            "preferred_language": preferred_language,
-            "shared_context": shared_context_dict,
-            "request_id": request_id,
-            "execution_constraints": task.get("meta", {}).get("execution_constraints", {})
-        }
-        
-        # Send heartbeat before agent service call
-        activity.heartbeat(f"Calling agent service for task: {task['task_id']}")
-        
-        response = await call_agent_factory(client, execution_input)
-        
-        execution_time = (datetime.now(timezone.utc) - start_time).total_seconds()
-        
-        if response.status_code != 200:
-            # Store failed execution for learning
-            await client.post(
-                f"http://vector-memory:{settings.VECTOR_MEMORY_PORT}/store/execution",
-                json={
-                    "request_id": request_id,
-                    "task": task,
-                    "result": {
-                        "status": "failed",
-                        "error": f"Agent execution failed: {response.status_code}",
-                        "tier": tier,
-                        "execution_time": execution_time
-                    }
+    clients = get_service_clients()
+    # Execute via agent service
+    start_time = datetime.now(timezone.utc)
+    
+    # Step 3: Inject language metadata into agent input for LLM logging
+    context = task.get("context", {}).copy()
+    preferred_language = task.get("meta", {}).get("preferred_language", "python")
+    context["preferred_language"] = preferred_language
+    
+    # Add cost tracking context
+    context["workflow_id"] = request_id  # Use request_id as workflow_id
+    context["tenant_id"] = shared_context_dict.get("tenant_id", "default")
+    context["user_id"] = shared_context_dict.get("user_id")
+    context["request_id"] = request_id
+    # Agents stream generation progress to clients following the Temporal workflow
+    context["progress_workflow_id"] = activity.info().workflow_id
+    
+    execution_input = {
+        "task": {
+            "id": task.get("task_id", task.get("id", "")),
+            "type": task.get("type", "code_generation"),
+            "description": task.get("description", ""),
+            "complexity": task.get("complexity", "medium"),
+            "status": task.get("status", "pending"),
+            "metadata": task.get("metadata", {}),
+            "meta": task.get("meta", {})  # Include structured metadata
+        },
+        "tier": tier,
+        "context": context,
+        "preferred_language": preferred_language,
+        "shared_context": shared_context_dict,
+        "request_id": request_id,
+        "execution_constraints": task.get("meta", {}).get("execution_constraints", {})
+    }
+    
+    # Send heartbeat before agent service call
+    activity.heartbeat(f"Calling agent service for task: {task['task_id']}")
+    
+    response = await call_agent_factory(execution_input)
+    
+    execution_time = (datetime.now(timezone.utc) - start_time).total_seconds()
+    
+    if response.status_code != 200:
+        # Store failed execution for learning
+        await clients["vector-memory"].post(
+            "/store/execution",
+            json={
+                "request_id": request_id,
+                "task": task,
+                "result": {
+                    "status": "failed",
+                    "error": f"Agent execution failed: {response.status_code}",
+                    "tier": tier,
+                    "execution_time": execution_time
                 }
+            }
+        )
+        
+        return {
+            "task_id": task["task_id"],
+            "status": "failed",
+            "output_type": "error",
+            "output": {"error": f"Agent execution failed: {response.status_code}"},
+            "execution_time": execution_time,
+            "confidence_score": 0,
+            "agent_tier_used": tier,
+            "metadata": {"http_status": response.status_code}
+        }
+    
+    result = response.json()
+    
+    # HAP Check on Agent Output
+    from ..moderation import check_content, CheckContext, Severity
+    
+    if result.get("status") == "completed" and result.get("output"):
+        output_text = ""
+        if isinstance(result["output"], dict):
+            output_text = result["output"].get("code", result["output"].get("content", ""))
+        else:
+            output_text = str(result["output"])
+        
+        if output_text:
+            hap_result = await check_content(
+                content=output_text,
+                context=CheckContext.AGENT_OUTPUT,
+                user_id=shared_context_dict.get("user_id"),
+                tenant_id=shared_context_dict.get("tenant_id")
             )
             
-            return {
-                "task_id": task["task_id"],
-                "status": "failed",
-                "output_type": "error",
-                "output": {"error": f"Agent execution failed: {response.status_code}"},
-                "execution_time": execution_time,
-                "confidence_score": 0,
-                "agent_tier_used": tier,
-                "metadata": {"http_status": response.status_code}
+            # Add HAP metadata
+            result["hap_check"] = {
+                "severity": hap_result.severity.value,
+                "categories": [cat.value for cat in hap_result.categories],
+                "filtered": hap_result.severity >= Severity.MEDIUM
             }
-        
-        result = response.json()
-        
-        # HAP Check on Agent Output
-        from ..moderation import check_content, CheckContext, Severity
-        
-        if result.get("status") == "completed" and result.get("output"):
-            output_text = ""
-            if isinstance(result["output"], dict):
-                output_text = result["output"].get("code", result["output"].get("content", ""))
-            else:
-                output_text = str(result["output"])
             
-            if output_text:
-                hap_result = await check_content(
-                    content=output_text,
-                    context=CheckContext.AGENT_OUTPUT,
-                    user_id=shared_context_dict.get("user_id"),
-                    tenant_id=shared_context_dict.get("tenant_id")
+            # If content is inappropriate, mark as failed
+            # Use configurable threshold for output blocking
+            output_blocking_threshold = getattr(Severity, settings.HAP_OUTPUT_BLOCKING_THRESHOLD, Severity.HIGH)
+            if hap_result.severity >= output_blocking_threshold:
+                activity.logger.warning(
+                    f"Agent output blocked by HAP - Task: {task['task_id']}, Severity: {hap_result.severity}, Threshold: {output_blocking_threshold}"
                 )
-                
-                # Add HAP metadata
-                result["hap_check"] = {
-                    "severity": hap_result.severity.value,
-                    "categories": [cat.value for cat in hap_result.categories],
-                    "filtered": hap_result.severity >= Severity.MEDIUM
+                result["status"] = "failed"
+                result["output"] = {
+                    "error": "Agent generated inappropriate content",
+                    "hap_severity": hap_result.severity.value,
+                    "hap_explanation": hap_result.explanation,
+                    "hap_threshold": output_blocking_threshold.value
                 }
+                result["output_type"] = "error"
+    
+    # Step 4: Post-hoc detection & rejection if wrong language
+    if result.get("status") == "completed" and result.get("output_type") == "code":
+        output = result.get("output", {})
+        if isinstance(output, dict):
+            generated_code = output.get("code", output.get("content", ""))
+            detected_language = output.get("language", "python")
+            expected_language = preferred_language
+            
+            # If detected language doesn't match expected, log and potentially retry
+            if detected_language != expected_language and generated_code:
+                activity.logger.warning(f"Language mismatch detected: expected {expected_language}, got {detected_language}")
+                activity.logger.warning(f"Code sample: {generated_code[:100]}...")
                 
-                # If content is inappropriate, mark as failed
-                # Use configurable threshold for output blocking
-                output_blocking_threshold = getattr(Severity, settings.HAP_OUTPUT_BLOCKING_THRESHOLD, Severity.HIGH)
-                if hap_result.severity >= output_blocking_threshold:
-                    activity.logger.warning(
-                        f"Agent output blocked by HAP - Task: {task['task_id']}, Severity: {hap_result.severity}, Threshold: {output_blocking_threshold}"
-                    )
-                    result["status"] = "failed"
-                    result["output"] = {
-                        "error": "Agent generated inappropriate content",
-                        "hap_severity": hap_result.severity.value,
-                        "hap_explanation": hap_result.explanation,
-                        "hap_threshold": output_blocking_threshold.value
-                    }
-                    result["output_type"] = "error"
-        
-        # Step 4: Post-hoc detection & rejection if wrong language
-        if result.get("status") == "completed" and result.get("output_type") == "code":
-            output = result.get("output", {})
-            if isinstance(output, dict):
-                generated_code = output.get("code", output.get("content", ""))
-                detected_language = output.get("language", "python")
-                expected_language = preferred_language
-                
-                # If detected language doesn't match expected, log and potentially retry
-                if detected_language != expected_language and generated_code:
-                    activity.logger.warning(f"Language mismatch detected: expected {expected_language}, got {detected_language}")
-                    activity.logger.warning(f"Code sample: {generated_code[:100]}...")
-                    
-                    # For now, just log the mismatch - could add retry logic here
-                    result["metadata"] = result.get("metadata", {})
-                    result["metadata"]["language_mismatch"] = {
-                        "expected": expected_language,
-                        "detected": detected_language,
-                        "code_sample": generated_code[:200]
-                    }
-        
-        # Store successful execution for learning
-        await client.post(
-            f"http://vector-memory:{settings.VECTOR_MEMORY_PORT}/store/execution",
-            json={
-                "request_id": request_id,
-                "task": task,
-                "result": result
-            }
-        )
-        
-        # Store code pattern if successful
-        if result.get("status") == "completed" and result.get("output_type") == "code":
-            output = result.get("output", {})
-            if isinstance(output, dict) and "code" in output:
-                await client.post(
-                    f"http://vector-memory:{settings.VECTOR_MEMORY_PORT}/patterns/code",
-                    json={
-                        "content": output["code"],
-                        "metadata": {
-                            "task_type": task["type"],
-                            "complexity": task["complexity"],
-                            "tier": tier,
-                            "confidence": result.get("confidence_score", 0),
-                            "language": output.get("language", "python")
-                        }
+                # For now, just log the mismatch - could add retry logic here
+                result["metadata"] = result.get("metadata", {})
+                result["metadata"]["language_mismatch"] = {
+                    "expected": expected_language,
+                    "detected": detected_language,
+                    "code_sample": generated_code[:200]
+                }
+    
+    # Store successful execution for learning
+    await clients["vector-memory"].post(
+        "/store/execution",
+        json={
+            "request_id": request_id,
+            "task": task,
+            "result": result
+        }
+    )
+    
+    # Store code pattern if successful
+    if result.get("status") == "completed" and result.get("output_type") == "code":
+        output = result.get("output", {})
+        if isinstance(output, dict) and "code" in output:
+            await clients["vector-memory"].post(
+                "/patterns/code",
+                json={
+                    "content": output["code"],
+                    "metadata": {
+                        "task_type": task["type"],
+                        "complexity": task["complexity"],
+                        "tier": tier,
+                        "confidence": result.get("confidence_score", 0),
+                        "language": output.get("language", "python")
                     }
-                )
-        
-        return result
+                }
+            )
+    
+    return result
 
 
 @activity.defn
 async def validate_result_activity(result: Dict[str, Any], task: Dict[str, Any]) -> Dict[str, Any]:
     """Validate execution result with full validation pipeline"""
-    import httpx
-    from ..common.config import settings
     from ..validation.enhanced_validator import enhanced_validator
     
     activity.logger.info(f"Validating result for task: {task['task_id']}")
@@ -806,81 +760,80 @@ async def validate_result_activity(result: Dict[str, Any], task: Dict[str, Any])
             "metadata": {"reason": "no_code"}
         }
     
-    async with httpx.AsyncClient(timeout=120.0) as client:
-        # Send heartbeat before validation service call
-        activity.heartbeat(f"Calling validation service for task: {task['task_id']}")
-        
-        # Run full validation pipeline
-        validation_input = {
-            "code": code,
-            "language": language,
-            "validators": ["syntax", "style", "security", "types", "runtime"],
-            "context": {
-                "task_type": task["type"],
-                "requirements": task.get("description", "")
-            }
+    # Send heartbeat before validation service call
+    activity.heartbeat(f"Calling validation service for task: {task['task_id']}")
+    
+    # Run full validation pipeline
+    validation_input = {
+        "code": code,
+        "language": language,
+        "validators": ["syntax", "style", "security", "types", "runtime"],
+        "context": {
+            "task_type": task["type"],
+            "requirements": task.get("description", "")
         }
+    }
+    
+    response = await call_validation_service(validation_input)
+    
+    if response.status_code != 200:
+        return {
+            "overall_status": "error",
+            "confidence_score": 0,
+            "checks": [],
+            "requires_human_review": True,
+            "metadata": {"error": f"Validation service error: {response.status_code}"}
+        }
+    
+    validation_result = response.json()
+    
+    # Ensure confidence_score is always present (safety check)
+    if "confidence_score" not in validation_result or validation_result["confidence_score"] is None:
+        validation_result["confidence_score"] = 0.5  # Default to medium confidence
+    
+    # Determine if human review is needed based on confidence and critical issues
+    confidence = validation_result.get("confidence_score", 0)
+    critical_issues = any(
+        check.get("severity") == "critical" 
+        for check in validation_result.get("checks", [])
+        if check.get("status") == "failed"
+    )
+    
+    validation_result["requires_human_review"] = confidence < 0.7 or critical_issues
+    
+    # Perform enhanced validation
+    enhanced_result = await enhanced_validator.validate_code_quality(code, language)
+    
+    # Merge enhanced validation results
+    if enhanced_result["issues"]:
+        # Add enhanced issues to checks
+        for issue in enhanced_result["issues"]:
+            validation_result.setdefault("checks", []).append({
+                "name": f"enhanced_{issue['type']}",
+                "type": issue["type"],
+                "status": "failed" if issue["severity"] in ["critical", "high"] else "warning",
+                "message": issue["message"],
+                "severity": issue["severity"],
+                "line_number": issue.get("line_number"),
+                "suggestion": issue.get("suggestion")
+            })
         
-        response = await call_validation_service(client, validation_input)
-        
-        if response.status_code != 200:
-            return {
-                "overall_status": "error",
-                "confidence_score": 0,
-                "checks": [],
-                "requires_human_review": True,
-                "metadata": {"error": f"Validation service error: {response.status_code}"}
-            }
-        
-        validation_result = response.json()
-        
-        # Ensure confidence_score is always present (safety check)
-        if "confidence_score" not in validation_result or validation_result["confidence_score"] is None:
-            validation_result["confidence_score"] = 0.5  # Default to medium confidence
-        
-        # Determine if human review is needed based on confidence and critical issues
-        confidence = validation_result.get("confidence_score", 0)
-        critical_issues = any(
-            check.get("severity") == "critical" 
-            for check in validation_result.get("checks", [])
-            if check.get("status") == "failed"
-        )
-        
-        validation_result["requires_human_review"] = confidence < 0.7 or critical_issues
-        
-        # Perform enhanced validation
-        enhanced_result = await enhanced_validator.validate_code_quality(code, language)
-        
-        # Merge enhanced validation results
-        if enhanced_result["issues"]:
-            # Add enhanced issues to checks
-            for issue in enhanced_result["issues"]:
-                validation_result.setdefault("checks", []).append({
-                    "name": f"enhanced_{issue['type']}",
-                    "type": issue["type"],
-                    "status": "failed" if issue["severity"] in ["critical", "high"] else "warning",
-                    "message": issue["message"],
-                    "severity": issue["severity"],
-                    "line_number": issue.get("line_number"),
-                    "suggestion": issue.get("suggestion")
-                })
-            
-            # Update confidence score based on security issues
-            if enhanced_result["critical_issues"] > 0:
-                validation_result["confidence_score"] *= 0.5  # Halve confidence for critical issues
-                validation_result["requires_human_review"] = True
-            elif enhanced_result["high_issues"] > 0:
-                validation_result["confidence_score"] *= 0.8  # Reduce confidence for high issues
-            
-            # Add security score to metadata
-            validation_result.setdefault("metadata", {})["security_score"] = enhanced_result["security_score"]
-            validation_result["metadata"]["enhanced_validation"] = {
-                "total_issues": enhanced_result["total_issues"],
-                "critical_issues": enhanced_result["critical_issues"],
-                "high_issues": enhanced_result["high_issues"]
-            }
-        
-        return validation_result
+        # Update confidence score based on security issues
+        if enhanced_result["critical_issues"] > 0:
+            validation_result["confidence_score"] *= 0.5  # Halve confidence for critical issues
+            validation_result["requires_human_review"] = True
+        elif enhanced_result["high_issues"] > 0:
+            validation_result["confidence_score"] *= 0.8  # Reduce confidence for high issues
+        
+        # Add security score to metadata
+        validation_result.setdefault("metadata", {})["security_score"] = enhanced_result["security_score"]
+        validation_result["metadata"]["enhanced_validation"] = {
+            "total_issues": enhanced_result["total_issues"],
+            "critical_issues": enhanced_result["critical_issues"],
+            "high_issues": enhanced_result["high_issues"]
+        }
+    
+    return validation_result
 
 
 @activity.defn
@@ -1014,49 +967,45 @@ edition = "2021"
         activity.heartbeat(f"Running capsule validation for language: {language}")
         
         # Use enhanced sandbox via HTTP (Docker-in-Docker compatible)
-        import httpx
-        sandbox_client = httpx.AsyncClient(timeout=120.0)
+        from ..common.service_clients import get_service_clients
+        sandbox_client = get_service_clients()["sandbox"]
         
-        try:
-            # Execute code using enhanced sandbox (use container network name)
-            request_data = {
-                "code": code,
-                "language": language_normalized
-            }
-            # Only add optional fields if they have values
-            if test_inputs:
-                request_data["inputs"] = test_inputs[0] if test_inputs else {}
-            
-            activity.logger.info(f"Sending request to enhanced sandbox: {request_data}")
-            response = await sandbox_client.post(
-                "http://execution-sandbox:8004/execute",
-                json=request_data
-            )
-            activity.logger.info(f"Enhanced sandbox response: {response.status_code}")
-            response.raise_for_status()
-            sandbox_result = response.json()
-            activity.logger.info(f"Enhanced sandbox result: {sandbox_result}")
-            
-            # Convert sandbox result to runtime validation format
-            success = sandbox_result.get("status") == "completed"
-            stdout = sandbox_result.get("output", "")
-            stderr = sandbox_result.get("error", "") if not success else ""
-            execution_time = sandbox_result.get("duration_ms", 0) / 1000.0
-            memory_usage = sandbox_result.get("resource_usage", {}).get("memory_usage_mb", 0)
-            
-            # Create a RuntimeValidationResult-like object
-            class RuntimeResult:
-                def __init__(self, success, stdout, stderr, execution_time, memory_usage):
-                    self.success = success
-                    self.stdout = stdout
-                    self.stderr = stderr
-                    self.execution_time = execution_time
-                    self.memory_usage = memory_usage
-            
-            runtime_result = RuntimeResult(success, stdout, stderr, execution_time, memory_usage)
-            
-        finally:
-            await sandbox_client.aclose()
+        # Execute code using enhanced sandbox (use container network name)
+        request_data = {
+            "code": code,
+            "language": language_normalized
+        }
+        # Only add optional fields if they have values
+        if test_inputs:
+            request_data["inputs"] = test_inputs[0] if test_inputs else {}
+        
+        activity.logger.info(f"Sending request to enhanced sandbox: {request_data}")
+        response = await sandbox_client.post(
+            "/execute",
+            json=request_data
+        )
+        activity.logger.info(f"Enhanced sandbox response: {response.status_code}")
+        response.raise_for_status()
+        sandbox_result = response.json()
+        activity.logger.info(f"Enhanced sandbox result: {sandbox_result}")
+        
+        # Convert sandbox result to runtime validation format
+        success = sandbox_result.get("status") == "completed"
+        stdout = sandbox_result.get("output", "")
+        stderr = sandbox_result.get("error", "") if not success else ""
+        execution_time = sandbox_result.get("duration_ms", 0) / 1000.0
+        memory_usage = sandbox_result.get("resource_usage", {}).get("memory_usage_mb", 0)
+        
+        # Create a RuntimeValidationResult-like object
+        class RuntimeResult:
+            def __init__(self, success, stdout, stderr, execution_time, memory_usage):
+                self.success = success
+                self.stdout = stdout
+                self.stderr = stderr
+                self.execution_time = execution_time
+                self.memory_usage = memory_usage
+        
+        runtime_result = RuntimeResult(success, stdout, stderr, execution_time, memory_usage)
         
         # Convert to expected format
         results = [{
@@ -1107,6 +1056,145 @@ edition = "2021"
             }
         }
 
+# Per-language test commands for capsule runtime validation: (test file suffixes, command builder)
+CAPSULE_TEST_RUNNERS = {
+    "python": ((".py",), lambda path: ["python", "-m", "pytest", "-q", "-p", "no:cacheprovider", path]),
+    "javascript": ((".js", ".mjs"), lambda path: ["node", "--test", path]),
+    "typescript": ((".ts",), lambda path: ["npx", "tsx", "--test", path]),
+    "go": (("_test.go",), lambda path: ["go", "test", "./..."]),
+}
+
+# Test runners the language images do not ship, installed into the capsule's dependency layer
+CAPSULE_TEST_RUNNER_PACKAGES = {
+    "python": "pytest",
+    "typescript": "tsx",
+}
+
+# Dependency manifests per language, installed with network access before the tests run offline
+CAPSULE_MANIFESTS = {
+    "python": ("requirements.txt",),
+    "javascript": ("package.json", "package-lock.json"),
+    "typescript": ("package.json", "package-lock.json"),
+    "go": ("go.mod", "go.sum"),
+}
+
+
+def build_capsule_test_manifests(language: str, files: Dict[str, str]) -> Dict[str, str]:
+    """The capsule's dependency manifests, with the test runner added where the image lacks it"""
+    manifests = {name: files[name] for name in CAPSULE_MANIFESTS.get(language, ()) if name in files}
+    runner = CAPSULE_TEST_RUNNER_PACKAGES.get(language)
+    if runner is None:
+        return manifests
+
+    if language == "python":
+        requirements = manifests.get("requirements.txt", "")
+        names = {re.split(r"[<>=!~\[; ]", line.strip(), 1)[0].lower() for line in requirements.splitlines()}
+        if runner not in names:
+            manifests["requirements.txt"] = f"{requirements.rstrip()}\n{runner}\n".lstrip()
+    else:
+        try:
+            package = json.loads(manifests.get("package.json") or "{}")
+        except ValueError:
+            # Left as is; the sandbox reports the failed install
+            return manifests
+        declared = {**package.get("dependencies", {}), **package.get("devDependencies", {})}
+        if runner not in declared:
+            package.setdefault("devDependencies", {})[runner] = "*"
+            manifests["package.json"] = json.dumps(package, indent=2)
+    return manifests
+
+
+def build_capsule_test_invocations(language: str, tests: Dict[str, str], timeout: int = 60) -> List[Dict[str, Any]]:
+    """One sandbox test invocation per test file (a single one for package-level runners)"""
+    runner = CAPSULE_TEST_RUNNERS.get(language)
+    if not runner:
+        return []
+    suffixes, command = runner
+    invocations = []
+    for path in sorted(tests):
+        if not path.endswith(suffixes):
+            continue
+        invocation = {"name": path, "command": command(path), "timeout": timeout}
+        if invocation["command"] in [i["command"] for i in invocations]:
+            continue
+        invocations.append(invocation)
+    return invocations
+
+
+@activity.defn
+async def run_capsule_tests_activity(capsule_id: str) -> Dict[str, Any]:
+    """Run a capsule's tests in one sandbox container via /execute/batch"""
+    from ..common.service_clients import get_service_clients
+    
+    activity.logger.info(f"Running runtime validation for capsule: {capsule_id}")
+    clients = get_service_clients()
+    
+    capsule_response = await clients["orchestrator"].get(f"/capsules/{capsule_id}")
+    if capsule_response.status_code != 200:
+        return {
+            "all_passed": False,
+            "error": f"Failed to get capsule details: {capsule_response.status_code}"
+        }
+    capsule = capsule_response.json()
+    
+    language = (capsule.get("manifest") or {}).get("language", "python").lower()
+    source_code = capsule.get("source_code") or {}
+    tests = capsule.get("tests") or {}
+    invocations = build_capsule_test_invocations(language, tests)
+    if not invocations:
+        return {"all_passed": False, "skipped": True, "reason": f"No runnable tests for {language}"}
+    files = {**source_code, **tests}
+    
+    result = {"install": None, "setup": None, "cases": [], "summary": None}
+    try:
+        async with clients["sandbox"].stream(
+            "POST",
+            "/execute/batch",
+            json={
+                "files": files,
+                "language": language,
+                "tests": invocations,
+                "manifests": build_capsule_test_manifests(language, files),
+                "stream": True
+            },
+            timeout=600.0
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.strip():
+                    continue
+                event = json.loads(line)
+                if event["type"] == "case":
+                    result["cases"].append(event)
+                    activity.heartbeat(f"{event['name']}: {event['status']}")
+                elif event["type"] == "install":
+                    result["install"] = event
+                    activity.heartbeat("dependencies: " + (
+                        "failed" if not event.get("passed") else "cached" if event.get("cache_hit") else "installed"
+                    ))
+                elif event["type"] == "setup":
+                    result["setup"] = event
+                else:
+                    result["summary"] = event
+    except Exception as e:
+        activity.logger.error(f"Capsule runtime validation failed: {e}")
+        return {"all_passed": False, "error": f"Sandbox batch execution failed: {str(e)}"}
+    
+    summary = result["summary"] or {}
+    install = result["install"] or {}
+    return {
+        "all_passed": summary.get("all_passed", False),
+        "language": language,
+        "summary": summary,
+        "dependency_image": install.get("image"),
+        "dependency_cache_hit": install.get("cache_hit", False),
+        "cases": [
+            {k: case.get(k) for k in ("name", "status", "passed", "exit_code", "duration_ms", "error")}
+            for case in result["cases"]
+        ]
+    }
+
+
 @activity.defn
 async def request_aitl_review_activity(
     task: Dict[str, Any], 
@@ -1115,7 +1203,7 @@ async def request_aitl_review_activity(
     reason: str
 ) -> Dict[str, Any]:
     """Request AITL (AI-in-the-Loop) review directly - no human involvement"""
-    import httpx
+    from ..common.service_clients import get_service_clients
     from ..common.config import settings
     
     # Check if AITL is enabled - if disabled, auto-approve
@@ -1155,48 +1243,48 @@ async def request_aitl_review_activity(
         }
     }
     
-    async with httpx.AsyncClient(timeout=300.0) as client:
-        activity.logger.info(f"Calling AITL intelligent review directly for task: {task['task_id']}")
-        
-        # Call the AITL intelligent review function directly via internal endpoint
-        aitl_response = await client.post(
-            f"http://orchestrator:{settings.ORCHESTRATOR_PORT}/internal/aitl-review",
-            json=aitl_request_data
-        )
+    clients = get_service_clients()
+    activity.logger.info(f"Calling AITL intelligent review directly for task: {task['task_id']}")
+    
+    # Call the AITL intelligent review function directly via internal endpoint
+    aitl_response = await clients["orchestrator"].post(
+        "/internal/aitl-review",
+        json=aitl_request_data
+    )
+    
+    if aitl_response.status_code == 200:
+        aitl_result = aitl_response.json()
+        activity.logger.info(f"AITL direct review completed: {aitl_result.get('decision')} (confidence: {aitl_result.get('confidence')})")
         
-        if aitl_response.status_code == 200:
-            aitl_result = aitl_response.json()
-            activity.logger.info(f"AITL direct review completed: {aitl_result.get('decision')} (confidence: {aitl_result.get('confidence')})")
-            
-            return {
-                "approved": aitl_result.get("decision") in ["approve", "approved", "approved_with_modifications"],
-                "reviewer": "aitl-system",
-                "confidence": aitl_result.get("confidence", 0),
-                "comments": aitl_result.get("feedback", ""),
-                "modifications": {
-                    "security_issues": aitl_result.get("security_issues", []),
-                    "modifications_required": aitl_result.get("modifications_required", []),
-                    "estimated_fix_time": aitl_result.get("estimated_fix_time", 15)
-                },
-                "timestamp": datetime.now(timezone.utc).isoformat(),
-                "aitl_processed": True,
-                "decision": aitl_result.get("decision"),
-                "quality_score": aitl_result.get("quality_score", 0)
-            }
-        else:
-            activity.logger.error(f"AITL direct review failed: {aitl_response.status_code}")
-            # Fallback to simple approval for system errors
-            return {
-                "approved": False,
-                "reviewer": "aitl-system",
-                "confidence": 0.0,
-                "comments": "AITL system error - rejected for safety",
-                "modifications": {},
-                "timestamp": datetime.now(timezone.utc).isoformat(),
-                "aitl_processed": True,
-                "decision": "rejected",
-                "reason": "AITL system error"
-            }
+        return {
+            "approved": aitl_result.get("decision") in ["approve", "approved", "approved_with_modifications"],
+            "reviewer": "aitl-system",
+            "confidence": aitl_result.get("confidence", 0),
+            "comments": aitl_result.get("feedback", ""),
+            "modifications": {
+                "security_issues": aitl_result.get("security_issues", []),
+                "modifications_required": aitl_result.get("modifications_required", []),
+                "estimated_fix_time": aitl_result.get("estimated_fix_time", 15)
+            },
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "aitl_processed": True,
+            "decision": aitl_result.get("decision"),
+            "quality_score": aitl_result.get("quality_score", 0)
+        }
+    else:
+        activity.logger.error(f"AITL direct review failed: {aitl_response.status_code}")
+        # Fallback to simple approval for system errors
+        return {
+            "approved": False,
+            "reviewer": "aitl-system",
+            "confidence": 0.0,
+            "comments": "AITL system error - rejected for safety",
+            "modifications": {},
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "aitl_processed": True,
+            "decision": "rejected",
+            "reason": "AITL system error"
+        }
 
 
 def _is_test_code(code: str) -> bool:
@@ -1237,6 +1325,84 @@ def _is_documentation(code: str) -> bool:
     
     return any(indicator in code_lower for indicator in doc_indicators)
 
+async def _organize_task_outputs(
+    tasks: List[Dict[str, Any]],
+    results: List[Dict[str, Any]],
+    project_context: Dict[str, Any]
+) -> Dict[int, Any]:
+    """Organize every plain code output up front with bounded concurrency
+    
+    Returns the organization (or the exception raised) per task index. Results
+    are merged afterwards in task order, so the capsule layout doesn't depend on
+    which call finishes first.
+    """
+    from ..common.config import settings
+    from .intelligent_file_organizer import organize_code_intelligently, python_module_imports
+    
+    pending = {}
+    for i, (task, result) in enumerate(zip(tasks, results)):
+        execution_data = result if "status" in result else result.get("execution", {})
+        if execution_data.get("status") != "completed" or execution_data.get("output_type") == "meta_execution":
+            continue
+        output = execution_data.get("output", {})
+        if not isinstance(output, dict):
+            continue
+        code = output.get("code", output.get("content", ""))
+        if not code or not code.strip():
+            continue
+        pending[i] = (code, {
+            'type': task.get('type', ''),
+            'task_id': task.get('task_id', ''),
+            'description': task.get('description', ''),
+            'language': output.get("language", "python"),
+            'metadata': task.get('metadata', {})
+        })
+    
+    if not pending:
+        return {}
+    
+    # Modules are named after what the other outputs import from them
+    project_context = {**project_context, 'python_imports': python_module_imports(
+        code for code, task_context in pending.values() if task_context['language'] in ('python', 'py')
+    )}
+    semaphore = asyncio.Semaphore(max(1, settings.FILE_ORGANIZER_CONCURRENCY))
+    done = 0
+    
+    async def organize(i: int):
+        nonlocal done
+        code, task_context = pending[i]
+        async with semaphore:
+            try:
+                organized = await organize_code_intelligently(
+                    code=code,
+                    task_context=task_context,
+                    project_context=project_context
+                )
+            except Exception as e:
+                organized = e
+        done += 1
+        activity.heartbeat(f"Organized {done} of {len(pending)} task outputs")
+        return i, organized
+    
+    # LLM calls can outlast the heartbeat timeout on their own
+    heartbeat_task = asyncio.create_task(_send_periodic_heartbeats("file organizer", HEARTBEAT_INTERVAL))
+    try:
+        organized_outputs = await asyncio.gather(*(organize(i) for i in pending))
+    finally:
+        heartbeat_task.cancel()
+        try:
+            await heartbeat_task
+        except asyncio.CancelledError:
+            pass
+    
+    methods = [o.get('method') for _, o in organized_outputs if isinstance(o, dict)]
+    activity.logger.info(
+        f"Organized {len(pending)} task outputs: "
+        f"{methods.count('rules')} by rules, {methods.count('cache')} cached, {methods.count('llm')} via LLM"
+    )
+    return dict(organized_outputs)
+
+
 @activity.defn
 async def create_ql_capsule_activity(
     request_id: str,
@@ -1245,7 +1411,7 @@ async def create_ql_capsule_activity(
     shared_context_dict: Dict[str, Any]
 ) -> Dict[str, Any]:
     """Create a QLCapsule with all artifacts using shared context"""
-    import httpx
+    from ..common.service_clients import get_service_clients
     from ..common.config import settings
     from .shared_context import SharedContext
     
@@ -1261,9 +1427,6 @@ async def create_ql_capsule_activity(
     # Send heartbeat for capsule creation start
     activity.heartbeat(f"Starting capsule creation for request: {request_id}")
     
-    # Import intelligent file organizer
-    from .intelligent_file_organizer import organize_code_intelligently
-    
     # Extract execution context from first task (all tasks should have same context)
     execution_context = {}
     if tasks:
@@ -1296,6 +1459,8 @@ async def create_ql_capsule_activity(
         'main_file_name': shared_context.file_structure.main_file_name
     }
     
+    organized_outputs = await _organize_task_outputs(tasks, results, project_context)
+    
     for i, (task, result) in enumerate(zip(tasks, results)):
         # Send heartbeat for each task processing
         activity.heartbeat(f"Processing task {i+1} of {len(tasks)}")
@@ -1351,26 +1516,14 @@ async def create_ql_capsule_activity(
                     activity.logger.info(f"DEBUG: Skipping task {i}: no code content")
                     continue
                 
-                # Build task context for intelligent organization
-                task_context = {
-                    'type': task.get('type', ''),
-                    'task_id': task.get('task_id', ''),
-                    'description': task.get('description', ''),
-                    'language': actual_language,
-                    'metadata': task.get('metadata', {})
-                }
-                
                 try:
-                    # Use intelligent LLM-powered organization
-                    activity.logger.info(f"Using intelligent organization for task {i}")
-                    organized = await organize_code_intelligently(
-                        code=code,
-                        task_context=task_context,
-                        project_context=project_context
-                    )
+                    # Organized concurrently above; merge in task order
+                    organized = organized_outputs.get(i)
+                    if isinstance(organized, Exception):
+                        raise organized
                     
                     # Add organized files to appropriate collections
-                    if organized['success']:
+                    if organized and organized['success']:
                         # Add source files
                         for filename, content in organized['source_files'].items():
                             if len(source_code) == 0 and 'main' in filename.lower():
@@ -1688,94 +1841,99 @@ async def create_ql_capsule_activity(
         }
     }
     
-    async with httpx.AsyncClient(timeout=60.0) as client:
+    async def save_to_postgres():
+        activity.logger.info("Saving capsule to PostgreSQL database...")
         try:
-            # Send heartbeat before storing capsule
-            activity.heartbeat(f"Storing capsule for request: {request_id}")
-            
-            # Store capsule
-            response = await client.post(
-                f"http://vector-memory:{settings.VECTOR_MEMORY_PORT}/store/capsule",
-                json=capsule_data
+            from ..common.database import get_db
+            from ..orchestrator.capsule_storage import CapsuleStorageService
+            from ..common.models import QLCapsule, ExecutionRequest
+            
+            # Create QLCapsule instance
+            capsule = QLCapsule(**capsule_data)
+            
+            # Create ExecutionRequest for storage
+            exec_request = ExecutionRequest(
+                id=request_id,
+                tenant_id=execution_context.get("tenant_id", "default"),
+                user_id=execution_context.get("user_id", "system"),
+                description=execution_context.get("original_request", "Generated capsule"),
+                requirements="",
+                constraints={}
             )
             
-            if response.status_code != 200:
-                error_detail = response.text
-                activity.logger.error(f"Failed to store capsule: {response.status_code} - {error_detail}")
-                return {
-                    "capsule_id": None,
-                    "error": f"Failed to store capsule: {response.status_code} - {error_detail}"
-                }
+            # Get database session
+            db = next(get_db())
+            storage_service = CapsuleStorageService(db)
             
-            storage_result = response.json()
-            capsule_id = storage_result.get("capsule_id", capsule_data["id"])
+            # Store in PostgreSQL
+            stored_id = await storage_service.store_capsule(
+                capsule=capsule,
+                request=exec_request,
+                overwrite=True
+            )
             
-            # Also save to PostgreSQL for persistent storage
-            activity.logger.info("Saving capsule to PostgreSQL database...")
-            try:
-                from ..common.database import get_db
-                from ..orchestrator.capsule_storage import CapsuleStorageService
-                from ..common.models import QLCapsule, ExecutionRequest
-                
-                # Create QLCapsule instance
-                capsule = QLCapsule(**capsule_data)
-                
-                # Create ExecutionRequest for storage
-                exec_request = ExecutionRequest(
-                    id=request_id,
-                    tenant_id=execution_context.get("tenant_id", "default"),
-                    user_id=execution_context.get("user_id", "system"),
-                    description=execution_context.get("original_request", "Generated capsule"),
-                    requirements="",
-                    constraints={}
-                )
-                
-                # Get database session
-                db = next(get_db())
-                storage_service = CapsuleStorageService(db)
-                
-                # Store in PostgreSQL
-                stored_id = await storage_service.store_capsule(
-                    capsule=capsule,
-                    request=exec_request,
-                    overwrite=True
-                )
-                
-                activity.logger.info(f"✅ Capsule saved to PostgreSQL with ID: {stored_id}")
-                db.close()
-                
-            except Exception as db_error:
-                activity.logger.error(f"Failed to save to PostgreSQL: {str(db_error)}")
-                # Continue even if database save fails
+            activity.logger.info(f"✅ Capsule saved to PostgreSQL with ID: {stored_id}")
+            db.close()
             
-        except Exception as e:
-            activity.logger.error(f"Exception while storing capsule: {str(e)}")
+        except Exception as db_error:
+            activity.logger.error(f"Failed to save to PostgreSQL: {str(db_error)}")
+            # Continue even if database save fails
+    
+    clients = get_service_clients()
+    try:
+        # Send heartbeat before storing capsule
+        activity.heartbeat(f"Storing capsule for request: {request_id}")
+        
+        # Store capsule
+        response = await clients["vector-memory"].post(
+            "/store/capsule",
+            json=capsule_data,
+            timeout=60.0
+        )
+        
+        if response.status_code != 200:
+            error_detail = response.text
+            activity.logger.error(f"Failed to store capsule: {response.status_code} - {error_detail}")
             return {
                 "capsule_id": None,
-                "error": f"Exception while storing capsule: {str(e)}"
+                "error": f"Failed to store capsule: {response.status_code} - {error_detail}"
             }
         
-        # Generate download URL or storage location
-        capsule_url = f"http://orchestrator:{settings.ORCHESTRATOR_PORT}/capsules/{capsule_id}"
+        storage_result = response.json()
+        capsule_id = storage_result.get("capsule_id", capsule_data["id"])
+        
+        # Also save to PostgreSQL for persistent storage, once vector memory has the capsule
+        await save_to_postgres()
         
+    except Exception as e:
+        activity.logger.error(f"Exception while storing capsule: {str(e)}")
         return {
-            "capsule_id": capsule_id,
-            "capsule_url": capsule_url,
-            "manifest": capsule_data["manifest"],
-            "files": {
-                "source": list(source_code.keys()),
-                "tests": list(tests.keys()),
-                "docs": ["README.md"] if documentation else []
-            },
-            "database_saved": True,
-            "storage_locations": ["vector_memory", "postgresql"]
+            "capsule_id": None,
+            "error": f"Exception while storing capsule: {str(e)}"
         }
+    
+    # Generate download URL or storage location
+    capsule_url = f"http://orchestrator:{settings.ORCHESTRATOR_PORT}/capsules/{capsule_id}"
+    
+    return {
+        "capsule_id": capsule_id,
+        "capsule_url": capsule_url,
+        "manifest": capsule_data["manifest"],
+        "files": {
+            "source": list(source_code.keys()),
+            "tests": list(tests.keys()),
+            "docs": ["README.md"] if documentation else []
+        },
+        "database_saved": True,
+        "storage_locations": ["vector_memory", "postgresql"]
+    }
 
 
 @activity.defn
-async def llm_clean_code_activity(code: str) -> str:
+async def llm_clean_code_activity(code: str, tenant_id: Optional[str] = None) -> str:
     """LLM-powered intelligent code cleanup activity"""
     from src.agents.azure_llm_client import llm_client, get_model_for_tier
+    from src.agents.llm_cache import CachePolicy
     
     activity.logger.info("Starting LLM-powered code cleanup")
     
@@ -1809,9 +1967,11 @@ Output the cleaned code:
             ],
             model=model,
             provider=provider,
-            temperature=0.1,  # Low temperature for precise formatting
+            temperature=0,  # Responses are only shared for deterministic calls
             max_tokens=4000,
-            timeout=30.0
+            timeout=30.0,
+            tenant_id=tenant_id,
+            cache=CachePolicy(scope="code_cleanup")
         )
         
         cleaned_code = response["content"].strip()
@@ -1827,75 +1987,74 @@ Output the cleaned code:
 @activity.defn
 async def prepare_delivery_activity(capsule_id: str, request: Dict[str, Any]) -> Dict[str, Any]:
     """Prepare capsule for delivery with packaging and deployment configs"""
-    import httpx
-    from ..common.config import settings
+    from ..common.service_clients import get_service_clients
     
     activity.logger.info(f"Preparing delivery for capsule: {capsule_id}")
     
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        try:
-            # Get capsule details
-            capsule_response = await client.get(
-                f"http://orchestrator:{settings.ORCHESTRATOR_PORT}/capsules/{capsule_id}"
-            )
-            
-            if capsule_response.status_code != 200:
-                return {
-                    "ready": False,
-                    "error": f"Failed to get capsule details: {capsule_response.status_code}"
-                }
-            
-            capsule_data = capsule_response.json()
-            
-            # Prepare delivery package
-            delivery_package = {
-                "capsule_id": capsule_id,
-                "request_id": request["request_id"],
-                "tenant_id": request["tenant_id"],
-                "user_id": request["user_id"],
-                "package_format": "zip",
-                "delivery_methods": ["download", "email", "api"],
-                "deployment_ready": True,
-                "includes": {
-                    "source_code": True,
-                    "tests": True,
-                    "documentation": True,
-                    "deployment_configs": True,
-                    "runtime_validation": True
-                }
-            }
-            
-            # Create delivery record
-            delivery_response = await client.post(
-                f"http://orchestrator:{settings.ORCHESTRATOR_PORT}/capsules/{capsule_id}/deliver",
-                json=delivery_package
-            )
-            
-            if delivery_response.status_code != 200:
-                return {
-                    "ready": False,
-                    "error": f"Failed to create delivery record: {delivery_response.status_code}"
-                }
-            
-            delivery_result = delivery_response.json()
-            
+    clients = get_service_clients()
+    try:
+        # Get capsule details
+        capsule_response = await clients["orchestrator"].get(
+            f"/capsules/{capsule_id}"
+        )
+        
+        if capsule_response.status_code != 200:
             return {
-                "ready": True,
-                "capsule_id": capsule_id,
-                "delivery_id": delivery_result.get("delivery_id"),
-                "download_url": delivery_result.get("download_url"),
-                "expires_at": delivery_result.get("expires_at"),
-                "methods": delivery_package["delivery_methods"],
-                "package_size": delivery_result.get("package_size", 0),
-                "deployment_ready": True
+                "ready": False,
+                "error": f"Failed to get capsule details: {capsule_response.status_code}"
             }
-            
-        except Exception as e:
-            activity.logger.error(f"Failed to prepare delivery: {str(e)}")
+        
+        capsule_data = capsule_response.json()
+        
+        # Prepare delivery package
+        delivery_package = {
+            "capsule_id": capsule_id,
+            "request_id": request["request_id"],
+            "tenant_id": request["tenant_id"],
+            "user_id": request["user_id"],
+            "package_format": "zip",
+            "delivery_methods": ["download", "email", "api"],
+            "deployment_ready": True,
+            "includes": {
+                "source_code": True,
+                "tests": True,
+                "documentation": True,
+                "deployment_configs": True,
+                "runtime_validation": True
+            }
+        }
+        
+        # Create delivery record
+        delivery_response = await clients["orchestrator"].post(
+            f"/capsules/{capsule_id}/deliver",
+            json=delivery_package
+        )
+        
+        if delivery_response.status_code != 200:
             return {
                 "ready": False,
-                "error": f"Delivery preparation failed: {str(e)}"
+                "error": f"Failed to create delivery record: {delivery_response.status_code}"
             }
+        
+        delivery_result = delivery_response.json()
+        
+        return {
+            "ready": True,
+            "capsule_id": capsule_id,
+            "delivery_id": delivery_result.get("delivery_id"),
+            "download_url": delivery_result.get("download_url"),
+            "expires_at": delivery_result.get("expires_at"),
+            "methods": delivery_package["delivery_methods"],
+            "package_size": delivery_result.get("package_size", 0),
+            "deployment_ready": True
+        }
+        
+    except Exception as e:
+        activity.logger.error(f"Failed to prepare delivery: {str(e)}")
+        return {
+            "ready": False,
+            "error": f"Delivery preparation failed: {str(e)}"
+        }
 
 
 @activity.defn
@@ -1987,57 +2146,42 @@ async def load_workflow_checkpoint_activity(workflow_id: str) -> Optional[Dict[s
 async def stream_workflow_results_activity(workflow_id: str, batch_idx: int, 
                                          batch_results: List[Dict[str, Any]], 
                                          total_batches: int) -> Dict[str, Any]:
-    """Stream partial results back to client via Redis pub/sub or similar mechanism"""
+    """Push partial results to progress subscribers on every orchestrator replica"""
+    from src.common.progress_streaming import ProgressEvent, ProgressEventType, progress_manager
+    
     activity.logger.info(f"Streaming results for workflow {workflow_id}, batch {batch_idx + 1}/{total_batches}")
     
     try:
-        # Initialize Redis client
-        redis_client = await redis.from_url(
-            f"redis://redis:6379/0",
-            encoding="utf-8",
-            decode_responses=True
-        )
-        
         # Create streaming update
         stream_update = {
-            "workflow_id": workflow_id,
+            "request_id": workflow_id,
             "batch_index": batch_idx,
             "total_batches": total_batches,
             "batch_size": len(batch_results),
-            "timestamp": datetime.now(timezone.utc).isoformat(),
             "completed_tasks": [r["task_id"] for r in batch_results if r["execution"].get("status") == "completed"],
             "failed_tasks": [r["task_id"] for r in batch_results if r["execution"].get("status") == "failed"],
+            "batch_results": [{"task_id": r["task_id"],
+                               "status": r["execution"].get("status"),
+                               "output_type": r["execution"].get("output_type")}
+                              for r in batch_results],
             "progress_percentage": round((batch_idx + 1) / total_batches * 100, 2)
         }
         
-        # Store in Redis stream for real-time updates
-        stream_key = f"workflow:stream:{workflow_id}"
-        await redis_client.xadd(stream_key, stream_update)
-        
-        # Also publish to pub/sub channel for real-time listeners
-        channel = f"workflow:updates:{workflow_id}"
-        await redis_client.publish(channel, json.dumps(stream_update))
-        
-        # Store latest results for polling clients
-        results_key = f"workflow:results:{workflow_id}:batch:{batch_idx}"
-        await redis_client.setex(
-            results_key, 
-            3600,  # 1 hour TTL
-            json.dumps({
-                "batch_results": [{"task_id": r["task_id"], 
-                                 "status": r["execution"].get("status"),
-                                 "output_type": r["execution"].get("output_type")}
-                                for r in batch_results],
-                "update": stream_update
-            })
-        )
-        
-        await redis_client.close()
+        # Clients follow the Temporal workflow ID; the workflow passes its request ID
+        event_id = await progress_manager.publish_event(ProgressEvent(
+            id=str(uuid4()),
+            type=ProgressEventType.STATUS_UPDATE,
+            timestamp=datetime.utcnow(),
+            source="qlp-workflow",
+            workflow_id=activity.info().workflow_id,
+            data=stream_update
+        ))
         
         return {
             "streamed": True,
             "batch_index": batch_idx,
-            "tasks_streamed": len(batch_results)
+            "tasks_streamed": len(batch_results),
+            "event_id": event_id
         }
         
     except Exception as e:
@@ -2048,16 +2192,58 @@ async def stream_workflow_results_activity(workflow_id: str, batch_idx: int,
         }
 
 
+@activity.defn
+async def publish_workflow_status_activity(workflow_id: str, progress: Dict[str, Any],
+                                           workflow_result: Dict[str, Any]) -> Dict[str, Any]:
+    """Store the terminal status snapshot and the result once, for polls that skip Temporal"""
+    from src.common.progress_streaming import ProgressEvent, ProgressEventType, progress_manager
+    from src.orchestrator.workflow_status import terminal_snapshot, workflow_status_store
+    
+    snapshot = terminal_snapshot(workflow_id, workflow_result, started_at=progress.get("started_at"),
+                                 completed_at=datetime.now(timezone.utc).isoformat())
+    snapshot = await workflow_status_store.put_terminal(workflow_id, snapshot, workflow_result)
+    
+    # Ends push streams; clients fetch the full result from result_url
+    failed = snapshot["status"] == "failed"
+    await progress_manager.publish_event(ProgressEvent(
+        id=str(uuid4()),
+        type=ProgressEventType.WORKFLOW_FAILED if failed else ProgressEventType.WORKFLOW_COMPLETED,
+        timestamp=datetime.utcnow(),
+        source="qlp-workflow",
+        workflow_id=workflow_id,
+        data=snapshot
+    ))
+    return {"published": True, "result_ref": snapshot["result_ref"]}
+
+
 # Workflow - Production-ready orchestration
 @workflow.defn
 class QLPWorkflow:
     """Production workflow for Quantum Layer Platform request processing"""
     
+    def __init__(self):
+        # Progress projection served to status polls through the get_status query
+        self._progress: Dict[str, Any] = {
+            "current_stage": "queued",
+            "current_task": "",
+            "tasks_completed": 0,
+            "tasks_total": 0
+        }
+    
+    @workflow.query
+    def get_status(self) -> Dict[str, Any]:
+        """Current progress without reading workflow history"""
+        return self._progress
+    
+    def _set_stage(self, stage: str, **fields):
+        self._progress.update(current_stage=stage, **fields)
+    
     @workflow.run
     async def run(self, request: Dict[str, Any]) -> Dict[str, Any]:
         """Execute the complete workflow for an NLP request"""
         # Use workflow.now() instead of time.time() for deterministic time
         start_time = workflow.now()
+        self._set_stage("decomposing", request_id=request["request_id"], started_at=start_time.isoformat())
         
         workflow_result = {
             "request_id": request["request_id"],
@@ -2083,102 +2269,24 @@ class QLPWorkflow:
             
             workflow_result["tasks_total"] = len(tasks)
             workflow_result["status"] = "decomposed"
+            self._set_stage("executing", tasks_total=len(tasks))
             
             # Step 2: Create execution plan based on dependencies
             execution_order = self._topological_sort(tasks, dependencies)
             
-            # Step 3: Execute tasks with parallel processing for independent tasks
-            task_results = {}
-            completed_tasks = set()
-            
-            # Group tasks into parallel execution batches
-            execution_batches = self._create_parallel_execution_batches(tasks, dependencies, execution_order)
-            workflow.logger.info(f"Created {len(execution_batches)} execution batches for parallel processing")
-            
-            # Process each batch in order (batches must be sequential, tasks within batch can be parallel)
-            for batch_idx, batch_tasks in enumerate(execution_batches):
-                workflow.logger.info(f"Processing batch {batch_idx + 1}/{len(execution_batches)} with {len(batch_tasks)} tasks")
-                
-                # Execute all tasks in this batch concurrently
-                batch_futures = []
-                
-                for task in batch_tasks:
-                    task_id = task["task_id"]
-                    
-                    # Verify dependencies are met (should be by design of batching)
-                    task_deps = dependencies.get(task_id, [])
-                    deps_met = all(dep_id in completed_tasks for dep_id in task_deps)
-                    
-                    if not deps_met:
-                        workflow.logger.error(f"Dependencies not met for task {task_id} in batch {batch_idx}")
-                        continue
-                    
-                    # Create a coroutine for this task's execution pipeline
-                    task_future = self._execute_task_pipeline(
-                        task, request["request_id"], shared_context_dict
-                    )
-                    batch_futures.append((task_id, task_future))
-                
-                # Execute all tasks in batch concurrently
-                if batch_futures:
-                    # Use asyncio.gather to run tasks in parallel
-                    task_ids = [task_id for task_id, _ in batch_futures]
-                    task_coroutines = [future for _, future in batch_futures]
-                    
-                    workflow.logger.info(f"Executing {len(task_coroutines)} tasks in parallel: {task_ids}")
-                    
-                    # Execute all coroutines concurrently
-                    batch_results = await asyncio.gather(*task_coroutines, return_exceptions=True)
-                    
-                    # Process results
-                    for (task_id, _), result in zip(batch_futures, batch_results):
-                        if isinstance(result, Exception):
-                            workflow.logger.error(f"Task {task_id} failed with exception: {result}")
-                            # Create error result
-                            task_results[task_id] = {
-                                "task_id": task_id,
-                                "execution": {
-                                    "status": "failed",
-                                    "output_type": "error",
-                                    "output": {"error": str(result)},
-                                    "execution_time": 0,
-                                    "confidence_score": 0,
-                                    "agent_tier_used": "unknown"
-                                },
-                                "validation": {"overall_status": "failed"},
-                                "sandbox": None,
-                                "review": None
-                            }
-                        else:
-                            task_results[task_id] = result
-                            if result["execution"].get("status") == "completed":
-                                completed_tasks.add(task_id)
-                
-                # Continue with original logic after batch
-                # The rest of the loop will be removed as we're processing in batches now
-                # Save checkpoint and stream results after each batch completes
-                if completed_tasks:
-                    # Save checkpoint
-                    await workflow.execute_activity(
-                        save_workflow_checkpoint_activity,
-                        args=[request["request_id"], list(task_results.values()), shared_context_dict],
-                        start_to_close_timeout=timedelta(minutes=1),
-                        retry_policy=RetryPolicy(maximum_attempts=2)
-                    )
-                    
-                    # Stream batch results for real-time updates
-                    batch_results_for_streaming = [task_results[task["task_id"]] 
-                                                 for task in batch_tasks 
-                                                 if task["task_id"] in task_results]
-                    
-                    await workflow.execute_activity(
-                        stream_workflow_results_activity,
-                        args=[request["request_id"], batch_idx, batch_results_for_streaming, len(execution_batches)],
-                        start_to_close_timeout=timedelta(seconds=30),
-                        retry_policy=RetryPolicy(maximum_attempts=2)
-                    )
+            # Step 3: Execute tasks as soon as their own dependencies complete.
+            # Workflows started before the dataflow scheduler keep replaying the
+            # original level-synchronous batches.
+            if workflow.patched(DATAFLOW_SCHEDULER_PATCH):
+                task_results, completed_tasks = await self._execute_tasks_dataflow(
+                    request, tasks, dependencies, shared_context_dict
+                )
+            else:
+                task_results, completed_tasks = await self._execute_tasks_batched(
+                    request, tasks, dependencies, shared_context_dict, execution_order
+                )
             
-            # After all batches complete, update workflow result
+            # After all tasks complete, update workflow result
             workflow_result["tasks_completed"] = len(completed_tasks)
             workflow_result["outputs"] = list(task_results.values())
             
@@ -2200,6 +2308,7 @@ class QLPWorkflow:
                             }
                         })
                 
+                self._set_stage("creating_capsule", current_task="")
                 capsule_result = await workflow.execute_activity(
                     create_ql_capsule_activity,
                     args=[request["request_id"], tasks, ordered_results, shared_context_dict],
@@ -2209,15 +2318,30 @@ class QLPWorkflow:
                 
                 workflow_result["capsule_id"] = capsule_result.get("capsule_id")
                 workflow_result["metadata"]["capsule_info"] = capsule_result
+                self._progress["capsule_id"] = workflow_result["capsule_id"]
                 
-                # Step 5: Runtime Validation in Sandbox - TEMPORARILY DISABLED FOR DEBUGGING
-                # TODO: Fix sandbox file mounting issue
-                workflow_result["runtime_validated"] = True  # Skip sandbox for now
+                # Step 5: Runtime Validation in Sandbox - one batched container run per capsule
                 workflow_result["delivery_ready"] = True
-                workflow_result["metadata"]["sandbox_validation"] = {"skipped": True, "reason": "Debugging capsule generation"}
+                if (workflow.patched(CAPSULE_RUNTIME_VALIDATION_PATCH)
+                        and capsule_result.get("capsule_id")
+                        and request.get("metadata", {}).get("runtime_validation", True)):
+                    self._set_stage("runtime_validation")
+                    sandbox_result = await workflow.execute_activity(
+                        run_capsule_tests_activity,
+                        args=[capsule_result.get("capsule_id")],
+                        start_to_close_timeout=timedelta(minutes=10),
+                        heartbeat_timeout=timedelta(minutes=2),
+                        retry_policy=DEFAULT_RETRY_POLICY
+                    )
+                    workflow_result["metadata"]["sandbox_validation"] = sandbox_result
+                    workflow_result["runtime_validated"] = sandbox_result.get("all_passed", False)
+                else:
+                    workflow_result["runtime_validated"] = True  # Skip sandbox for now
+                    workflow_result["metadata"]["sandbox_validation"] = {"skipped": True, "reason": "Debugging capsule generation"}
                 
                 # Prepare delivery without sandbox validation
                 if capsule_result.get("capsule_id"):
+                    self._set_stage("preparing_delivery")
                     delivery_result = await workflow.execute_activity(
                         prepare_delivery_activity,
                         args=[capsule_result.get("capsule_id"), request],
@@ -2231,7 +2355,7 @@ class QLPWorkflow:
                 # ORIGINAL SANDBOX CODE COMMENTED OUT:
                 # if capsule_result.get("capsule_id"):
                 #     # Extract main code for sandbox testing
-                #     main_code, detected_language = await self._extract_and_clean_main_code(task_results)
+                #     main_code, detected_language = await self._extract_and_clean_main_code(task_results, request.get("tenant_id"))
                 #     if main_code:
                 #         sandbox_result = await workflow.execute_activity(
                 #             execute_in_sandbox_activity,
@@ -2293,6 +2417,7 @@ class QLPWorkflow:
                         "use_enterprise": use_enterprise
                     }
                     
+                    self._set_stage("pushing_to_github")
                     github_result = await workflow.execute_activity(
                         push_to_github_activity,
                         github_params,
@@ -2325,6 +2450,7 @@ class QLPWorkflow:
                                 "auto_fix": True
                             }
                             
+                            self._set_stage("monitoring_ci")
                             try:
                                 monitor_result = await workflow.execute_activity(
                                     monitor_github_actions_activity,
@@ -2388,9 +2514,223 @@ class QLPWorkflow:
         # Calculate execution time using workflow time
         end_time = workflow.now()
         workflow_result["execution_time"] = (end_time - start_time).total_seconds()
+        self._set_stage("finished", status=workflow_result["status"], current_task="")
+        
+        if workflow.patched(STATUS_PROJECTION_PATCH):
+            try:
+                await workflow.execute_activity(
+                    publish_workflow_status_activity,
+                    args=[workflow.info().workflow_id, self._progress, workflow_result],
+                    start_to_close_timeout=timedelta(minutes=1),
+                    retry_policy=RetryPolicy(maximum_attempts=3)
+                )
+            except Exception as e:
+                # Polls fall back to describing the workflow
+                workflow.logger.warning(f"Failed to publish workflow status: {str(e)}")
         return workflow_result
     
-    async def _extract_and_clean_main_code(self, task_results: Dict[str, Any]) -> Tuple[str, str]:
+    async def _execute_tasks_dataflow(self, request: Dict[str, Any],
+                                      tasks: List[Dict[str, Any]],
+                                      dependencies: Dict[str, List[str]],
+                                      shared_context_dict: Dict[str, Any]) -> Tuple[Dict[str, Any], set]:
+        """Run task pipelines from a ready queue, starting each task once its dependencies complete"""
+        task_results = {}
+        metadata = request.get("metadata") or {}
+        scheduler = DataflowScheduler(
+            tasks,
+            dependencies,
+            max_parallel=metadata.get("max_parallel_tasks", DEFAULT_MAX_PARALLEL_TASKS)
+        )
+        workflow.logger.info(
+            f"Dataflow scheduling {len(tasks)} tasks with up to {scheduler.max_parallel} in parallel"
+        )
+        
+        running: Dict[Any, str] = {}
+        finished_count = 0
+        
+        def dispatch_ready():
+            # Start every task whose dependencies are satisfied, up to the concurrency cap
+            for task in scheduler.take_ready():
+                workflow.logger.info(
+                    f"Starting task {task['task_id']} (critical path {scheduler.priorities[task['task_id']]})"
+                )
+                pipeline = asyncio.create_task(
+                    self._execute_task_pipeline(task, request["request_id"], shared_context_dict)
+                )
+                running[pipeline] = task["task_id"]
+        
+        dispatch_ready()
+        while running:
+            done, _ = await workflow.wait(list(running), return_when=asyncio.FIRST_COMPLETED)
+            
+            # Handle completions in decomposition order so replays see identical commands
+            wave_results = []
+            for pipeline in sorted(done, key=lambda f: scheduler.order_of(running[f])):
+                task_id = running.pop(pipeline)
+                exc = pipeline.exception()
+                if exc is not None:
+                    workflow.logger.error(f"Task {task_id} failed with exception: {exc}")
+                    result = self._failed_task_result(task_id, str(exc))
+                else:
+                    result = pipeline.result()
+                task_results[task_id] = result
+                wave_results.append(result)
+                
+                if result["execution"].get("status") == "completed":
+                    scheduler.mark_completed(task_id)
+                    self._progress.update(tasks_completed=len(scheduler.completed), current_task=task_id)
+                else:
+                    skipped = scheduler.mark_failed(task_id)
+                    if skipped:
+                        workflow.logger.error(f"Skipping tasks {skipped}: dependency {task_id} did not complete")
+            
+            finished_count += len(wave_results)
+            
+            # Dispatch newly ready tasks before checkpointing so they are not held back
+            dispatch_ready()
+            
+            if scheduler.completed:
+                await workflow.execute_activity(
+                    save_workflow_checkpoint_activity,
+                    args=[request["request_id"], list(task_results.values()), shared_context_dict],
+                    start_to_close_timeout=timedelta(minutes=1),
+                    retry_policy=RetryPolicy(maximum_attempts=2)
+                )
+                
+                # Progress is reported per finished task rather than per batch
+                await workflow.execute_activity(
+                    stream_workflow_results_activity,
+                    args=[request["request_id"], finished_count - 1, wave_results, len(tasks)],
+                    start_to_close_timeout=timedelta(seconds=30),
+                    retry_policy=RetryPolicy(maximum_attempts=2)
+                )
+        
+        blocked = scheduler.blocked()
+        if blocked:
+            workflow.logger.error(f"Tasks never became ready (failed dependency or cycle): {blocked}")
+        
+        return task_results, scheduler.completed
+    
+    @staticmethod
+    def _failed_task_result(task_id: str, error: str) -> Dict[str, Any]:
+        """Build the result record for a task whose pipeline raised"""
+        return {
+            "task_id": task_id,
+            "execution": {
+                "status": "failed",
+                "output_type": "error",
+                "output": {"error": error},
+                "execution_time": 0,
+                "confidence_score": 0,
+                "agent_tier_used": "unknown"
+            },
+            "validation": {"overall_status": "failed"},
+            "sandbox": None,
+            "review": None
+        }
+    
+    async def _execute_tasks_batched(self, request: Dict[str, Any],
+                                     tasks: List[Dict[str, Any]],
+                                     dependencies: Dict[str, List[str]],
+                                     shared_context_dict: Dict[str, Any],
+                                     execution_order: List[str]) -> Tuple[Dict[str, Any], set]:
+        """Legacy level-synchronous batch execution, kept for replaying older workflows"""
+        # Step 3: Execute tasks with parallel processing for independent tasks
+        task_results = {}
+        completed_tasks = set()
+        
+        # Group tasks into parallel execution batches
+        execution_batches = self._create_parallel_execution_batches(tasks, dependencies, execution_order)
+        workflow.logger.info(f"Created {len(execution_batches)} execution batches for parallel processing")
+        
+        # Process each batch in order (batches must be sequential, tasks within batch can be parallel)
+        for batch_idx, batch_tasks in enumerate(execution_batches):
+            workflow.logger.info(f"Processing batch {batch_idx + 1}/{len(execution_batches)} with {len(batch_tasks)} tasks")
+            
+            # Execute all tasks in this batch concurrently
+            batch_futures = []
+            
+            for task in batch_tasks:
+                task_id = task["task_id"]
+                
+                # Verify dependencies are met (should be by design of batching)
+                task_deps = dependencies.get(task_id, [])
+                deps_met = all(dep_id in completed_tasks for dep_id in task_deps)
+                
+                if not deps_met:
+                    workflow.logger.error(f"Dependencies not met for task {task_id} in batch {batch_idx}")
+                    continue
+                
+                # Create a coroutine for this task's execution pipeline
+                task_future = self._execute_task_pipeline(
+                    task, request["request_id"], shared_context_dict
+                )
+                batch_futures.append((task_id, task_future))
+            
+            # Execute all tasks in batch concurrently
+            if batch_futures:
+                # Use asyncio.gather to run tasks in parallel
+                task_ids = [task_id for task_id, _ in batch_futures]
+                task_coroutines = [future for _, future in batch_futures]
+                
+                workflow.logger.info(f"Executing {len(task_coroutines)} tasks in parallel: {task_ids}")
+                
+                # Execute all coroutines concurrently
+                batch_results = await asyncio.gather(*task_coroutines, return_exceptions=True)
+                
+                # Process results
+                for (task_id, _), result in zip(batch_futures, batch_results):
+                    if isinstance(result, Exception):
+                        workflow.logger.error(f"Task {task_id} failed with exception: {result}")
+                        # Create error result
+                        task_results[task_id] = {
+                            "task_id": task_id,
+                            "execution": {
+                                "status": "failed",
+                                "output_type": "error",
+                                "output": {"error": str(result)},
+                                "execution_time": 0,
+                                "confidence_score": 0,
+                                "agent_tier_used": "unknown"
+                            },
+                            "validation": {"overall_status": "failed"},
+                            "sandbox": None,
+                            "review": None
+                        }
+                    else:
+                        task_results[task_id] = result
+                        if result["execution"].get("status") == "completed":
+                            completed_tasks.add(task_id)
+                            self._progress.update(tasks_completed=len(completed_tasks), current_task=task_id)
+            
+            # Continue with original logic after batch
+            # The rest of the loop will be removed as we're processing in batches now
+            # Save checkpoint and stream results after each batch completes
+            if completed_tasks:
+                # Save checkpoint
+                await workflow.execute_activity(
+                    save_workflow_checkpoint_activity,
+                    args=[request["request_id"], list(task_results.values()), shared_context_dict],
+                    start_to_close_timeout=timedelta(minutes=1),
+                    retry_policy=RetryPolicy(maximum_attempts=2)
+                )
+                
+                # Stream batch results for real-time updates
+                batch_results_for_streaming = [task_results[task["task_id"]] 
+                                             for task in batch_tasks 
+                                             if task["task_id"] in task_results]
+                
+                await workflow.execute_activity(
+                    stream_workflow_results_activity,
+                    args=[request["request_id"], batch_idx, batch_results_for_streaming, len(execution_batches)],
+                    start_to_close_timeout=timedelta(seconds=30),
+                    retry_policy=RetryPolicy(maximum_attempts=2)
+                )
+        
+        return task_results, completed_tasks
+    
+    async def _extract_and_clean_main_code(self, task_results: Dict[str, Any],
+                                           tenant_id: Optional[str] = None) -> Tuple[str, str]:
         """Extract and intelligently clean the main executable code from task results"""
         # Get execution context from first task result
         execution_context = {}
@@ -2441,7 +2781,7 @@ class QLPWorkflow:
             
             # Use LLM-powered code cleanup if needed
             if self._needs_cleanup(combined_code):
-                combined_code = await self._llm_clean_code(combined_code)
+                combined_code = await self._llm_clean_code(combined_code, tenant_id)
             
             # Add language-specific test execution
             combined_code += self._add_language_specific_test(combined_code, selected_language)
@@ -2544,12 +2884,12 @@ class QLPWorkflow:
         ]
         return any(issues)
     
-    async def _llm_clean_code(self, code: str) -> str:
+    async def _llm_clean_code(self, code: str, tenant_id: Optional[str] = None) -> str:
         """Use LLM to intelligently clean code formatting issues - moved to activity for Temporal compliance"""
         # This method can't use imports inside workflow - use activity instead
         return await workflow.execute_activity(
             llm_clean_code_activity,
-            args=[code],
+            args=[code, tenant_id],
             start_to_close_timeout=timedelta(seconds=60),
             retry_policy=RetryPolicy(maximum_attempts=2)
         )
@@ -3072,6 +3412,7 @@ async def start_worker():
         execute_task_activity,
         validate_result_activity,
         execute_in_sandbox_activity,
+        run_capsule_tests_activity,
         request_aitl_review_activity,
         create_ql_capsule_activity,
         llm_clean_code_activity,
@@ -3080,7 +3421,8 @@ async def start_worker():
         monitor_github_actions_activity,  # Add GitHub Actions monitoring activity
         save_workflow_checkpoint_activity,  # Add checkpoint saving activity
         load_workflow_checkpoint_activity,  # Add checkpoint loading activity
-        stream_workflow_results_activity  # Add workflow streaming activity
+        stream_workflow_results_activity,  # Add workflow streaming activity
+        publish_workflow_status_activity
     ]
     
     # Add marketing workflows and activities if available
@@ -3158,17 +3500,31 @@ async def start_worker():
     logger.info(f"  - Graceful shutdown timeout: 30s")
     logger.info(f"  - Enhanced capabilities: {enhanced_available}")
     
-    # Start both workers concurrently if enhanced is available
-    if enhanced_available and enhanced_worker:
-        import asyncio
-        # Run both workers concurrently
-        await asyncio.gather(
-            worker.run(),
-            enhanced_worker.run()
-        )
-    else:
-        # Start standard worker only
-        await worker.run()
+    # Expose pooled service client metrics for sizing under load
+    if settings.WORKER_METRICS_PORT:
+        from prometheus_client import start_http_server
+        start_http_server(settings.WORKER_METRICS_PORT)
+        logger.info(f"  - Metrics port: {settings.WORKER_METRICS_PORT}")
+    
+    try:
+        # Start both workers concurrently if enhanced is available
+        if enhanced_available and enhanced_worker:
+            import asyncio
+            # Run both workers concurrently
+            await asyncio.gather(
+                worker.run(),
+                enhanced_worker.run()
+            )
+        else:
+            # Start standard worker only
+            await worker.run()
+    finally:
+        # Release keep-alive connections held by the activity clients
+        from ..common.service_clients import close_service_clients
+        await close_service_clients()
+        # Write LLM costs still buffered in memory
+        from ..common.cost_calculator_persistent import persistent_cost_calculator
+        await persistent_cost_calculator.close()
 
 
 # TDD Integration Functions
@@ -3232,63 +3588,59 @@ def _should_use_tdd(task: Dict[str, Any]) -> bool:
 
 async def _execute_with_tdd(task: Dict[str, Any], tier: str, request_id: str) -> Dict[str, Any]:
     """Execute task using Test-Driven Development approach"""
-    import httpx
-    from ..common.config import settings
-    
     activity.logger.info(f"Executing TDD workflow for task {task['task_id']}")
     
-    async with httpx.AsyncClient(timeout=600.0) as client:  # Longer timeout for TDD
-        start_time = datetime.now(timezone.utc)
+    start_time = datetime.now(timezone.utc)
+    
+    try:
+        # Step 1: Generate tests first
+        activity.heartbeat("TDD Step 1: Generating tests")
+        test_generation_result = await _generate_tests_first(task, tier, request_id)
         
-        try:
-            # Step 1: Generate tests first
-            activity.heartbeat("TDD Step 1: Generating tests")
-            test_generation_result = await _generate_tests_first(client, task, tier, request_id)
-            
-            if test_generation_result.get("status") != "completed":
-                return test_generation_result
-            
-            # Step 2: Generate code to pass tests
-            activity.heartbeat("TDD Step 2: Generating code to pass tests")
-            code_generation_result = await _generate_code_for_tests(
-                client, task, tier, request_id, test_generation_result
-            )
-            
-            if code_generation_result.get("status") != "completed":
-                return code_generation_result
-            
-            # Step 3: Verify and refine
-            activity.heartbeat("TDD Step 3: Verifying and refining")
-            final_result = await _verify_and_refine_tdd(
-                client, task, tier, request_id, 
-                test_generation_result, code_generation_result
-            )
-            
-            # Add TDD metadata
-            final_result["metadata"] = final_result.get("metadata", {})
-            final_result["metadata"]["tdd_enabled"] = True
-            final_result["metadata"]["tdd_iterations"] = final_result.get("metadata", {}).get("tdd_iterations", 1)
-            
-            execution_time = (datetime.now(timezone.utc) - start_time).total_seconds()
-            final_result["execution_time"] = execution_time
-            
-            return final_result
-            
-        except Exception as e:
-            activity.logger.error(f"TDD execution failed: {e}")
-            return {
-                "task_id": task["task_id"],
-                "status": "failed",
-                "output_type": "error",
-                "output": {"error": f"TDD execution failed: {str(e)}"},
-                "execution_time": (datetime.now(timezone.utc) - start_time).total_seconds(),
-                "confidence_score": 0,
-                "agent_tier_used": tier,
-                "metadata": {"tdd_enabled": True, "tdd_error": str(e)}
-            }
+        if test_generation_result.get("status") != "completed":
+            return test_generation_result
+        
+        # Step 2: Generate code to pass tests
+        activity.heartbeat("TDD Step 2: Generating code to pass tests")
+        code_generation_result = await _generate_code_for_tests(
+            task, tier, request_id, test_generation_result
+        )
+        
+        if code_generation_result.get("status") != "completed":
+            return code_generation_result
+        
+        # Step 3: Verify and refine
+        activity.heartbeat("TDD Step 3: Verifying and refining")
+        final_result = await _verify_and_refine_tdd(
+            task, tier, request_id, 
+            test_generation_result, code_generation_result
+        )
+        
+        # Add TDD metadata
+        final_result["metadata"] = final_result.get("metadata", {})
+        final_result["metadata"]["tdd_enabled"] = True
+        final_result["metadata"]["tdd_iterations"] = final_result.get("metadata", {}).get("tdd_iterations", 1)
+        
+        execution_time = (datetime.now(timezone.utc) - start_time).total_seconds()
+        final_result["execution_time"] = execution_time
+        
+        return final_result
+        
+    except Exception as e:
+        activity.logger.error(f"TDD execution failed: {e}")
+        return {
+            "task_id": task["task_id"],
+            "status": "failed",
+            "output_type": "error",
+            "output": {"error": f"TDD execution failed: {str(e)}"},
+            "execution_time": (datetime.now(timezone.utc) - start_time).total_seconds(),
+            "confidence_score": 0,
+            "agent_tier_used": tier,
+            "metadata": {"tdd_enabled": True, "tdd_error": str(e)}
+        }
 
 
-async def _generate_tests_first(client, task: Dict[str, Any], tier: str, request_id: str) -> Dict[str, Any]:
+async def _generate_tests_first(task: Dict[str, Any], tier: str, request_id: str) -> Dict[str, Any]:
     """Generate comprehensive test suite first"""
     from ..common.config import settings
     activity.logger.info(f"Generating tests for task {task['task_id']}")
@@ -3331,7 +3683,7 @@ async def _generate_tests_first(client, task: Dict[str, Any], tier: str, request
         "context": {**task.get("context", {}), "generation_type": "tests_only"}
     }
     
-    response = await call_agent_factory(client, test_execution_input)
+    response = await call_agent_factory(test_execution_input)
     
     if response.status_code != 200:
         return {
@@ -3347,7 +3699,7 @@ async def _generate_tests_first(client, task: Dict[str, Any], tier: str, request
 
 
 async def _generate_code_for_tests(
-    client, task: Dict[str, Any], tier: str, request_id: str, 
+    task: Dict[str, Any], tier: str, request_id: str, 
     test_result: Dict[str, Any]
 ) -> Dict[str, Any]:
     """Generate code that passes the test suite"""
@@ -3406,7 +3758,7 @@ async def _generate_code_for_tests(
         }
     }
     
-    response = await call_agent_factory(client, code_execution_input)
+    response = await call_agent_factory(code_execution_input)
     
     if response.status_code != 200:
         return {
@@ -3422,7 +3774,7 @@ async def _generate_code_for_tests(
 
 
 async def _verify_and_refine_tdd(
-    client, task: Dict[str, Any], tier: str, request_id: str,
+    task: Dict[str, Any], tier: str, request_id: str,
     test_result: Dict[str, Any], code_result: Dict[str, Any]
 ) -> Dict[str, Any]:
     """Verify code passes tests and refine if needed"""
@@ -37,6 +37,8 @@ from src.orchestrator.worker_production import (
     save_workflow_checkpoint_activity,  # Import checkpoint activity
     load_workflow_checkpoint_activity,  # Import load checkpoint activity
     stream_workflow_results_activity,  # Import streaming activity
+    run_capsule_tests_activity,  # Import batched sandbox test activity
+    publish_workflow_status_activity,  # Import status projection activity
 )
 
 # Import original activities - we'll override them with enhanced versions below
@@ -111,6 +113,8 @@ async def run_worker(task_queue: str = "qlp-production-queue"):
         save_workflow_checkpoint_activity,  # Checkpoint saving
         load_workflow_checkpoint_activity,  # Checkpoint loading
         stream_workflow_results_activity,  # Results streaming
+        run_capsule_tests_activity,  # Batched sandbox tests
+        publish_workflow_status_activity,  # Terminal status snapshots
     ]
     
     # Add marketing workflows and activities if available
@@ -0,0 +1,276 @@
+"""
+Event-driven watching of GitHub Actions workflow runs
+
+One WorkflowRunWatcher per process follows the runs of every monitored
+repository. GitHub webhooks (workflow_run, check_suite) wake it as soon as a
+run changes, on any replica through a Redis stream; polling with conditional
+requests and adaptive backoff remains as the fallback.
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+import aiohttp
+import structlog
+
+from src.common.config import settings
+
+logger = structlog.get_logger()
+
+
+@dataclass
+class _WorkflowWatch:
+    """Latest run of one repository's workflow, shared by everyone waiting on it"""
+    owner: str
+    repo: str
+    workflow_file: str
+    headers: Dict[str, str]
+    run: Optional[Dict[str, Any]] = None
+    etag: Optional[str] = None
+    interval: float = 0.0
+    next_poll: float = 0.0
+    waiters: int = 0
+    updated: asyncio.Event = None
+    
+    def __post_init__(self):
+        self.updated = asyncio.Event()
+    
+    @property
+    def full_name(self) -> str:
+        return f"{self.owner}/{self.repo}".lower()
+
+
+class WorkflowRunWatcher:
+    """Watches the workflow runs of many repositories from one task
+    
+    Waiters register a (repository, workflow) watch. A webhook event for a
+    repository makes its watches re-poll right away; without events each
+    watch is polled with If-None-Match, so unchanged answers (304) cost no
+    rate limit. While the latest run is queued or in progress the watch polls
+    every min_interval; once it has completed the interval doubles up to
+    max_interval while nothing changes. Events are shared between replicas
+    through a Redis stream.
+    """
+    
+    def __init__(self, redis_url: Optional[str] = None,
+                 min_interval: float = 15.0, max_interval: float = 120.0,
+                 stream_key: str = "qlp:github:events", stream_maxlen: int = 10000,
+                 max_concurrent_polls: int = 10):
+        self.redis_url = redis_url
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.stream_key = stream_key
+        self.stream_maxlen = stream_maxlen
+        self.max_concurrent_polls = max_concurrent_polls
+        self.api_base = "https://api.github.com"
+        
+        self._watches: Dict[Tuple[str, str], _WorkflowWatch] = {}
+        self._wake = asyncio.Event()
+        self._redis = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._poll_task: Optional[asyncio.Task] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._last_event_id: Optional[str] = None
+        
+        # Metrics
+        self.polls = 0
+        self.not_modified = 0
+        self.events = 0
+    
+    def _get_redis(self):
+        if self._redis is None and self.redis_url:
+            try:
+                import redis.asyncio as redis
+                self._redis = redis.from_url(self.redis_url, decode_responses=True)
+            except Exception as e:
+                logger.warning("CI event sharing falling back to in-process delivery", error=str(e))
+                self.redis_url = None
+        return self._redis
+    
+    async def wait_for_completed_run(
+        self,
+        owner: str,
+        repo: str,
+        headers: Dict[str, str],
+        workflow_file: str,
+        timeout: float,
+        exclude_run_id: Optional[int] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Latest run of a workflow once it has completed, None on timeout
+        
+        exclude_run_id skips a run already handled, e.g. to wait for the run
+        triggered by a fix pushed after it.
+        """
+        key = (f"{owner}/{repo}".lower(), workflow_file)
+        watch = self._watches.get(key)
+        if watch is None:
+            watch = _WorkflowWatch(owner, repo, workflow_file, dict(headers), interval=self.min_interval)
+            self._watches[key] = watch
+        watch.waiters += 1
+        self._ensure_tasks()
+        self._wake.set()
+        
+        deadline = time.monotonic() + timeout
+        try:
+            while True:
+                run = watch.run
+                if run and run.get("status") == "completed" and run.get("id") != exclude_run_id:
+                    return run
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                watch.updated.clear()
+                try:
+                    await asyncio.wait_for(watch.updated.wait(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    return None
+        finally:
+            watch.waiters -= 1
+            if watch.waiters == 0:
+                self._watches.pop(key, None)
+                self._wake.set()
+    
+    async def publish_event(self, event: str, payload: Dict[str, Any]) -> None:
+        """Hand a webhook delivery to the watchers of every replica"""
+        full_name = (payload.get("repository") or {}).get("full_name")
+        if not full_name:
+            return
+        
+        redis_client = self._get_redis()
+        if redis_client is not None:
+            try:
+                await redis_client.xadd(
+                    self.stream_key, {"event": event, "repository": full_name},
+                    maxlen=self.stream_maxlen, approximate=True
+                )
+                return
+            except Exception as e:
+                logger.warning("CI event publish to Redis failed, delivering locally", error=str(e))
+        self.notify(full_name)
+    
+    def notify(self, full_name: str) -> None:
+        """Something changed in a repository: poll its watches now"""
+        self.events += 1
+        now = time.monotonic()
+        for watch in self._watches.values():
+            if watch.full_name == full_name.lower():
+                watch.next_poll = now
+                watch.interval = self.min_interval
+                self._wake.set()
+    
+    def _ensure_tasks(self):
+        if self._poll_task is None or self._poll_task.done():
+            # Created with the task so it belongs to the running loop
+            self._wake = asyncio.Event()
+            self._poll_task = asyncio.create_task(self._poll_loop())
+        if self._get_redis() is not None and (self._reader_task is None or self._reader_task.done()):
+            self._reader_task = asyncio.create_task(self._read_events())
+    
+    async def _poll_loop(self):
+        """Poll due watches; sleeps until the next one is due or an event arrives"""
+        semaphore = asyncio.Semaphore(self.max_concurrent_polls)
+        
+        async def poll(watch: _WorkflowWatch):
+            async with semaphore:
+                await self._poll(watch)
+        
+        try:
+            while self._watches:
+                now = time.monotonic()
+                due = [w for w in self._watches.values() if w.next_poll <= now]
+                if due:
+                    await asyncio.gather(*(poll(w) for w in due))
+                    continue
+                
+                self._wake.clear()
+                next_poll = min(w.next_poll for w in self._watches.values())
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=max(next_poll - now, 0))
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            if self._session is not None:
+                await self._session.close()
+                self._session = None
+    
+    async def _poll(self, watch: _WorkflowWatch):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30))
+        
+        # The workflow file name works in place of its ID
+        workflow = watch.workflow_file.rsplit("/", 1)[-1]
+        url = f"{self.api_base}/repos/{watch.owner}/{watch.repo}/actions/workflows/{workflow}/runs"
+        headers = dict(watch.headers)
+        if watch.etag:
+            headers["If-None-Match"] = watch.etag
+        
+        changed = False
+        rate_limited = False
+        self.polls += 1
+        try:
+            async with self._session.get(url, headers=headers, params={"per_page": "1"}) as response:
+                if response.status == 304:
+                    self.not_modified += 1
+                elif response.status == 200:
+                    watch.etag = response.headers.get("ETag")
+                    runs = (await response.json()).get("workflow_runs") or []
+                    run = runs[0] if runs else None
+                    changed = run != watch.run
+                    watch.run = run
+                elif response.status in (403, 429):
+                    logger.warning("Rate limited polling workflow runs", repository=watch.full_name)
+                    rate_limited = True
+                else:
+                    logger.warning("Failed to poll workflow runs", repository=watch.full_name,
+                                   status=response.status)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning("Failed to poll workflow runs", repository=watch.full_name, error=str(e))
+        
+        if changed:
+            watch.updated.set()
+        if rate_limited:
+            watch.interval = self.max_interval
+        elif changed or not watch.run or watch.run.get("status") != "completed":
+            # A queued or running run will change soon; only idle workflows back off
+            watch.interval = self.min_interval
+        else:
+            watch.interval = min(watch.interval * 2, self.max_interval)
+        watch.next_poll = time.monotonic() + watch.interval
+    
+    async def _read_events(self):
+        """Apply webhook events published by any replica"""
+        while self._watches:
+            try:
+                if self._last_event_id is None:
+                    # Start from the current end of the stream, then follow by ID so
+                    # events added between two reads are not skipped as "$" would
+                    latest = await self._redis.xrevrange(self.stream_key, count=1)
+                    self._last_event_id = latest[0][0] if latest else "0-0"
+                response = await self._redis.xread({self.stream_key: self._last_event_id}, block=1000, count=100)
+                for _, entries in response or []:
+                    for stream_id, fields in entries:
+                        self._last_event_id = stream_id
+                        self.notify(fields["repository"])
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.error("CI event stream read failed", error=str(e))
+                await asyncio.sleep(1)
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        return {
+            "watches": len(self._watches),
+            "repositories": len({w.full_name for w in self._watches.values()}),
+            "polls": self.polls,
+            "not_modified": self.not_modified,
+            "events": self.events,
+        }
+
+
+ci_watcher = WorkflowRunWatcher(
+    redis_url=settings.REDIS_URL,
+    min_interval=settings.CI_POLL_MIN_INTERVAL,
+    max_interval=settings.CI_POLL_MAX_INTERVAL,
+)
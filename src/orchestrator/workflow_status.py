@@ -0,0 +1,169 @@
+"""
+Workflow status projection
+
+QLPWorkflow keeps a small progress record that the API reads through a
+Temporal query while the workflow runs. When it finishes, an activity stores
+the terminal snapshot and the full result once in Redis, so status polls for
+finished workflows never touch Temporal and the capsule-sized result is only
+fetched by clients that ask for it.
+"""
+
+import json
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import structlog
+
+from src.common.config import settings
+
+logger = structlog.get_logger()
+
+# Fields of a workflow result that status polls need; the rest is served by reference
+RESULT_SUMMARY_FIELDS = (
+    "request_id", "status", "capsule_id", "tasks_completed", "tasks_total",
+    "execution_time", "errors", "delivery_ready", "runtime_validated", "github_url"
+)
+
+# Capsule file contents stay behind the reference; the file names are kept
+CAPSULE_CONTENT_FIELDS = ("source_code", "tests", "documentation")
+
+
+def summarize_result(result: Any) -> Any:
+    """Compact view of a workflow result for status responses"""
+    if not isinstance(result, dict):
+        return result
+    summary = {key: result[key] for key in RESULT_SUMMARY_FIELDS if key in result}
+    metadata = result.get("metadata")
+    if isinstance(metadata, dict):
+        summary["metadata"] = dict(metadata)
+        capsule_info = metadata.get("capsule_info")
+        if isinstance(capsule_info, dict):
+            summary["metadata"]["capsule_info"] = {
+                key: value for key, value in capsule_info.items() if key not in CAPSULE_CONTENT_FIELDS
+            }
+    return summary
+
+
+def terminal_status(result: Any) -> str:
+    """Status of a finished run from its task results: completed, partial or failed"""
+    if not isinstance(result, dict):
+        return "completed"
+    if result.get("status") == "failed":
+        return "failed"
+    tasks_total = result.get("tasks_total") or 0
+    tasks_completed = result.get("tasks_completed") or 0
+    if tasks_total and not tasks_completed:
+        return "failed"
+    if tasks_completed < tasks_total:
+        return "partial"
+    return "completed"
+
+
+def terminal_snapshot(workflow_id: str, result: Any, started_at: Optional[str] = None,
+                      completed_at: Optional[str] = None) -> Dict[str, Any]:
+    """Status response for a finished workflow; workflow_status is the run's own status"""
+    snapshot = {
+        "status": terminal_status(result),
+        "workflow_id": workflow_id,
+        "started_at": started_at,
+        "completed_at": completed_at,
+        "result": summarize_result(result)
+    }
+    if isinstance(result, dict):
+        snapshot["workflow_status"] = result.get("status")
+        snapshot["tasks_completed"] = result.get("tasks_completed", 0)
+        snapshot["tasks_total"] = result.get("tasks_total", 0)
+        errors = result.get("errors") or []
+        if errors and snapshot["status"] != "completed":
+            first = errors[0]
+            snapshot["error"] = first.get("message", str(first)) if isinstance(first, dict) else str(first)
+    return snapshot
+
+
+def result_url(workflow_id: str) -> str:
+    return f"/workflow/result/{workflow_id}"
+
+
+class WorkflowStatusStore:
+    """Terminal status snapshots and results, in Redis with an in-process LRU in front"""
+
+    def __init__(self, redis_url: Optional[str] = None, ttl_seconds: int = 7 * 24 * 3600,
+                 cache_size: int = 1024):
+        self.redis_url = redis_url
+        self.ttl_seconds = ttl_seconds
+        self.cache_size = cache_size
+        self._redis = None
+        # Terminal snapshots never change, so they can be cached without expiry checks
+        self._snapshots: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def _get_redis(self):
+        if self._redis is None and self.redis_url:
+            import redis.asyncio as redis
+            self._redis = redis.from_url(self.redis_url, decode_responses=True)
+        return self._redis
+
+    @staticmethod
+    def snapshot_key(workflow_id: str) -> str:
+        return f"qlp:workflow:status:{workflow_id}"
+
+    @staticmethod
+    def result_key(workflow_id: str) -> str:
+        return f"qlp:workflow:result:{workflow_id}"
+
+    def _remember(self, workflow_id: str, snapshot: Dict[str, Any]):
+        self._snapshots[workflow_id] = snapshot
+        self._snapshots.move_to_end(workflow_id)
+        while len(self._snapshots) > self.cache_size:
+            self._snapshots.popitem(last=False)
+
+    async def get_snapshot(self, workflow_id: str) -> Optional[Dict[str, Any]]:
+        snapshot = self._snapshots.get(workflow_id)
+        if snapshot is not None:
+            self._snapshots.move_to_end(workflow_id)
+            return snapshot
+
+        redis_client = self._get_redis()
+        if redis_client is None:
+            return None
+        try:
+            raw = await redis_client.get(self.snapshot_key(workflow_id))
+        except Exception as e:
+            logger.warning(f"Workflow status lookup failed: {e}")
+            return None
+        if raw is None:
+            return None
+        snapshot = json.loads(raw)
+        self._remember(workflow_id, snapshot)
+        return snapshot
+
+    async def put_terminal(self, workflow_id: str, snapshot: Dict[str, Any], result: Any = None):
+        """Store a finished workflow's snapshot, and its result once"""
+        snapshot = {**snapshot, "result_ref": self.result_key(workflow_id), "result_url": result_url(workflow_id)}
+        redis_client = self._get_redis()
+        if redis_client is not None:
+            try:
+                pipe = redis_client.pipeline()
+                if result is not None:
+                    # Results are immutable; a retried activity must not rewrite them
+                    pipe.set(self.result_key(workflow_id), json.dumps(result, default=str),
+                             ex=self.ttl_seconds, nx=True)
+                pipe.set(self.snapshot_key(workflow_id), json.dumps(snapshot, default=str), ex=self.ttl_seconds)
+                await pipe.execute()
+            except Exception as e:
+                logger.warning(f"Failed to store workflow status for {workflow_id}: {e}")
+        self._remember(workflow_id, snapshot)
+        return snapshot
+
+    async def get_result(self, workflow_id: str) -> Optional[Any]:
+        redis_client = self._get_redis()
+        if redis_client is None:
+            return None
+        try:
+            raw = await redis_client.get(self.result_key(workflow_id))
+        except Exception as e:
+            logger.warning(f"Workflow result lookup failed: {e}")
+            return None
+        return json.loads(raw) if raw is not None else None
+
+
+workflow_status_store = WorkflowStatusStore(redis_url=settings.REDIS_URL)
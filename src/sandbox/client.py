@@ -2,7 +2,8 @@
 Client for Sandbox service
 """
 
-from typing import Dict, Any, Optional
+import json
+from typing import Any, Callable, Dict, List, Optional
 import httpx
 from src.common.models import ExecutionResult
 from fastapi.encoders import jsonable_encoder
@@ -52,6 +53,51 @@ class SandboxServiceClient:
             }
         )
     
+    async def execute_batch(self, files: Dict[str, str], language: str, tests: List[Dict[str, Any]],
+                            setup_command: Optional[List[str]] = None,
+                            manifests: Optional[Dict[str, str]] = None,
+                            on_event: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """Run several test invocations against one file tree in a single container
+        
+        Args:
+            files: File tree as relative path -> content
+            language: Programming language
+            tests: Test invocations, each {"name", "command", "timeout"?}
+            setup_command: Optional command run once before the tests
+            manifests: Dependency manifests installed into a cached image the tests run on
+            on_event: Called with each streamed event as it arrives
+        
+        Returns:
+            {"install": ..., "setup": ..., "cases": [...], "summary": {...}}
+        """
+        payload = {
+            "files": files,
+            "language": language,
+            "tests": tests,
+            "setup_command": setup_command,
+            "manifests": manifests,
+            "stream": True
+        }
+        
+        result = {"install": None, "setup": None, "cases": [], "summary": None}
+        async with self.client.stream("POST", f"{self.base_url}/execute/batch", json=payload) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.strip():
+                    continue
+                event = json.loads(line)
+                if on_event:
+                    on_event(event)
+                if event["type"] == "case":
+                    result["cases"].append(event)
+                elif event["type"] == "install":
+                    result["install"] = event
+                elif event["type"] == "setup":
+                    result["setup"] = event
+                else:
+                    result["summary"] = event
+        return result
+    
     async def get_languages(self) -> list:
         """Get supported languages"""
         response = await self.client.get(f"{self.base_url}/languages")
@@ -0,0 +1,370 @@
+"""
+Warm Container Pool
+
+Keeps a per-language pool of pre-started, network-less, resource-limited
+containers so short executions skip container creation. Code is copied in
+with put_archive and run with exec as an unprivileged user; after each use
+every process of that user is killed and every file it owns is removed, and the
+container is recycled when that reset cannot be verified, after a number of
+uses, on contamination (timeouts), when idle too long or when too old. All docker-py calls run in worker threads
+so they never block the event loop.
+"""
+
+import asyncio
+import io
+import logging
+import os
+import tarfile
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+POOL_LABEL = "qlp.sandbox.pool"
+WORKDIR = "/app"
+# Owns the files and every process of a lease; PID 1 (docker's init) runs as root
+EXEC_UID = 65534
+EXEC_USER = f"{EXEC_UID}:{EXEC_UID}"
+# Run as EXEC_USER: signals every process that user may signal, i.e. all of its own
+KILL_COMMAND = ["sh", "-c", "kill -9 -1 2>/dev/null; true"]
+# World-writable locations a lease can leave files in; HOME is /tmp
+WRITABLE_DIRS = ("/tmp", "/var/tmp", "/dev/shm")
+
+
+def reset_script(root: str = "") -> str:
+    """
+    Shell script run as root between leases: waits until init has reaped every
+    EXEC_USER process, removes the working directory's contents, the writable
+    directories' contents and every other file EXEC_USER owns, and fails if
+    either step leaves something behind. ``root`` prefixes the paths, for tests.
+    """
+    owned = (
+        f"find {root}/ \\( -path {root}/proc -o -path {root}/sys \\) -prune "
+        f"-o -user {EXEC_UID} ! -path {root}{WORKDIR}"
+    )
+    wipe = " ".join(f"{root}{path}/* {root}{path}/.[!.]*" for path in (WORKDIR, *WRITABLE_DIRS))
+    return (
+        "for attempt in 1 2 3 4 5 6 7 8 9 10; do "
+        "alive=0; "
+        f"for s in {root}/proc/[0-9]*/status; do "
+        f"grep -q '^Uid:[[:space:]]*{EXEC_UID}[[:space:]]' \"$s\" 2>/dev/null && alive=1; "
+        "done; "
+        "[ $alive = 0 ] && break; "
+        "sleep 0.1; "
+        "done; "
+        "[ $alive = 0 ] || exit 1; "
+        f"rm -rf {wipe} 2>/dev/null; "
+        f"{owned} -exec rm -rf {{}} + 2>/dev/null; "
+        f"[ -z \"$({owned} -print 2>/dev/null | head -n 1)\" ]"
+    )
+
+
+RESET_COMMAND = ["sh", "-c", reset_script()]
+
+
+@dataclass
+class PoolConfig:
+    """Sizing and recycling policy for the warm pool"""
+    languages: List[str] = field(default_factory=lambda: ["python", "javascript"])
+    size: int = 2
+    min_idle: int = 1
+    max_uses: int = 50
+    idle_timeout: float = 300.0
+    max_age: float = 1800.0
+    memory: str = "512m"
+    cpu_count: int = 1
+    pids_limit: int = 256
+    maintenance_interval: float = 15.0
+
+    @classmethod
+    def from_env(cls) -> "PoolConfig":
+        languages = os.getenv("SANDBOX_POOL_LANGUAGES", "python,javascript")
+        return cls(
+            languages=[lang.strip() for lang in languages.split(",") if lang.strip()],
+            size=int(os.getenv("SANDBOX_POOL_SIZE", "2")),
+            min_idle=int(os.getenv("SANDBOX_POOL_MIN_IDLE", "1")),
+            max_uses=int(os.getenv("SANDBOX_POOL_MAX_USES", "50")),
+            idle_timeout=float(os.getenv("SANDBOX_POOL_IDLE_TIMEOUT", "300")),
+            max_age=float(os.getenv("SANDBOX_POOL_MAX_AGE", "1800")),
+            memory=os.getenv("SANDBOX_POOL_MEMORY", "512m"),
+            cpu_count=int(os.getenv("SANDBOX_POOL_CPU_COUNT", "1")),
+        )
+
+
+@dataclass
+class PooledContainer:
+    """A warm container and its usage bookkeeping"""
+    container: Any
+    language: str
+    created_at: float
+    last_used: float
+    uses: int = 0
+    # Set for one-off containers started from another image, e.g. a dependency layer
+    image: Optional[str] = None
+
+
+def _build_archive(files: Dict[str, str]) -> bytes:
+    buffer = io.BytesIO()
+    directories = set()
+    with tarfile.open(fileobj=buffer, mode="w") as tar:
+        for name, content in files.items():
+            normalized = os.path.normpath(name)
+            if os.path.isabs(normalized) or normalized.startswith(".."):
+                raise ValueError(f"File path escapes the working directory: {name}")
+            # Parent directories get their own entries so EXEC_USER owns them too
+            parent = os.path.dirname(normalized)
+            while parent and parent not in directories:
+                directories.add(parent)
+                info = tarfile.TarInfo(name=parent)
+                info.type = tarfile.DIRTYPE
+                info.mode = 0o755
+                info.uid = info.gid = EXEC_UID
+                info.mtime = int(time.time())
+                tar.addfile(info)
+                parent = os.path.dirname(parent)
+            data = content.encode("utf-8")
+            info = tarfile.TarInfo(name=normalized)
+            info.size = len(data)
+            info.uid = info.gid = EXEC_UID
+            info.mtime = int(time.time())
+            tar.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+class ContainerPool:
+    """Per-language pool of warm execution containers"""
+
+    def __init__(self, client, images: Dict[str, str], config: Optional[PoolConfig] = None):
+        self.client = client
+        self.images = images
+        self.config = config or PoolConfig()
+        self._idle: Dict[str, Deque[PooledContainer]] = {lang: deque() for lang in self.config.languages}
+        self._in_use = 0
+        self._maintenance_task: Optional[asyncio.Task] = None
+        self._background: set = set()
+        self.stats = {"hits": 0, "misses": 0, "created": 0, "recycled": 0, "contaminated": 0}
+
+    def supports(self, language: str, memory: str, cpu_count: int) -> bool:
+        """Whether a request can run in a pooled container"""
+        return (
+            self.config.size > 0
+            and language in self._idle
+            and memory == self.config.memory
+            and cpu_count == self.config.cpu_count
+        )
+
+    async def start(self):
+        """Pre-start containers and begin periodic maintenance"""
+        await self._fill(self.config.size)
+        self._maintenance_task = asyncio.create_task(self._maintenance_loop())
+
+    async def stop(self):
+        if self._maintenance_task:
+            self._maintenance_task.cancel()
+            self._maintenance_task = None
+        for task in list(self._background):
+            task.cancel()
+        for pool in self._idle.values():
+            while pool:
+                await self._destroy(pool.popleft())
+
+    async def acquire(self, language: str, image: Optional[str] = None) -> PooledContainer:
+        """
+        Take a warm container, starting one if the pool is empty.
+
+        Languages without a pool, and images other than the language's own,
+        get a one-off container that is removed on release.
+        """
+        if image is not None and image != self.images.get(language):
+            self.stats["misses"] += 1
+            pooled = await self._create(language, image)
+            self._in_use += 1
+            return pooled
+
+        pool = self._idle.get(language, ())
+        while pool:
+            pooled = pool.pop()
+            if not self._too_old(pooled, time.monotonic()):
+                self.stats["hits"] += 1
+                self._in_use += 1
+                return pooled
+            self._recycle(pooled)
+
+        self.stats["misses"] += 1
+        pooled = await self._create(language)
+        self._in_use += 1
+        return pooled
+
+    def release(self, pooled: PooledContainer, contaminated: bool = False):
+        """Reset and return a container to the pool in the background"""
+        self._in_use -= 1
+        self._spawn(self._reset_and_return(pooled, contaminated))
+
+    async def run(self, pooled: PooledContainer, files: Dict[str, str], command: List[str],
+                  timeout: int, environment: Optional[Dict[str, str]] = None) -> Tuple[int, str, str]:
+        """Copy files into the container and run a command, returning (exit_code, stdout, stderr)"""
+        await self.put_files(pooled, files)
+        return await self.exec(pooled, command, timeout, environment)
+
+    async def put_files(self, pooled: PooledContainer, files: Dict[str, str]):
+        """Copy a file tree (relative path -> content) into the working directory"""
+        pooled.uses += 1
+        pooled.last_used = time.monotonic()
+        await asyncio.to_thread(pooled.container.put_archive, WORKDIR, _build_archive(files))
+
+    async def exec(self, pooled: PooledContainer, command: List[str], timeout: int,
+                   environment: Optional[Dict[str, str]] = None) -> Tuple[int, str, str]:
+        """Run a command in the working directory, returning (exit_code, stdout, stderr)"""
+        pooled.last_used = time.monotonic()
+        return await asyncio.to_thread(self._exec_sync, pooled.container, command, timeout, environment)
+
+    @staticmethod
+    def _exec_sync(container, command: List[str], timeout: int,
+                   environment: Optional[Dict[str, str]]) -> Tuple[int, str, str]:
+        # Enforce the timeout inside the container as well, so a runaway exec is killed
+        result = container.exec_run(
+            ["timeout", "-s", "KILL", str(timeout), *command],
+            workdir=WORKDIR,
+            user=EXEC_USER,
+            environment=environment,
+            demux=True
+        )
+        stdout, stderr = result.output if result.output else (None, None)
+        return (
+            result.exit_code,
+            (stdout or b"").decode("utf-8", errors="replace"),
+            (stderr or b"").decode("utf-8", errors="replace")
+        )
+
+    async def _reset_and_return(self, pooled: PooledContainer, contaminated: bool):
+        if contaminated:
+            self.stats["contaminated"] += 1
+            await self._destroy(pooled)
+            return
+        if pooled.language not in self._idle or pooled.image is not None:
+            await self._destroy(pooled)
+            return
+        if pooled.uses >= self.config.max_uses or self._too_old(pooled, time.monotonic()):
+            self.stats["recycled"] += 1
+            await self._destroy(pooled)
+            return
+
+        try:
+            # Background processes the lease left behind would otherwise see the next caller's files
+            await asyncio.to_thread(pooled.container.exec_run, KILL_COMMAND, user=EXEC_USER)
+            result = await asyncio.to_thread(pooled.container.exec_run, RESET_COMMAND)
+            if result.exit_code != 0:
+                raise RuntimeError(f"reset exited with {result.exit_code}")
+        except Exception as e:
+            logger.warning(f"Discarding sandbox container after failed reset: {e}")
+            self.stats["contaminated"] += 1
+            await self._destroy(pooled)
+            return
+
+        pool = self._idle[pooled.language]
+        if len(pool) >= self.config.size:
+            await self._destroy(pooled)
+        else:
+            pool.append(pooled)
+
+    def _expired(self, pooled: PooledContainer, now: float) -> bool:
+        return (
+            now - pooled.created_at > self.config.max_age
+            or now - pooled.last_used > self.config.idle_timeout
+        )
+
+    def _too_old(self, pooled: PooledContainer, now: float) -> bool:
+        return now - pooled.created_at > self.config.max_age
+
+    def _recycle(self, pooled: PooledContainer):
+        self.stats["recycled"] += 1
+        self._spawn(self._destroy(pooled))
+
+    async def _create(self, language: str, image: Optional[str] = None) -> PooledContainer:
+        container = await asyncio.to_thread(
+            self.client.containers.run,
+            image=image or self.images[language],
+            command=["tail", "-f", "/dev/null"],
+            name=f"qlp-sandbox-{language}-{uuid.uuid4().hex[:8]}",
+            detach=True,
+            # An init as PID 1 reaps the processes killed on reset
+            init=True,
+            working_dir=WORKDIR,
+            network_mode="none",
+            mem_limit=self.config.memory,
+            nano_cpus=int(self.config.cpu_count * 1e9),
+            pids_limit=self.config.pids_limit,
+            labels={POOL_LABEL: language},
+            environment={
+                "PYTHONUNBUFFERED": "1",
+                "NODE_ENV": "production",
+                "HOME": "/tmp"
+            }
+        )
+        try:
+            result = await asyncio.to_thread(container.exec_run, ["chown", EXEC_USER, WORKDIR])
+            if result.exit_code != 0:
+                raise RuntimeError(f"chown exited with {result.exit_code}")
+        except Exception:
+            await asyncio.to_thread(container.remove, force=True)
+            raise
+        self.stats["created"] += 1
+        now = time.monotonic()
+        return PooledContainer(container=container, language=language, created_at=now, last_used=now,
+                               image=image)
+
+    async def _destroy(self, pooled: PooledContainer):
+        try:
+            await asyncio.to_thread(pooled.container.remove, force=True)
+        except Exception as e:
+            logger.debug(f"Failed to remove sandbox container: {e}")
+
+    async def _fill(self, target: int):
+        """Top every language up to ``target`` idle containers"""
+        for language, pool in self._idle.items():
+            missing = target - len(pool)
+            if missing <= 0:
+                continue
+            results = await asyncio.gather(
+                *(self._create(language) for _ in range(missing)),
+                return_exceptions=True
+            )
+            for result in results:
+                if isinstance(result, Exception):
+                    logger.warning(f"Failed to warm {language} sandbox container: {result}")
+                else:
+                    pool.append(result)
+
+    async def _maintenance_loop(self):
+        while True:
+            await asyncio.sleep(self.config.maintenance_interval)
+            try:
+                now = time.monotonic()
+                for pool in self._idle.values():
+                    # Old containers always go; idle ones only shrink the pool down to min_idle
+                    for pooled in list(pool):
+                        if self._too_old(pooled, now) or (
+                            len(pool) > self.config.min_idle and self._expired(pooled, now)
+                        ):
+                            pool.remove(pooled)
+                            await self._destroy(pooled)
+                            self.stats["recycled"] += 1
+                await self._fill(min(self.config.min_idle, self.config.size))
+            except Exception as e:
+                logger.warning(f"Sandbox pool maintenance failed: {e}")
+
+    def _spawn(self, coro):
+        task = asyncio.ensure_future(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "in_use": self._in_use,
+            "idle": {language: len(pool) for language, pool in self._idle.items()},
+            "size": self.config.size
+        }
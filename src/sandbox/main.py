@@ -9,7 +9,7 @@ import asyncio
 import docker
 import json
 import logging
-import os as os_module
+import os
 from src.common.structured_logging import setup_logging, LogContext, log_operation
 from src.common.logging_middleware import setup_request_logging
 from src.common.logging_decorators import log_function, measure_performance
@@ -20,15 +20,19 @@ from contextlib import asynccontextmanager
 from datetime import datetime
 from enum import Enum
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import AsyncIterator, Dict, List, Optional, Any, Tuple
 
 from fastapi import FastAPI, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.encoders import jsonable_encoder
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 import httpx
 from pydantic import BaseModel, Field, ConfigDict
 
+from src.validation.dependency_layers import DependencyLayer, DependencyLayerCache
+
+from .container_pool import ContainerPool, PoolConfig
+
 # Import Kata executor if available
 try:
     from .kata_executor import KataExecutor
@@ -40,8 +44,8 @@ except ImportError:
 # Setup structured logging
 logger = setup_logging(
     service_name="execution-sandbox",
-    log_level=os_module.getenv("LOG_LEVEL", "INFO"),
-    json_output=os_module.getenv("ENVIRONMENT", "development") == "production"
+    log_level=os.getenv("LOG_LEVEL", "INFO"),
+    json_output=os.getenv("ENVIRONMENT", "development") == "production"
 )
 
 # Supported languages and their Docker images
@@ -54,6 +58,15 @@ LANGUAGE_IMAGES = {
     "rust": "rust:1.75-slim",
 }
 
+# Dependency layer runtime and install command per language; installs run with network
+# access once per distinct set of manifests, and batches run on the resulting image
+LAYER_INSTALLS = {
+    "python": ("python", "pip install --no-cache-dir -r requirements.txt"),
+    "javascript": ("nodejs", "npm install --no-audit --no-fund"),
+    "typescript": ("nodejs", "npm install --no-audit --no-fund"),
+    "go": ("go", "go mod download"),
+}
+
 # Language-specific file extensions
 LANGUAGE_EXTENSIONS = {
     "python": ".py",
@@ -100,6 +113,22 @@ class ExecutionRequest(BaseModel):
     test_mode: bool = Field(default=False, description="Run in test mode")
     runtime: Optional[str] = Field(default="docker", description="Execution runtime: docker or kata")
 
+class TestInvocation(BaseModel):
+    """A single test command run inside a batch container"""
+    name: str = Field(..., description="Test case name")
+    command: List[str] = Field(..., description="Command to run from the capsule root")
+    timeout: Optional[int] = Field(default=None, description="Per-test timeout in seconds")
+
+class BatchExecutionRequest(BaseModel):
+    """Request to run several tests against one file tree"""
+    files: Dict[str, str] = Field(..., description="File tree as relative path -> content")
+    language: str = Field(..., description="Programming language")
+    tests: List[TestInvocation] = Field(..., description="Test invocations to run")
+    setup_command: Optional[List[str]] = Field(default=None, description="Run once before the tests, e.g. a build step")
+    manifests: Optional[Dict[str, str]] = Field(default=None, description="Dependency manifests (requirements.txt, package.json, ...) installed into a cached image the tests run on")
+    resource_limits: Optional[ResourceLimits] = Field(default_factory=ResourceLimits)
+    stream: bool = Field(default=True, description="Stream NDJSON results as tests finish")
+
 class ExecutionResult(BaseModel):
     """Result of code execution"""
     model_config = ConfigDict(json_encoders={datetime: lambda v: v.isoformat()})
@@ -120,15 +149,34 @@ class SandboxManager:
     
     def __init__(self):
         self.client = None
+        self.pool: Optional[ContainerPool] = None
+        self.dependency_layers: Optional[DependencyLayerCache] = None
         try:
             self.client = docker.from_env()
             logger.info("Docker client initialized successfully")
             # Test connection
             self.client.ping()
+            self.dependency_layers = DependencyLayerCache(self.client)
         except Exception as e:
             logger.warning(f"Docker client initialization failed: {e}")
             logger.warning("Sandbox service will run with limited functionality")
     
+    async def start_pool(self, config: Optional[PoolConfig] = None):
+        """Start the warm container pool"""
+        if not self.client:
+            return
+        config = config or PoolConfig.from_env()
+        if config.size <= 0:
+            logger.info("Warm container pool disabled, containers are started on demand")
+        self.pool = ContainerPool(self.client, LANGUAGE_IMAGES, config)
+        await self.pool.start()
+        logger.info(f"Warm container pool started: {self.pool.get_stats()}")
+    
+    async def stop_pool(self):
+        if self.pool:
+            await self.pool.stop()
+            self.pool = None
+    
     async def execute_code(
         self,
         code: str,
@@ -155,6 +203,230 @@ class SandboxManager:
         if language not in LANGUAGE_IMAGES:
             raise ValueError(f"Unsupported language: {language}")
         
+        # Prepare code with any inputs
+        if inputs:
+            # Inject inputs as environment variables or command line args
+            # This is language-specific
+            prepared_code = self._prepare_code_with_inputs(code, language, inputs)
+        else:
+            prepared_code = code
+        
+        files = {f"main{LANGUAGE_EXTENSIONS[language]}": prepared_code}
+        if dependencies and language in ["python", "javascript", "typescript"]:
+            files.update(self._dependency_files(language, dependencies))
+        
+        if self.pool and self.pool.supports(language, resource_limits.memory, resource_limits.cpu_count):
+            result = await self._execute_pooled(execution_id, language, files, resource_limits)
+        else:
+            result = await self._execute_cold(execution_id, language, files, resource_limits)
+        
+        # Calculate duration
+        result.duration_ms = int((time.time() - start_time) * 1000)
+        result.completed_at = datetime.utcnow()
+        
+        return result
+    
+    async def _execute_pooled(
+        self,
+        execution_id: str,
+        language: str,
+        files: Dict[str, str],
+        resource_limits: ResourceLimits
+    ) -> ExecutionResult:
+        """Run code in a warm container from the pool"""
+        result = ExecutionResult(
+            execution_id=execution_id,
+            status=ExecutionStatus.RUNNING
+        )
+        
+        pooled = await self.pool.acquire(language)
+        contaminated = False
+        try:
+            await self.pool.put_files(pooled, files)
+            case = await self._run_in_container(
+                pooled, self._get_run_command(language, "main"), resource_limits.timeout
+            )
+            contaminated = case["contaminated"]
+            result.status = case["status"]
+            result.exit_code = case["exit_code"]
+            result.output = case["output"]
+            result.error = case["error"]
+            
+        except Exception as e:
+            contaminated = True
+            logger.error(f"Pooled execution error: {e}")
+            result.status = ExecutionStatus.FAILED
+            result.error = str(e)
+            
+        finally:
+            self.pool.release(pooled, contaminated=contaminated)
+        
+        return result
+    
+    async def _run_in_container(self, pooled, command: List[str], timeout: int) -> Dict[str, Any]:
+        """Run one command in a leased container and classify the outcome"""
+        started = time.monotonic()
+        try:
+            exit_code, output, error = await asyncio.wait_for(
+                self.pool.exec(
+                    pooled,
+                    command,
+                    timeout,
+                    environment={'PYTHONUNBUFFERED': '1', 'NODE_ENV': 'production'}
+                ),
+                # Grace period on top of the in-container timeout
+                timeout=timeout + 5
+            )
+        except asyncio.TimeoutError:
+            exit_code, output, error = None, "", None
+        
+        duration_ms = int((time.monotonic() - started) * 1000)
+        if exit_code is None or (exit_code == 137 and duration_ms >= timeout * 1000):
+            # Killed by the timeout; child processes may still be around
+            return {
+                "status": ExecutionStatus.TIMEOUT,
+                "exit_code": exit_code,
+                "output": output,
+                "error": f"Execution exceeded timeout of {timeout} seconds",
+                "duration_ms": duration_ms,
+                "contaminated": True
+            }
+        
+        return {
+            "status": ExecutionStatus.COMPLETED if exit_code == 0 else ExecutionStatus.FAILED,
+            "exit_code": exit_code,
+            "output": output,
+            "error": error if error else None,
+            "duration_ms": duration_ms,
+            "contaminated": False
+        }
+    
+    async def execute_batch(self, request: BatchExecutionRequest) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Run a capsule's tests in a single container, yielding one event per test.
+        
+        Manifests are installed first (an install event reports the layer image),
+        files are copied in and the setup command runs once; the final event is
+        a summary.
+        """
+        if not self.client or not self.pool:
+            raise RuntimeError("Docker is not available")
+        if request.language not in LANGUAGE_IMAGES:
+            raise ValueError(f"Unsupported language: {request.language}")
+        
+        execution_id = str(uuid.uuid4())
+        limits = request.resource_limits or ResourceLimits()
+        started = time.monotonic()
+        counts = {"passed": 0, "failed": 0, "timeout": 0, "skipped": 0}
+        setup_error = None
+        
+        layer = None
+        if request.manifests:
+            layer, install = await self._dependency_layer(request.language, request.manifests)
+            yield {"type": "install", "execution_id": execution_id, **install}
+            if not install["passed"]:
+                setup_error = install["error"]
+        
+        pooled = await self.pool.acquire(request.language, image=layer.image if layer else None)
+        contaminated = False
+        try:
+            await self.pool.put_files(pooled, request.files)
+            
+            if request.setup_command:
+                setup = await self._run_in_container(pooled, request.setup_command, limits.timeout)
+                contaminated = setup["contaminated"]
+                yield {"type": "setup", "execution_id": execution_id, **self._case_event(setup)}
+                if setup["status"] != ExecutionStatus.COMPLETED:
+                    setup_error = setup["error"] or f"Setup exited with {setup['exit_code']}"
+            
+            for test in request.tests:
+                if setup_error:
+                    counts["skipped"] += 1
+                    yield {
+                        "type": "case",
+                        "name": test.name,
+                        "status": "skipped",
+                        "passed": False,
+                        "error": f"Setup failed: {setup_error}",
+                        "duration_ms": 0
+                    }
+                    continue
+                
+                command = layer.wrap_argv(test.command) if layer else test.command
+                case = await self._run_in_container(pooled, command, test.timeout or limits.timeout)
+                contaminated = contaminated or case["contaminated"]
+                if case["status"] == ExecutionStatus.TIMEOUT:
+                    counts["timeout"] += 1
+                elif case["status"] == ExecutionStatus.COMPLETED:
+                    counts["passed"] += 1
+                else:
+                    counts["failed"] += 1
+                yield {"type": "case", "name": test.name, **self._case_event(case)}
+            
+        except Exception as e:
+            contaminated = True
+            logger.error(f"Batch execution error: {e}")
+            setup_error = setup_error or str(e)
+            
+        finally:
+            self.pool.release(pooled, contaminated=contaminated)
+        
+        yield {
+            "type": "summary",
+            "execution_id": execution_id,
+            "total": len(request.tests),
+            **counts,
+            "all_passed": counts["passed"] == len(request.tests),
+            "error": setup_error,
+            "duration_ms": int((time.monotonic() - started) * 1000)
+        }
+    
+    async def _dependency_layer(self, language: str,
+                                manifests: Dict[str, str]) -> Tuple[Optional[DependencyLayer], Dict[str, Any]]:
+        """Layer image with the manifests installed, and the install event to report"""
+        if language not in LAYER_INSTALLS or self.dependency_layers is None:
+            return None, {"passed": False, "cache_hit": False, "image": None, "duration_ms": 0,
+                          "error": f"Dependency installation is not supported for {language}"}
+        
+        layer_language, install_command = LAYER_INSTALLS[language]
+        layer = await self.dependency_layers.get_layer_for_manifests(
+            layer_language, LANGUAGE_IMAGES[language], install_command, manifests
+        )
+        if layer is None:
+            return None, {"passed": False, "cache_hit": False, "image": None, "duration_ms": 0,
+                          "error": "Dependencies that install from the capsule's own sources are not supported"}
+        
+        event = {
+            "passed": layer.install_success,
+            "cache_hit": layer.cache_hit,
+            "image": layer.image,
+            "duration_ms": int(layer.install_time * 1000),
+            "error": None
+        }
+        if not layer.install_success:
+            event["error"] = f"Dependency install failed: {(layer.stderr or layer.stdout)[-2000:]}"
+            return None, event
+        return layer, event
+    
+    @staticmethod
+    def _case_event(case: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "status": case["status"].value,
+            "passed": case["status"] == ExecutionStatus.COMPLETED,
+            "exit_code": case["exit_code"],
+            "output": case["output"],
+            "error": case["error"],
+            "duration_ms": case["duration_ms"]
+        }
+    
+    async def _execute_cold(
+        self,
+        execution_id: str,
+        language: str,
+        files: Dict[str, str],
+        resource_limits: ResourceLimits
+    ) -> ExecutionResult:
+        """Run code in a fresh container, removed afterwards"""
         result = ExecutionResult(
             execution_id=execution_id,
             status=ExecutionStatus.PENDING
@@ -166,23 +438,9 @@ class SandboxManager:
         try:
             # Create temporary directory for code
             temp_dir = tempfile.mkdtemp(prefix="sandbox_")
-            code_file = os.path.join(temp_dir, f"main{LANGUAGE_EXTENSIONS[language]}")
-            
-            # Prepare code with any inputs
-            if inputs:
-                # Inject inputs as environment variables or command line args
-                # This is language-specific
-                prepared_code = self._prepare_code_with_inputs(code, language, inputs)
-            else:
-                prepared_code = code
-            
-            # Write code to file
-            with open(code_file, 'w') as f:
-                f.write(prepared_code)
-            
-            # Install dependencies if needed
-            if dependencies and language in ["python", "javascript", "typescript"]:
-                await self._install_dependencies(temp_dir, language, dependencies)
+            for name, content in files.items():
+                with open(os.path.join(temp_dir, name), 'w') as f:
+                    f.write(content)
             
             # Prepare Docker run command
             image = LANGUAGE_IMAGES[language]
@@ -191,7 +449,8 @@ class SandboxManager:
             # Create and run container
             logger.info(f"Creating container for {language} execution")
             
-            container = self.client.containers.run(
+            container = await asyncio.to_thread(
+                self.client.containers.run,
                 image=image,
                 command=command,
                 volumes={temp_dir: {'bind': '/app', 'mode': 'rw'}},
@@ -212,11 +471,11 @@ class SandboxManager:
             
             # Wait for completion with timeout
             try:
-                exit_code = container.wait(timeout=resource_limits.timeout)['StatusCode']
+                exit_code = (await asyncio.to_thread(container.wait, timeout=resource_limits.timeout))['StatusCode']
                 
                 # Get output
-                output = container.logs(stdout=True, stderr=False).decode('utf-8')
-                error = container.logs(stdout=False, stderr=True).decode('utf-8')
+                output = (await asyncio.to_thread(container.logs, stdout=True, stderr=False)).decode('utf-8')
+                error = (await asyncio.to_thread(container.logs, stdout=False, stderr=True)).decode('utf-8')
                 
                 result.exit_code = exit_code
                 result.output = output
@@ -230,13 +489,13 @@ class SandboxManager:
                 
                 # Force stop container
                 try:
-                    container.stop(timeout=5)
+                    await asyncio.to_thread(container.stop, timeout=5)
                 except:
-                    container.kill()
+                    await asyncio.to_thread(container.kill)
             
             # Get resource usage
             try:
-                stats = container.stats(stream=False)
+                stats = await asyncio.to_thread(container.stats, stream=False)
                 result.resource_usage = {
                     'cpu_percent': self._calculate_cpu_percent(stats),
                     'memory_usage_mb': stats['memory_stats'].get('usage', 0) / (1024 * 1024),
@@ -250,9 +509,9 @@ class SandboxManager:
             result.error = f"Docker image not found for {language}. Pulling image..."
             # Try to pull the image
             try:
-                self.client.images.pull(LANGUAGE_IMAGES[language])
+                await asyncio.to_thread(self.client.images.pull, LANGUAGE_IMAGES[language])
                 # Retry execution
-                return await self.execute_code(code, language, inputs, resource_limits, dependencies)
+                return await self._execute_cold(execution_id, language, files, resource_limits)
             except Exception as pull_error:
                 result.error = f"Failed to pull Docker image: {str(pull_error)}"
                 
@@ -265,17 +524,13 @@ class SandboxManager:
             # Cleanup
             if container:
                 try:
-                    container.remove(force=True)
+                    await asyncio.to_thread(container.remove, force=True)
                 except:
                     pass
             
             if temp_dir and os.path.exists(temp_dir):
                 import shutil
                 shutil.rmtree(temp_dir, ignore_errors=True)
-            
-            # Calculate duration
-            result.duration_ms = int((time.time() - start_time) * 1000)
-            result.completed_at = datetime.utcnow()
         
         return result
     
@@ -304,14 +559,12 @@ class SandboxManager:
         else:
             return code
     
-    async def _install_dependencies(self, temp_dir: str, language: str, dependencies: List[str]):
-        """Install dependencies before execution"""
+    def _dependency_files(self, language: str, dependencies: List[str]) -> Dict[str, str]:
+        """Dependency manifests to place next to the code"""
         
         if language == "python":
             # Create requirements.txt
-            req_file = os.path.join(temp_dir, "requirements.txt")
-            with open(req_file, 'w') as f:
-                f.write('\n'.join(dependencies))
+            return {"requirements.txt": '\n'.join(dependencies)}
                 
         elif language in ["javascript", "typescript"]:
             # Create package.json
@@ -320,9 +573,9 @@ class SandboxManager:
                 "version": "1.0.0",
                 "dependencies": {dep: "*" for dep in dependencies}
             }
-            pkg_file = os.path.join(temp_dir, "package.json")
-            with open(pkg_file, 'w') as f:
-                json.dump(package_json, f)
+            return {"package.json": json.dumps(package_json)}
+        
+        return {}
     
     def _get_run_command(self, language: str, filename: str) -> List[str]:
         """Get the run command for a language"""
@@ -370,6 +623,7 @@ async def lifespan(app: FastAPI):
     try:
         sandbox_manager = SandboxManager()
         logger.info("Sandbox manager initialized")
+        await sandbox_manager.start_pool()
     except Exception as e:
         logger.error(f"Failed to initialize sandbox manager: {e}")
         # Don't raise - allow service to start without Docker
@@ -388,6 +642,8 @@ async def lifespan(app: FastAPI):
     yield
     
     logger.info("Shutting down Execution Sandbox Service...")
+    if sandbox_manager:
+        await sandbox_manager.stop_pool()
 
 # Create FastAPI app
 app = FastAPI(
@@ -418,7 +674,7 @@ async def health_check():
     docker_status = "unavailable"
     try:
         if sandbox_manager and sandbox_manager.client:
-            sandbox_manager.client.ping()
+            await asyncio.to_thread(sandbox_manager.client.ping)
             docker_status = "healthy"
     except:
         pass
@@ -427,6 +683,7 @@ async def health_check():
         "status": "healthy" if docker_status == "healthy" else "degraded",
         "service": "execution_sandbox",
         "docker": docker_status,
+        "pool": sandbox_manager.pool.get_stats() if sandbox_manager and sandbox_manager.pool else None,
         "timestamp": datetime.utcnow().isoformat()
     }
 
@@ -502,6 +759,49 @@ async def execute_code(request: ExecutionRequest):
             detail=f"Execution failed: {str(e)}"
         )
 
+@app.post("/execute/batch")
+async def execute_batch(request: BatchExecutionRequest):
+    """Run a capsule's test invocations in one container
+    
+    Streams one NDJSON line per test followed by a summary line, or returns
+    all cases and the summary as JSON when ``stream`` is false.
+    """
+    if not sandbox_manager or not sandbox_manager.pool:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Sandbox manager not initialized"
+        )
+    if request.language not in LANGUAGE_IMAGES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported language: {request.language}"
+        )
+    
+    events = sandbox_manager.execute_batch(request)
+    
+    if request.stream:
+        async def ndjson():
+            async for event in events:
+                yield json.dumps(event) + "\n"
+        
+        return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+    
+    cases = []
+    install = None
+    setup = None
+    summary = None
+    async for event in events:
+        if event["type"] == "case":
+            cases.append(event)
+        elif event["type"] == "install":
+            install = event
+        elif event["type"] == "setup":
+            setup = event
+        else:
+            summary = event
+    return {"install": install, "setup": setup, "cases": cases, "summary": summary}
+
+
 @app.get("/languages")
 async def list_languages():
     """List supported languages"""
@@ -0,0 +1,318 @@
+"""
+Content-addressed dependency layers for runtime validation
+
+Capsules that share a dependency manifest (requirements.txt, package.json, ...)
+share one prebuilt image: the runtime's base image with those dependencies
+installed, tagged by the hash of the normalized manifests, the base image and
+the install command. Validation runs the capsule's run and test stages on that
+image, so a warm capsule skips installation entirely. Manifests that depend on
+the capsule's own sources (editable installs, lifecycle scripts) are not
+cacheable and fall back to a cold install. All docker-py calls run in worker
+threads so they never block the event loop.
+"""
+
+import asyncio
+import hashlib
+import io
+import json
+import shlex
+import tarfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import structlog
+from prometheus_client import Counter, Histogram
+
+logger = structlog.get_logger()
+
+# Bump to rebuild every layer, e.g. when normalization or the build recipe changes
+LAYER_VERSION = "1"
+LAYER_LABEL = "qlp.dependency-layer"
+LAYER_REPOSITORY = "qlp-deps"
+LAYER_WORKDIR = "/deps"
+
+dependency_layer_requests = Counter(
+    'qlp_runtime_dependency_layer_requests_total',
+    'Dependency layer lookups during runtime validation',
+    ['language', 'result']
+)
+
+dependency_install_seconds = Histogram(
+    'qlp_runtime_dependency_install_seconds',
+    'Time spent providing dependencies for runtime validation',
+    ['language', 'cached'],
+    buckets=(0.1, 0.5, 1, 5, 15, 30, 60, 120, 300)
+)
+
+
+@dataclass(frozen=True)
+class LayerSpec:
+    """Which files define a runtime's dependencies and where its install puts them"""
+    manifests: Tuple[str, ...]
+    # Directories the install creates next to the manifests; linked into the workspace
+    linked_dirs: Tuple[str, ...] = ()
+
+
+# Only runtimes whose install needs nothing but the manifests; the rest install cold
+LAYER_SPECS: Dict[str, LayerSpec] = {
+    "python": LayerSpec(manifests=("requirements.txt",)),
+    "nodejs": LayerSpec(manifests=("package.json", "package-lock.json"), linked_dirs=("node_modules",)),
+    "go": LayerSpec(manifests=("go.mod", "go.sum")),
+    "ruby": LayerSpec(manifests=("Gemfile", "Gemfile.lock")),
+    "php": LayerSpec(manifests=("composer.json", "composer.lock"), linked_dirs=("vendor",)),
+}
+
+NPM_DEPENDENCY_FIELDS = (
+    "dependencies", "devDependencies", "optionalDependencies", "peerDependencies",
+    "overrides", "resolutions", "engines"
+)
+NPM_LIFECYCLE_SCRIPTS = ("preinstall", "install", "postinstall", "prepare")
+
+
+def normalize_manifest(filename: str, content: str) -> Optional[str]:
+    """Canonical form of a manifest, or None if installing it needs the capsule's sources"""
+    if filename == "requirements.txt":
+        requirements = set()
+        for line in content.splitlines():
+            line = line.split(" #", 1)[0].strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith(("-e", "--editable", "-r", "--requirement", "-c", ".", "/", "file:")):
+                return None
+            requirements.add(" ".join(line.lower().split()))
+        return "\n".join(sorted(requirements))
+
+    if filename == "package.json":
+        try:
+            package = json.loads(content)
+        except ValueError:
+            return None
+        if not isinstance(package, dict):
+            return None
+        scripts = package.get("scripts") or {}
+        if any(name in scripts for name in NPM_LIFECYCLE_SCRIPTS):
+            return None
+        relevant = {name: package[name] for name in NPM_DEPENDENCY_FIELDS if name in package}
+        return json.dumps(relevant, sort_keys=True, separators=(",", ":"))
+
+    # Lock files and other manifests are already canonical enough
+    return "\n".join(line.rstrip() for line in content.strip().splitlines())
+
+
+@dataclass
+class DependencyLayer:
+    """The image a capsule's run and test stages should use"""
+    image: str
+    key: Optional[str]
+    cache_hit: bool
+    install_success: bool
+    install_time: float
+    stdout: str = ""
+    stderr: str = ""
+    linked_dirs: Tuple[str, ...] = field(default_factory=tuple)
+
+    def wrap_command(self, command: str) -> str:
+        """Link installed dependency directories into the workspace before running"""
+        if not self.linked_dirs:
+            return command
+        links = " && ".join(
+            f"ln -sfn {LAYER_WORKDIR}/{name} {name}" for name in self.linked_dirs
+        )
+        return f"sh -c {shlex.quote(f'{links} && {command}')}"
+
+    def wrap_argv(self, command: List[str]) -> List[str]:
+        """wrap_command for a command given as an argument list"""
+        if not self.linked_dirs:
+            return command
+        links = " && ".join(
+            f"ln -sfn {LAYER_WORKDIR}/{name} {name}" for name in self.linked_dirs
+        )
+        return ["sh", "-c", f'{links} && exec "$@"', "sh", *command]
+
+
+def _manifest_archive(files: Dict[str, str]) -> bytes:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w") as tar:
+        for name, content in files.items():
+            data = content.encode("utf-8")
+            info = tarfile.TarInfo(name=name)
+            info.size = len(data)
+            info.mtime = int(time.time())
+            tar.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+class DependencyLayerCache:
+    """Builds and reuses dependency layer images keyed by manifest content"""
+
+    def __init__(self, docker_client: Any, max_layers: int = 200, install_timeout: int = 300,
+                 mem_limit: str = "1g"):
+        self.docker_client = docker_client
+        self.max_layers = max_layers
+        self.install_timeout = install_timeout
+        self.mem_limit = mem_limit
+        # Concurrent validations of capsules with the same manifest build the layer once.
+        # A key's lock is dropped only once no caller holds or waits on it, so a late
+        # caller never gets a second lock for a key that is still being built
+        self._building: Dict[str, asyncio.Lock] = {}
+        self._lock_users: Dict[str, int] = {}
+        self.stats = {"hits": 0, "builds": 0, "uncacheable": 0, "failed": 0}
+
+    @staticmethod
+    def layer_key(language: str, base_image: str, install_command: str,
+                  manifests: Dict[str, str]) -> Optional[str]:
+        parts = [LAYER_VERSION, language, base_image, install_command]
+        for filename in sorted(manifests):
+            normalized = normalize_manifest(filename, manifests[filename])
+            if normalized is None:
+                return None
+            parts += [filename, normalized]
+        return hashlib.sha256("\x00".join(parts).encode("utf-8")).hexdigest()[:32]
+
+    @staticmethod
+    def read_manifests(capsule_path: Path, spec: LayerSpec) -> Dict[str, str]:
+        return {
+            name: (capsule_path / name).read_text()
+            for name in spec.manifests
+            if (capsule_path / name).is_file()
+        }
+
+    async def get_layer(self, language: str, base_image: str, install_command: str,
+                        capsule_path: Path) -> Optional[DependencyLayer]:
+        """Dependency layer for a capsule; None means install cold on the base image"""
+        spec = LAYER_SPECS.get(language)
+        if spec is None:
+            return None
+        return await self.get_layer_for_manifests(language, base_image, install_command,
+                                                  self.read_manifests(capsule_path, spec))
+
+    async def get_layer_for_manifests(self, language: str, base_image: str, install_command: str,
+                                      manifests: Dict[str, str]) -> Optional[DependencyLayer]:
+        """Dependency layer for manifests given by content; None means install cold on the base image"""
+        spec = LAYER_SPECS.get(language)
+        if spec is None:
+            return None
+
+        start = time.time()
+        manifests = {name: content for name, content in manifests.items() if name in spec.manifests}
+        if not manifests:
+            # Nothing to install; the base image already is the layer
+            dependency_layer_requests.labels(language=language, result="empty").inc()
+            return DependencyLayer(image=base_image, key=None, cache_hit=True, install_success=True,
+                                   install_time=0.0)
+
+        key = self.layer_key(language, base_image, install_command, manifests)
+        if key is None:
+            self.stats["uncacheable"] += 1
+            dependency_layer_requests.labels(language=language, result="uncacheable").inc()
+            return None
+
+        image = f"{LAYER_REPOSITORY}/{language}:{key}"
+        lock = self._building.setdefault(key, asyncio.Lock())
+        self._lock_users[key] = self._lock_users.get(key, 0) + 1
+        try:
+            async with lock:
+                if await self._image_exists(image):
+                    self.stats["hits"] += 1
+                    dependency_layer_requests.labels(language=language, result="hit").inc()
+                    install_time = time.time() - start
+                    dependency_install_seconds.labels(language=language, cached="true").observe(install_time)
+                    return DependencyLayer(image=image, key=key, cache_hit=True, install_success=True,
+                                           install_time=install_time, linked_dirs=spec.linked_dirs)
+
+                dependency_layer_requests.labels(language=language, result="miss").inc()
+                layer = await self._build(language, base_image, install_command, manifests, image, key, spec)
+                dependency_install_seconds.labels(language=language, cached="false").observe(layer.install_time)
+        finally:
+            self._lock_users[key] -= 1
+            if not self._lock_users[key]:
+                del self._lock_users[key]
+                del self._building[key]
+
+        if layer.install_success:
+            await self._prune()
+        return layer
+
+    async def _image_exists(self, image: str) -> bool:
+        import docker
+        try:
+            await asyncio.to_thread(self.docker_client.images.get, image)
+            return True
+        except docker.errors.ImageNotFound:
+            return False
+
+    async def _build(self, language: str, base_image: str, install_command: str,
+                     manifests: Dict[str, str], image: str, key: str, spec: LayerSpec) -> DependencyLayer:
+        """Install the manifests on the base image and commit the result as the layer"""
+        start = time.time()
+        container = None
+        try:
+            # Created stopped so the manifests are in place before the install starts
+            container = await asyncio.to_thread(
+                self.docker_client.containers.create,
+                base_image,
+                ["sh", "-c", f"mkdir -p {LAYER_WORKDIR} && cd {LAYER_WORKDIR} && {install_command}"],
+                working_dir="/",
+                mem_limit=self.mem_limit,
+                labels={LAYER_LABEL: "build"}
+            )
+            await asyncio.to_thread(container.put_archive, "/", self._workdir_archive(manifests))
+            await asyncio.to_thread(container.start)
+            result = await asyncio.to_thread(container.wait, timeout=self.install_timeout)
+            exit_code = result["StatusCode"]
+            stdout = (await asyncio.to_thread(container.logs, stdout=True, stderr=False)).decode("utf-8", "replace")
+            stderr = (await asyncio.to_thread(container.logs, stdout=False, stderr=True)).decode("utf-8", "replace")
+
+            if exit_code != 0:
+                self.stats["failed"] += 1
+                return DependencyLayer(image=base_image, key=key, cache_hit=False, install_success=False,
+                                       install_time=time.time() - start, stdout=stdout, stderr=stderr)
+
+            repository, tag = image.split(":", 1)
+            await asyncio.to_thread(
+                container.commit, repository=repository, tag=tag,
+                conf={"Labels": {LAYER_LABEL: key}}
+            )
+            self.stats["builds"] += 1
+            logger.info("Built dependency layer", language=language, image=image,
+                        install_time=round(time.time() - start, 2))
+            return DependencyLayer(image=image, key=key, cache_hit=False, install_success=True,
+                                   install_time=time.time() - start, stdout=stdout, stderr=stderr,
+                                   linked_dirs=spec.linked_dirs)
+        except Exception as e:
+            self.stats["failed"] += 1
+            logger.error(f"Dependency layer build failed: {e}", language=language)
+            return DependencyLayer(image=base_image, key=key, cache_hit=False, install_success=False,
+                                   install_time=time.time() - start, stderr=str(e))
+        finally:
+            if container is not None:
+                try:
+                    await asyncio.to_thread(container.remove, force=True)
+                except Exception:
+                    pass
+
+    @staticmethod
+    def _workdir_archive(manifests: Dict[str, str]) -> bytes:
+        return _manifest_archive({f"{LAYER_WORKDIR.strip('/')}/{name}": content
+                                  for name, content in manifests.items()})
+
+    async def _prune(self):
+        """Drop the oldest layers beyond max_layers"""
+        try:
+            images = await asyncio.to_thread(self.docker_client.images.list, filters={"label": LAYER_LABEL})
+            if len(images) <= self.max_layers:
+                return
+            images.sort(key=lambda image: image.attrs.get("Created", ""))
+            for image in images[:len(images) - self.max_layers]:
+                await asyncio.to_thread(self.docker_client.images.remove, image.id, force=True)
+        except Exception as e:
+            logger.warning(f"Dependency layer pruning failed: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["builds"] + self.stats["failed"]
+        return {
+            **self.stats,
+            "hit_rate": self.stats["hits"] / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,220 @@
+"""
+Local fast-path validators
+
+Deterministic analyzers that run ahead of the LLM validators in the
+validation mesh: Python compile + pyflakes, JSON/YAML parsing and tree-sitter
+grammars for other languages. They run in a process pool so CPU-bound parsing
+never blocks the service's event loop. Outputs rejected here never reach the
+LLM validators; dimensions decided here are not sent to them.
+"""
+
+import ast
+import asyncio
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set
+
+import structlog
+
+from src.common.models import ValidationCheck, ValidationStatus
+
+try:
+    from pyflakes import checker as pyflakes_checker
+    from pyflakes import messages as pyflakes_messages
+    PYFLAKES_AVAILABLE = True
+except ImportError:
+    PYFLAKES_AVAILABLE = False
+
+try:
+    from tree_sitter_language_pack import get_parser
+    TREE_SITTER_AVAILABLE = True
+except ImportError:
+    TREE_SITTER_AVAILABLE = False
+
+logger = structlog.get_logger()
+
+# Languages parsed by tree-sitter, mapped to grammar names
+TREE_SITTER_GRAMMARS = {
+    "javascript": "javascript",
+    "typescript": "typescript",
+    "go": "go",
+    "rust": "rust",
+    "java": "java",
+    "ruby": "ruby",
+    "php": "php",
+    "c": "c",
+    "cpp": "cpp",
+    "csharp": "csharp",
+}
+
+# Data formats only need a parse check plus the security review
+DATA_FORMATS = {"json", "yaml", "yml"}
+
+
+@dataclass
+class LocalAnalysis:
+    """Outcome of the local tier"""
+    checks: List[ValidationCheck] = field(default_factory=list)
+    # LLM validator names whose dimension the local tier already decided
+    resolved: Set[str] = field(default_factory=set)
+    # Validators still worth running for this output (None means all)
+    remaining: Optional[Set[str]] = None
+    rejected: bool = False
+    duration_ms: float = 0.0
+
+
+def _check(name: str, check_type: str, status: ValidationStatus, message: str,
+           severity: str = "info", **details) -> Dict[str, Any]:
+    return {
+        "name": name,
+        "type": check_type,
+        "status": status.value,
+        "message": message,
+        "severity": severity,
+        "details": {"tier": "local", **details},
+    }
+
+
+def _analyze_python(code: str) -> Dict[str, Any]:
+    try:
+        tree = ast.parse(code)
+        compile(tree, "<generated>", "exec")
+    except SyntaxError as e:
+        return {
+            "checks": [_check("syntax_validator", "static_analysis", ValidationStatus.FAILED,
+                              f"Syntax error: {e.msg}", "error", line=e.lineno, offset=e.offset)],
+            "resolved": ["syntax_validator"],
+            "rejected": True,
+        }
+
+    checks = [_check("syntax_validator", "static_analysis", ValidationStatus.PASSED, "Python source compiles")]
+    resolved = ["syntax_validator"]
+    if not PYFLAKES_AVAILABLE:
+        return {"checks": checks, "resolved": resolved, "rejected": False}
+
+    undefined = []
+    warnings = []
+    for message in pyflakes_checker.Checker(tree, filename="<generated>").messages:
+        text = f"line {message.lineno}: {message.message % message.message_args}"
+        if isinstance(message, (pyflakes_messages.UndefinedName, pyflakes_messages.UndefinedLocal)):
+            undefined.append(text)
+        else:
+            warnings.append(text)
+
+    if undefined:
+        checks.append(_check("type_validator", "static_analysis", ValidationStatus.FAILED,
+                             f"{len(undefined)} undefined name(s)", "error", issues=undefined))
+        resolved.append("type_validator")
+        return {"checks": checks, "resolved": resolved, "rejected": True}
+
+    if warnings:
+        checks.append(_check("pyflakes", "static_analysis", ValidationStatus.WARNING,
+                             f"{len(warnings)} pyflakes warning(s)", "warning", issues=warnings[:50]))
+    return {"checks": checks, "resolved": resolved, "rejected": False}
+
+
+def _analyze_data(code: str, language: str) -> Dict[str, Any]:
+    try:
+        if language == "json":
+            json.loads(code)
+        else:
+            import yaml
+            list(yaml.safe_load_all(code))
+    except Exception as e:
+        return {
+            "checks": [_check("syntax_validator", "static_analysis", ValidationStatus.FAILED,
+                              f"Invalid {language.upper()}: {e}", "error")],
+            "resolved": ["syntax_validator"],
+            "rejected": True,
+        }
+    return {
+        "checks": [_check("syntax_validator", "static_analysis", ValidationStatus.PASSED,
+                          f"Valid {language.upper()}")],
+        "resolved": ["syntax_validator"],
+        "remaining": ["security_validator"],
+        "rejected": False,
+    }
+
+
+def _analyze_tree_sitter(code: str, language: str) -> Optional[Dict[str, Any]]:
+    try:
+        parser = get_parser(TREE_SITTER_GRAMMARS[language])
+    except Exception:
+        return None
+
+    root = parser.parse(code.encode("utf-8")).root_node
+    if not root.has_error:
+        return {
+            "checks": [_check("syntax_validator", "static_analysis", ValidationStatus.PASSED,
+                              f"{language} source parses cleanly")],
+            "resolved": ["syntax_validator"],
+            "rejected": False,
+        }
+
+    errors = []
+    stack = [root]
+    while stack and len(errors) < 20:
+        node = stack.pop()
+        if node.type == "ERROR" or node.is_missing:
+            errors.append(f"line {node.start_point[0] + 1}: {'missing ' + node.type if node.is_missing else 'unexpected syntax'}")
+        elif node.has_error:
+            stack.extend(reversed(node.children))
+    return {
+        "checks": [_check("syntax_validator", "static_analysis", ValidationStatus.FAILED,
+                          f"{language} parse errors", "error", issues=errors)],
+        "resolved": ["syntax_validator"],
+        "rejected": True,
+    }
+
+
+def analyze_code(code: str, language: str) -> Dict[str, Any]:
+    """Run the local analyzers for a language; picklable for the process pool"""
+    language = (language or "").lower()
+    if language == "python":
+        return _analyze_python(code)
+    if language in DATA_FORMATS:
+        return _analyze_data(code, "yaml" if language == "yml" else language)
+    if TREE_SITTER_AVAILABLE and language in TREE_SITTER_GRAMMARS:
+        result = _analyze_tree_sitter(code, language)
+        if result is not None:
+            return result
+    return {"checks": [], "resolved": [], "rejected": False}
+
+
+class LocalValidatorPool:
+    """Runs local analyzers in a process pool"""
+
+    def __init__(self, max_workers: Optional[int] = None):
+        self.max_workers = max_workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    async def analyze(self, code: str, language: str) -> LocalAnalysis:
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        try:
+            raw = await loop.run_in_executor(self._get_executor(), analyze_code, code, language)
+        except BrokenProcessPool:
+            logger.warning("Local validator pool broke, restarting it")
+            self._executor = None
+            raw = await loop.run_in_executor(None, analyze_code, code, language)
+
+        return LocalAnalysis(
+            checks=[ValidationCheck(**check) for check in raw["checks"]],
+            resolved=set(raw["resolved"]),
+            remaining=set(raw["remaining"]) if raw.get("remaining") is not None else None,
+            rejected=raw["rejected"],
+            duration_ms=(time.perf_counter() - start) * 1000
+        )
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -40,6 +40,8 @@ from src.common.models import (
     ValidationStatus
 )
 from src.common.config import settings
+from src.validation.local_validators import LocalValidatorPool
+from src.validation.validation_cache import ValidationCache, prompt_digest
 
 # Setup structured logging
 logger = setup_logging(
@@ -109,6 +111,8 @@ class Validator:
 class LLMValidator(Validator):
     """Universal LLM-powered validator for any programming language"""
     
+    SYSTEM_PROMPT = "You are an expert code validator. Analyze code and respond in JSON format."
+    
     def __init__(self, name: str, validator_type: str, validation_focus: str):
         super().__init__(name, validator_type)
         self.validation_focus = validation_focus
@@ -161,7 +165,7 @@ class LLMValidator(Validator):
             response = await self.llm_client.chat.completions.create(
                 model=model,
                 messages=[
-                    {"role": "system", "content": "You are an expert code validator. Analyze code and respond in JSON format."},
+                    {"role": "system", "content": self.SYSTEM_PROMPT},
                     {"role": "user", "content": prompt}
                 ],
                 response_format={"type": "json_object"},
@@ -191,6 +195,15 @@ class LLMValidator(Validator):
                 severity="warning"
             )
     
+    @property
+    def prompt_hash(self) -> str:
+        """Hash of the model and prompt template; changes invalidate cached results"""
+        return prompt_digest(
+            getattr(settings, 'AZURE_OPENAI_DEPLOYMENT_NAME', 'gpt-3.5-turbo'),
+            self.SYSTEM_PROMPT,
+            self._create_validation_prompt("{code}", "{language}")
+        )
+    
     def _create_validation_prompt(self, code: str, language: str) -> str:
         """Create language-agnostic validation prompt"""
         return f"""
@@ -277,16 +290,71 @@ class ValidationMesh:
             LogicValidator(),
             RuntimeValidator()
         ]
+        self.local_validators = LocalValidatorPool(max_workers=settings.VALIDATION_LOCAL_WORKERS)
+        self.cache = ValidationCache(
+            max_entries=settings.VALIDATION_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.VALIDATION_CACHE_TTL_SECONDS,
+            redis_url=settings.REDIS_URL
+        )
+    
+    async def _validate_cached(self, validator: LLMValidator, code: str, language: str) -> ValidationCheck:
+        """Run one LLM validator, reusing its verdict for identical code"""
+        prompt_hash = validator.prompt_hash
+        cached = await self.cache.get(validator.name, prompt_hash, language, code)
+        if cached is not None:
+            cached.details = {**(cached.details or {}), "cached": True}
+            return cached
+        
+        check = await validator.validate(code, language)
+        # Only cache real verdicts, not missing clients or transient LLM errors
+        transient = check.status == ValidationStatus.SKIPPED or (check.message or "").startswith("LLM validation error")
+        if not transient:
+            await self.cache.put(validator.name, prompt_hash, language, code, check)
+        return check
         
     async def validate_code(self, code: str, language: str = "python") -> ValidationReport:
-        """Run all validators and compute consensus"""
-        # Run validators in parallel
-        validation_tasks = [
-            validator.validate(code, language) 
-            for validator in self.validators
-        ]
-        
-        checks = await asyncio.gather(*validation_tasks)
+        """Run local fast-path analyzers, then the LLM validators still needed, and compute consensus"""
+        # Tier 1: deterministic local analyzers
+        local = await self.local_validators.analyze(code, language)
+        tiers = [{
+            "tier": "local",
+            "duration_ms": round(local.duration_ms, 2),
+            "validators": [check.name for check in local.checks]
+        }]
+        checks = list(local.checks)
+        
+        if local.rejected:
+            # Rejected by the cheap gates - don't spend LLM calls on it
+            decided_by = "local"
+            checks.extend(
+                ValidationCheck(
+                    name=validator.name,
+                    type=validator.type,
+                    status=ValidationStatus.SKIPPED,
+                    message="Skipped: rejected by local validation",
+                    details={"tier": "local"}
+                )
+                for validator in self.validators
+                if validator.name not in local.resolved
+            )
+        else:
+            # Tier 2: LLM validators for the dimensions still undecided, in parallel
+            llm_validators = [
+                validator for validator in self.validators
+                if validator.name not in local.resolved
+                and (local.remaining is None or validator.name in local.remaining)
+            ]
+            llm_start = datetime.utcnow()
+            checks.extend(await asyncio.gather(*(
+                self._validate_cached(validator, code, language)
+                for validator in llm_validators
+            )))
+            tiers.append({
+                "tier": "llm",
+                "duration_ms": round((datetime.utcnow() - llm_start).total_seconds() * 1000, 2),
+                "validators": [validator.name for validator in llm_validators]
+            })
+            decided_by = "llm" if llm_validators else "local"
         
         # Compute overall status
         failed_count = sum(1 for check in checks if check.status == ValidationStatus.FAILED)
@@ -321,7 +389,9 @@ class ValidationMesh:
             metadata={
                 "language": language,
                 "failed_count": failed_count,
-                "warning_count": warning_count
+                "warning_count": warning_count,
+                "decided_by": decided_by,
+                "tiers": tiers
             }
         )
     
@@ -375,6 +445,12 @@ class ValidationMesh:
 validation_mesh = ValidationMesh()
 
 
+@app.on_event("shutdown")
+async def shutdown_local_validators():
+    """Stop the local validator process pool"""
+    validation_mesh.local_validators.shutdown()
+
+
 # Import new runtime validation components
 from src.validation.qlcapsule_runtime_validator import QLCapsuleRuntimeValidator
 from src.validation.confidence_engine import AdvancedConfidenceEngine
@@ -691,9 +767,10 @@ async def list_validators():
     """List available validators"""
     return {
         "validators": [
-            {"name": v.name, "type": v.type} 
+            {"name": v.name, "type": v.type, "prompt_hash": v.prompt_hash}
             for v in validation_mesh.validators
-        ]
+        ],
+        "cache": validation_mesh.cache.get_stats()
     }
 
 
@@ -22,7 +22,9 @@ import yaml
 import structlog
 from pydantic import BaseModel, Field
 
+from src.common.config import settings
 from src.common.models import QLCapsule, ValidationReport, ValidationCheck, ValidationStatus
+from src.validation.dependency_layers import DependencyLayer, DependencyLayerCache
 
 logger = structlog.get_logger()
 
@@ -247,6 +249,10 @@ class DockerCapsuleRunner:
     def __init__(self, docker_client: Optional[docker.DockerClient] = None):
         self.docker_client = docker_client or docker.from_env()
         self.env_manager = RuntimeEnvironmentManager()
+        self.dependency_layers = (
+            DependencyLayerCache(self.docker_client, max_layers=settings.RUNTIME_DEPENDENCY_LAYER_MAX_IMAGES)
+            if settings.RUNTIME_DEPENDENCY_LAYERS_ENABLED else None
+        )
     
     async def run_capsule(self, capsule: QLCapsule, language: SupportedLanguage) -> RuntimeValidationResult:
         """Run capsule in language-specific container"""
@@ -271,14 +277,32 @@ class DockerCapsuleRunner:
                 # Pull Docker image
                 await self._pull_docker_image(env.docker_image)
                 
-                # Run installation
-                install_result = await self._run_install(capsule_path, env)
+                # Use a prebuilt dependency layer when one matches the manifests
+                layer = None
+                if self.dependency_layers is not None:
+                    layer = await self.dependency_layers.get_layer(
+                        language.value, env.docker_image, env.install_command, capsule_path
+                    )
+                
+                if layer is not None:
+                    install_result = ExecutionResult(
+                        success=layer.install_success,
+                        exit_code=0 if layer.install_success else 1,
+                        stdout=layer.stdout,
+                        stderr=layer.stderr,
+                        execution_time=layer.install_time,
+                        memory_usage=0,
+                        stage="install"
+                    )
+                else:
+                    # Cold install
+                    install_result = await self._run_install(capsule_path, env)
                 
                 # Run capsule
-                run_result = await self._run_capsule_exec(capsule_path, env)
+                run_result = await self._run_capsule_exec(capsule_path, env, layer)
                 
                 # Run tests if available
-                test_result = await self._run_tests(capsule_path, env)
+                test_result = await self._run_tests(capsule_path, env, layer)
                 
                 # Calculate metrics
                 execution_time = time.time() - start_time
@@ -302,7 +326,9 @@ class DockerCapsuleRunner:
                         "install_time": install_result.execution_time,
                         "run_time": run_result.execution_time,
                         "test_time": test_result.execution_time if test_result else 0,
-                        "docker_image": env.docker_image,
+                        "docker_image": layer.image if layer else env.docker_image,
+                        "dependency_cache_hit": bool(layer and layer.cache_hit),
+                        "dependency_layer": layer.key if layer else None,
                         "language": language.value
                     }
                 )
@@ -362,24 +388,26 @@ class DockerCapsuleRunner:
             "install"
         )
     
-    async def _run_capsule_exec(self, capsule_path: Path, env: RuntimeEnvironment) -> 'ExecutionResult':
+    async def _run_capsule_exec(self, capsule_path: Path, env: RuntimeEnvironment,
+                                layer: Optional[DependencyLayer] = None) -> 'ExecutionResult':
         """Run capsule execution command"""
         return await self._run_docker_command(
             capsule_path,
-            env.docker_image,
-            env.run_command,
+            layer.image if layer else env.docker_image,
+            layer.wrap_command(env.run_command) if layer else env.run_command,
             "run"
         )
     
-    async def _run_tests(self, capsule_path: Path, env: RuntimeEnvironment) -> Optional['ExecutionResult']:
+    async def _run_tests(self, capsule_path: Path, env: RuntimeEnvironment,
+                         layer: Optional[DependencyLayer] = None) -> Optional['ExecutionResult']:
         """Run tests if test command is available"""
         if not env.test_command:
             return None
         
         return await self._run_docker_command(
             capsule_path,
-            env.docker_image,
-            env.test_command,
+            layer.image if layer else env.docker_image,
+            layer.wrap_command(env.test_command) if layer else env.test_command,
             "test"
         )
     
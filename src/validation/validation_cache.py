@@ -0,0 +1,89 @@
+"""
+Content-addressed validation result cache
+
+Stores each LLM validator's ValidationCheck keyed by the sha256 of the code,
+the language, the validator set version and a hash of the validator's prompt.
+Changing a prompt (or bumping the set version) changes the key, so stale
+results are never served. Results are kept in an in-process LRU in front of
+Redis so all validation mesh replicas share them.
+"""
+
+import hashlib
+from typing import Dict, Optional
+
+import structlog
+from prometheus_client import Counter
+
+from src.common.models import ValidationCheck
+from src.common.tiered_cache import TieredCache
+
+logger = structlog.get_logger()
+
+# Bump to invalidate every cached result, e.g. when response parsing changes
+VALIDATOR_SET_VERSION = "1"
+
+validation_cache_requests = Counter(
+    'qlp_validation_cache_requests_total',
+    'Validation cache lookups by validator and result',
+    ['validator', 'result']
+)
+
+
+def code_digest(code: str) -> str:
+    return hashlib.sha256(code.encode("utf-8")).hexdigest()
+
+
+def prompt_digest(*parts: str) -> str:
+    """Stable hash of everything that shapes a validator's prompt"""
+    return hashlib.sha256("\x00".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+class ValidationCache:
+    """Two-tier cache of per-validator checks: in-process LRU, then Redis"""
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: int = 7 * 24 * 3600,
+                 redis_url: Optional[str] = None):
+        self.store = TieredCache("Validation cache", max_entries=max_entries, ttl_seconds=ttl_seconds,
+                                 redis_url=redis_url)
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    @staticmethod
+    def key(validator: str, prompt_hash: str, language: str, code: str) -> str:
+        return (
+            f"qlp:validation:{VALIDATOR_SET_VERSION}:{validator}:{prompt_hash}:"
+            f"{(language or 'unknown').lower()}:{code_digest(code)}"
+        )
+
+    def _record(self, validator: str, result: str):
+        stats = self.stats.setdefault(validator, {"hits": 0, "misses": 0})
+        stats["hits" if result == "hit" else "misses"] += 1
+        validation_cache_requests.labels(validator=validator, result=result).inc()
+
+    async def get(self, validator: str, prompt_hash: str, language: str, code: str) -> Optional[ValidationCheck]:
+        fields = await self.store.get(self.key(validator, prompt_hash, language, code))
+        if fields is None:
+            self._record(validator, "miss")
+            return None
+        self._record(validator, "hit")
+        return ValidationCheck(**fields)
+
+    async def put(self, validator: str, prompt_hash: str, language: str, code: str, check: ValidationCheck):
+        await self.store.put(self.key(validator, prompt_hash, language, code), check.model_dump(mode="json"))
+
+    def get_stats(self) -> Dict[str, object]:
+        hits = sum(s["hits"] for s in self.stats.values())
+        lookups = hits + sum(s["misses"] for s in self.stats.values())
+        return {
+            "version": VALIDATOR_SET_VERSION,
+            "entries": len(self.store),
+            "hits": hits,
+            "lookups": lookups,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "by_validator": {
+                name: {
+                    **s,
+                    "hit_rate": s["hits"] / (s["hits"] + s["misses"]) if s["hits"] + s["misses"] else 0.0
+                }
+                for name, s in self.stats.items()
+            }
+        }
@@ -183,7 +183,7 @@ async def load_test_data():
     
     try:
         # Check if collection has data
-        collection_info = memory_service.qdrant.get_collection(collection_name)
+        collection_info = await memory_service.qdrant.get_collection(collection_name)
         
         if collection_info.points_count < 100:
             print(f"\nCollection has {collection_info.points_count} points. Loading test data...")
@@ -195,7 +195,7 @@ async def load_test_data():
             batch_size = 100
             for i in range(0, len(test_points), batch_size):
                 batch = test_points[i:i + batch_size]
-                memory_service.qdrant.upsert(
+                await memory_service.qdrant.upsert(
                     collection_name=collection_name,
                     points=batch
                 )
@@ -264,7 +264,7 @@ async def main():
     
     for name, collection_name in COLLECTIONS.items():
         try:
-            info = memory_service.qdrant.get_collection(collection_name)
+            info = await memory_service.qdrant.get_collection(collection_name)
             print(f"{name:20}: {info.points_count} points, {info.vectors_count} vectors")
         except:
             print(f"{name:20}: Not initialized")
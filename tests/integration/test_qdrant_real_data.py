@@ -29,7 +29,7 @@ async def test_search_real_code_patterns():
     
     # First, let's see what's in the collection
     collection_name = COLLECTIONS["code_patterns"]
-    collection_info = memory_service.qdrant.get_collection(collection_name)
+    collection_info = await memory_service.qdrant.get_collection(collection_name)
     print(f"Total code patterns in collection: {collection_info.points_count}")
     
     if collection_info.points_count == 0:
@@ -76,7 +76,7 @@ async def test_search_real_executions():
     
     # Check collection status
     collection_name = COLLECTIONS["executions"]
-    collection_info = memory_service.qdrant.get_collection(collection_name)
+    collection_info = await memory_service.qdrant.get_collection(collection_name)
     print(f"Total executions in collection: {collection_info.points_count}")
     
     if collection_info.points_count == 0:
@@ -130,7 +130,7 @@ async def test_search_agent_decisions():
     
     # Check collection status
     collection_name = COLLECTIONS["agent_decisions"]
-    collection_info = memory_service.qdrant.get_collection(collection_name)
+    collection_info = await memory_service.qdrant.get_collection(collection_name)
     print(f"Total agent decisions in collection: {collection_info.points_count}")
     
     if collection_info.points_count == 0:
@@ -167,7 +167,7 @@ async def test_direct_qdrant_queries():
     print("\nDirect Query 1: All Python code patterns")
     start_time = time.time()
     
-    result = memory_service.qdrant.scroll(
+    result = await memory_service.qdrant.scroll(
         collection_name=COLLECTIONS["code_patterns"],
         scroll_filter=Filter(
             must=[
@@ -189,7 +189,7 @@ async def test_direct_qdrant_queries():
     print("\nDirect Query 2: High-quality patterns (success_rate > 0.9)")
     start_time = time.time()
     
-    result = memory_service.qdrant.scroll(
+    result = await memory_service.qdrant.scroll(
         collection_name=COLLECTIONS["code_patterns"],
         scroll_filter=Filter(
             must=[
@@ -214,7 +214,7 @@ async def test_direct_qdrant_queries():
     seven_days_ago = (datetime.utcnow() - timedelta(days=7)).isoformat() + "Z"
     
     start_time = time.time()
-    result = memory_service.qdrant.scroll(
+    result = await memory_service.qdrant.scroll(
         collection_name=COLLECTIONS["executions"],
         scroll_filter=Filter(
             must=[
@@ -260,7 +260,7 @@ async def test_performance_comparison():
     print("=" * 50)
     
     # Only test if we have data
-    collection_info = memory_service.qdrant.get_collection(COLLECTIONS["code_patterns"])
+    collection_info = await memory_service.qdrant.get_collection(COLLECTIONS["code_patterns"])
     if collection_info.points_count < 10:
         print("Not enough data for performance comparison")
         return
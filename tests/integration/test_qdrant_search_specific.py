@@ -79,7 +79,7 @@ async def search_by_tenant_user():
             )
         
         # Direct Qdrant query
-        result = memory_service.qdrant.scroll(
+        result = await memory_service.qdrant.scroll(
             collection_name=COLLECTIONS["executions"],
             scroll_filter=Filter(must=must_conditions),
             limit=10,
@@ -103,7 +103,7 @@ async def search_code_patterns_by_request():
     print("=" * 50)
     
     # Get some request IDs from executions
-    result = memory_service.qdrant.scroll(
+    result = await memory_service.qdrant.scroll(
         collection_name=COLLECTIONS["executions"],
         limit=5,
         with_payload=True
@@ -118,7 +118,7 @@ async def search_code_patterns_by_request():
         print(f"\nSearching patterns for request: {request_id}")
         
         # Search code patterns for this request
-        result = memory_service.qdrant.scroll(
+        result = await memory_service.qdrant.scroll(
             collection_name=COLLECTIONS["code_patterns"],
             scroll_filter=Filter(
                 must=[
@@ -174,7 +174,7 @@ async def performance_test_filters():
         
         # Time the query
         start = time.time()
-        result = memory_service.qdrant.scroll(
+        result = await memory_service.qdrant.scroll(
             collection_name=COLLECTIONS["executions"],
             scroll_filter=filter_obj,
             limit=100,
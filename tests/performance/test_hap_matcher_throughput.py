@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark HAP rule screening on 10KB-1MB inputs
+
+Screens capsule-sized content with the single-pass matcher and with the
+previous per-pattern loop (every rule and technical indicator searched on its
+own, case-insensitively), and reports throughput for clean and flagged text.
+"""
+
+import os
+import random
+import re
+import sys
+import time
+
+import pytest
+
+# Add src to path for imports
+sys.path.insert(0, '.')
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from src.moderation.hap_service import (
+    HAPService, Severity, RULE_PATTERNS, TECHNICAL_PATTERNS, TECHNICAL_TERMS
+)
+
+SIZES = [10_000, 100_000, 1_000_000]
+CLEAN_WORDS = ["build", "a", "todo", "app", "with", "the", "list", "of", "items", "and", "tests"]
+FLAGGED_WORDS = CLEAN_WORDS * 20 + ["kill", "stupid", "damn"]
+
+
+def make_text(size, vocabulary, seed=7):
+    rnd = random.Random(seed)
+    words = []
+    length = 0
+    while length < size:
+        word = rnd.choice(vocabulary)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)[:size]
+
+
+# The per-pattern loop screening used before all rules were combined
+PER_PATTERN_RULES = [
+    re.compile(rf'\b({pattern})\b', re.IGNORECASE)
+    for patterns in RULE_PATTERNS.values() for pattern in patterns
+]
+PER_PATTERN_TECHNICAL = [rf'\b({term})\b' for term in sorted(TECHNICAL_TERMS)] + TECHNICAL_PATTERNS
+
+
+def per_pattern_check(service, text):
+    normalized = service._normalize_text(text)
+    any(re.search(p, text, re.IGNORECASE | re.MULTILINE) for p in PER_PATTERN_TECHNICAL)
+    hits = [p.search(normalized) or p.search(text) for p in PER_PATTERN_RULES]
+    profane = [w for w in normalized.split() if w in service.profanity_list]
+    return hits, profane
+
+
+def best_of(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+@pytest.mark.asyncio
+async def test_single_pass_matcher_throughput():
+    service = HAPService()
+    print("\nHAP rule screening (best of 3)")
+
+    for kind, vocabulary in (("clean", CLEAN_WORDS), ("flagged", FLAGGED_WORDS)):
+        for size in SIZES:
+            text = make_text(size, vocabulary)
+            result = await service._rule_based_check(service._normalize_text(text), text)
+            assert (result.severity == Severity.CLEAN) == (kind == "clean")
+
+            single_pass = float("inf")
+            for _ in range(3):
+                start = time.perf_counter()
+                await service._rule_based_check(service._normalize_text(text), text)
+                single_pass = min(single_pass, time.perf_counter() - start)
+            per_pattern = best_of(lambda: per_pattern_check(service, text))
+
+            print(f"  {kind:7} {size // 1000:>5}KB: single pass {single_pass * 1000:7.1f}ms "
+                  f"({size / single_pass / 1e6:6.1f} MB/s), per pattern {per_pattern * 1000:7.1f}ms")
+
+            if size == SIZES[-1]:
+                assert single_pass < per_pattern / 2
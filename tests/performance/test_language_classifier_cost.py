@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Benchmark language classification per call on real capsule files
+
+The corpus is the files of test_capsule.zip plus the repository's own source
+files. Each file is classified from its content alone (as agents classify
+generated code) with the shared classifier and with the per-call scoring the
+agents used before (a pattern table built and searched on every call), and
+the whole tree is classified in one batch call.
+"""
+
+import os
+import re
+import sys
+import time
+import zipfile
+from pathlib import Path
+
+import pytest
+
+# Add src to path for imports
+sys.path.insert(0, '.')
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from src.common.language_classifier import classify_code, classify_files
+
+CAPSULE = Path("test_capsule.zip")
+SOURCE_SUFFIXES = {".py", ".sh", ".ts", ".tsx", ".js", ".sql"}
+
+
+def load_corpus():
+    files = {}
+    if CAPSULE.exists():
+        with zipfile.ZipFile(CAPSULE) as archive:
+            for name in archive.namelist():
+                files[f"capsule/{name}"] = archive.read(name).decode("utf-8", errors="replace")
+    for path in Path("src").rglob("*"):
+        if path.suffix in SOURCE_SUFFIXES and path.is_file():
+            files[str(path)] = path.read_text(errors="replace")
+    return files
+
+
+# The pattern table LanguageDetector scored code with before the shared classifier
+PER_CALL_PATTERNS = {
+    "python": [
+        (r'^\s*def\s+\w+\s*\(', 10),
+        (r'^\s*class\s+\w+', 10),
+        (r'^\s*import\s+\w+', 8),
+        (r'^\s*from\s+\w+\s+import', 8),
+        (r'if\s+__name__\s*==\s*["\']__main__["\']', 10),
+        (r'print\s*\(', 5),
+        (r'^\s*@\w+', 7),
+        (r':\s*$', 3),
+        (r'self\.', 7),
+    ],
+    "javascript": [
+        (r'function\s+\w+\s*\(', 10),
+        (r'const\s+\w+\s*=', 8),
+        (r'let\s+\w+\s*=', 8),
+        (r'var\s+\w+\s*=', 7),
+        (r'=>', 8),
+        (r'console\.log\s*\(', 7),
+        (r'module\.exports', 8),
+        (r'require\s*\(', 8),
+        (r'async\s+function', 8),
+        (r'\.then\s*\(', 7),
+    ],
+    "typescript": [
+        (r':\s*\w+\s*[=;]', 10),
+        (r'interface\s+\w+', 10),
+        (r'type\s+\w+\s*=', 10),
+        (r'<\w+>', 8),
+        (r'export\s+interface', 9),
+        (r'implements\s+\w+', 9),
+    ],
+    "java": [
+        (r'public\s+class\s+\w+', 10),
+        (r'private\s+\w+\s+\w+', 8),
+        (r'public\s+static\s+void\s+main', 10),
+        (r'import\s+java\.', 9),
+        (r'System\.out\.println', 8),
+        (r'@Override', 7),
+        (r'new\s+\w+\s*\(', 6),
+    ],
+    "go": [
+        (r'package\s+\w+', 10),
+        (r'func\s+\w+\s*\(', 10),
+        (r'import\s+\(', 8),
+        (r'fmt\.Print', 8),
+        (r':=', 9),
+        (r'go\s+func', 8),
+    ],
+    "rust": [
+        (r'fn\s+\w+\s*\(', 10),
+        (r'let\s+mut\s+', 9),
+        (r'impl\s+\w+', 8),
+        (r'pub\s+fn', 8),
+        (r'use\s+\w+::', 8),
+        (r'println!\s*\(', 7),
+        (r'match\s+\w+\s*\{', 8),
+    ],
+}
+
+
+def per_call_classify(code):
+    # Searched through the re module cache on every call
+    scores = {}
+    for language, patterns in PER_CALL_PATTERNS.items():
+        score = 0
+        for pattern, weight in patterns:
+            if re.search(pattern, code, re.MULTILINE):
+                score += weight
+        if score > 0:
+            scores[language] = score
+    if scores:
+        best = max(scores, key=scores.get)
+        if scores[best] >= 10:
+            return best
+    return None
+
+
+def best_of(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def test_classifier_cost_on_capsule_files():
+    files = load_corpus()
+    if not files:
+        pytest.skip("no capsule files to classify")
+    contents = list(files.values())
+    size = sum(len(content) for content in contents)
+
+    agree = sum(classify_code(c).language == per_call_classify(c) for c in contents)
+
+    shared = best_of(lambda: [classify_code(c) for c in contents])
+    per_call = best_of(lambda: [per_call_classify(c) for c in contents])
+    batch = best_of(lambda: classify_files(files))
+
+    print(f"\nLanguage classification of {len(files)} files, {size / 1e6:.1f}MB (best of 3)")
+    print(f"  same language as the per-call patterns for {agree}/{len(files)} files")
+    print(f"  content only, shared classifier: {shared * 1e6 / len(files):8.1f}us/file")
+    print(f"  content only, per-call patterns: {per_call * 1e6 / len(files):8.1f}us/file")
+    print(f"  whole tree, classify_files:      {batch * 1e6 / len(files):8.1f}us/file")
+
+    assert shared < per_call
+    assert batch < shared / 5
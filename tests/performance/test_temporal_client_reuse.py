@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Benchmark /execute under a burst of concurrent submissions
+
+Runs the orchestrator app in-process against a fake Temporal whose connect
+costs a TLS handshake, once connecting per request (the old behaviour) and
+once through the shared client pool, and reports p50/p99 for 200 concurrent
+submissions.
+"""
+
+import asyncio
+import os
+import statistics
+import sys
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+# Add src to path for imports
+sys.path.insert(0, '.')
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+# The orchestrator app pulls in every provider SDK
+pytest.importorskip("anthropic")
+
+CONCURRENT_SUBMISSIONS = 200
+HANDSHAKE_LATENCY = 0.15
+START_WORKFLOW_LATENCY = 0.005
+# Temporal Cloud handshakes are CPU bound on the client; cap how many overlap
+HANDSHAKE_CONCURRENCY = 16
+
+
+class FakeTemporal:
+    def __init__(self):
+        self.connects = 0
+        self.handshakes = asyncio.Semaphore(HANDSHAKE_CONCURRENCY)
+
+    async def connect(self):
+        async with self.handshakes:
+            self.connects += 1
+            await asyncio.sleep(HANDSHAKE_LATENCY)
+        return self
+
+    async def start_workflow(self, workflow, arg, id, task_queue):
+        await asyncio.sleep(START_WORKFLOW_LATENCY)
+        return SimpleNamespace(id=id)
+
+
+async def measure_latencies(app) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://orchestrator", timeout=60) as client:
+        async def submit(i):
+            start = time.perf_counter()
+            response = await client.post("/execute", json={
+                "tenant_id": "load-test", "user_id": f"user-{i}", "description": "Build a REST API"
+            })
+            assert response.status_code == 200, response.text
+            return time.perf_counter() - start
+
+        latencies = sorted(await asyncio.gather(*(submit(i) for i in range(CONCURRENT_SUBMISSIONS))))
+
+    return {
+        "p50": statistics.median(latencies),
+        "p99": latencies[int(len(latencies) * 0.99) - 1]
+    }
+
+
+@pytest.mark.asyncio
+async def test_execute_latency_with_shared_temporal_client(monkeypatch):
+    import src.moderation
+    from src.common.temporal_cloud import TemporalClientManager
+    from src.moderation import HAPCheckResult, Severity
+    from src.orchestrator import main
+
+    async def allow_content(**kwargs):
+        return HAPCheckResult(result="clean", severity=Severity.CLEAN, confidence=1.0)
+
+    monkeypatch.setattr(src.moderation, "check_content", allow_content)
+
+    per_request = FakeTemporal()
+    monkeypatch.setattr(main, "get_shared_temporal_client", per_request.connect)
+    before = await measure_latencies(main.app)
+
+    pooled = FakeTemporal()
+    manager = TemporalClientManager(pool_size=2, connect=pooled.connect)
+    await manager.start()
+    monkeypatch.setattr(main, "get_shared_temporal_client", manager.get)
+    try:
+        after = await measure_latencies(main.app)
+    finally:
+        await manager.stop()
+
+    print(f"\n/execute with {CONCURRENT_SUBMISSIONS} concurrent submissions")
+    print(f"  connect per request: p50={before['p50'] * 1000:.1f}ms p99={before['p99'] * 1000:.1f}ms "
+          f"({per_request.connects} connects)")
+    print(f"  shared client pool:  p50={after['p50'] * 1000:.1f}ms p99={after['p99'] * 1000:.1f}ms "
+          f"({pooled.connects} connects)")
+
+    assert per_request.connects == CONCURRENT_SUBMISSIONS
+    assert pooled.connects == 2
+    assert after["p99"] < before["p99"] / 5
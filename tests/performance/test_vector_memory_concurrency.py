@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark /search/similar under concurrent callers
+
+Runs the vector memory app in-process through the real VectorMemoryService
+search path (embedding cache, micro-batcher, Qdrant query) with only the
+network edges stubbed: the embeddings API and AsyncQdrantClient.search, each
+with a fixed latency. Reports p50/p99 for 50 parallel callers against the
+time the same searches take one after another.
+"""
+
+import asyncio
+import os
+import statistics
+import sys
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+# Add src to path for imports
+sys.path.insert(0, '.')
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+PARALLEL_CALLERS = 50
+SEARCH_LATENCY = 0.02
+EMBEDDING_LATENCY = 0.01
+
+
+class StubAsyncQdrant:
+    """AsyncQdrantClient.search with network latency; records each query"""
+
+    def __init__(self):
+        self.searches = []
+
+    async def search(self, **kwargs):
+        self.searches.append(kwargs)
+        await asyncio.sleep(SEARCH_LATENCY)
+        return [SimpleNamespace(id="1", score=0.9, payload={"task": {}, "result": {}, "created_at": None})]
+
+
+class StubEmbeddings:
+    """Embeddings API with network latency; records each request's inputs"""
+
+    def __init__(self, dim):
+        self.dim = dim
+        self.requests = []
+
+    async def __call__(self, texts):
+        self.requests.append(list(texts))
+        await asyncio.sleep(EMBEDDING_LATENCY)
+        return [[0.0] * self.dim for _ in texts]
+
+
+async def measure_latencies(app) -> dict:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://vector-memory") as client:
+        async def call(i):
+            start = time.perf_counter()
+            response = await client.post("/search/similar", json={"query": f"task {i}", "tenant_id": "tenant-a", "limit": 3})
+            assert response.status_code == 200
+            assert response.json()["results"]
+            return time.perf_counter() - start
+
+        start = time.perf_counter()
+        latencies = sorted(await asyncio.gather(*(call(i) for i in range(PARALLEL_CALLERS))))
+        wall = time.perf_counter() - start
+
+    return {
+        "p50": statistics.median(latencies),
+        "p99": latencies[int(len(latencies) * 0.99) - 1],
+        "wall": wall
+    }
+
+
+@pytest.mark.asyncio
+async def test_search_similar_latency_under_parallel_callers(monkeypatch):
+    from src.memory import main
+    from src.memory.embedding_cache import EmbeddingBatcher, EmbeddingCache
+
+    service = main.memory_service
+    qdrant = StubAsyncQdrant()
+    embeddings = StubEmbeddings(main.VECTOR_DIM)
+    monkeypatch.setattr(service, "qdrant", qdrant)
+    monkeypatch.setattr(service, "embedding_cache", EmbeddingCache(model=main.EMBEDDING_MODEL))
+    monkeypatch.setattr(service, "embedding_batcher", EmbeddingBatcher(embeddings, max_wait_ms=5))
+
+    result = await measure_latencies(main.app)
+    serial = PARALLEL_CALLERS * (SEARCH_LATENCY + EMBEDDING_LATENCY)
+
+    print(f"\n/search/similar with {PARALLEL_CALLERS} parallel callers")
+    print(f"  p50={result['p50'] * 1000:.1f}ms p99={result['p99'] * 1000:.1f}ms "
+          f"wall={result['wall'] * 1000:.1f}ms (one after another: {serial * 1000:.0f}ms)")
+    print(f"  {len(embeddings.requests)} embeddings requests for {PARALLEL_CALLERS} queries")
+
+    # Every caller went through the service's Qdrant query
+    assert len(qdrant.searches) == PARALLEL_CALLERS
+    assert all(s["collection_name"] == main.COLLECTIONS["executions"] for s in qdrant.searches)
+    # Searches only see the caller's tenant
+    assert all(s["query_filter"].must[0].match.value == "tenant-a" for s in qdrant.searches)
+    # Concurrent queries share embeddings requests and their searches overlap
+    assert len(embeddings.requests) < PARALLEL_CALLERS / 5
+    assert result["p99"] < serial / 5
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Test the content-addressed blob store and blob-backed capsule versioning
+"""
+
+import os
+import sys
+
+import pytest
+
+# Add src to path for imports
+sys.path.insert(0, '.')
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from src.common.blob_store import FilesystemBlobStore, load_capsule_files, store_capsule_files
+from src.common.models import QLCapsule
+
+
+class CountingBlobStore(FilesystemBlobStore):
+    def __init__(self, root):
+        super().__init__(root)
+        self.writes = []
+
+    async def _write(self, digest, data):
+        self.writes.append(digest)
+        await super()._write(digest, data)
+
+
+def make_capsule(source_code, tests=None):
+    return QLCapsule(
+        id="capsule-1",
+        request_id="req-1",
+        manifest={},
+        source_code=source_code,
+        tests=tests or {},
+        documentation="",
+        validation_report=None,
+        deployment_config={},
+        metadata={}
+    )
+
+
+@pytest.mark.asyncio
+async def test_identical_content_is_stored_once(tmp_path):
+    store = CountingBlobStore(tmp_path)
+
+    first = await store.put_files({"a.py": "x = 1\n", "b.py": "x = 1\n"})
+    second = await store.put_files({"c.py": "x = 1\n"})
+
+    assert first["a.py"] == first["b.py"] == second["c.py"]
+    assert len(store.writes) == 1
+    assert len(list(tmp_path.rglob(first["a.py"]))) == 1
+
+
+@pytest.mark.asyncio
+async def test_capsule_files_can_be_read_partially(tmp_path):
+    store = FilesystemBlobStore(tmp_path)
+    manifest = await store_capsule_files(
+        store, {"main.py": "print(1)\n", "util.py": "def f(): ...\n"}, {"test_main.py": "def test(): ...\n"},
+        documentation="# Readme"
+    )
+
+    full = await load_capsule_files(store, manifest)
+    partial = await load_capsule_files(store, manifest, paths=["util.py"], include_documentation=False)
+
+    assert full["tests"] == {"test_main.py": "def test(): ...\n"}
+    assert full["documentation"] == "# Readme"
+    assert partial == {"source_code": {"util.py": "def f(): ...\n"}, "tests": {}, "documentation": ""}
+
+
+@pytest.fixture
+def versioning():
+    pytest.importorskip("aiofiles")
+    from src.orchestrator import capsule_versioning
+    return capsule_versioning
+
+
+@pytest.mark.asyncio
+async def test_versions_store_only_changed_files(tmp_path, versioning):
+    CapsuleVersionManager, ChangeType = versioning.CapsuleVersionManager, versioning.ChangeType
+    store = CountingBlobStore(tmp_path / "blobs")
+    manager = CapsuleVersionManager(tmp_path / "versions", blob_store=store)
+
+    initial = await manager.create_initial_version(make_capsule({"a.py": "a = 1\n", "b.py": "b = 1\n"}))
+    second = await manager.create_version(make_capsule({"a.py": "a = 2\n", "b.py": "b = 1\n"}))
+    third = await manager.create_version(make_capsule({"b.py": "b = 1\n"}))
+
+    assert len(store.writes) == 3
+    assert [(c.path, c.change_type) for c in second.changes] == [("a.py", ChangeType.MODIFIED)]
+    # Compared against the full parent snapshot, not just the files the parent changed
+    assert [(c.path, c.change_type) for c in third.changes] == [("a.py", ChangeType.DELETED)]
+    assert await manager.get_files("capsule-1", initial.version_id) == {"a.py": "a = 1\n", "b.py": "b = 1\n"}
+    assert await manager.get_files("capsule-1", second.version_id, paths=["a.py"]) == {"a.py": "a = 2\n"}
+
+
+@pytest.mark.asyncio
+async def test_history_is_persisted_per_version(tmp_path, versioning):
+    CapsuleVersionManager = versioning.CapsuleVersionManager
+    store = FilesystemBlobStore(tmp_path / "blobs")
+    manager = CapsuleVersionManager(tmp_path / "versions", blob_store=store)
+    initial = await manager.create_initial_version(make_capsule({"a.py": "a = 1\n"}))
+
+    # A fresh manager, like a new API request, continues the existing history
+    reloaded = CapsuleVersionManager(tmp_path / "versions", blob_store=store)
+    second = await reloaded.create_version(make_capsule({"a.py": "a = 2\n"}))
+
+    versions_dir = tmp_path / "versions" / "capsule-1" / "versions"
+    assert sorted(p.stem for p in versions_dir.glob("*.json")) == sorted([initial.version_id, second.version_id])
+    assert second.parent_version == initial.version_id
+    assert (await CapsuleVersionManager(tmp_path / "versions", blob_store=store).get_version("capsule-1")).version_id \
+        == second.version_id
+
+
+@pytest.mark.asyncio
+async def test_legacy_history_is_migrated(tmp_path, versioning):
+    import json
+
+    CapsuleVersionManager = versioning.CapsuleVersionManager
+    store = FilesystemBlobStore(tmp_path / "blobs")
+    storage = tmp_path / "versions"
+    manager = CapsuleVersionManager(storage, blob_store=store)
+    initial = await manager.create_initial_version(make_capsule({"a.py": "a = 1\n"}))
+
+    # Rewrite it as a whole-history file from before per-version storage
+    legacy = {"capsule_id": "capsule-1", "branches": {"main": initial.version_id}, "current_branch": "main",
+              "head": initial.version_id, "versions": [manager._version_to_dict(initial)]}
+    (storage / "capsule-1_history.json").write_text(json.dumps(legacy))
+    for path in (storage / "capsule-1").rglob("*.json"):
+        path.unlink()
+
+    second = await CapsuleVersionManager(storage, blob_store=store).create_version(make_capsule({"a.py": "a = 2\n"}))
+
+    assert not (storage / "capsule-1_history.json").exists()
+    reloaded = CapsuleVersionManager(storage, blob_store=store)
+    history = await reloaded.get_history("capsule-1")
+    assert [v.version_id for v in history] == [second.version_id, initial.version_id]
+    assert await reloaded.get_files("capsule-1", initial.version_id) == {"a.py": "a = 1\n"}
+
+
+@pytest.mark.asyncio
+async def test_merge_moves_the_branch_and_head(tmp_path, versioning):
+    CapsuleVersionManager = versioning.CapsuleVersionManager
+    store = FilesystemBlobStore(tmp_path / "blobs")
+    manager = CapsuleVersionManager(tmp_path / "versions", blob_store=store)
+    initial = await manager.create_initial_version(make_capsule({"a.py": "a = 1\n", "b.py": "b = 1\n"}))
+    await manager.create_branch("capsule-1", "feature")
+    feature = await manager.create_version(make_capsule({"a.py": "a = 2\n", "b.py": "b = 1\n"}), branch="feature")
+    main = await manager.create_version(make_capsule({"a.py": "a = 1\n", "b.py": "b = 2\n"}))
+    assert feature.parent_version == main.parent_version == initial.version_id
+
+    merged = await manager.merge_versions("capsule-1", feature.version_id, main.version_id)
+
+    reloaded = CapsuleVersionManager(tmp_path / "versions", blob_store=store)
+    assert (await reloaded.get_version("capsule-1")).version_id == merged.version_id
+    assert (await reloaded._load_history("capsule-1")).branches == {"main": merged.version_id,
+                                                                    "feature": feature.version_id}
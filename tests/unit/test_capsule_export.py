@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Test streaming capsule archives: formats, byte ranges, the version cache and memory use
+"""
+
+import asyncio
+import io
+import os
+import sys
+import tarfile
+import tracemalloc
+import zipfile
+
+import pytest
+
+# Add src to path for imports
+sys.path.insert(0, '.')
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from src.common.models import QLCapsule
+from src.orchestrator.capsule_export import (
+    CapsuleStreamer, ExportCache, RangeNotSatisfiableError, TarLayout, _tar_entries,
+    _tar_stream, archive_response, parse_byte_range
+)
+
+
+def make_capsule(files=3, size=100):
+    return QLCapsule(
+        id="capsule-1",
+        request_id="req-1",
+        manifest={"name": "Demo"},
+        source_code={f"src/mod_{i}.py": f"# {i}\n" + "x" * size for i in range(files)},
+        tests={"tests/test_mod.py": "def test(): pass\n"},
+        documentation="# Demo ✓\n",
+        created_at="2025-01-01T00:00:00",
+    )
+
+
+async def collect(chunks):
+    return b"".join([chunk async for chunk in chunks])
+
+
+async def response_body(response):
+    return await collect(response.body_iterator)
+
+
+@pytest.mark.asyncio
+async def test_streamed_archives_open_with_the_standard_library():
+    capsule = make_capsule()
+    streamer = CapsuleStreamer()
+
+    with zipfile.ZipFile(io.BytesIO(await collect(streamer.stream_capsule(capsule, "zip", 64)))) as zf:
+        assert zf.read("src/mod_1.py").decode() == capsule.source_code["src/mod_1.py"]
+        assert zf.read("README.md").decode() == capsule.documentation
+
+    data = await collect(streamer.stream_capsule(capsule, "tar.gz", 64))
+    with tarfile.open(fileobj=io.BytesIO(data), mode="r:gz") as tar:
+        assert tar.extractfile("tests/test_mod.py").read() == b"def test(): pass\n"
+
+
+def test_tar_ranges_reassemble_the_archive():
+    capsule = make_capsule(files=5, size=3000)
+    layout = TarLayout(_tar_entries(capsule), chunk_size=1000)
+    whole = b"".join(_tar_stream(layout))
+
+    assert len(whole) == layout.size
+    with tarfile.open(fileobj=io.BytesIO(whole)) as tar:
+        assert tar.extractfile("src/mod_4.py").read().decode() == capsule.source_code["src/mod_4.py"]
+
+    cuts = [0, 1, 511, 512, 4097, 9999, layout.size]
+    parts = [b"".join(_tar_stream(layout, start=a, end=b)) for a, b in zip(cuts, cuts[1:])]
+    assert b"".join(parts) == whole
+    # The same capsule always produces the same bytes, so ETags are stable
+    assert TarLayout(_tar_entries(capsule), chunk_size=77).etag == layout.etag
+
+
+def test_parse_byte_range():
+    assert parse_byte_range("bytes=0-99", 1000) == (0, 100)
+    assert parse_byte_range("bytes=900-", 1000) == (900, 1000)
+    assert parse_byte_range("bytes=-100", 1000) == (900, 1000)
+    assert parse_byte_range("bytes=0-5000", 1000) == (0, 1000)
+    assert parse_byte_range("bytes=0-1,5-6", 1000) is None
+    assert parse_byte_range("items=0-1", 1000) is None
+    with pytest.raises(RangeNotSatisfiableError):
+        parse_byte_range("bytes=1000-", 1000)
+
+
+@pytest.mark.asyncio
+async def test_tar_response_resumes_from_a_range():
+    capsule = make_capsule(size=5000)
+    full = await archive_response(capsule, "tar", "demo.tar")
+    whole = await response_body(full)
+    assert full.headers["accept-ranges"] == "bytes"
+    assert int(full.headers["content-length"]) == len(whole)
+
+    partial = await archive_response(capsule, "tar", "demo.tar", "bytes=1000-", full.headers["etag"])
+    assert partial.status_code == 206
+    assert partial.headers["content-range"] == f"bytes 1000-{len(whole) - 1}/{len(whole)}"
+    assert await response_body(partial) == whole[1000:]
+
+    # A stale If-Range gets the whole archive
+    stale = await archive_response(capsule, "tar", "demo.tar", "bytes=1000-", '"old"')
+    assert stale.status_code == 200
+
+    unsatisfiable = await archive_response(capsule, "tar", "demo.tar", f"bytes={len(whole)}-")
+    assert unsatisfiable.status_code == 416
+
+
+@pytest.mark.asyncio
+async def test_version_archives_are_built_once(tmp_path, monkeypatch):
+    from src.orchestrator import capsule_export
+
+    cache = ExportCache(tmp_path, max_bytes=10 ** 9)
+    monkeypatch.setattr(capsule_export, "export_cache", cache)
+    builds = []
+    build = cache._build
+    monkeypatch.setattr(cache, "_build", lambda *args: builds.append(args) or build(*args))
+    capsule = make_capsule()
+
+    responses = await asyncio.gather(*(
+        archive_response(capsule, "zip", "demo.zip", cache_key="version-1") for _ in range(5)
+    ))
+    bodies = [await response_body(response) for response in responses]
+
+    assert len(builds) == 1
+    assert len(set(bodies)) == 1
+    ranged = await archive_response(capsule, "zip", "demo.zip", "bytes=-10", cache_key="version-1")
+    assert await response_body(ranged) == bodies[0][-10:]
+    assert zipfile.ZipFile(io.BytesIO(bodies[0])).read("src/mod_0.py").startswith(b"# 0")
+
+
+@pytest.mark.asyncio
+async def test_concurrent_downloads_use_bounded_memory():
+    # 100 files of 1MB; streams share the capsule's strings and hold only a few chunks each
+    capsule = make_capsule(files=100, size=1024 * 1024)
+    streamer = CapsuleStreamer()
+
+    async def download():
+        total = 0
+        async for chunk in streamer.stream_capsule(capsule, "tar", 256 * 1024):
+            total += len(chunk)
+        return total
+
+    tracemalloc.start()
+    try:
+        sizes = await asyncio.gather(*(download() for _ in range(20)))
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert len(set(sizes)) == 1 and sizes[0] > 100 * 1024 * 1024
+    # Buffering whole archives would need 20 x 100MB
+    assert peak < 64 * 1024 * 1024
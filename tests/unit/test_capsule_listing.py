@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Test async capsule reads: summary projections, keyset pagination and lazy file loading
+"""
+
+import os
+import sys
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+# Add src to path for imports
+sys.path.insert(0, '.')
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+pytest.importorskip("psycopg2")
+pytest.importorskip("aiosqlite")
+
+from sqlalchemy import event
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.ext.compiler import compiles
+
+from src.common.blob_store import FilesystemBlobStore, store_capsule_files
+from src.common.database import Base, CapsuleModel, CapsuleVersionModel
+from src.common.error_handling import ValidationError
+from src.orchestrator.capsule_storage import AsyncCapsuleStorageService, decode_cursor, encode_cursor
+
+START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+@compiles(UUID, "sqlite")
+def compile_uuid_for_sqlite(type_, compiler, **kw):
+    return "CHAR(32)"
+
+
+async def make_database():
+    """In-memory database and the list of SQL statements run against it"""
+    engine = create_async_engine("sqlite+aiosqlite://")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all,
+                            tables=[CapsuleModel.__table__, CapsuleVersionModel.__table__])
+
+    statements = []
+    event.listen(engine.sync_engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    return engine, async_sessionmaker(engine, expire_on_commit=False), statements
+
+
+async def add_capsules(session_factory, count, tenant_id="tenant-1", **columns):
+    ids = []
+    async with session_factory() as session:
+        for i in range(count):
+            capsule_id = uuid.uuid4()
+            ids.append(str(capsule_id))
+            session.add(CapsuleModel(
+                id=capsule_id, request_id=f"req-{i}", tenant_id=tenant_id, user_id="user-1",
+                manifest={"name": f"Project {i}"}, source_code={"main.py": "x" * 1000}, tests={},
+                deployment_config={}, meta_data={}, file_count=1, status="stored",
+                # Pairs of capsules share a timestamp so the id breaks ties
+                created_at=START + timedelta(minutes=i // 2), updated_at=START,
+                **columns
+            ))
+        await session.commit()
+    return ids
+
+
+def test_cursor_round_trip_and_rejects_garbage():
+    capsule_id = uuid.uuid4()
+
+    assert decode_cursor(encode_cursor(START, capsule_id)) == (START, capsule_id)
+    with pytest.raises(ValidationError):
+        decode_cursor("not-a-cursor")
+
+
+@pytest.mark.asyncio
+async def test_listing_pages_by_keyset_without_loading_files(tmp_path):
+    engine, session_factory, statements = await make_database()
+    try:
+        ids = await add_capsules(session_factory, 7)
+        await add_capsules(session_factory, 3, tenant_id="tenant-2")
+        statements.clear()
+
+        seen, cursor = [], None
+        async with session_factory() as session:
+            storage = AsyncCapsuleStorageService(session, blob_store=FilesystemBlobStore(tmp_path))
+            while True:
+                page = await storage.list_capsules("tenant-1", limit=3, cursor=cursor)
+                seen += [capsule["id"] for capsule in page["capsules"]]
+                cursor = page["next_cursor"]
+                if cursor is None:
+                    break
+    finally:
+        await engine.dispose()
+
+    assert sorted(seen) == sorted(ids) and len(seen) == len(set(seen))
+    created = [ids.index(capsule_id) // 2 for capsule_id in seen]
+    assert created == sorted(created, reverse=True)
+    assert not any("source_code" in statement for statement in statements)
+    # Pages after the first seek past the previous page's last row
+    assert all("capsules.created_at < ?" in statement for statement in statements[1:])
+
+
+@pytest.mark.asyncio
+async def test_files_are_loaded_only_when_asked_for(tmp_path):
+    engine, session_factory, statements = await make_database()
+    store = FilesystemBlobStore(tmp_path)
+    try:
+        manifest = await store_capsule_files(store, {"main.py": "print(1)\n", "util.py": "u = 1\n"}, {})
+        legacy_id, = await add_capsules(session_factory, 1)
+        blob_id, = await add_capsules(session_factory, 1, file_manifest=manifest)
+
+        async with session_factory() as session:
+            storage = AsyncCapsuleStorageService(session, blob_store=store)
+            statements.clear()
+            summary = await storage.get_capsule_summary(blob_id)
+            assert not any("source_code" in statement for statement in statements)
+
+            assert summary["tenant_id"] == "tenant-1" and summary["manifest"] == {"name": "Project 0"}
+            assert await storage.get_capsule_files(blob_id, ["util.py"]) == {"util.py": "u = 1\n"}
+            assert (await storage.get_capsule(legacy_id)).source_code == {"main.py": "x" * 1000}
+    finally:
+        await engine.dispose()
+
+
+def test_user_listing_endpoint_returns_pages(tmp_path):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+
+    from src.common.database import get_db
+    from src.orchestrator.capsule_endpoints import router
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine, tables=[CapsuleModel.__table__, CapsuleVersionModel.__table__])
+    Session = sessionmaker(engine)
+    with Session() as session:
+        for i in range(5):
+            session.add(CapsuleModel(
+                id=uuid.uuid4(), request_id=f"req-{i}", tenant_id="tenant-1", user_id="user-1",
+                manifest={"name": f"Project {i}"}, source_code={}, tests={}, deployment_config={},
+                meta_data={}, file_count=0, status="stored",
+                created_at=START + timedelta(minutes=i), updated_at=START
+            ))
+        session.commit()
+
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[get_db] = lambda: Session()
+    client = TestClient(app)
+
+    first = client.get("/capsules/user/tenant-1/user-1", params={"limit": 3}).json()
+    second = client.get("/capsules/user/tenant-1/user-1",
+                        params={"limit": 3, "cursor": first["next_cursor"]}).json()
+
+    assert first["count"] == 3 and [c["manifest"]["name"] for c in first["capsules"]] == \
+        ["Project 4", "Project 3", "Project 2"]
+    assert second["count"] == 2 and second["next_cursor"] is None
+    assert client.get("/capsules/user/tenant-1/user-1", params={"cursor": "garbage"}).status_code == 400
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Test the sandbox warm container pool with a fake Docker client
+"""
+
+import os
+import subprocess
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+# Add src to path for imports
+sys.path.insert(0, '.')
+
+from src.sandbox.container_pool import (
+    EXEC_UID, EXEC_USER, KILL_COMMAND, RESET_COMMAND, ContainerPool, PoolConfig, reset_script
+)
+
+
+class FakeContainer:
+    def __init__(self, name):
+        self.name = name
+        self.archives = []
+        self.commands = []
+        self.users = []
+        self.removed = False
+        self.reset_exit_code = 0
+
+    def put_archive(self, path, data):
+        self.archives.append((path, data))
+
+    def exec_run(self, cmd, user="", **kwargs):
+        self.commands.append(cmd)
+        self.users.append(user)
+        if cmd == RESET_COMMAND:
+            return SimpleNamespace(exit_code=self.reset_exit_code, output=b"")
+        if cmd[0] != "timeout":
+            return SimpleNamespace(exit_code=0, output=b"")
+        return SimpleNamespace(exit_code=0, output=(b"hello\n", None))
+
+    def remove(self, force=False):
+        self.removed = True
+
+
+class FakeDockerClient:
+    def __init__(self):
+        self.created = []
+        self.containers = SimpleNamespace(run=self._run)
+
+    def _run(self, **kwargs):
+        assert kwargs["network_mode"] == "none"
+        assert kwargs["init"] is True
+        container = FakeContainer(kwargs["name"])
+        self.created.append(container)
+        return container
+
+
+def make_pool(**overrides) -> ContainerPool:
+    config = PoolConfig(languages=["python"], size=2, **overrides)
+    return ContainerPool(FakeDockerClient(), {"python": "python:3.11-slim"}, config)
+
+
+async def drain(pool: ContainerPool):
+    for task in list(pool._background):
+        await task
+
+
+@pytest.mark.asyncio
+async def test_warm_containers_are_reused():
+    pool = make_pool()
+    await pool._fill(pool.config.size)
+
+    pooled = await pool.acquire("python")
+    exit_code, output, error = await pool.run(pooled, {"main.py": "print('hello')"}, ["python", "main.py"], 5)
+    pool.release(pooled)
+    await drain(pool)
+    again = await pool.acquire("python")
+
+    assert (exit_code, output, error) == (0, "hello\n", "")
+    container = pooled.container
+    assert container.commands[1][:4] == ["timeout", "-s", "KILL", "5"]
+    # Callers run unprivileged; on release every process they left is killed as that user,
+    # then the files are removed and the kill is verified as root
+    assert container.commands[2:] == [KILL_COMMAND, RESET_COMMAND]
+    assert container.users[1:] == [EXEC_USER, EXEC_USER, ""]
+    assert again is pooled
+    assert len(pool.client.created) == 2
+    assert pool.get_stats()["hits"] == 2
+
+
+@pytest.mark.asyncio
+async def test_contaminated_and_worn_out_containers_are_discarded():
+    pool = make_pool(max_uses=1)
+
+    pooled = await pool.acquire("python")
+    pool.release(pooled, contaminated=True)
+    worn = await pool.acquire("python")
+    await pool.run(worn, {"main.py": ""}, ["python", "main.py"], 5)
+    pool.release(worn)
+    await drain(pool)
+
+    assert pooled.container.removed and worn.container.removed
+    assert pool.get_stats()["idle"] == {"python": 0}
+    assert pool.get_stats()["contaminated"] == 1
+    assert pool.get_stats()["recycled"] == 1
+
+
+@pytest.mark.asyncio
+async def test_files_belong_to_the_exec_user():
+    import io
+    import tarfile
+
+    pool = make_pool()
+    pooled = await pool.acquire("python")
+    await pool.put_files(pooled, {"src/app/main.py": "print(1)"})
+
+    [(path, data)] = pooled.container.archives
+    with tarfile.open(fileobj=io.BytesIO(data)) as tar:
+        members = {m.name: m for m in tar.getmembers()}
+    assert path == "/app"
+    assert sorted(members) == ["src", "src/app", "src/app/main.py"]
+    assert {m.uid for m in members.values()} == {65534}
+    assert members["src/app"].isdir()
+
+
+@pytest.mark.asyncio
+async def test_failed_reset_discards_container():
+    pool = make_pool()
+    pooled = await pool.acquire("python")
+    pooled.container.reset_exit_code = 1
+
+    pool.release(pooled)
+    await drain(pool)
+
+    assert pooled.container.removed
+    assert pool.get_stats()["idle"] == {"python": 0}
+
+
+@pytest.mark.skipif(os.name != "posix" or os.geteuid() != 0, reason="needs root to own files as the exec user")
+def test_reset_leaves_nothing_of_the_previous_lease(tmp_path):
+    # Files lease A left anywhere it could write, and one that belongs to the image
+    leftovers = ["app/main.py", "app/.env", "tmp/.cache/x", "var/tmp/y", "dev/shm/z", "home/nobody/.history"]
+    for name in leftovers + ["usr/lib/image.so"]:
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("lease A")
+    for name in leftovers + ["app", "tmp/.cache", "home/nobody"]:
+        os.chown(tmp_path / name, EXEC_UID, EXEC_UID)
+
+    result = subprocess.run(["sh", "-c", reset_script(str(tmp_path))])
+
+    assert result.returncode == 0
+    assert not any((tmp_path / name).exists() for name in leftovers)
+    assert not (tmp_path / "home" / "nobody").exists()
+    assert (tmp_path / "app").is_dir()
+    assert (tmp_path / "usr/lib/image.so").exists()
+
+
+def test_only_default_limits_use_the_pool():
+    pool = make_pool()
+
+    assert pool.supports("python", "512m", 1)
+    assert not pool.supports("python", "1g", 1)
+    assert not pool.supports("go", "512m", 1)
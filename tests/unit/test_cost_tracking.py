@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Test buffered LLM cost ingestion and the rollups cost reports read
+"""
+
+import asyncio
+import os
+import sys
+from datetime import datetime, timezone
+
+import pytest
+
+# Add src to path for imports
+sys.path.insert(0, '.')
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+pytest.importorskip("asyncpg")
+pytest.importorskip("aiosqlite")
+
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.common.cost_calculator_persistent import PersistentCostCalculator
+
+# SQLite stand-ins for migrations 003 and 007
+SCHEMA = [
+    """CREATE TABLE llm_usage (
+        id INTEGER PRIMARY KEY, workflow_id TEXT, tenant_id TEXT NOT NULL, user_id TEXT, task_id TEXT,
+        provider TEXT NOT NULL, model TEXT NOT NULL, input_tokens INTEGER NOT NULL, output_tokens INTEGER NOT NULL,
+        input_cost_usd NUMERIC NOT NULL, output_cost_usd NUMERIC NOT NULL, latency_ms INTEGER,
+        metadata TEXT, created_at TIMESTAMP)""",
+    """CREATE TABLE llm_cost_workflow_rollups (
+        workflow_id TEXT, provider TEXT, model TEXT, tenant_id TEXT, request_count INTEGER,
+        input_tokens INTEGER, output_tokens INTEGER, cost_usd NUMERIC, first_request TIMESTAMP,
+        last_request TIMESTAMP, PRIMARY KEY (workflow_id, provider, model))""",
+    """CREATE TABLE llm_cost_tenant_daily_rollups (
+        tenant_id TEXT, usage_date DATE, request_count INTEGER, input_tokens INTEGER,
+        output_tokens INTEGER, cost_usd NUMERIC, PRIMARY KEY (tenant_id, usage_date))""",
+    """CREATE TABLE llm_cost_model_daily_rollups (
+        usage_date DATE, provider TEXT, model TEXT, request_count INTEGER, input_tokens INTEGER,
+        output_tokens INTEGER, cost_usd NUMERIC, PRIMARY KEY (usage_date, provider, model))""",
+]
+
+
+async def make_calculator(tmp_path, **options):
+    calculator = PersistentCostCalculator(f"sqlite+aiosqlite:///{tmp_path}/costs.db")
+    for name, value in options.items():
+        setattr(calculator, name, value)
+    async with calculator.engine.begin() as conn:
+        for statement in SCHEMA:
+            await conn.execute(text(statement))
+    statements = []
+    event.listen(calculator.engine.sync_engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    return calculator, statements
+
+
+async def track(calculator, i):
+    return await calculator.track_llm_cost_async(
+        model="gpt-4-turbo" if i % 3 else "gpt-3.5-turbo", provider="azure_openai",
+        prompt_tokens=100 + i, completion_tokens=50, workflow_id=f"wf-{i % 4}", tenant_id=f"tenant-{i % 2}",
+    )
+
+
+@pytest.mark.asyncio
+async def test_usage_is_written_in_batches_with_matching_rollups(tmp_path):
+    calculator, statements = await make_calculator(tmp_path, flush_batch_size=500, flush_interval=60)
+    try:
+        costs = [await track(calculator, i) for i in range(1200)]
+        await calculator.flush()
+
+        inserts = [s for s in statements if s.startswith("INSERT INTO llm_usage")]
+        # 1200 rows in a handful of statements instead of one each
+        assert 2 <= len(inserts) <= 4
+
+        async with calculator.get_db() as session:
+            assert (await session.execute(text("SELECT COUNT(*) FROM llm_usage"))).scalar() == 1200
+        statements.clear()
+        report = await calculator.get_workflow_cost("wf-1")
+        assert not any("FROM llm_usage" in s for s in statements)
+
+        expected = [c for i, c in enumerate(costs) if i % 4 == 1]
+        assert report["total_requests"] == len(expected)
+        assert report["total_input_tokens"] == sum(c["input_tokens"] for c in expected)
+        assert report["total_cost_usd"] == pytest.approx(sum(c["total_cost_usd"] for c in expected))
+        assert set(report["model_breakdown"]) == {"azure_openai/gpt-4-turbo", "azure_openai/gpt-3.5-turbo"}
+
+        tenant = await calculator.get_tenant_costs("tenant-0")
+        assert tenant["total_requests"] == 600
+        assert tenant["total_cost_usd"] == pytest.approx(sum(c["total_cost_usd"] for c in costs[::2]))
+        assert list(tenant["daily_breakdown"]) == [datetime.now(timezone.utc).date().isoformat()]
+
+        models = await calculator.get_model_costs()
+        assert sum(m["count"] for m in models["models"].values()) == 1200
+    finally:
+        await calculator.close()
+
+
+@pytest.mark.asyncio
+async def test_flushes_on_interval_and_on_close(tmp_path):
+    calculator, statements = await make_calculator(tmp_path, flush_batch_size=1000, flush_interval=0.1)
+    try:
+        await track(calculator, 0)
+        await asyncio.sleep(0.3)
+        assert calculator._buffer == []
+
+        calculator.flush_interval = 60
+        calculator._flusher.cancel()
+        await asyncio.gather(calculator._flusher, return_exceptions=True)
+        for i in range(5):
+            await track(calculator, i)
+        assert len(calculator._buffer) == 5
+    finally:
+        await calculator.close()
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/costs.db")
+    try:
+        async with engine.connect() as conn:
+            assert (await conn.execute(text("SELECT COUNT(*) FROM llm_usage"))).scalar() == 6
+            rollup = (await conn.execute(text(
+                "SELECT SUM(request_count) FROM llm_cost_tenant_daily_rollups"))).scalar()
+            assert rollup == 6
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_keeps_rows_for_the_next_one(tmp_path):
+    calculator, _ = await make_calculator(tmp_path, flush_interval=60, max_buffer_rows=3)
+    try:
+        async with calculator.engine.begin() as conn:
+            await conn.execute(text("ALTER TABLE llm_usage RENAME TO llm_usage_offline"))
+        for i in range(2):
+            await track(calculator, i)
+        assert await calculator.flush() == 0
+        assert len(calculator._buffer) == 2
+
+        # Beyond max_buffer_rows the oldest rows are dropped
+        for i in range(2, 4):
+            await track(calculator, i)
+        assert len(calculator._buffer) == 3 and calculator.dropped_rows == 1
+
+        async with calculator.engine.begin() as conn:
+            await conn.execute(text("ALTER TABLE llm_usage_offline RENAME TO llm_usage"))
+        assert await calculator.flush() == 3
+        report = await calculator.get_workflow_cost("wf-3")
+        assert report["total_requests"] == 1
+    finally:
+        await calculator.close()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Test content-addressed dependency layers for runtime validation with a fake Docker client
+"""
+
+import asyncio
+import sys
+import threading
+from types import SimpleNamespace
+
+import docker
+import pytest
+
+# Add src to path for imports
+sys.path.insert(0, '.')
+
+from src.validation.dependency_layers import DependencyLayerCache, normalize_manifest
+
+
+class FakeContainer:
+    def __init__(self, client, image, command, exit_code):
+        self.client = client
+        self.image = image
+        self.command = command
+        self.exit_code = exit_code
+        self.archives = []
+        self.removed = False
+
+    def put_archive(self, path, data):
+        self.archives.append((path, data))
+
+    def start(self):
+        pass
+
+    def wait(self, timeout=None):
+        # Give concurrent lookups a chance to race the build
+        import time
+        with self.client.lock:
+            self.client.running += 1
+            self.client.max_running = max(self.client.max_running, self.client.running)
+        time.sleep(0.05)
+        with self.client.lock:
+            self.client.running -= 1
+        return {"StatusCode": self.exit_code}
+
+    def logs(self, stdout=True, stderr=False):
+        return b"installed\n" if stdout else b""
+
+    def commit(self, repository, tag, conf=None):
+        self.client.images_built[f"{repository}:{tag}"] = conf
+
+    def remove(self, force=False):
+        self.removed = True
+
+
+class FakeDockerClient:
+    def __init__(self, exit_code=0):
+        self.exit_code = exit_code
+        self.images_built = {}
+        self.builds = []
+        self.lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+        self.containers = SimpleNamespace(create=self._create)
+        self.images = SimpleNamespace(get=self._get_image, list=lambda filters=None: [], remove=None)
+
+    def _create(self, image, command, **kwargs):
+        container = FakeContainer(self, image, command, self.exit_code)
+        self.builds.append(container)
+        return container
+
+    def _get_image(self, name):
+        if name not in self.images_built:
+            raise docker.errors.ImageNotFound(name)
+        return SimpleNamespace(id=name)
+
+
+def write_capsule(tmp_path, name, files):
+    path = tmp_path / name
+    path.mkdir()
+    for filename, content in files.items():
+        (path / filename).write_text(content)
+    return path
+
+
+def test_requirements_normalization_ignores_order_case_and_comments():
+    assert normalize_manifest("requirements.txt", "# deps\nRequests==2.31\nflask>=2  # web\n") == \
+        normalize_manifest("requirements.txt", "Flask>=2\n\nrequests==2.31\n")
+    assert normalize_manifest("requirements.txt", "-e .\n") is None
+    assert normalize_manifest("package.json", '{"scripts": {"postinstall": "node setup.js"}}') is None
+
+
+@pytest.mark.asyncio
+async def test_capsules_with_the_same_manifest_share_one_layer(tmp_path):
+    client = FakeDockerClient()
+    cache = DependencyLayerCache(client)
+    first = write_capsule(tmp_path, "a", {"requirements.txt": "requests==2.31\nflask>=2\n", "main.py": "a"})
+    second = write_capsule(tmp_path, "b", {"requirements.txt": "flask>=2\nrequests==2.31\n", "main.py": "b"})
+
+    cold, concurrent = await asyncio.gather(
+        cache.get_layer("python", "python:3.11-slim", "pip install -r requirements.txt", first),
+        cache.get_layer("python", "python:3.11-slim", "pip install -r requirements.txt", second),
+    )
+    warm = await cache.get_layer("python", "python:3.11-slim", "pip install -r requirements.txt", second)
+
+    assert len(client.builds) == 1
+    assert client.builds[0].removed
+    assert not cold.cache_hit and cold.install_success
+    assert concurrent.cache_hit and warm.cache_hit
+    assert cold.image == warm.image and cold.image.startswith("qlp-deps/python:")
+    assert cache.get_stats()["hits"] == 2
+
+
+@pytest.mark.asyncio
+async def test_failed_install_is_not_cached(tmp_path):
+    client = FakeDockerClient(exit_code=1)
+    cache = DependencyLayerCache(client)
+    capsule = write_capsule(tmp_path, "a", {"requirements.txt": "does-not-exist==0\n"})
+
+    layer = await cache.get_layer("python", "python:3.11-slim", "pip install -r requirements.txt", capsule)
+
+    assert not layer.install_success
+    assert layer.image == "python:3.11-slim"
+    assert not client.images_built
+
+
+@pytest.mark.asyncio
+async def test_failed_install_retries_never_build_concurrently(tmp_path):
+    client = FakeDockerClient(exit_code=1)
+    cache = DependencyLayerCache(client)
+    capsule = write_capsule(tmp_path, "a", {"requirements.txt": "does-not-exist==0\n"})
+
+    async def late_lookup():
+        # Arrives while the second caller retries the failed build
+        await asyncio.sleep(0.07)
+        return await cache.get_layer("python", "python:3.11-slim", "pip install -r requirements.txt", capsule)
+
+    layers = await asyncio.gather(
+        cache.get_layer("python", "python:3.11-slim", "pip install -r requirements.txt", capsule),
+        cache.get_layer("python", "python:3.11-slim", "pip install -r requirements.txt", capsule),
+        late_lookup(),
+    )
+
+    assert not any(layer.install_success for layer in layers)
+    assert len(client.builds) == 3
+    assert client.max_running == 1
+    assert not cache._building
+
+
+@pytest.mark.asyncio
+async def test_uncacheable_and_unsupported_capsules_install_cold(tmp_path):
+    cache = DependencyLayerCache(FakeDockerClient())
+    editable = write_capsule(tmp_path, "a", {"requirements.txt": "-e .\n"})
+    empty = write_capsule(tmp_path, "b", {"main.py": "print(1)"})
+
+    assert await cache.get_layer("python", "python:3.11-slim", "pip install -r requirements.txt", editable) is None
+    assert await cache.get_layer("rust", "rust:1.70-slim", "cargo build", editable) is None
+    layer = await cache.get_layer("python", "python:3.11-slim", "pip install -r requirements.txt", empty)
+    assert layer.image == "python:3.11-slim" and layer.install_success
+
+
+def test_node_layers_link_node_modules_into_the_workspace():
+    from src.validation.dependency_layers import DependencyLayer
+
+    layer = DependencyLayer(image="qlp-deps/nodejs:abc", key="abc", cache_hit=True, install_success=True,
+                            install_time=0.1, linked_dirs=("node_modules",))
+
+    assert layer.wrap_command("npm test") == "sh -c 'ln -sfn /deps/node_modules node_modules && npm test'"
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Test the embedding cache and micro-batcher used by the vector memory service
+"""
+
+import asyncio
+import sys
+
+import pytest
+
+# Add src to path for imports
+sys.path.insert(0, '.')
+
+from src.memory.embedding_cache import EmbeddingBatcher, EmbeddingCache
+
+
+class FakeEmbeddings:
+    """Records each embeddings request and returns deterministic vectors"""
+
+    def __init__(self):
+        self.calls = []
+
+    async def __call__(self, texts):
+        self.calls.append(list(texts))
+        await asyncio.sleep(0)
+        return [[float(len(t)), 1.0] for t in texts]
+
+
+@pytest.mark.asyncio
+async def test_lru_evicts_least_recently_used():
+    cache = EmbeddingCache(model="test", max_entries=2)
+    await cache.put_many({"a": [1.0], "b": [2.0]})
+    await cache.get_many(["a"])
+    await cache.put_many({"c": [3.0]})
+
+    found = await cache.get_many(["a", "b", "c"])
+
+    assert set(found) == {"a", "c"}
+    assert cache.get_stats()["evictions"] == 1
+
+
+@pytest.mark.asyncio
+async def test_expired_entries_are_misses():
+    cache = EmbeddingCache(model="test", ttl_seconds=-1)
+    await cache.put_many({"a": [1.0]})
+
+    assert await cache.get_many(["a"]) == {}
+    assert cache.get_stats()["misses"] == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_embeds_share_one_request():
+    fake = FakeEmbeddings()
+    batcher = EmbeddingBatcher(fake, max_batch_size=64, max_wait_ms=5)
+
+    vectors = await asyncio.gather(*(batcher.embed(t) for t in ["x", "yy", "x", "zzz"]))
+
+    assert fake.calls == [["x", "yy", "zzz"]]
+    assert vectors == [[1.0, 1.0], [2.0, 1.0], [1.0, 1.0], [3.0, 1.0]]
+
+
+@pytest.mark.asyncio
+async def test_full_batch_flushes_without_waiting():
+    fake = FakeEmbeddings()
+    batcher = EmbeddingBatcher(fake, max_batch_size=2, max_wait_ms=10_000)
+
+    await asyncio.wait_for(asyncio.gather(batcher.embed("a"), batcher.embed("b")), timeout=1)
+
+    assert fake.calls == [["a", "b"]]
+
+
+@pytest.mark.asyncio
+async def test_embed_many_chunks_by_size_and_characters():
+    fake = FakeEmbeddings()
+    batcher = EmbeddingBatcher(fake, max_batch_size=3, max_batch_chars=10)
+
+    vectors = await batcher.embed_many(["aaaa", "bbbb", "cccc", "d", "e", "f", "g"])
+
+    assert fake.calls == [["aaaa", "bbbb"], ["cccc", "d", "e"], ["f", "g"]]
+    assert len(vectors) == 7
+    assert batcher.get_stats()["requests_sent"] == 3
+
+
+@pytest.mark.asyncio
+async def test_batch_errors_propagate_to_every_waiter():
+    async def failing(texts):
+        raise RuntimeError("quota exceeded")
+
+    batcher = EmbeddingBatcher(failing, max_wait_ms=1)
+    results = await asyncio.gather(batcher.embed("a"), batcher.embed("b"), return_exceptions=True)
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+@pytest.mark.asyncio
+async def test_batches_in_flight_are_held_until_done():
+    release = asyncio.Event()
+
+    async def slow(texts):
+        await release.wait()
+        return [[1.0] for _ in texts]
+
+    batcher = EmbeddingBatcher(slow, max_batch_size=1)
+    pending = asyncio.ensure_future(batcher.embed("a"))
+    await asyncio.sleep(0)
+
+    assert len(batcher._batches) == 1
+    release.set()
+    assert await pending == [1.0]
+    await asyncio.sleep(0)
+    assert not batcher._batches
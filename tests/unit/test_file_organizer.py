@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Test rule-based, cached and concurrent file organization for capsules
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+from temporalio.testing import ActivityEnvironment
+
+# Add src to path for imports
+sys.path.insert(0, '.')
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from src.orchestrator import intelligent_file_organizer
+from src.orchestrator.intelligent_file_organizer import (
+    FileAnalysis, FileType, OrganizationCache, organize_code_intelligently, organize_with_rules,
+    python_module_imports
+)
+
+PROJECT = {'language': 'python', 'architecture_pattern': 'layered'}
+
+MODULE = '''
+def add(a, b):
+    return a + b
+'''
+
+TESTS = '''
+import pytest
+from calculator import add
+
+@pytest.fixture
+def numbers():
+    return 1, 2
+
+def test_add(numbers):
+    assert add(*numbers) == 3
+'''
+
+MIXED = MODULE + '''
+def test_add():
+    assert add(1, 2) == 3
+'''
+
+
+class FakeOrganizer:
+    def __init__(self, fallback=False, delay=0.0):
+        self.calls = 0
+        self.fallback = fallback
+        self.delay = delay
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def analyze_and_organize_code(self, code, task_context, project_context):
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.delay)
+        self.in_flight -= 1
+        return FileAnalysis(
+            file_type=FileType.MIXED,
+            primary_purpose="split",
+            contains_tests=True,
+            contains_implementation=True,
+            contains_documentation=False,
+            suggested_files=[
+                {"filename": "calculator.py", "content": MODULE, "file_type": "source"},
+                {"filename": "test_calculator.py", "content": "def test_add(): ...", "file_type": "test"},
+            ],
+            language_insights={},
+            confidence=0.9,
+            fallback=self.fallback
+        )
+
+
+@pytest.fixture
+def organizer(monkeypatch):
+    fake = FakeOrganizer()
+    monkeypatch.setattr(intelligent_file_organizer, "_get_organizer", lambda: fake)
+    monkeypatch.setattr(intelligent_file_organizer, "organization_cache", OrganizationCache())
+    return fake
+
+
+def test_rules_handle_plain_modules_and_tests():
+    project = {**PROJECT, 'python_imports': python_module_imports([MODULE, TESTS])}
+    source = organize_with_rules(MODULE, {'task_id': 'T-1', 'type': 'code_generation', 'language': 'python'}, project)
+    tests = organize_with_rules("```python\n" + TESTS + "```", {'task_id': 'calc', 'type': 'test_creation'}, project)
+
+    # Named after the module the tests import, not the task
+    assert source['source_files'] == {"calculator.py": MODULE}
+    assert list(tests['test_files']) == ["test_calc.py"]
+    assert tests['test_files']["test_calc.py"].strip() == TESTS.strip()
+    assert not tests['source_files']
+
+
+def test_module_imports_cover_both_import_styles():
+    code = "import os\nimport shapes.circle as circle\nfrom .util import x\n" \
+           "from store import save, load\nprint(circle.area(1), os.sep)\n"
+
+    assert python_module_imports([code, "def broken(:"]) == {
+        "shapes.circle": ["area"], "store": ["load", "save"]
+    }
+    project = {**PROJECT, 'python_imports': python_module_imports([code])}
+    area = organize_with_rules("def area(r):\n    return 3.14 * r * r\n", {'language': 'python'}, project)
+    assert area['source_files'] == {"shapes/circle.py": "def area(r):\n    return 3.14 * r * r\n"}
+
+
+@pytest.mark.parametrize("code,task_context", [
+    (MIXED, {'type': 'code_generation', 'language': 'python'}),
+    # Nothing imports it, so there is no name the tests would find
+    (MODULE, {'type': 'code_generation', 'language': 'python'}),
+    (MODULE, {'type': 'test_creation', 'language': 'python'}),
+    ("def broken(:\n", {'language': 'python'}),
+    ("function add(a, b) { return a + b }", {'language': 'javascript'}),
+])
+def test_ambiguous_outputs_are_left_to_the_llm(code, task_context):
+    assert organize_with_rules(code, task_context, PROJECT) is None
+
+
+@pytest.mark.asyncio
+async def test_llm_organization_is_cached_by_content(organizer):
+    task_context = {'task_id': 'T-2', 'type': 'code_generation', 'language': 'python'}
+
+    first = await organize_code_intelligently(MIXED, task_context, PROJECT)
+    second = await organize_code_intelligently(MIXED, {**task_context, 'task_id': 'T-9'}, PROJECT)
+
+    assert organizer.calls == 1
+    assert (first['method'], second['method']) == ("llm", "cache")
+    assert second['test_files'] == first['test_files'] == {"test_calculator.py": "def test_add(): ..."}
+
+
+@pytest.mark.asyncio
+async def test_fallback_organization_is_not_cached(organizer):
+    organizer.fallback = True
+    await organize_code_intelligently(MIXED, {'language': 'python'}, PROJECT)
+    await organize_code_intelligently(MIXED, {'language': 'python'}, PROJECT)
+
+    assert organizer.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_task_outputs_are_organized_concurrently(organizer, monkeypatch):
+    from src.common.config import settings
+    from src.orchestrator.worker_production import _organize_task_outputs
+
+    monkeypatch.setattr(settings, "FILE_ORGANIZER_CONCURRENCY", 3)
+    organizer.delay = 0.05
+    tasks = [{'task_id': f'T-{i}', 'type': 'code_generation'} for i in range(9)]
+    results = [
+        {"status": "completed", "output": {"code": MIXED + f"\nVALUE = {i}\n", "language": "python"}}
+        for i in range(6)
+    ] + [
+        {"status": "completed", "output": {"code": MODULE, "language": "python"}},
+        {"status": "completed", "output": {"code": TESTS, "language": "python"}},
+        {"status": "failed"},
+    ]
+
+    organized = await ActivityEnvironment().run(_organize_task_outputs, tasks, results, PROJECT)
+
+    assert sorted(organized) == list(range(8))
+    assert organized[6]['method'] == "rules"
+    assert organized[6]['source_files'] == {"calculator.py": MODULE}
+    assert organizer.calls == 6
+    assert organizer.max_in_flight == 3
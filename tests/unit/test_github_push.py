@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Test pushing capsules with the Git Data API against a local stand-in for GitHub
+"""
+
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import sys
+import time
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+# Add src to path for imports
+sys.path.insert(0, '.')
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from src.common.models import QLCapsule
+from src.orchestrator.github_integration_v2 import GitHubIntegrationV2, git_blob_sha
+
+LATENCY = 0.02
+
+
+class FakeGitHub:
+    """Just enough of the GitHub REST API for one user's repositories"""
+
+    def __init__(self, rate_limit_first_blob=False):
+        self.blobs, self.trees, self.commits, self.refs = {}, {}, {}, {}
+        self.repos = {}
+        self.calls = []
+        self.in_flight = self.max_in_flight = 0
+        self.rate_limit_next_blob = rate_limit_first_blob
+
+        self.app = web.Application(middlewares=[self.track])
+        self.app.router.add_get("/user", self.user)
+        self.app.router.add_post("/user/repos", self.create_repo)
+        self.app.router.add_get("/repos/{owner}/{repo}", self.get_repo)
+        self.app.router.add_put("/repos/{owner}/{repo}/contents/{path:.+}", self.put_contents)
+        self.app.router.add_post("/repos/{owner}/{repo}/git/blobs", self.create_blob)
+        self.app.router.add_post("/repos/{owner}/{repo}/git/trees", self.create_tree)
+        self.app.router.add_get("/repos/{owner}/{repo}/git/trees/{sha}", self.get_tree)
+        self.app.router.add_post("/repos/{owner}/{repo}/git/commits", self.create_commit)
+        self.app.router.add_get("/repos/{owner}/{repo}/git/commits/{sha}", self.get_commit)
+        self.app.router.add_get("/repos/{owner}/{repo}/git/ref/heads/{branch}", self.get_ref)
+        self.app.router.add_post("/repos/{owner}/{repo}/git/refs", self.create_ref)
+        self.app.router.add_patch("/repos/{owner}/{repo}/git/refs/heads/{branch}", self.update_ref)
+
+    @web.middleware
+    async def track(self, request, handler):
+        self.calls.append((request.method, request.path))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(LATENCY)
+            return await handler(request)
+        finally:
+            self.in_flight -= 1
+
+    def count(self, method, suffix):
+        return sum(1 for m, path in self.calls if m == method and path.endswith(suffix))
+
+    def _repo_json(self, name):
+        return {
+            "name": name, "full_name": f"octo/{name}", "owner": {"login": "octo"}, "private": False,
+            "html_url": f"https://github.test/octo/{name}", "clone_url": "", "ssh_url": "",
+            "default_branch": "main",
+        }
+
+    def _add_blob(self, content: bytes) -> str:
+        sha = hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+        self.blobs[sha] = content
+        return sha
+
+    def _add_tree(self, entries) -> str:
+        sha = hashlib.sha1(json.dumps(sorted(entries.items())).encode()).hexdigest()
+        self.trees[sha] = entries
+        return sha
+
+    def _add_commit(self, tree, parents) -> str:
+        sha = hashlib.sha1(json.dumps([tree, parents, len(self.commits)]).encode()).hexdigest()
+        self.commits[sha] = {"tree": tree, "parents": parents}
+        return sha
+
+    def files(self, ref="main"):
+        tree = self.trees[self.commits[self.refs[ref]]["tree"]]
+        return {path: self.blobs[sha].decode() for path, sha in tree.items()}
+
+    async def user(self, request):
+        return web.json_response({"login": "octo"})
+
+    async def create_repo(self, request):
+        name = (await request.json())["name"]
+        if name in self.repos:
+            return web.json_response({"message": "name already exists on this account"}, status=422)
+        self.repos[name] = self._repo_json(name)
+        return web.json_response(self.repos[name], status=201)
+
+    async def get_repo(self, request):
+        return web.json_response(self.repos[request.match_info["repo"]])
+
+    async def put_contents(self, request):
+        body = await request.json()
+        if body["branch"] in self.refs:
+            return web.json_response({"message": "sha wasn't supplied"}, status=422)
+        sha = self._add_blob(base64.b64decode(body["content"]))
+        tree = self._add_tree({request.match_info["path"]: sha})
+        self.refs[body["branch"]] = self._add_commit(tree, [])
+        return web.json_response({"commit": {"sha": self.refs[body["branch"]]}}, status=201)
+
+    async def create_blob(self, request):
+        if self.rate_limit_next_blob:
+            self.rate_limit_next_blob = False
+            return web.json_response({"message": "You have exceeded a secondary rate limit"},
+                                     status=403, headers={"Retry-After": "1"})
+        body = await request.json()
+        return web.json_response({"sha": self._add_blob(body["content"].encode())}, status=201)
+
+    async def create_tree(self, request):
+        entries = {}
+        for entry in (await request.json())["tree"]:
+            if "content" in entry:
+                entries[entry["path"]] = self._add_blob(entry["content"].encode())
+            elif entry["sha"] in self.blobs:
+                entries[entry["path"]] = entry["sha"]
+            else:
+                return web.json_response({"message": "BadObjectState"}, status=422)
+        return web.json_response({"sha": self._add_tree(entries)}, status=201)
+
+    async def get_tree(self, request):
+        tree = self.trees[request.match_info["sha"]]
+        return web.json_response({"tree": [{"path": p, "type": "blob", "sha": s} for p, s in tree.items()]})
+
+    async def create_commit(self, request):
+        body = await request.json()
+        return web.json_response({"sha": self._add_commit(body["tree"], body["parents"])}, status=201)
+
+    async def get_commit(self, request):
+        commit = self.commits[request.match_info["sha"]]
+        return web.json_response({"sha": request.match_info["sha"], "tree": {"sha": commit["tree"]}})
+
+    async def get_ref(self, request):
+        if not self.refs:
+            return web.json_response({"message": "Git Repository is empty."}, status=409)
+        branch = request.match_info["branch"]
+        if branch not in self.refs:
+            return web.json_response({"message": "Not Found"}, status=404)
+        return web.json_response({"object": {"sha": self.refs[branch]}})
+
+    async def create_ref(self, request):
+        body = await request.json()
+        branch = body["ref"].rsplit("/", 1)[-1]
+        if branch in self.refs:
+            return web.json_response({"message": "Reference already exists"}, status=422)
+        self.refs[branch] = body["sha"]
+        return web.json_response({}, status=201)
+
+    async def update_ref(self, request):
+        body = await request.json()
+        branch = request.match_info["branch"]
+        if self.refs[branch] not in self.commits[body["sha"]]["parents"]:
+            return web.json_response({"message": "Update is not a fast forward"}, status=422)
+        self.refs[branch] = body["sha"]
+        return web.json_response({})
+
+
+def make_capsule(files=150):
+    # A mix of small files and a few large ones, two of them identical
+    source = {f"src/module_{i}.py": f"def f{i}():\n    return {i}\n" for i in range(files - 4)}
+    large = "x = 1\n" * 10000
+    source.update({"assets/a.txt": large, "assets/b.txt": large,
+                   "assets/c.txt": large + "#c\n", "assets/d.txt": large + "#d\n"})
+    return QLCapsule(id="capsule-1", request_id="req-1", manifest={"name": "Enterprise App"},
+                     source_code=source, tests={}, documentation="# Enterprise App\n")
+
+
+async def push(server, capsule):
+    github = GitHubIntegrationV2("test-token")
+    github.api_base = str(server.make_url("")).rstrip("/")
+    return await github.push_capsule_atomic(capsule)
+
+
+@pytest.mark.asyncio
+async def test_push_creates_one_commit_with_parallel_uploads():
+    fake = FakeGitHub()
+    capsule = make_capsule()
+    async with TestServer(fake.app) as server:
+        start = time.perf_counter()
+        result = await push(server, capsule)
+        elapsed = time.perf_counter() - start
+
+    files = fake.files()
+    assert files["src/module_7.py"] == capsule.source_code["src/module_7.py"]
+    assert files["assets/d.txt"] == capsule.source_code["assets/d.txt"]
+    assert result["commit_sha"] == fake.refs["main"] and result["files_created"] == len(files)
+    # Only large files are uploaded as blobs, identical ones once, and in parallel
+    assert fake.count("POST", "/git/blobs") == 3
+    assert fake.max_in_flight > 1
+    assert fake.count("POST", "/git/commits") == 1
+    # One request per file would take at least len(files) round trips
+    assert elapsed < len(files) * LATENCY / 3
+
+
+@pytest.mark.asyncio
+async def test_repush_skips_unchanged_files():
+    fake = FakeGitHub()
+    capsule = make_capsule()
+    async with TestServer(fake.app) as server:
+        first = await push(server, capsule)
+        fake.calls.clear()
+        again = await push(server, capsule)
+        assert again["commit_sha"] == first["commit_sha"]
+        assert fake.count("POST", "/git/blobs") == 0 and fake.count("POST", "/git/commits") == 0
+
+        capsule.source_code["assets/c.txt"] += "# changed\n"
+        fake.calls.clear()
+        changed = await push(server, capsule)
+
+    assert fake.count("POST", "/git/blobs") == 1
+    assert fake.commits[changed["commit_sha"]]["parents"] == [first["commit_sha"]]
+    assert fake.files()["assets/c.txt"].endswith("# changed\n")
+
+
+@pytest.mark.asyncio
+async def test_blob_upload_waits_out_rate_limits():
+    fake = FakeGitHub(rate_limit_first_blob=True)
+    capsule = make_capsule(files=20)
+    async with TestServer(fake.app) as server:
+        await push(server, capsule)
+
+    assert fake.count("POST", "/git/blobs") == 4
+    assert fake.files()["assets/a.txt"] == capsule.source_code["assets/a.txt"]
+
+
+def test_git_blob_sha_matches_git():
+    # `printf 'hello\n' | git hash-object --stdin`
+    assert git_blob_sha("hello\n") == "ce013625030ba8dba906f756967f9e9ca394464a"
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Test the single-pass HAP rule matcher, batch checks and screening reuse
+"""
+
+import os
+import sys
+
+import pytest
+
+# Add src to path for imports
+sys.path.insert(0, '.')
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from src.moderation.hap_service import (
+    HAPService, HAPCheckRequest, HAPCheckResult, Category, CheckContext, Severity,
+    check_content, scan_rules, screening_record, RULES
+)
+
+
+async def rule_check(service, content):
+    return await service._rule_based_check(service._normalize_text(content), content)
+
+
+def counting_service():
+    service = HAPService()
+    service.screened = []
+    rule_based_check = service._rule_based_check
+
+    async def counted(normalized, original):
+        service.screened.append(original)
+        return await rule_based_check(normalized, original)
+
+    service._rule_based_check = counted
+    return service
+
+
+def test_one_scan_reports_every_rule_including_overlaps():
+    hits = scan_rules("they said self-harm, then kill the idiot; kill again")
+    categories = {RULES[index][0] for index in hits}
+
+    # 'harm' inside 'self-harm' is still an abuse hit
+    assert categories == {Category.SELF_HARM, Category.ABUSE, Category.PROFANITY}
+    assert sorted(hits.values()) == ["harm", "idiot", "self-harm"]
+
+
+@pytest.mark.asyncio
+async def test_rule_check_scores_like_per_pattern_matching():
+    service = HAPService()
+
+    threat = await rule_check(service, "I will kill you")
+    assert threat.severity == Severity.HIGH and threat.categories == [Category.ABUSE]
+
+    # Leetspeak only matches after normalization, shouting only in the original
+    assert (await rule_check(service, "go d13 now")).categories == [Category.ABUSE]
+    assert (await rule_check(service, "KILL")).severity == Severity.HIGH
+
+    technical = await rule_check(service, "kill -9 12345")
+    assert technical.severity == Severity.LOW
+    assert "technical context: 'kill'" in technical.explanation
+
+    profane = await rule_check(service, "well damn, that is crap")
+    assert profane.categories == [Category.PROFANITY] and profane.severity == Severity.LOW
+
+    clean = await rule_check(service, "Build a todo app with a REST API")
+    assert clean.result == "clean" and clean.explanation is None
+
+
+@pytest.mark.asyncio
+async def test_batch_screens_identical_content_once():
+    service = counting_service()
+    contents = ["def main():\n    pass\n", "Go harm yourself", "def main():\n    pass\n", "# Readme\n"]
+
+    results = await service.check_content_batch([
+        HAPCheckRequest(content=content, context=CheckContext.CAPSULE_CONTENT) for content in contents
+    ])
+
+    assert [r.severity for r in results] == [Severity.CLEAN, Severity.HIGH, Severity.CLEAN, Severity.CLEAN]
+    assert len(service.screened) == 3
+
+    # Later checks of the same content are answered from memory
+    again = await service.check_content(HAPCheckRequest(content="Go harm yourself"))
+    assert again.severity == Severity.HIGH and len(service.screened) == 3
+
+
+@pytest.mark.asyncio
+async def test_memo_is_bounded():
+    service = counting_service()
+    service.memo_size = 2
+    for content in ("one", "two", "three", "one"):
+        await service.check_content(HAPCheckRequest(content=content))
+
+    assert service.screened == ["one", "two", "three", "one"]
+    assert len(service._memo) == 2
+
+
+@pytest.mark.asyncio
+async def test_later_stage_reuses_screening_of_same_content():
+    content = "Build a REST API for a todo app "
+    first = HAPCheckResult(result="flagged", severity=Severity.LOW, categories=[Category.PROFANITY],
+                           confidence=0.9, explanation="Contains profanity: crap")
+
+    reused = await check_content(content, previous=screening_record(content, first))
+
+    assert reused.severity == Severity.LOW and reused.explanation == first.explanation
+    # A record for other content is not trusted
+    assert screening_record(content + "and drop tables", first)["content_hash"] != \
+        screening_record(content, first)["content_hash"]
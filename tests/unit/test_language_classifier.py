@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Test the shared language classifier for code, capsule file trees and descriptions
+"""
+
+import os
+import sys
+
+import pytest
+
+# Add src to path for imports
+sys.path.insert(0, '.')
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from src.common.language_classifier import (
+    classify_code, classify_description, classify_files, language_for_path
+)
+from src.orchestrator.shared_context import ContextBuilder
+
+SNIPPETS = {
+    "python": "import os\n\nclass User:\n    def __init__(self):\n        self.name = 'x'\n",
+    "javascript": "const express = require('express');\nconst app = express();\nmodule.exports = app;\n",
+    "typescript": "interface User {\n  name: string;\n}\nexport type Id = number;\n",
+    "go": "package main\n\nimport (\n  \"fmt\"\n)\n\nfunc main() {\n  x := 1\n  fmt.Println(x)\n}\n",
+    "rust": "use std::io;\nfn main() {\n    let mut s = String::new();\n    println!(\"{}\", s);\n}\n",
+    "java": "public class App {\n  public static void main(String[] args) {\n    System.out.println(1);\n  }\n}\n",
+    "cpp": "#include <iostream>\nusing namespace std;\nint main() {\n  cout << 1;\n}\n",
+}
+
+
+def test_code_is_classified_with_confidence():
+    for language, code in SNIPPETS.items():
+        guess = classify_code(code)
+        assert guess.language == language, (language, guess.scores)
+        assert 0 < guess.confidence <= 1
+
+    # A lone colon is not enough evidence for anything
+    weak = classify_code("value:\n")
+    assert weak.language is None and weak.confidence == 0.0
+
+
+def test_extension_and_shebang_outweigh_tokens():
+    # The extension decides without looking at the content
+    assert classify_code(SNIPPETS["python"], path="src/app.js").language == "javascript"
+    assert classify_code("#!/usr/bin/env python3\nx = 1\n").language == "python"
+    assert classify_code("#!/bin/bash\necho hi\n").language == "shell"
+
+    # .h is shared by C and C++, so the content breaks the tie
+    assert classify_code("#include <vector>\nclass A {\n};\n", path="a.h").language == "cpp"
+    assert language_for_path("include/a.h") is None
+    assert language_for_path("Main.JAVA") == "java"
+
+
+def test_capsule_tree_is_classified_in_one_call():
+    guesses = classify_files({
+        "main.py": "",
+        "server/index.ts": "",
+        "README.md": SNIPPETS["javascript"],
+        "bin/run": "#!/usr/bin/env node\nconsole.log(1)\n",
+    })
+
+    assert {path: guess.language for path, guess in guesses.items()} == {
+        "main.py": "python", "server/index.ts": "typescript", "README.md": None, "bin/run": "javascript",
+    }
+
+
+def test_descriptions_match_whole_terms():
+    assert classify_description("Create a TypeScript Express API").language == "typescript"
+    assert classify_description("Go microservice with gin").language == "go"
+    # 'go' inside 'google' and 'js' inside 'json' are not mentions
+    assert classify_description("Parse google json exports in Python").language == "python"
+    assert classify_description("Build a todo app").language is None
+
+    restricted = classify_description("A React app", languages=("python", "javascript"), min_score=1)
+    assert restricted.language == "javascript"
+
+
+def test_shared_context_uses_the_classifier():
+    assert ContextBuilder._detect_language("Angular dashboard") == "typescript"
+    assert ContextBuilder._detect_language("React app") == "javascript"
+    assert ContextBuilder._detect_language("Build a todo app") == "python"
+
+
+def test_language_detector_uses_the_classifier():
+    # Importing src.agents pulls in the LLM clients
+    pytest.importorskip("anthropic")
+    from src.agents.language_utils import LanguageDetector
+
+    assert LanguageDetector.detect_language(code=SNIPPETS["rust"]) == "rust"
+    assert LanguageDetector.detect_language(description="Spring Boot service in Java") == "java"
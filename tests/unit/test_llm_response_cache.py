@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Test LLM request coalescing and the exact and similarity response caches
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+# Add src to path for imports
+sys.path.insert(0, '.')
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+# Importing src.agents pulls in the provider SDKs
+pytest.importorskip("anthropic")
+
+from src.agents.llm_cache import CachePolicy, LLMResponseCache, NO_SHARING, json_content
+
+MESSAGES = [{"role": "system", "content": "You are a code reviewer."},
+            {"role": "user", "content": "Review def add(a, b): return a + b"}]
+
+
+class Provider:
+    """Counts completion calls and answers each after a short delay"""
+
+    def __init__(self, delay=0.05, error=None):
+        self.calls = 0
+        self.delay = delay
+        self.error = error
+
+    def completion(self, content="looks good"):
+        async def complete():
+            self.calls += 1
+            await asyncio.sleep(self.delay)
+            if self.error:
+                raise self.error
+            return {"content": content, "model": "gpt-4-turbo", "provider": "openai",
+                    "usage": {"prompt_tokens": 1000, "completion_tokens": 500, "total_tokens": 1500}}
+        return complete
+
+
+async def ask(cache, provider, messages=MESSAGES, tenant_id="tenant-a", temperature=0,
+              policy=CachePolicy(scope="review")):
+    return await cache.get_or_complete(
+        provider.completion(), policy=policy, tenant_id=tenant_id, provider="openai",
+        model="gpt-4-turbo", messages=messages, temperature=temperature, max_tokens=2000
+    )
+
+
+async def bag_of_words(texts):
+    vocabulary = ["review", "def", "add", "a", "b", "return", "sub", "x", "y", "class", "user"]
+    return [[float(text.lower().replace("(", " ").replace(")", " ").replace(",", " ").split().count(word))
+             for word in vocabulary] for text in texts]
+
+
+@pytest.mark.asyncio
+async def test_identical_requests_in_flight_share_one_call():
+    cache, provider = LLMResponseCache(), Provider()
+
+    results = await asyncio.gather(*(ask(cache, provider) for _ in range(10)))
+
+    assert provider.calls == 1
+    assert all(r["content"] == "looks good" for r in results)
+    assert sorted(r.get("cache_hit", "miss") for r in results) == ["coalesced"] * 9 + ["miss"]
+
+    # Once answered, the same request comes from the exact cache
+    again = await ask(cache, provider)
+    assert again["cache_hit"] == "exact" and provider.calls == 1
+
+    stats = cache.get_stats()
+    assert stats["coalesced"] == 9 and stats["exact_hits"] == 1 and stats["misses"] == 1
+    # gpt-4-turbo at $10/$30 per 1M tokens is $0.025 a call
+    assert stats["saved_cost_usd"] == pytest.approx(10 * 0.025)
+    assert stats["by_scope"]["review"]["exact_hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_only_deterministic_calls_from_the_same_tenant_and_call_site_are_shared():
+    cache, provider = LLMResponseCache(), Provider(delay=0)
+
+    await ask(cache, provider, tenant_id="tenant-a")
+    await ask(cache, provider, tenant_id="tenant-b")
+    await ask(cache, provider, policy=CachePolicy(scope="cleanup"))
+    assert provider.calls == 3
+
+    # Sampled calls always reach the provider
+    await asyncio.gather(ask(cache, provider, temperature=0.3), ask(cache, provider, temperature=0.3))
+    await ask(cache, provider, policy=NO_SHARING)
+    assert provider.calls == 6
+
+
+@pytest.mark.asyncio
+async def test_failures_reach_every_waiter_and_are_not_cached():
+    cache, failing = LLMResponseCache(), Provider(error=RuntimeError("provider down"))
+
+    results = await asyncio.gather(*(ask(cache, failing) for _ in range(3)), return_exceptions=True)
+    assert failing.calls == 1
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+    healthy = Provider(delay=0)
+    assert (await ask(cache, healthy))["content"] == "looks good"
+    assert healthy.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_responses_the_call_site_cannot_parse_are_not_cached():
+    cache, provider = LLMResponseCache(), Provider(delay=0)
+    policy = CachePolicy(scope="solution_review", validate=json_content)
+
+    # "looks good" is not JSON: the retry has to reach the provider again
+    await ask(cache, provider, policy=policy)
+    again = await ask(cache, provider, policy=policy)
+    assert "cache_hit" not in again and provider.calls == 2
+
+    valid = await cache.get_or_complete(
+        provider.completion('{"valid": true}'), policy=policy, tenant_id="tenant-a", provider="openai",
+        model="gpt-4-turbo", messages=MESSAGES, temperature=0, max_tokens=2000
+    )
+    assert valid["content"] == '{"valid": true}'
+    assert (await ask(cache, provider, policy=policy))["cache_hit"] == "exact"
+    assert provider.calls == 3
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_shared_call():
+    cache, provider = LLMResponseCache(), Provider(delay=0.1)
+
+    first = asyncio.ensure_future(ask(cache, provider))
+    await asyncio.sleep(0.01)
+    second = asyncio.ensure_future(ask(cache, provider))
+    await asyncio.sleep(0.01)
+    first.cancel()
+
+    assert (await second)["cache_hit"] == "coalesced"
+    assert provider.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_similarity_cache_is_opt_in_and_tenant_scoped():
+    cache = LLMResponseCache(embed_fn=bag_of_words)
+    provider = Provider(delay=0)
+    semantic = CachePolicy(scope="tone", semantic=True, similarity=0.95)
+    near_duplicate = [MESSAGES[0], {"role": "user", "content": "Review  def add(a, b):  return a + b "}]
+    different = [MESSAGES[0], {"role": "user", "content": "Review class User"}]
+
+    await ask(cache, provider, policy=semantic)
+    hit = await ask(cache, provider, messages=near_duplicate, policy=semantic)
+    assert hit["cache_hit"] == "semantic" and provider.calls == 1
+
+    await ask(cache, provider, messages=different, policy=semantic)
+    await ask(cache, provider, messages=near_duplicate, tenant_id="tenant-b", policy=semantic)
+    # Without opting in only exact matches are reused
+    await ask(cache, provider, messages=near_duplicate, policy=CachePolicy(scope="tone"))
+    assert provider.calls == 4
+    assert cache.get_stats()["semantic_hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_llm_client_shares_deterministic_completions():
+    from src.agents.azure_llm_client import LLMClient, LLMProvider
+
+    client = LLMClient()
+    client.response_cache = LLMResponseCache()
+    provider = Provider()
+
+    async def complete(messages, model, *args, **kwargs):
+        return await provider.completion()()
+
+    client._complete = complete
+    results = await asyncio.gather(*(
+        client.chat_completion(MESSAGES, model="gpt-4-turbo", provider=LLMProvider.OPENAI,
+                               temperature=0, tenant_id="tenant-a")
+        for _ in range(4)
+    ))
+
+    assert provider.calls == 1 and len(results) == 4
+    assert client.response_cache.get_stats()["coalesced"] == 3
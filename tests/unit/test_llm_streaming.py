@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+"""
+Test streamed LLM completions: provider streams, token accounting, early abort and progress
+"""
+
+import asyncio
+import json
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+import pytest
+
+# Add src to path for imports
+sys.path.insert(0, '.')
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+# Importing src.agents pulls in the provider SDKs
+pytest.importorskip("anthropic")
+
+from src.agents import azure_llm_client
+from src.agents.azure_llm_client import LLMClient, LLMProvider
+from src.agents.base_agents import generation_guard
+from src.agents.llm_streaming import StreamAborted, StreamProgress
+
+MESSAGES = [{"role": "system", "content": "You are an expert software architect."},
+            {"role": "user", "content": "Write a user service in Python"}]
+LINES = [f"    field_{i} = {i}\n" for i in range(40)]
+
+
+class FakeStream:
+    """Yields provider events with a delay before each, like a provider generating tokens"""
+
+    def __init__(self, events, delay=0.01):
+        self.events = events
+        self.delay = delay
+        self.sent = 0
+        self.closed = False
+
+    def __aiter__(self):
+        return self._events()
+
+    async def _events(self):
+        for event in self.events:
+            await asyncio.sleep(self.delay)
+            self.sent += 1
+            yield event
+
+    async def close(self):
+        self.closed = True
+
+
+class FakeProvider:
+    """Stands in for an SDK client; create() returns a FakeStream and records its arguments"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.requests = []
+        self.chat = SimpleNamespace(completions=self)
+        self.messages = self
+
+    async def create(self, **kwargs):
+        self.requests.append(kwargs)
+        return self.stream
+
+
+def openai_event(content=None, finish_reason=None, usage=None):
+    choices = [SimpleNamespace(delta=SimpleNamespace(content=content), finish_reason=finish_reason)]
+    return SimpleNamespace(model="gpt-4-turbo-2024-04-09", choices=[] if usage else choices,
+                           usage=SimpleNamespace(**usage) if usage else None)
+
+
+def openai_events(lines):
+    return ([openai_event(line) for line in lines]
+            + [openai_event(finish_reason="stop"),
+               openai_event(usage={"prompt_tokens": 52, "completion_tokens": 4 * len(lines)})])
+
+
+@pytest.fixture
+def client(monkeypatch):
+    async def allow(*args, **kwargs):
+        return True
+
+    tracked = []
+
+    async def track_llm_cost(**kwargs):
+        tracked.append(kwargs)
+
+    monkeypatch.setattr(azure_llm_client.global_rate_limiter, "wait_and_acquire", allow)
+    monkeypatch.setattr(azure_llm_client, "track_llm_cost", track_llm_cost)
+    # Only the fake providers each test installs, never SDK clients from the environment
+    monkeypatch.setattr(LLMClient, "_initialize_clients", lambda self: None)
+    llm = LLMClient()
+    llm.tracked = tracked
+    return llm
+
+
+@pytest.mark.asyncio
+async def test_openai_text_arrives_as_it_is_generated(client):
+    provider = FakeProvider(FakeStream(openai_events(LINES)))
+    client.clients[LLMProvider.OPENAI] = provider
+
+    sent_at_arrival = []
+    async with client.stream_chat_completion(MESSAGES, model="gpt-4-turbo", provider=LLMProvider.OPENAI,
+                                             max_tokens=4000, workflow_id="wf-1", task_id="t-1") as stream:
+        async for delta in stream:
+            sent_at_arrival.append(provider.stream.sent)
+    await asyncio.sleep(0)
+
+    # The first line arrives before the provider has sent the rest
+    assert sent_at_arrival[0] < len(provider.stream.events)
+    assert sent_at_arrival == sorted(sent_at_arrival)
+    assert provider.requests[0]["stream"] is True
+    assert provider.requests[0]["stream_options"] == {"include_usage": True}
+    assert provider.stream.closed
+
+    response = stream.response
+    assert response["content"] == "".join(LINES)
+    assert response["finish_reason"] == "stop" and response["streamed"] is True
+    # Reported usage replaces the running estimate
+    assert response["usage"] == {"prompt_tokens": 52, "completion_tokens": 160, "total_tokens": 212}
+    assert response["cost"]["estimated"] is False
+    assert response["cost"]["total_cost_usd"] == pytest.approx((52 * 10 + 160 * 30) / 1_000_000)
+
+    [tracked] = client.tracked
+    assert tracked["completion_tokens"] == 160 and tracked["workflow_id"] == "wf-1"
+    assert tracked["metadata"] == {"streamed": True, "usage_estimated": False}
+
+
+@pytest.mark.asyncio
+async def test_groq_stream_reports_usage_under_x_groq(client):
+    events = [openai_event(line) for line in LINES[:5]] + [openai_event(finish_reason="stop")]
+    # Groq's final chunk carries usage in x_groq rather than a usage-only chunk
+    events[-1].x_groq = SimpleNamespace(usage=SimpleNamespace(prompt_tokens=40, completion_tokens=20))
+    provider = FakeProvider(FakeStream(events, delay=0))
+    client.clients[LLMProvider.GROQ] = provider
+
+    response = await client.chat_completion(MESSAGES, model="llama3-70b-8192", provider=LLMProvider.GROQ,
+                                            stream=True)
+
+    # The Groq SDK raises TypeError on stream_options
+    assert "stream_options" not in provider.requests[0]
+    assert response["content"] == "".join(LINES[:5])
+    assert response["usage"] == {"prompt_tokens": 40, "completion_tokens": 20, "total_tokens": 60}
+
+
+@pytest.mark.asyncio
+async def test_anthropic_stream_through_chat_completion(client):
+    events = [SimpleNamespace(type="message_start",
+                              message=SimpleNamespace(model="claude-3-opus", usage=SimpleNamespace(input_tokens=30)))]
+    events += [SimpleNamespace(type="content_block_delta", delta=SimpleNamespace(type="text_delta", text=line))
+               for line in LINES[:5]]
+    events += [SimpleNamespace(type="message_delta", delta=SimpleNamespace(stop_reason="end_turn"),
+                               usage=SimpleNamespace(output_tokens=25)),
+               SimpleNamespace(type="message_stop")]
+    provider = FakeProvider(FakeStream(events, delay=0))
+    client.clients[LLMProvider.ANTHROPIC] = provider
+
+    response = await client.chat_completion(MESSAGES, model="claude-3-opus", provider=LLMProvider.ANTHROPIC,
+                                            stream=True)
+
+    assert response["content"] == "".join(LINES[:5])
+    assert response["usage"] == {"prompt_tokens": 30, "completion_tokens": 25, "total_tokens": 55}
+    assert response["finish_reason"] == "end_turn" and response["model"] == "claude-3-opus"
+
+
+@pytest.mark.asyncio
+async def test_validator_aborts_a_generation_gone_wrong(client):
+    lines = ["Here is the service:\n", "```javascript\n"] + LINES
+    provider = FakeProvider(FakeStream(openai_events(lines), delay=0))
+    client.clients[LLMProvider.OPENAI] = provider
+
+    with pytest.raises(StreamAborted) as aborted:
+        await client.chat_completion(MESSAGES, model="gpt-4-turbo", provider=LLMProvider.OPENAI,
+                                     max_tokens=4000, should_abort=generation_guard("python"))
+    await asyncio.sleep(0)
+
+    assert aborted.value.reason == "generated javascript instead of python"
+    assert aborted.value.response["finish_reason"] == "aborted"
+    # The provider stream is closed as soon as the fence is seen
+    assert provider.stream.closed and provider.stream.sent == 2
+
+    # What was generated before the abort is still billed, from the running count
+    [tracked] = client.tracked
+    assert tracked["completion_tokens"] == -(-len("".join(lines[:2])) // 4)
+    assert tracked["metadata"]["usage_estimated"] is True
+    assert tracked["metadata"]["abort_reason"] == aborted.value.reason
+
+
+def test_generation_guard():
+    python = generation_guard("python")
+    assert python("Sure:\n```py\nimport os\n") is None
+    assert python("```bash\npip install flask\n") is None
+
+    assert generation_guard("typescript")("```js\nconst a = 1;\n") is None
+    assert generation_guard("go")("```rust\nfn main() {}\n") == "generated rust instead of go"
+
+    looping = "```python\n" + "x = 1\n" * 25
+    assert generation_guard("python")(looping) == "the same line repeated 25 times"
+    assert generation_guard("python")("```python\n" + "\n" * 30) is None
+
+
+@pytest.mark.asyncio
+async def test_progress_is_forwarded_while_tokens_arrive(client):
+    provider = FakeProvider(FakeStream(openai_events(LINES)))
+    client.clients[LLMProvider.OPENAI] = provider
+    published = []
+
+    async def publish(event):
+        published.append((time.perf_counter(), event))
+
+    progress = StreamProgress("wf-1", task_id="t-1", interval=0.05, publish=publish)
+    start = time.perf_counter()
+    response = await client.chat_completion(MESSAGES, model="gpt-4-turbo", provider=LLMProvider.OPENAI,
+                                            max_tokens=400, progress=progress)
+
+    events = [event for _, event in published]
+    # The first tokens reach clients at once, the rest in throttled batches
+    assert published[0][0] - start < 0.1
+    assert 3 <= len(events) < len(LINES) / 2
+    assert all(e.type.value == "task_progress" and e.task_id == "t-1" for e in events)
+
+    data = [e.data for e in events]
+    assert "".join(d["delta"] for d in data) == response["content"]
+    assert all(later["offset"] == earlier["offset"] + len(earlier["delta"])
+               for earlier, later in zip(data, data[1:]))
+    assert data[-1]["stage"] == "generated" and data[-1]["progress_percentage"] == 40.0
+
+
+class FakeEventStream:
+    """botocore EventStream of response stream events"""
+
+    def __init__(self, events):
+        self.events = events
+        self.closed = False
+
+    def __iter__(self):
+        for event in self.events:
+            time.sleep(0.005)
+            yield {"chunk": {"bytes": json.dumps(event).encode()}}
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.mark.asyncio
+async def test_bedrock_response_stream(monkeypatch):
+    pytest.importorskip("boto3")
+    from src.agents.aws_bedrock_client import ProductionBedrockClient
+
+    events = [{"type": "message_start", "message": {"usage": {"input_tokens": 40}}}]
+    events += [{"type": "content_block_delta", "delta": {"type": "text_delta", "text": line}} for line in LINES[:10]]
+    events += [{"type": "message_delta", "delta": {"stop_reason": "end_turn"}, "usage": {"output_tokens": 30}},
+               {"type": "message_stop",
+                "amazon-bedrock-invocationMetrics": {"inputTokenCount": 40, "outputTokenCount": 30}}]
+    body = FakeEventStream(events)
+    monkeypatch.setattr(ProductionBedrockClient, "_initialize_client", lambda self: None)
+    bedrock = ProductionBedrockClient(region="us-east-1")
+    bedrock._client = SimpleNamespace(invoke_model_with_response_stream=lambda **kwargs: {"body": body})
+
+    chunks = [chunk async for chunk in bedrock.stream_chat_completion(
+        MESSAGES, model="anthropic.claude-3-haiku-20240307-v1:0", max_tokens=1000)]
+
+    assert "".join(c.delta for c in chunks) == "".join(LINES[:10])
+    assert [c.finish_reason for c in chunks if c.finish_reason] == ["end_turn"]
+    assert chunks[-1].cost["total_cost_usd"] > 0 and body.closed
+    assert bedrock.metrics.successful_requests == 1
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Test the local fast-path validators that run ahead of the LLM validation mesh
+"""
+
+import sys
+
+import pytest
+
+# Add src to path for imports
+sys.path.insert(0, '.')
+
+from src.common.models import ValidationStatus
+from src.validation.local_validators import PYFLAKES_AVAILABLE, LocalValidatorPool, analyze_code
+
+
+def test_python_syntax_error_is_rejected_locally():
+    result = analyze_code("def broken(:\n    pass\n", "python")
+
+    assert result["rejected"]
+    assert result["resolved"] == ["syntax_validator"]
+    assert result["checks"][0]["status"] == "failed"
+    assert result["checks"][0]["details"]["line"] == 1
+
+
+def test_valid_python_resolves_syntax_only():
+    result = analyze_code("import os\n\ndef f(x):\n    return x + 1\n", "python")
+
+    assert not result["rejected"]
+    assert result["resolved"] == ["syntax_validator"]
+
+
+@pytest.mark.skipif(not PYFLAKES_AVAILABLE, reason="pyflakes not installed")
+def test_undefined_names_fail_the_type_gate():
+    result = analyze_code("def f():\n    return missing_name\n", "python")
+
+    assert result["rejected"]
+    assert "type_validator" in result["resolved"]
+    assert "missing_name" in result["checks"][-1]["details"]["issues"][0]
+
+
+def test_data_formats_only_need_security_review():
+    ok = analyze_code('{"a": 1}', "json")
+    bad = analyze_code("key: [unclosed", "yaml")
+
+    assert ok["remaining"] == ["security_validator"]
+    assert not ok["rejected"]
+    assert bad["rejected"]
+
+
+def test_unknown_language_defers_to_llm():
+    assert analyze_code("whatever", "cobol") == {"checks": [], "resolved": [], "rejected": False}
+
+
+@pytest.mark.asyncio
+async def test_pool_returns_validation_checks():
+    pool = LocalValidatorPool(max_workers=1)
+    try:
+        analysis = await pool.analyze("x = (", "python")
+    finally:
+        pool.shutdown()
+
+    assert analysis.rejected
+    assert analysis.checks[0].status == ValidationStatus.FAILED
+    assert analysis.duration_ms > 0
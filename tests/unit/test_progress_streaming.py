@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Test cross-replica progress streaming and per-client backpressure
+"""
+
+import asyncio
+import json
+import os
+import sys
+import uuid
+from datetime import datetime
+
+import httpx
+import pytest
+
+# Add src to path for imports
+sys.path.insert(0, '.')
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from src.common.progress_streaming import (
+    ProgressEvent, ProgressEventType, ProgressStreamManager, ProgressSubscriber
+)
+
+
+class FakeRedisStreams:
+    """Just enough of the Redis stream commands, shared by several managers"""
+
+    def __init__(self):
+        self.streams = {}
+        self.ms = 1000
+        self.appended = asyncio.Condition()
+
+    async def xadd(self, key, fields, maxlen=None, approximate=True):
+        self.ms += 1
+        stream_id = f"{self.ms}-0"
+        self.streams.setdefault(key, []).append((stream_id, fields))
+        async with self.appended:
+            self.appended.notify_all()
+        return stream_id
+
+    async def expire(self, key, ttl):
+        return True
+
+    async def xrange(self, key, min="-", max="+"):
+        entries = self.streams.get(key, [])
+        if min.startswith("("):
+            after = int(min[1:].split("-")[0])
+            return [e for e in entries if int(e[0].split("-")[0]) > after]
+        return list(entries)
+
+    def _newer(self, streams):
+        response = []
+        for key, cursor in streams.items():
+            after = int(cursor.split("-")[0])
+            entries = [e for e in self.streams.get(key, []) if int(e[0].split("-")[0]) > after]
+            if entries:
+                response.append((key, entries))
+        return response
+
+    async def xread(self, streams, block=None, count=None):
+        async with self.appended:
+            try:
+                await asyncio.wait_for(
+                    self.appended.wait_for(lambda: self._newer(streams)), timeout=(block or 0) / 1000
+                )
+            except asyncio.TimeoutError:
+                return []
+        return self._newer(streams)
+
+
+def make_event(workflow_id, event_type, **data):
+    return ProgressEvent(
+        id=str(uuid.uuid4()),
+        type=event_type,
+        timestamp=datetime.utcnow(),
+        source="test",
+        data=data,
+        workflow_id=workflow_id
+    )
+
+
+def make_manager(redis=None):
+    manager = ProgressStreamManager()
+    manager._redis = redis
+    return manager
+
+
+def test_slow_subscriber_coalesces_and_keeps_terminal_event():
+    subscriber = ProgressSubscriber("wf-1", max_buffer=3)
+    subscriber.offer("1-0", {"type": "task_started", "task_id": "t1"})
+    subscriber.offer("2-0", {"type": "status_update", "data": {"progress_percentage": 10}})
+    subscriber.offer("3-0", {"type": "workflow_completed"})
+    # Buffer full: the newer status supersedes the buffered one
+    subscriber.offer("4-0", {"type": "status_update", "data": {"progress_percentage": 20}})
+    # Nothing to coalesce: the oldest non-terminal event goes
+    subscriber.offer("5-0", {"type": "log_message"})
+    # Replayed or duplicate IDs are ignored
+    subscriber.offer("4-0", {"type": "status_update"})
+
+    assert [stream_id for stream_id, _ in subscriber.buffer] == ["3-0", "4-0", "5-0"]
+    assert subscriber.coalesced == 1
+    assert subscriber.dropped == 1
+
+
+def test_batch_status_updates_are_not_coalesced_with_each_other():
+    subscriber = ProgressSubscriber("wf-1", max_buffer=2)
+    subscriber.offer("1-0", {"type": "status_update", "data": {"batch_index": 0, "completed_tasks": ["t1"]}})
+    subscriber.offer("2-0", {"type": "status_update", "data": {"batch_index": 1, "completed_tasks": ["t2"]}})
+    # A plain status update doesn't replace either batch; the oldest event makes room
+    subscriber.offer("3-0", {"type": "status_update", "data": {"status": "running"}})
+
+    assert [stream_id for stream_id, _ in subscriber.buffer] == ["2-0", "3-0"]
+    assert subscriber.coalesced == 0
+    assert subscriber.dropped == 1
+
+
+@pytest.mark.asyncio
+async def test_local_subscribe_resumes_after_last_event_id():
+    manager = make_manager()
+    first = await manager.publish_event(make_event("wf-2", ProgressEventType.TASK_STARTED))
+    second = await manager.publish_event(make_event("wf-2", ProgressEventType.TASK_COMPLETED))
+
+    subscriber = await manager.subscribe("wf-2", last_event_id=first)
+    stream_id, event = await subscriber.get(timeout=1)
+    await manager.unsubscribe(subscriber)
+
+    assert stream_id == second
+    assert event["type"] == "task_completed"
+    assert "wf-2" not in manager.get_metrics()["subscribers_by_workflow"]
+
+
+@pytest.mark.asyncio
+async def test_sse_stream_ends_after_terminal_event():
+    manager = make_manager()
+    stream = manager.create_sse_stream("wf-3", keepalive_seconds=0.05)
+
+    async def publish():
+        await asyncio.sleep(0.05)
+        await manager.publish_event(make_event("wf-3", ProgressEventType.STATUS_UPDATE, progress_percentage=50))
+        await manager.publish_event(make_event("wf-3", ProgressEventType.WORKFLOW_COMPLETED))
+
+    publisher = asyncio.create_task(publish())
+    frames = [frame async for frame in stream]
+    await publisher
+
+    events = [json.loads(frame.split("data: ", 1)[1]) for frame in frames if "data: " in frame]
+    assert [event["type"] for event in events] == ["status_update", "workflow_completed"]
+    assert frames[-1].startswith("id: 0-2\n")
+    assert manager.get_metrics()["active_connections"] == 0
+
+
+@pytest.mark.asyncio
+async def test_events_reach_subscribers_on_other_replicas():
+    redis = FakeRedisStreams()
+    worker, replica = make_manager(redis), make_manager(redis)
+    await replica.start()
+    try:
+        early = await worker.publish_event(make_event("wf-4", ProgressEventType.TASK_STARTED))
+        subscriber = await replica.subscribe("wf-4")
+        late = await worker.publish_event(make_event("wf-4", ProgressEventType.WORKFLOW_COMPLETED))
+
+        received = [await subscriber.get(timeout=2), await subscriber.get(timeout=2)]
+    finally:
+        await replica.stop()
+
+    assert [stream_id for stream_id, _ in received] == [early, late]
+    assert received[1][1]["type"] == "workflow_completed"
+
+
+def workflow_server(status, events=(), keepalives=True):
+    """httpx transport for a workflow whose stream holds only the given events, then keepalives"""
+    calls = {"status": 0, "streams": 0}
+
+    async def stream_body():
+        for i, event in enumerate(events):
+            yield f"id: {i}\ndata: {json.dumps(event)}\n\n".encode()
+        while keepalives:
+            await asyncio.sleep(0.01)
+            yield b": keepalive\n\n"
+
+    def handler(request):
+        path = request.url.path
+        if path.startswith("/progress/stream/"):
+            calls["streams"] += 1
+            return httpx.Response(200, content=stream_body(), headers={"content-type": "text/event-stream"})
+        calls["status"] += 1
+        return httpx.Response(200, json={"workflow_id": "wf-1", "status": status, "started_at": None,
+                                         "completed_at": None, "execution_time": None, "progress": {}})
+
+    return httpx.MockTransport(handler), calls
+
+
+def sdk_client(transport):
+    sys.path.insert(0, "client/python")
+    from qlp_client import QLPClient
+
+    client = QLPClient(base_url="http://qlp")
+    client.client = httpx.AsyncClient(transport=transport)
+    return client
+
+
+@pytest.mark.asyncio
+async def test_sdk_notices_a_cancelled_workflow_while_the_stream_idles():
+    transport, calls = workflow_server("CANCELLED", events=[{"type": "task_started", "data": {}}])
+    client = sdk_client(transport)
+
+    with pytest.raises(RuntimeError, match="cancelled"):
+        await asyncio.wait_for(client.wait_for_completion("wf-1", timeout=30, idle_check_interval=0.1), 2)
+    await client.client.aclose()
+    assert calls["status"] == 2
+
+
+@pytest.mark.asyncio
+async def test_sdk_polls_at_once_when_the_stream_delivers_nothing():
+    transport, calls = workflow_server("TERMINATED", keepalives=False)
+    client = sdk_client(transport)
+
+    with pytest.raises(RuntimeError, match="terminated"):
+        await asyncio.wait_for(client.wait_for_completion("wf-1", timeout=30, idle_check_interval=60), 1)
+    await client.client.aclose()
+    # One connection, no reconnects, then straight to the status check
+    assert calls == {"status": 1, "streams": 1}
+
+
+@pytest.mark.asyncio
+async def test_cli_stops_following_a_quiet_stream_of_a_timed_out_workflow():
+    sys.path.insert(0, "qlp-cli")
+    from types import SimpleNamespace
+    from qlp_cli.api_client import QLPClient
+
+    transport, calls = workflow_server("timed_out", events=[{"type": "task_started", "data": {}}])
+    client = QLPClient(SimpleNamespace(api_url="http://qlp", api_key=None))
+
+    async with httpx.AsyncClient(transport=transport) as http:
+        finished = await asyncio.wait_for(
+            client._follow_progress_stream(http, "wf-1", idle_check_interval=0.1), 2
+        )
+    assert finished and calls["status"] == 1
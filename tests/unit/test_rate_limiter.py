@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Test LLM rate limiting: continuous refill, fair queuing and shared backoff
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+# Add src to path for imports
+sys.path.insert(0, '.')
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+# Importing src.agents pulls in the provider SDKs
+pytest.importorskip("anthropic")
+
+from src.agents.rate_limiter import (
+    REDUCE_SCRIPT, REFUND_SCRIPT, TAKE_SCRIPT, DistributedRateLimiter, ProviderRateLimiter, TokenBucket, _take
+)
+
+
+def test_take_refills_continuously():
+    state = {}
+    assert _take(state, 0.0, rpm=60, tpm=6000, cost=6000) == (True, 0.0)
+
+    allowed, wait = _take(state, 0.0, rpm=60, tpm=6000, cost=100)
+    assert not allowed and wait == pytest.approx(1.0)
+
+    # Half a second later half the deficit has trickled back
+    allowed, wait = _take(state, 0.5, rpm=60, tpm=6000, cost=100)
+    assert not allowed and wait == pytest.approx(0.5)
+    assert _take(state, 1.0, rpm=60, tpm=6000, cost=100)[0]
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_refills_before_full_period():
+    bucket = TokenBucket(capacity=100, refill_rate=100, refill_period=60.0)
+    assert await bucket.acquire(100)
+
+    bucket.last_refill -= 6.0
+    assert await bucket.acquire(10)
+
+
+@pytest.mark.asyncio
+async def test_waiters_are_served_round_robin_across_tenants():
+    limiter = ProviderRateLimiter(
+        provider_limits={"openai": {"rpm": 6000, "tpm": 60000}},
+        backend=DistributedRateLimiter()
+    )
+    # Drain the bucket so every waiter has to queue (100 tokens refill in 0.1s)
+    assert await limiter.acquire("openai", 60000)
+
+    order = []
+
+    async def request(tenant, name):
+        assert await limiter.wait_and_acquire("openai", 100, max_wait=5.0, tenant_id=tenant)
+        order.append(name)
+
+    await asyncio.gather(
+        request("a", "a1"), request("a", "a2"), request("a", "a3"), request("b", "b1")
+    )
+
+    assert order == ["a1", "b1", "a2", "a3"]
+
+
+@pytest.mark.asyncio
+async def test_wait_times_out_without_blocking_queue():
+    limiter = ProviderRateLimiter(
+        provider_limits={"openai": {"rpm": 60, "tpm": 600}},
+        backend=DistributedRateLimiter()
+    )
+    assert await limiter.acquire("openai", 600)
+
+    start = time.monotonic()
+    assert not await limiter.wait_and_acquire("openai", 600, max_wait=0.05)
+    assert time.monotonic() - start < 0.5
+    assert await limiter.wait_and_acquire("unknown", 1)
+
+
+class SlowBackend(DistributedRateLimiter):
+    """Local buckets whose grants take longer to arrive than the caller waits"""
+
+    async def try_acquire(self, *args):
+        await asyncio.sleep(0.1)
+        return await super().try_acquire(*args)
+
+
+@pytest.mark.asyncio
+async def test_timeout_during_dispatch_refunds_the_grant():
+    backend = SlowBackend()
+    limiter = ProviderRateLimiter(provider_limits={"openai": {"rpm": 2, "tpm": 1000}}, backend=backend)
+
+    assert not await limiter.wait_and_acquire("openai", 800, max_wait=0.02)
+    # Let the dispatcher finish the grant nobody is waiting for
+    await limiter._queues[("openai", "default")].dispatcher
+
+    bucket = backend._local["qlp:ratelimit:openai:default:bucket"]
+    assert bucket["requests"] == pytest.approx(2, abs=0.01)
+    assert bucket["tokens"] == pytest.approx(1000, abs=1)
+
+
+@pytest.mark.asyncio
+async def test_reduction_is_shared_through_backend():
+    backend = DistributedRateLimiter()
+    first = ProviderRateLimiter(provider_limits={"groq": {"rpm": 10, "tpm": 1000}}, backend=backend)
+    second = ProviderRateLimiter(provider_limits={"groq": {"rpm": 10, "tpm": 1000}}, backend=backend)
+
+    assert await first.report_rate_limited("groq") == pytest.approx(0.8)
+    assert await second.report_rate_limited("groq") == pytest.approx(0.64)
+    # Scaled capacity is 640 tokens, so a 700 token request is capped rather than starved
+    assert await second.acquire("groq", 700)
+    assert not await first.acquire("groq", 1)
+
+
+def redis_backend(server):
+    """DistributedRateLimiter running its Lua scripts on a fake Redis server"""
+    fakeredis = pytest.importorskip("fakeredis")
+    backend = DistributedRateLimiter(redis_url="redis://fake")
+    backend._redis = fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+    backend._take_script = backend._redis.register_script(TAKE_SCRIPT)
+    backend._refund_script = backend._redis.register_script(REFUND_SCRIPT)
+    backend._reduce_script = backend._redis.register_script(REDUCE_SCRIPT)
+    return backend
+
+
+@pytest.mark.asyncio
+async def test_redis_buckets_are_shared_and_refill():
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    first, second = redis_backend(server), redis_backend(server)
+
+    assert await first.try_acquire("openai", "gpt-4", rpm=2, tpm=1000, tokens=400) == 0
+    assert await second.try_acquire("openai", "gpt-4", rpm=2, tpm=1000, tokens=400) == 0
+    # Both requests were taken from the same bucket: no requests left, a minute per request
+    wait = await first.try_acquire("openai", "gpt-4", rpm=2, tpm=1000, tokens=100)
+    assert 29 < wait <= 30
+    # A denied call debits nothing
+    bucket = await first._redis.hgetall("qlp:ratelimit:openai:gpt-4:bucket")
+    assert float(bucket["requests"]) == pytest.approx(0, abs=0.01)
+    assert float(bucket["tokens"]) == pytest.approx(200, abs=1)
+    # Other deployments have their own bucket
+    assert await first.try_acquire("openai", "gpt-4o", rpm=2, tpm=1000, tokens=400) == 0
+
+    # Half a minute later (on the Redis clock) one request and 500 tokens have refilled
+    await first._redis.hincrby("qlp:ratelimit:openai:gpt-4:bucket", "ts", -30000)
+    assert await second.try_acquire("openai", "gpt-4", rpm=2, tpm=1000, tokens=600) == 0
+    wait = await first.try_acquire("openai", "gpt-4", rpm=2, tpm=1000, tokens=1)
+    assert wait > 0
+
+    # A refunded grant is available again, but never beyond the limits
+    await second.refund("openai", "gpt-4", rpm=2, tpm=1000, tokens=600)
+    await second.refund("openai", "gpt-4", rpm=2, tpm=1000, tokens=600)
+    bucket = await first._redis.hgetall("qlp:ratelimit:openai:gpt-4:bucket")
+    assert float(bucket["requests"]) == pytest.approx(2, abs=0.01)
+    assert float(bucket["tokens"]) == pytest.approx(1000, abs=1)
+
+
+@pytest.mark.asyncio
+async def test_reported_429_shrinks_redis_limits_for_every_process():
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    limits = {"groq": {"rpm": 10, "tpm": 1000}}
+    first = ProviderRateLimiter(provider_limits=limits, backend=redis_backend(server))
+    second = ProviderRateLimiter(provider_limits=limits, backend=redis_backend(server))
+
+    assert await first.report_rate_limited("groq") == pytest.approx(0.8)
+    assert await second.report_rate_limited("groq") == pytest.approx(0.64)
+    ttl = await first.backend._redis.ttl("qlp:ratelimit:groq:default:scale")
+    assert 0 < ttl <= 600
+
+    # Scaled capacity is 640 tokens: a 700 token request is capped, then the bucket is empty
+    assert await second.acquire("groq", 700)
+    assert not await first.acquire("groq", 1)
+
+    # The scale bottoms out at the floor
+    for _ in range(20):
+        scale = await first.report_rate_limited("groq")
+    assert scale == pytest.approx(0.1)
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Test batched multi-file execution in the sandbox service
+"""
+
+import asyncio
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+# Add src to path for imports
+sys.path.insert(0, '.')
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from src.sandbox import main as sandbox_main
+from src.sandbox.client import SandboxServiceClient
+from src.sandbox.container_pool import ContainerPool, PoolConfig
+from src.validation.dependency_layers import DependencyLayer
+
+
+class ScriptedContainer:
+    """Fake container whose exec results are looked up by the test file name"""
+
+    def __init__(self, outcomes):
+        self.outcomes = outcomes
+        self.archives = []
+        self.commands = []
+        self.images = []
+        self.removed = False
+
+    def put_archive(self, path, data):
+        self.archives.append(path)
+
+    def exec_run(self, cmd, **kwargs):
+        if cmd[0] != "timeout":
+            # Pool housekeeping: chown on start, kill and reset on release
+            return SimpleNamespace(exit_code=0, output=b"")
+        self.commands.append(cmd)
+        exit_code, stdout = self.outcomes[cmd[-1]]
+        return SimpleNamespace(exit_code=exit_code, output=(stdout, b"boom" if exit_code else None))
+
+    def remove(self, force=False):
+        self.removed = True
+
+
+class FakeDependencyLayers:
+    """Stands in for the layer cache; records the manifests it was asked to install"""
+
+    def __init__(self, layer):
+        self.layer = layer
+        self.requests = []
+
+    async def get_layer_for_manifests(self, language, base_image, install_command, manifests):
+        self.requests.append((language, base_image, install_command, manifests))
+        return self.layer
+
+
+def make_manager(outcomes, layer=None):
+    container = ScriptedContainer(outcomes)
+
+    def run(**kwargs):
+        container.images.append(kwargs["image"])
+        return container
+
+    client = SimpleNamespace(containers=SimpleNamespace(run=run))
+    manager = sandbox_main.SandboxManager.__new__(sandbox_main.SandboxManager)
+    manager.client = client
+    manager.dependency_layers = FakeDependencyLayers(layer)
+    manager.pool = ContainerPool(client, sandbox_main.LANGUAGE_IMAGES, PoolConfig(languages=["python"], size=1))
+    return manager, container
+
+
+def batch_request(**overrides):
+    payload = {
+        "files": {"app.py": "x = 1", "tests/test_app.py": "def test(): pass"},
+        "language": "python",
+        "tests": [
+            {"name": "ok", "command": ["python", "ok.py"]},
+            {"name": "broken", "command": ["python", "broken.py"]}
+        ],
+        **overrides
+    }
+    return sandbox_main.BatchExecutionRequest(**payload)
+
+
+@pytest.mark.asyncio
+async def test_batch_runs_all_tests_in_one_container():
+    manager, container = make_manager({"ok.py": (0, b"1 passed"), "broken.py": (1, b"")})
+
+    events = [event async for event in manager.execute_batch(batch_request())]
+
+    assert [e["type"] for e in events] == ["case", "case", "summary"]
+    assert events[0]["passed"] and events[0]["output"] == "1 passed"
+    assert not events[1]["passed"] and events[1]["error"] == "boom"
+    assert events[2]["passed"] == 1 and events[2]["failed"] == 1 and not events[2]["all_passed"]
+    assert container.archives == ["/app"]
+    assert manager.pool.get_stats()["created"] == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_setup_skips_tests():
+    manager, _ = make_manager({"setup.py": (2, b""), "ok.py": (0, b""), "broken.py": (0, b"")})
+
+    events = [event async for event in manager.execute_batch(batch_request(setup_command=["python", "setup.py"]))]
+
+    assert events[0]["type"] == "setup" and not events[0]["passed"]
+    assert [e["status"] for e in events[1:3]] == ["skipped", "skipped"]
+    assert events[-1]["skipped"] == 2
+
+
+@pytest.mark.asyncio
+async def test_tests_run_on_the_dependency_layer_image():
+    layer = DependencyLayer(image="qlp-deps/nodejs:abc", key="abc", cache_hit=True, install_success=True,
+                            install_time=0.0, linked_dirs=("node_modules",))
+    manager, container = make_manager({"ok.ts": (0, b"")}, layer=layer)
+    manifests = {"package.json": '{"devDependencies": {"tsx": "*"}}'}
+
+    events = [event async for event in manager.execute_batch(batch_request(
+        language="typescript", manifests=manifests,
+        tests=[{"name": "ok", "command": ["npx", "tsx", "--test", "ok.ts"]}]
+    ))]
+
+    assert events[0] == {"type": "install", "execution_id": events[-1]["execution_id"], "passed": True,
+                         "cache_hit": True, "image": "qlp-deps/nodejs:abc", "duration_ms": 0, "error": None}
+    assert events[-1]["all_passed"]
+    assert manager.dependency_layers.requests == [
+        ("nodejs", "node:18-slim", "npm install --no-audit --no-fund", manifests)
+    ]
+    # A one-off container on the layer image, with node_modules linked in before the runner starts
+    assert container.images == ["qlp-deps/nodejs:abc"]
+    [command] = container.commands
+    assert command[4:7] == ["sh", "-c", 'ln -sfn /deps/node_modules node_modules && exec "$@"']
+    assert command[-4:] == ["npx", "tsx", "--test", "ok.ts"]
+    await asyncio.gather(*manager.pool._background)
+    assert container.removed
+
+
+@pytest.mark.asyncio
+async def test_failed_install_skips_tests():
+    layer = DependencyLayer(image="python:3.11-slim", key="abc", cache_hit=False, install_success=False,
+                            install_time=1.0, stderr="No matching distribution found for pytset")
+    manager, _ = make_manager({}, layer=layer)
+
+    events = [event async for event in manager.execute_batch(batch_request(manifests={"requirements.txt": "pytset"}))]
+
+    assert events[0]["type"] == "install" and not events[0]["passed"]
+    assert "No matching distribution" in events[0]["error"]
+    assert [e["status"] for e in events[1:3]] == ["skipped", "skipped"]
+
+
+def test_capsule_manifests_add_the_test_runner():
+    pytest.importorskip("temporalio")
+    from src.orchestrator.worker_production import build_capsule_test_manifests
+
+    python = build_capsule_test_manifests("python", {"requirements.txt": "requests==2.31.0", "app.py": ""})
+    assert python == {"requirements.txt": "requests==2.31.0\npytest\n"}
+    assert build_capsule_test_manifests("python", {"requirements.txt": "pytest>=7\n"}) == {"requirements.txt": "pytest>=7\n"}
+    assert build_capsule_test_manifests("python", {}) == {"requirements.txt": "pytest\n"}
+
+    typescript = build_capsule_test_manifests("typescript", {"package.json": '{"dependencies": {"zod": "^3"}}'})
+    assert json.loads(typescript["package.json"]) == {"dependencies": {"zod": "^3"}, "devDependencies": {"tsx": "*"}}
+    # node --test ships with node; only the capsule's own dependencies are installed
+    assert build_capsule_test_manifests("javascript", {"app.js": ""}) == {}
+
+
+@pytest.mark.asyncio
+async def test_batch_endpoint_streams_ndjson_to_client(monkeypatch):
+    manager, _ = make_manager({"ok.py": (0, b""), "broken.py": (0, b"")})
+    monkeypatch.setattr(sandbox_main, "sandbox_manager", manager)
+
+    client = SandboxServiceClient("http://sandbox")
+    client.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=sandbox_main.app))
+    seen = []
+    result = await client.execute_batch(
+        files={"app.py": ""},
+        language="python",
+        tests=[{"name": "ok", "command": ["python", "ok.py"]}, {"name": "also-ok", "command": ["python", "broken.py"]}],
+        on_event=seen.append
+    )
+    await client.close()
+
+    assert [e["type"] for e in seen] == ["case", "case", "summary"]
+    assert result["summary"]["all_passed"]
+    assert [c["name"] for c in result["cases"]] == ["ok", "also-ok"]
+
+
+@pytest.mark.asyncio
+async def test_batch_endpoint_returns_json_when_not_streaming(monkeypatch):
+    manager, _ = make_manager({"ok.py": (0, b""), "broken.py": (1, b"")})
+    monkeypatch.setattr(sandbox_main, "sandbox_manager", manager)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=sandbox_main.app), base_url="http://sandbox") as client:
+        response = await client.post("/execute/batch", json={**json.loads(batch_request().model_dump_json()), "stream": False})
+
+    body = response.json()
+    assert response.status_code == 200
+    assert len(body["cases"]) == 2
+    assert body["summary"]["failed"] == 1
+
+
+class LocalBatchSandbox:
+    """execute_batch that writes the files to a directory and really runs each command"""
+
+    def __init__(self, workdir):
+        self.workdir = workdir
+
+    async def execute_batch(self, files, language, tests, **kwargs):
+        import subprocess
+
+        for name, content in files.items():
+            (self.workdir / name).write_text(content)
+        cases = []
+        for test in tests:
+            run = subprocess.run([sys.executable, *test["command"][1:]], cwd=self.workdir,
+                                 capture_output=True, text=True)
+            cases.append({"name": test["name"], "status": "completed" if run.returncode == 0 else "failed",
+                          "passed": run.returncode == 0, "output": run.stdout, "error": run.stderr,
+                          "duration_ms": 1})
+        return {"cases": cases}
+
+
+@pytest.mark.asyncio
+async def test_batched_test_cases_each_run_with_their_own_input(tmp_path):
+    from src.agents.advanced_generation import ExecutionBasedValidator
+
+    validator = ExecutionBasedValidator(None, LocalBatchSandbox(tmp_path))
+    code = "import sys\nprint(x * int(sys.argv[1]))\n"
+
+    result = await validator._execute_test_cases_batch(code, "python", [
+        {"name": "doubles", "input": {"x": 2}, "args": [2], "expected_output": "4"},
+        {"name": "triples", "input": {"x": 5}, "args": [3], "expected_output": "16"},
+    ])
+
+    assert [case["output"] for case in result["test_results"]] == ["4\n", "15\n"]
+    assert result["pass_rate"] == 0.5
+    assert [failure["test_case"] for failure in result["failures"]] == ["triples"]
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Test pooled service clients: retry policy, circuit breaker and pool metrics
+"""
+
+import os
+import sys
+
+import httpx
+import pytest
+
+# Add src to path for imports
+sys.path.insert(0, '.')
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from src.common.error_handling import CircuitBreakerError, RetryStrategy
+from src.common.service_clients import ServiceClient, ServiceClientRegistry, ServiceConfig
+
+
+def make_client(name: str, handler) -> ServiceClient:
+    config = ServiceConfig(name=name, base_url="http://test-service", timeout=5.0, max_connections=2)
+    client = ServiceClient(config, retry_strategy=RetryStrategy(max_attempts=3, initial_delay=0, jitter=False))
+    client._client = httpx.AsyncClient(base_url=config.base_url, transport=httpx.MockTransport(handler))
+    return client
+
+
+@pytest.mark.asyncio
+async def test_retries_server_errors_then_succeeds():
+    statuses = iter([503, 502, 200])
+    attempts = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(next(statuses), json={"path": request.url.path})
+
+    client = make_client("retry-ok", handler)
+    response = await client.post("/execute", json={}, retry=True,
+                                 on_attempt=lambda a, m: attempts.append((a, m)))
+
+    assert response.status_code == 200
+    assert response.json() == {"path": "/execute"}
+    assert attempts == [(1, 3), (2, 3), (3, 3)]
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_returns_last_server_error_after_retries():
+    client = make_client("retry-exhausted", lambda request: httpx.Response(500))
+
+    response = await client.get("/performance/task")
+
+    assert response.status_code == 500
+    assert client.get_metrics()["total_requests"] == 3
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_posts_are_not_retried_by_default():
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.path)
+        return httpx.Response(503)
+
+    client = make_client("post-no-retry", handler)
+    response = await client.post("/store/capsule", json={})
+
+    assert response.status_code == 503
+    assert calls == ["/store/capsule"]
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_breaker_counts_one_failure_per_request_and_resets_on_success():
+    statuses = iter([500, 500, 500, 200])
+    client = make_client("breaker-count", lambda request: httpx.Response(next(statuses)))
+    breaker = client.circuit_breaker
+
+    await client.get("/health")
+    assert breaker.failure_count == 1
+
+    await client.get("/health")
+    assert breaker.failure_count == 0
+    assert breaker.state == "closed"
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_connect_errors_raise_after_retries():
+    def handler(request: httpx.Request) -> httpx.Response:
+        raise httpx.ConnectError("connection refused", request=request)
+
+    client = make_client("connect-error", handler)
+
+    with pytest.raises(httpx.ConnectError):
+        await client.get("/health")
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_open_circuit_breaker_short_circuits():
+    client = make_client("breaker", lambda request: httpx.Response(200))
+    client.circuit_breaker.failure_threshold = 1
+    client.circuit_breaker.record_failure()
+
+    with pytest.raises(CircuitBreakerError):
+        await client.get("/health")
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+async def test_registry_reuses_clients_and_reports_metrics():
+    registry = ServiceClientRegistry({
+        "svc": ServiceConfig(name="svc", base_url="http://svc", timeout=1.0)
+    })
+
+    assert registry["svc"] is registry["svc"]
+    with pytest.raises(KeyError):
+        registry["unknown"]
+
+    metrics = registry.get_metrics()
+    assert metrics["svc"]["in_use"] == 0
+    assert metrics["svc"]["max_connections"] == 20
+    await registry.aclose()
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Test the dataflow task scheduler used by QLPWorkflow
+
+Covers critical-path priorities, ready-queue dispatch, failure propagation and
+replay determinism of the workflow execution order.
+"""
+
+import sys
+import uuid
+from datetime import timedelta
+from typing import Any, Dict, List
+
+import pytest
+
+# Add src to path for imports
+sys.path.insert(0, '.')
+
+from src.orchestrator.task_scheduler import (
+    DataflowScheduler,
+    compute_critical_path_priorities,
+)
+
+
+def make_tasks(spec: Dict[str, str]) -> List[Dict[str, Any]]:
+    return [{"task_id": task_id, "complexity": complexity} for task_id, complexity in spec.items()]
+
+
+def run_schedule(scheduler: DataflowScheduler, durations: Dict[str, int]) -> List[str]:
+    """Simulate execution with fixed durations and return the start order"""
+    clock = 0
+    started = []
+    running = {}
+    for task in scheduler.take_ready():
+        started.append(task["task_id"])
+        running[task["task_id"]] = clock + durations[task["task_id"]]
+    while running:
+        clock = min(running.values())
+        for task_id in sorted(t for t, end in running.items() if end == clock):
+            del running[task_id]
+            scheduler.mark_completed(task_id)
+        for task in scheduler.take_ready():
+            started.append(task["task_id"])
+            running[task["task_id"]] = clock + durations[task["task_id"]]
+    return started
+
+
+def test_critical_path_prefers_long_chains():
+    tasks = make_tasks({"a": "simple", "b": "simple", "c": "complex", "d": "complex"})
+    # a -> c -> d is the long chain, b is a leaf
+    dependencies = {"c": ["a"], "d": ["c"]}
+
+    priorities = compute_critical_path_priorities(tasks, dependencies)
+
+    assert priorities == {"a": 7, "b": 1, "c": 6, "d": 3}
+
+
+def test_critical_path_ignores_unknown_and_cyclic_dependencies():
+    tasks = make_tasks({"a": "medium", "b": "medium", "c": "simple"})
+    dependencies = {"a": ["b", "missing"], "b": ["a"], "c": []}
+
+    priorities = compute_critical_path_priorities(tasks, dependencies)
+
+    assert priorities == {"a": 2, "b": 2, "c": 1}
+
+
+def test_task_starts_when_own_dependencies_finish():
+    # slow has no dependents; fast -> after_fast should not wait for slow
+    tasks = make_tasks({"slow": "complex", "fast": "simple", "after_fast": "simple"})
+    dependencies = {"after_fast": ["fast"]}
+    scheduler = DataflowScheduler(tasks, dependencies, max_parallel=5)
+
+    first = [t["task_id"] for t in scheduler.take_ready()]
+    assert first == ["slow", "fast"]
+
+    assert scheduler.mark_completed("fast") == ["after_fast"]
+    assert [t["task_id"] for t in scheduler.take_ready()] == ["after_fast"]
+    assert scheduler.running == {"slow", "after_fast"}
+
+
+def test_concurrency_cap_and_priority_order():
+    tasks = make_tasks({f"t{i}": "simple" for i in range(6)})
+    tasks.append({"task_id": "root", "complexity": "simple"})
+    dependencies = {"t5": ["t4"], "t4": ["t3"]}
+    scheduler = DataflowScheduler(tasks, dependencies, max_parallel=2)
+
+    # t3 heads the longest chain, then original order breaks ties
+    assert [t["task_id"] for t in scheduler.take_ready()] == ["t3", "t0"]
+    assert scheduler.take_ready() == []
+
+    scheduler.mark_completed("t0")
+    assert [t["task_id"] for t in scheduler.take_ready()] == ["t1"]
+
+
+def test_failed_dependency_skips_transitive_dependents():
+    tasks = make_tasks({"a": "simple", "b": "simple", "c": "simple", "d": "simple"})
+    dependencies = {"b": ["a"], "c": ["b"], "d": []}
+    scheduler = DataflowScheduler(tasks, dependencies)
+
+    scheduler.take_ready()
+    assert scheduler.mark_failed("a") == ["b", "c"]
+    scheduler.mark_completed("d")
+
+    assert scheduler.finished
+    assert scheduler.blocked() == ["b", "c"]
+    assert scheduler.completed == {"d"}
+
+
+def test_schedule_is_deterministic_across_input_ordering():
+    spec = {f"task_{i}": ("complex" if i % 3 == 0 else "simple") for i in range(15)}
+    dependencies = {f"task_{i}": [f"task_{i - 3}"] for i in range(3, 15)}
+    durations = {task_id: (5 if complexity == "complex" else 1) for task_id, complexity in spec.items()}
+
+    orders = []
+    for _ in range(3):
+        shuffled_deps = {k: list(reversed(v)) for k, v in reversed(list(dependencies.items()))}
+        scheduler = DataflowScheduler(make_tasks(spec), shuffled_deps, max_parallel=4)
+        orders.append(run_schedule(scheduler, durations))
+
+    assert orders[0] == orders[1] == orders[2]
+    assert sorted(orders[0]) == sorted(spec)
+
+
+@pytest.mark.asyncio
+async def test_workflow_replay_is_deterministic():
+    """Run QLPWorkflow against stub activities, then replay its history"""
+    from temporalio import activity
+    from temporalio.testing import WorkflowEnvironment
+    from temporalio.worker import Replayer, Worker
+
+    from src.orchestrator.worker_production import QLPWorkflow
+
+    try:
+        env = await WorkflowEnvironment.start_time_skipping()
+    except RuntimeError as e:
+        pytest.skip(f"Temporal test server unavailable: {e}")
+
+    tasks = [
+        {"task_id": f"task_{i}", "type": "code_generation", "description": f"Task {i}",
+         "complexity": "complex" if i % 2 else "simple", "dependencies": [], "context": {}, "metadata": {}}
+        for i in range(8)
+    ]
+    dependencies = {"task_2": ["task_0"], "task_3": ["task_1"], "task_6": ["task_2", "task_3"], "task_7": ["task_6"]}
+
+    @activity.defn(name="decompose_request_activity")
+    async def decompose(request):
+        return tasks, dependencies, {}
+
+    @activity.defn(name="select_agent_tier_activity")
+    async def select_tier(task):
+        return "T1"
+
+    @activity.defn(name="execute_task_activity")
+    async def execute(task, tier, request_id, shared_context):
+        return {"task_id": task["task_id"], "status": "completed", "output_type": "code", "output": {}}
+
+    @activity.defn(name="validate_result_activity")
+    async def validate(result, task):
+        return {"overall_status": "passed", "requires_human_review": False}
+
+    @activity.defn(name="save_workflow_checkpoint_activity")
+    async def checkpoint(workflow_id, tasks_completed, shared_context):
+        return {"saved": True}
+
+    @activity.defn(name="stream_workflow_results_activity")
+    async def stream(workflow_id, batch_idx, batch_results, total_batches):
+        return {"streamed": True}
+
+    @activity.defn(name="create_ql_capsule_activity")
+    async def create_capsule(request_id, tasks, results, shared_context):
+        return {"capsule_id": None}
+
+    async with env:
+        task_queue = f"scheduler-test-{uuid.uuid4()}"
+        async with Worker(
+            env.client,
+            task_queue=task_queue,
+            workflows=[QLPWorkflow],
+            activities=[decompose, select_tier, execute, validate, checkpoint, stream, create_capsule],
+        ):
+            handle = await env.client.start_workflow(
+                QLPWorkflow.run,
+                {"request_id": "replay-test", "metadata": {"max_parallel_tasks": 3}},
+                id=f"replay-test-{uuid.uuid4()}",
+                task_queue=task_queue,
+                execution_timeout=timedelta(minutes=5),
+            )
+            result = await handle.result()
+            history = await handle.fetch_history()
+
+        assert result["tasks_completed"] == len(tasks)
+        await Replayer(workflows=[QLPWorkflow]).replay_workflow(history)
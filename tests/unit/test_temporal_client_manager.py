@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Test the shared app-lifetime Temporal client pool
+"""
+
+import asyncio
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+# Add src to path for imports
+sys.path.insert(0, '.')
+
+from src.common.temporal_cloud import TemporalClientManager, TemporalUnavailableError
+
+
+class FakeConnector:
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.connects = 0
+        self.healthy = True
+
+    async def __call__(self):
+        self.connects += 1
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("handshake failed")
+        return SimpleNamespace(name=f"client-{self.connects}", service_client=SimpleNamespace(check_health=self.check_health))
+
+    async def check_health(self, timeout=None):
+        if not self.healthy:
+            raise ConnectionError("unhealthy")
+        return True
+
+
+@pytest.mark.asyncio
+async def test_clients_are_reused_round_robin():
+    connector = FakeConnector()
+    manager = TemporalClientManager(pool_size=2, health_interval=60, connect=connector)
+    await manager.start()
+    try:
+        names = [(await manager.get()).name for _ in range(4)]
+    finally:
+        await manager.stop()
+
+    assert connector.connects == 2
+    assert names == ["client-1", "client-2", "client-1", "client-2"]
+
+
+@pytest.mark.asyncio
+async def test_failed_startup_reconnects_in_background():
+    connector = FakeConnector(failures=1)
+    manager = TemporalClientManager(pool_size=1, health_interval=60, connect=connector)
+    await manager.start()
+    try:
+        assert not manager.is_connected
+        client = await manager.get(timeout=3.0)
+    finally:
+        await manager.stop()
+
+    assert client.name == "client-2"
+
+
+@pytest.mark.asyncio
+async def test_get_raises_when_temporal_stays_down():
+    manager = TemporalClientManager(pool_size=1, health_interval=60, connect=FakeConnector(failures=100))
+    await manager.start()
+    try:
+        with pytest.raises(TemporalUnavailableError):
+            await manager.get(timeout=0.05)
+    finally:
+        await manager.stop()
+
+
+@pytest.mark.asyncio
+async def test_unhealthy_connection_is_replaced():
+    connector = FakeConnector()
+    manager = TemporalClientManager(pool_size=1, health_interval=0.05, connect=connector)
+    await manager.start()
+    try:
+        connector.healthy = False
+        for _ in range(100):
+            await asyncio.sleep(0.02)
+            if manager.get_stats()["reconnecting"]:
+                break
+        connector.healthy = True
+        client = await manager.get(timeout=3.0)
+    finally:
+        await manager.stop()
+
+    assert connector.connects >= 2
+    assert client.name != "client-1"
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Test tier performance aggregates and the worker-side lookup cache
+"""
+
+import asyncio
+import os
+import sys
+
+import httpx
+import pytest
+
+# Add src to path for imports
+sys.path.insert(0, '.')
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from src.memory.tier_performance import TierPerformanceAggregate
+
+
+def test_aggregate_tracks_success_and_latency_per_tier():
+    aggregate = TierPerformanceAggregate(half_life_seconds=0)
+    aggregate.record("code_generation", "medium", "T1", True, 10.0, now=100)
+    aggregate.record("code_generation", "medium", "T1", False, 20.0, now=100)
+    aggregate.record("code_generation", "medium", "T2", True, 30.0, now=100)
+
+    perf = aggregate.get("code_generation", "medium", now=100)
+
+    assert perf["optimal_tier"] == "T2"
+    assert perf["sample_size"] == 3
+    assert perf["tier_performance"]["T1"]["success_rate"] == 0.5
+    assert perf["tier_performance"]["T1"]["avg_execution_time"] == 15.0
+    assert perf["tier_performance"]["T2"]["relative_cost"] == 0.6
+    assert aggregate.get("code_generation", "complex") is None
+
+
+def test_old_samples_decay():
+    aggregate = TierPerformanceAggregate(half_life_seconds=10)
+    aggregate.record("test_creation", "simple", "T0", False, 1.0, samples=4, now=0)
+    aggregate.record("test_creation", "simple", "T0", True, 1.0, samples=1, now=20)
+
+    perf = aggregate.get("test_creation", "simple", now=20)
+
+    # The four failures are two half-lives old and now weigh as one
+    assert perf["tier_stats"]["T0"]["total_count"] == 2.0
+    assert perf["tier_performance"]["T0"]["success_rate"] == 0.5
+
+
+@pytest.mark.asyncio
+async def test_worker_lookups_are_coalesced_and_cached():
+    from src.common import service_clients
+    from src.orchestrator import worker_production
+
+    calls = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(dict(request.url.params))
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, json={"tier_performance": {"T1": {"success_rate": 1.0, "relative_cost": 0.3}}})
+
+    registry = service_clients.ServiceClientRegistry({
+        "vector-memory": service_clients.ServiceConfig(name="vector-memory", base_url="http://vm", timeout=1.0)
+    })
+    registry["vector-memory"]._client = httpx.AsyncClient(base_url="http://vm", transport=httpx.MockTransport(handler))
+    service_clients._registry = registry
+    worker_production._task_performance_cache.clear()
+
+    try:
+        tasks = [
+            {"task_id": f"t{i}", "type": "code_generation", "complexity": "medium" if i % 2 else "simple"}
+            for i in range(20)
+        ]
+        tiers = await asyncio.gather(*(worker_production.select_agent_tier_activity(t) for t in tasks))
+        await worker_production.select_agent_tier_activity(tasks[0])
+    finally:
+        await service_clients.close_service_clients()
+
+    assert set(tiers) == {"T1"}
+    assert sorted(c["complexity"] for c in calls) == ["medium", "simple"]
+
+
+@pytest.mark.asyncio
+async def test_replicas_add_to_shared_counters_without_lost_updates():
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    replicas = []
+    for _ in range(3):
+        aggregate = TierPerformanceAggregate(half_life_seconds=0, reload_seconds=0)
+        aggregate._redis = fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+        replicas.append(aggregate)
+    assert await replicas[0].claim_seed("code_generation", "medium")
+
+    async def record(aggregate, i):
+        aggregate.record("code_generation", "medium", "T1", i % 2 == 0, 2.0, now=100)
+        await aggregate.persist("code_generation", "medium")
+
+    await asyncio.gather(*(record(replicas[i % 3], i) for i in range(30)))
+
+    # A replica whose copy has gone stale re-reads every replica's executions
+    reader = replicas[0]
+    assert not reader.is_loaded("code_generation", "medium")
+    assert await reader.load("code_generation", "medium")
+    stats = reader.get("code_generation", "medium", now=100)["tier_stats"]["T1"]
+    assert stats == {"success_count": 15.0, "total_count": 30.0, "total_time": 60.0}
+
+
+@pytest.mark.asyncio
+async def test_shared_counters_decay():
+    fakeredis = pytest.importorskip("fakeredis")
+    redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+    key = "qlp:tier_performance:test_creation:simple"
+    await redis.hset(key, mapping={"_seeded": "1", "T0:count": "4.0", "T0:successes": "0.0",
+                                   "T0:latency_sum": "4.0", "T0:updated_at": "0"})
+
+    aggregate = TierPerformanceAggregate(half_life_seconds=10)
+    aggregate._redis = redis
+    assert await aggregate.load("test_creation", "simple")
+    aggregate.record("test_creation", "simple", "T0", True, 1.0, now=20)
+    await aggregate.persist("test_creation", "simple")
+
+    stored = await redis.hgetall(key)
+    assert float(stored["T0:count"]) == 2.0 and float(stored["T0:successes"]) == 1.0
+    assert aggregate.get("test_creation", "simple", now=20)["tier_performance"]["T0"]["success_rate"] == 0.5
+
+
+@pytest.mark.asyncio
+async def test_keys_written_before_seeding_are_still_seeded():
+    fakeredis = pytest.importorskip("fakeredis")
+    aggregate = TierPerformanceAggregate(half_life_seconds=0)
+    aggregate._redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+
+    # An execution is added before any replica has seeded the key
+    aggregate.record("code_review", "simple", "T1", True, 1.0, now=10)
+    await aggregate.persist("code_review", "simple")
+
+    assert not await aggregate.load("code_review", "simple")
+    # Only the first replica to see a key seeds it from Qdrant
+    assert await aggregate.claim_seed("code_review", "simple")
+    assert not await aggregate.claim_seed("code_review", "simple")
+    assert await aggregate.load("code_review", "simple")
+    assert aggregate.get("code_review", "simple", now=10)["tier_stats"]["T1"]["total_count"] == 1.0
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Test the two-tier cache shared by validation, file organization and LLM responses
+"""
+
+import os
+import sys
+
+import pytest
+
+# Add src to path for imports
+sys.path.insert(0, '.')
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from src.common import tiered_cache
+from src.common.tiered_cache import TieredCache
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+        self.ttls = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def setex(self, key, ttl, value):
+        self.data[key] = value
+        self.ttls[key] = ttl
+
+    async def mget(self, keys):
+        self.mget_calls = getattr(self, "mget_calls", 0) + 1
+        return [self.data.get(key) for key in keys]
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def setex(self, key, ttl, value):
+        self.commands.append((key, ttl, value))
+
+    async def execute(self):
+        for key, ttl, value in self.commands:
+            await self.redis.setex(key, ttl, value)
+
+
+class BrokenRedis:
+    async def get(self, key):
+        raise ConnectionError("redis down")
+
+    async def setex(self, key, ttl, value):
+        raise ConnectionError("redis down")
+
+
+@pytest.mark.asyncio
+async def test_redis_hit_is_kept_locally():
+    shared = FakeRedis()
+    writer, reader = TieredCache("test"), TieredCache("test")
+    writer._redis = reader._redis = shared
+
+    await writer.put("k", {"files": ["a.py"]}, ttl_seconds=60)
+    assert shared.ttls["k"] == 60
+
+    assert await reader.get("k") == {"files": ["a.py"]}
+    assert len(reader) == 1
+    shared.data.clear()
+    assert await reader.get("k") == {"files": ["a.py"]}
+
+
+@pytest.mark.asyncio
+async def test_local_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(tiered_cache.time, "monotonic", lambda: now[0])
+    cache = TieredCache("test", ttl_seconds=10)
+
+    await cache.put("k", 1)
+    now[0] += 9
+    assert await cache.get("k") == 1
+    now[0] += 2
+    assert await cache.get("k") is None
+    assert len(cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_runs_on_the_local_tier_when_redis_fails():
+    cache = TieredCache("test")
+    cache._redis = BrokenRedis()
+
+    await cache.put("k", "v")
+    assert await cache.get("k") == "v"
+    assert await cache.get("missing") is None
+
+
+@pytest.mark.asyncio
+async def test_batch_lookups_take_one_redis_round_trip():
+    shared = FakeRedis()
+    writer, reader = TieredCache("test"), TieredCache("test", max_entries=2)
+    writer._redis = reader._redis = shared
+
+    await writer.put_many({"a": 1, "b": 2, "c": 3})
+    assert await reader.get("a") == 1
+
+    assert await reader.get_many(["a", "b", "c", "missing"]) == {"a": 1, "b": 2, "c": 3}
+    assert shared.mget_calls == 1
+    assert reader.evictions == 1
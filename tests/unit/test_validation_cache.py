@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Test the content-addressed validation result cache
+"""
+
+import sys
+
+import pytest
+
+# Add src to path for imports
+sys.path.insert(0, '.')
+
+from src.common.models import ValidationCheck, ValidationStatus
+from src.validation.validation_cache import ValidationCache, prompt_digest
+
+
+def make_check(status=ValidationStatus.PASSED):
+    return ValidationCheck(name="style_validator", type="style", status=status, message="ok", details={"issues": []})
+
+
+@pytest.mark.asyncio
+async def test_identical_code_hits_cache():
+    cache = ValidationCache()
+    prompt_hash = prompt_digest("model", "prompt")
+
+    assert await cache.get("style_validator", prompt_hash, "python", "x = 1") is None
+    await cache.put("style_validator", prompt_hash, "python", "x = 1", make_check())
+    cached = await cache.get("style_validator", prompt_hash, "Python", "x = 1")
+
+    assert cached.status == ValidationStatus.PASSED
+    assert cached.details == {"issues": []}
+    stats = cache.get_stats()
+    assert stats["hits"] == 1 and stats["lookups"] == 2
+    assert stats["by_validator"]["style_validator"]["hit_rate"] == 0.5
+
+
+@pytest.mark.asyncio
+async def test_prompt_change_or_different_code_misses():
+    cache = ValidationCache()
+    await cache.put("style_validator", prompt_digest("model", "v1"), "python", "x = 1", make_check())
+
+    assert await cache.get("style_validator", prompt_digest("model", "v2"), "python", "x = 1") is None
+    assert await cache.get("style_validator", prompt_digest("model", "v1"), "python", "x = 2") is None
+    assert await cache.get("security_validator", prompt_digest("model", "v1"), "python", "x = 1") is None
+
+
+@pytest.mark.asyncio
+async def test_lru_evicts_oldest_entries():
+    cache = ValidationCache(max_entries=2)
+    for code in ("a", "b", "c"):
+        await cache.put("style_validator", "h", "python", code, make_check())
+
+    assert await cache.get("style_validator", "h", "python", "a") is None
+    assert await cache.get("style_validator", "h", "python", "c") is not None
+    assert cache.get_stats()["entries"] == 2
+
+
+@pytest.mark.asyncio
+async def test_redis_tier_is_shared():
+    class FakeRedis:
+        def __init__(self):
+            self.data = {}
+
+        async def get(self, key):
+            return self.data.get(key)
+
+        async def setex(self, key, ttl, value):
+            self.data[key] = value
+
+    shared = FakeRedis()
+    writer, reader = ValidationCache(), ValidationCache()
+    writer.store._redis = reader.store._redis = shared
+
+    await writer.put("style_validator", "h", "python", "x = 1", make_check(ValidationStatus.WARNING))
+    cached = await reader.get("style_validator", "h", "python", "x = 1")
+
+    assert cached.status == ValidationStatus.WARNING
+    assert reader.get_stats()["entries"] == 1
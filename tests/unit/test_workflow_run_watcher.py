@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Test event-driven workflow run watching against a local stand-in for the GitHub Actions API
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+# Add src to path for imports
+sys.path.insert(0, '.')
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from src.orchestrator.workflow_run_watcher import WorkflowRunWatcher
+
+HEADERS = {"Authorization": "token test-token"}
+
+
+class FakeActions:
+    """Latest ci.yml run per repository, served with ETags"""
+
+    def __init__(self):
+        self.runs = {}
+        self.requests = 0
+        self.not_modified = 0
+        self.app = web.Application()
+        self.app.router.add_get("/repos/{owner}/{repo}/actions/workflows/{workflow}/runs", self.list_runs)
+
+    def set_run(self, repo, run_id, status, conclusion=None):
+        self.runs[repo] = {"id": run_id, "status": status, "conclusion": conclusion}
+
+    async def list_runs(self, request):
+        self.requests += 1
+        assert request.match_info["workflow"] == "ci.yml"
+        run = self.runs.get(request.match_info["repo"])
+        etag = f'"{hash(str(run))}"'
+        if request.headers.get("If-None-Match") == etag:
+            self.not_modified += 1
+            return web.Response(status=304)
+        return web.json_response({"workflow_runs": [run] if run else []}, headers={"ETag": etag})
+
+
+def make_watcher(server, **intervals):
+    watcher = WorkflowRunWatcher(**intervals)
+    watcher.api_base = str(server.make_url("")).rstrip("/")
+    return watcher
+
+
+def wait(watcher, repo, timeout=5, exclude_run_id=None):
+    return asyncio.create_task(watcher.wait_for_completed_run(
+        "octo", repo, HEADERS, ".github/workflows/ci.yml", timeout=timeout, exclude_run_id=exclude_run_id
+    ))
+
+
+@pytest.mark.asyncio
+async def test_webhook_event_wakes_waiter_without_waiting_for_a_poll():
+    fake = FakeActions()
+    fake.set_run("app", 1, "in_progress")
+    async with TestServer(fake.app) as server:
+        # Fallback polls are far apart, so only the event can finish in time
+        watcher = make_watcher(server, min_interval=60, max_interval=60)
+        waiter = wait(watcher, "app")
+        await asyncio.sleep(0.2)
+
+        fake.set_run("app", 1, "completed", "success")
+        start = time.perf_counter()
+        await watcher.publish_event("workflow_run", {"repository": {"full_name": "octo/App"}})
+        run = await waiter
+
+    assert run["conclusion"] == "success"
+    assert time.perf_counter() - start < 1
+    assert fake.requests == 2
+
+
+@pytest.mark.asyncio
+async def test_fallback_polling_is_conditional_and_backs_off():
+    fake = FakeActions()
+    fake.set_run("app", 1, "completed", "failure")
+    async with TestServer(fake.app) as server:
+        watcher = make_watcher(server, min_interval=0.05, max_interval=0.2)
+        # Run 1 was already handled; wait for the next one
+        waiter = wait(watcher, "app", exclude_run_id=1)
+        await asyncio.sleep(0.6)
+        assert not waiter.done()
+        polls_while_unchanged = fake.requests
+
+        fake.set_run("app", 2, "completed", "success")
+        run = await waiter
+
+    assert run["id"] == 2
+    assert fake.not_modified >= 2
+    # Backing off from 0.05s to 0.2s polls far fewer than 0.6 / 0.05 times
+    assert polls_while_unchanged < 8
+
+
+@pytest.mark.asyncio
+async def test_one_watcher_multiplexes_many_repositories():
+    fake = FakeActions()
+    repos = [f"app-{i}" for i in range(200)]
+    for repo in repos:
+        fake.set_run(repo, 1, "queued")
+    async with TestServer(fake.app) as server:
+        watcher = make_watcher(server, min_interval=60, max_interval=60)
+        waiters = [wait(watcher, repo) for repo in repos]
+        # Wait for the first poll of every repository, however slow the machine
+        for _ in range(100):
+            if fake.requests == 200:
+                break
+            await asyncio.sleep(0.05)
+        assert watcher.get_metrics()["repositories"] == 200
+
+        for i, repo in enumerate(repos):
+            fake.set_run(repo, 1, "completed", "success" if i % 2 else "failure")
+            watcher.notify(f"octo/{repo}")
+        runs = await asyncio.gather(*waiters)
+
+    assert [run["conclusion"] for run in runs] == ["success" if i % 2 else "failure" for i in range(200)]
+    # One poll to start and one per event, no polling loop per repository
+    assert fake.requests == 400
+    assert watcher.get_metrics()["watches"] == 0
+
+
+@pytest.mark.asyncio
+async def test_waiter_times_out():
+    fake = FakeActions()
+    fake.set_run("app", 1, "in_progress")
+    async with TestServer(fake.app) as server:
+        watcher = make_watcher(server, min_interval=0.05, max_interval=0.1)
+        assert await wait(watcher, "app", timeout=0.3) is None
+
+
+@pytest.mark.asyncio
+async def test_running_workflow_is_polled_without_backoff():
+    fake = FakeActions()
+    fake.set_run("app", 1, "in_progress")
+    async with TestServer(fake.app) as server:
+        watcher = make_watcher(server, min_interval=0.05, max_interval=1.0)
+        waiter = wait(watcher, "app")
+        await asyncio.sleep(0.5)
+        polls_while_running = fake.requests
+
+        fake.set_run("app", 1, "completed", "success")
+        run = await waiter
+
+    assert run["conclusion"] == "success"
+    # Backing off would have polled about four times in 0.5s
+    assert polls_while_running >= 6
+
+
+@pytest.mark.asyncio
+async def test_events_from_other_replicas_are_followed_by_stream_id():
+    fakeredis = pytest.importorskip("fakeredis")
+    redis_server = fakeredis.FakeServer()
+    fake = FakeActions()
+    fake.set_run("app", 1, "in_progress")
+    async with TestServer(fake.app) as server:
+        watcher, other_replica = make_watcher(server, min_interval=60, max_interval=60), WorkflowRunWatcher()
+        for replica in (watcher, other_replica):
+            replica.redis_url = "redis://fake"
+            replica._redis = fakeredis.FakeAsyncRedis(server=redis_server, decode_responses=True)
+        # Entries from before the watcher started are not replayed
+        await other_replica.publish_event("workflow_run", {"repository": {"full_name": "octo/old"}})
+        waiter = wait(watcher, "app")
+        await asyncio.sleep(0.2)
+
+        fake.set_run("app", 1, "completed", "success")
+        await other_replica.publish_event("workflow_run", {"repository": {"full_name": "octo/app"}})
+        run = await waiter
+
+    assert run["conclusion"] == "success"
+    assert watcher.events == 1
+    [(last_id, _)] = await other_replica._redis.xrevrange("qlp:github:events", count=1)
+    assert watcher._last_event_id == last_id
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Test the workflow status projection used by /workflow/status polls
+"""
+
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+from temporalio.testing import ActivityEnvironment
+
+# Add src to path for imports
+sys.path.insert(0, '.')
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+from src.orchestrator import workflow_status
+from src.orchestrator.workflow_status import WorkflowStatusStore, summarize_result, terminal_snapshot
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.ops = []
+
+    def set(self, key, value, ex=None, nx=False):
+        self.ops.append((key, value, nx))
+
+    async def execute(self):
+        for key, value, nx in self.ops:
+            if not (nx and key in self.redis.data):
+                self.redis.data[key] = value
+
+
+def make_store(redis=None):
+    store = WorkflowStatusStore()
+    store._redis = redis
+    return store
+
+
+WORKFLOW_RESULT = {
+    "request_id": "req-1",
+    "status": "completed",
+    "capsule_id": "cap-1",
+    "tasks_completed": 3,
+    "tasks_total": 3,
+    "outputs": [{"code": "x" * 10000}],
+    "metadata": {"capsule_info": {"files": {"src": ["main.py"]}, "source_code": {"main.py": "..."}}}
+}
+
+
+def test_summary_drops_bulky_outputs():
+    summary = summarize_result(WORKFLOW_RESULT)
+
+    assert summary["capsule_id"] == "cap-1"
+    assert "outputs" not in summary
+    assert summary["metadata"] == {"capsule_info": {"files": {"src": ["main.py"]}}}
+
+
+def test_terminal_status_follows_task_results():
+    partial = {
+        **WORKFLOW_RESULT,
+        "status": "partial",
+        "tasks_completed": 2,
+        "errors": [{"type": "task_failed", "message": "task-3 failed"}],
+        "metadata": {**WORKFLOW_RESULT["metadata"], "github_push": {"success": True}}
+    }
+
+    assert terminal_snapshot("wf-1", WORKFLOW_RESULT)["status"] == "completed"
+    # Every task done but not runtime validated is still a complete set of tasks
+    assert terminal_snapshot("wf-1", {**WORKFLOW_RESULT, "status": "partial"})["status"] == "completed"
+
+    snapshot = terminal_snapshot("wf-1", partial, started_at="2026-01-01T00:00:00")
+    assert snapshot["status"] == "partial" and snapshot["workflow_status"] == "partial"
+    assert (snapshot["tasks_completed"], snapshot["tasks_total"]) == (2, 3)
+    assert snapshot["error"] == "task-3 failed"
+    assert snapshot["result"]["metadata"]["github_push"] == {"success": True}
+
+    failed = {**WORKFLOW_RESULT, "status": "failed", "tasks_completed": 0, "errors": ["decomposition failed"]}
+    assert terminal_snapshot("wf-1", failed)["status"] == "failed"
+    assert terminal_snapshot("wf-1", failed)["error"] == "decomposition failed"
+
+
+@pytest.mark.asyncio
+async def test_terminal_snapshot_is_shared_and_result_stored_once():
+    redis = FakeRedis()
+    writer, reader = make_store(redis), make_store(redis)
+
+    await writer.put_terminal("wf-1", {"status": "completed", "result": summarize_result(WORKFLOW_RESULT)}, WORKFLOW_RESULT)
+    await writer.put_terminal("wf-1", {"status": "completed"}, {"status": "rewritten"})
+
+    snapshot = await reader.get_snapshot("wf-1")
+    assert snapshot["result_url"] == "/workflow/result/wf-1"
+    assert snapshot["result_ref"] == "qlp:workflow:result:wf-1"
+    assert (await reader.get_result("wf-1"))["outputs"] == WORKFLOW_RESULT["outputs"]
+
+    # Served from memory afterwards
+    redis.data.clear()
+    assert await reader.get_snapshot("wf-1") == snapshot
+    assert await make_store(redis).get_snapshot("wf-2") is None
+
+
+@pytest.mark.asyncio
+async def test_publish_activity_stores_summary(monkeypatch):
+    from src.orchestrator.worker_production import publish_workflow_status_activity
+
+    redis = FakeRedis()
+    monkeypatch.setattr(workflow_status, "workflow_status_store", make_store(redis))
+
+    result = await ActivityEnvironment().run(
+        publish_workflow_status_activity, "wf-9", {"started_at": "2026-01-01T00:00:00"}, WORKFLOW_RESULT
+    )
+
+    stored = json.loads(redis.data["qlp:workflow:status:wf-9"])
+    assert result == {"published": True, "result_ref": "qlp:workflow:result:wf-9"}
+    assert stored["status"] == "completed"
+    assert stored["started_at"] == "2026-01-01T00:00:00"
+    assert "outputs" not in stored["result"]
+
+
+def test_workflow_progress_query():
+    from src.orchestrator.worker_production import QLPWorkflow
+
+    wf = QLPWorkflow()
+    wf._set_stage("executing", tasks_total=4)
+    wf._progress.update(tasks_completed=1, current_task="task-1")
+
+    assert wf.get_status() == {
+        "current_stage": "executing",
+        "current_task": "task-1",
+        "tasks_completed": 1,
+        "tasks_total": 4
+    }
+
+
+@pytest.mark.asyncio
+async def test_publish_activity_reports_failed_runs(monkeypatch):
+    from src.common.progress_streaming import ProgressEventType, progress_manager
+    from src.orchestrator.worker_production import publish_workflow_status_activity
+
+    redis = FakeRedis()
+    published = []
+
+    async def publish_event(event):
+        published.append(event)
+
+    monkeypatch.setattr(workflow_status, "workflow_status_store", make_store(redis))
+    monkeypatch.setattr(progress_manager, "publish_event", publish_event)
+    failed = {**WORKFLOW_RESULT, "status": "failed", "tasks_completed": 0,
+              "errors": [{"type": "workflow_error", "message": "decomposition failed"}]}
+
+    await ActivityEnvironment().run(publish_workflow_status_activity, "wf-10", {}, failed)
+
+    stored = json.loads(redis.data["qlp:workflow:status:wf-10"])
+    assert stored["status"] == "failed" and stored["error"] == "decomposition failed"
+    assert stored["result"]["metadata"]["capsule_info"] == {"files": {"src": ["main.py"]}}
+    [event] = published
+    assert event.type == ProgressEventType.WORKFLOW_FAILED and event.data["status"] == "failed"
+
+
+class RunningHandle:
+    """Workflow handle whose result() would block until the run finishes"""
+
+    def __init__(self, status):
+        self.status = status
+
+    async def describe(self):
+        return SimpleNamespace(status=SimpleNamespace(name=self.status), start_time=None, close_time=None)
+
+    async def result(self):
+        raise AssertionError("result() must not be awaited for unfinished workflows")
+
+
+@pytest.mark.asyncio
+async def test_result_endpoint_rejects_unfinished_workflows(monkeypatch):
+    from fastapi import HTTPException
+    from src.orchestrator import unified_endpoints
+
+    class Client:
+        def get_workflow_handle(self, workflow_id):
+            return RunningHandle("RUNNING")
+
+    async def get_client():
+        return Client()
+
+    monkeypatch.setattr(unified_endpoints, "workflow_status_store", make_store(FakeRedis()))
+    monkeypatch.setattr(unified_endpoints, "get_shared_temporal_client", get_client)
+
+    with pytest.raises(HTTPException) as error:
+        await unified_endpoints.get_workflow_result("wf-11")
+    assert error.value.status_code == 409